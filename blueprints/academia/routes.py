@@ -427,6 +427,44 @@ def pagamentos_diaria():
                          pagamentos=pagamentos, academias=academias, academia_id=academia_id)
 
 
+@academia_bp.route("/visitantes/pagamentos-diaria/<int:pagamento_id>/comprovante")
+@login_required
+def comprovante_diaria(pagamento_id):
+    """Comprovante enviado pelo visitante (fora de /static: só a gestão da academia)."""
+    from utils.entrega_arquivos import enviar_upload
+
+    if not (
+        current_user.has_role("gestor_academia") or
+        current_user.has_role("professor") or
+        current_user.has_role("admin")
+    ):
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    academia_id, _ = _get_academia_gerenciamento()
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT vpd.comprovante
+            FROM visitante_pagamentos_diaria vpd
+            INNER JOIN visitantes v ON v.id = vpd.visitante_id
+            WHERE vpd.id = %s AND v.id_academia = %s
+        """, (pagamento_id, academia_id))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    comprovante = (row or {}).get("comprovante") or ""
+    # Gravado como "uploads/comprovantes/<arquivo>" (caminho relativo a static)
+    resp = enviar_upload(comprovante[len("uploads/"):] if comprovante.startswith("uploads/") else comprovante,
+                         como_anexo=False) if comprovante else None
+    if resp is None:
+        flash("Comprovante não encontrado.", "warning")
+        return redirect(url_for("academia.pagamentos_diaria"))
+    return resp
+
+
 @academia_bp.route("/visitantes/pagamentos-diaria/<int:pagamento_id>/confirmar", methods=["POST"])
 @login_required
 def confirmar_pagamento_diaria(pagamento_id):
@@ -9,12 +9,13 @@ from flask import (
     url_for,
     flash,
     Blueprint,
-    current_app,
     session,
 )
 from flask_login import login_required, current_user
 from config import get_db_connection
 from utils.modalidades import filtro_visibilidade_sql
+from utils import cache_calendario
+from utils import armazenamento
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 import os
@@ -184,14 +185,7 @@ def salvar_imagem_base64(data_url, prefix):
         return None
 
     filename = f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-    upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-    filepath = os.path.join(upload_folder, filename)
-
-    with open(filepath, "wb") as f:
-        f.write(img_data)
-
-    return filename
+    return armazenamento.salvar_bytes(img_data, filename)
 
 
 def salvar_arquivo_upload(file_storage, prefix):
@@ -209,11 +203,7 @@ def salvar_arquivo_upload(file_storage, prefix):
         ext = ".png"
 
     filename = f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}{ext.lower()}"
-    upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-    filepath = os.path.join(upload_folder, filename)
-    file_storage.save(filepath)
-    return filename
+    return armazenamento.salvar_arquivo(file_storage, filename)
 
 
 # ======================================================
@@ -1985,6 +1975,8 @@ def editar_aluno(aluno_id):
                 pass
 
             db.commit()
+            # Aulas do calendário do aluno dependem das turmas vinculadas
+            cache_calendario.invalidar_academias([aluno.get("id_academia")])
             flash(f'Dados do aluno "{nome}" atualizados com sucesso!', "success")
             db.close()
             redirect_url = request.form.get("next") or back_url
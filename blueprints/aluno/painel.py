@@ -7,6 +7,7 @@ from flask_login import login_required, current_user
 from config import get_db_connection
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
+from utils.ocorrencias import ocorre_em
 
 
 bp_painel_aluno = Blueprint(
@@ -1746,18 +1747,14 @@ def solicitar_visita(aluno, academia_destino_id):
             return redirect(url_for("painel_aluno.associacao"))
         
         dias_semana = (row_turma.get("dias_semana") or "").strip()
-        dias_list = [d.strip() for d in dias_semana.split(",") if d.strip()] if dias_semana else []
         
         # Validar cada data
         datas_validas = []
         datas_invalidas = []
         for data_visita_dt in datas_visita_list:
-            if dias_semana:
-                wd = data_visita_dt.weekday()
-                dia_num = "0" if wd == 6 else str(wd + 1)
-                if dia_num not in dias_list:
-                    datas_invalidas.append(data_visita_dt.strftime("%d/%m/%Y"))
-                    continue
+            if dias_semana and not ocorre_em(dias_semana, data_visita_dt):
+                datas_invalidas.append(data_visita_dt.strftime("%d/%m/%Y"))
+                continue
             
             # Verificar se já existe solicitação para esta data específica
             cur.execute(
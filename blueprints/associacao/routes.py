@@ -8,6 +8,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from config import get_db_connection
+from utils import armazenamento
 from utils.modalidades import filtro_visibilidade_sql
 
 associacao_bp = Blueprint("associacao", __name__, url_prefix="/associacao")
@@ -19,6 +20,14 @@ def _pasta_logos():
     return os.path.join(current_app.root_path, "static", "uploads", "logos")
 
 
+def _remover_logos(prefixo, entidade_id):
+    for ext in LOGO_EXTENSOES:
+        try:
+            armazenamento.remover(os.path.join("logos", f"{prefixo}_{entidade_id}{ext}"))
+        except OSError:
+            pass
+
+
 def _slugify(nome):
     """Converte nome em slug URL-amigável: 'Academia Judô Centro' -> 'academia-judo-centro'."""
     if not nome:
@@ -43,19 +52,9 @@ def salvar_logo_base64(data_url, prefixo, entidade_id):
         img_data = base64.b64decode(encoded)
     except Exception:
         return None
-    pasta = _pasta_logos()
-    os.makedirs(pasta, exist_ok=True)
-    for ext in LOGO_EXTENSOES:
-        existente = os.path.join(pasta, f"{prefixo}_{entidade_id}{ext}")
-        if os.path.exists(existente):
-            try:
-                os.remove(existente)
-            except OSError:
-                pass
+    _remover_logos(prefixo, entidade_id)
     filename = f"{prefixo}_{entidade_id}.png"
-    filepath = os.path.join(pasta, filename)
-    with open(filepath, "wb") as f:
-        f.write(img_data)
+    armazenamento.salvar_bytes(img_data, os.path.join("logos", filename))
     return filename
 
 
@@ -65,17 +64,9 @@ def salvar_logo(file_storage, prefixo, entidade_id):
     ext = os.path.splitext(file_storage.filename)[1].lower()
     if ext not in LOGO_EXTENSOES:
         return None
-    pasta = _pasta_logos()
-    os.makedirs(pasta, exist_ok=True)
-    for ext_item in LOGO_EXTENSOES:
-        existente = os.path.join(pasta, f"{prefixo}_{entidade_id}{ext_item}")
-        if os.path.exists(existente):
-            try:
-                os.remove(existente)
-            except OSError:
-                pass
+    _remover_logos(prefixo, entidade_id)
     filename = f"{prefixo}_{entidade_id}{ext}"
-    file_storage.save(os.path.join(pasta, filename))
+    armazenamento.salvar_arquivo(file_storage, os.path.join("logos", filename))
     return filename
 
 
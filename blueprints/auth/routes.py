@@ -1,6 +1,6 @@
 # blueprints/auth/routes.py
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session
 from flask_login import login_user, logout_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from config import get_db_connection
@@ -107,6 +107,7 @@ def login():
 @auth_bp.route("/logout")
 def logout():
     logout_user()
+    session.pop("checkin_totem", None)
     return redirect(url_for("auth.login"))
 
 
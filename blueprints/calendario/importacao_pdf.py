@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Importação de calendário em PDF em segundo plano.
+O upload é gravado em arquivo temporário e processado numa thread (a requisição volta na
+hora com o id do job); as páginas são extraídas em paralelo num pool de processos e o
+resultado fica em cache pelo SHA-256 do arquivo — reenviar o mesmo calendário é instantâneo.
+Estado em memória do processo (Waitress roda um processo com várias threads).
+"""
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.calendario_pdf import MSG_SEM_BIBLIOTECA, contar_paginas, extrair_paginas, eventos_de_paginas
+
+PAGINAS_POR_TAREFA = 4
+MAX_PROCESSOS = max(1, min(4, os.cpu_count() or 1))
+MAX_CACHE = 50
+JOB_TTL_SEGUNDOS = 3600
+
+_lock = threading.Lock()
+_jobs = {}
+_cache = OrderedDict()  # sha256 -> {'eventos': [...], 'arquivo_nome': str}
+_pool = None
+
+
+def _obter_pool():
+    """
+    Pool de processos criado sob demanda ('spawn': seguro com as threads do servidor).
+    Cada worker reexecuta o módulo principal (run_production.py), que só importa a
+    aplicação sob o guard __main__; os workers carregam apenas utils.calendario_pdf.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=MAX_PROCESSOS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, ValueError, NotImplementedError):
+                return None
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def resultado_em_cache(sha256):
+    """{'eventos', 'arquivo_nome'} já processado para este arquivo, ou None."""
+    with _lock:
+        item = _cache.get(sha256)
+        if item is not None:
+            _cache.move_to_end(sha256)
+        return item
+
+
+def _guardar_cache(sha256, eventos, arquivo_nome):
+    with _lock:
+        _cache[sha256] = {'eventos': eventos, 'arquivo_nome': arquivo_nome}
+        _cache.move_to_end(sha256)
+        while len(_cache) > MAX_CACHE:
+            _cache.popitem(last=False)
+
+
+def _atualizar_job(job_id, **campos):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(campos)
+
+
+def _limpar_jobs_antigos():
+    limite = time.time() - JOB_TTL_SEGUNDOS
+    with _lock:
+        for job_id in [j for j, job in _jobs.items() if job['criado_em'] < limite]:
+            del _jobs[job_id]
+
+
+def iniciar_importacao(arquivo, usuario_id):
+    """
+    Recebe o FileStorage do upload e devolve o id do job.
+    Se o mesmo arquivo já foi processado, o job nasce concluído (resultado do cache).
+    """
+    _limpar_jobs_antigos()
+    fd, caminho = tempfile.mkstemp(suffix='.pdf', prefix='calendario_')
+    os.close(fd)
+    arquivo.save(caminho)
+    sha256 = sha256_arquivo(caminho)
+
+    job_id = uuid.uuid4().hex
+    job = {
+        'id': job_id,
+        'usuario_id': usuario_id,
+        'arquivo_nome': arquivo.filename,
+        'sha256': sha256,
+        'status': 'processando',
+        'paginas_total': 0,
+        'paginas_lidas': 0,
+        'progresso': 0,
+        'total_eventos': 0,
+        'erro': None,
+        'criado_em': time.time(),
+    }
+    em_cache = resultado_em_cache(sha256)
+    if em_cache is not None:
+        os.remove(caminho)
+        job.update(status='concluido', progresso=100, total_eventos=len(em_cache['eventos']), cache=True)
+        with _lock:
+            _jobs[job_id] = job
+        return job_id
+
+    with _lock:
+        _jobs[job_id] = job
+    threading.Thread(target=_processar, args=(job_id, caminho, arquivo.filename, sha256),
+                     name=f"importacao-pdf-{job_id[:8]}", daemon=True).start()
+    return job_id
+
+
+def _extrair_em_paralelo(job_id, caminho, total):
+    lotes = [list(range(i, min(i + PAGINAS_POR_TAREFA, total))) for i in range(0, total, PAGINAS_POR_TAREFA)]
+    paginas = []
+    pool = _obter_pool() if len(lotes) > 1 else None
+    if pool is not None:
+        try:
+            futuros = [pool.submit(extrair_paginas, caminho, lote) for lote in lotes]
+            for futuro in as_completed(futuros):
+                paginas.extend(futuro.result())
+                _atualizar_job(job_id, paginas_lidas=len(paginas),
+                               progresso=int(90 * len(paginas) / total))
+            return paginas
+        except BrokenProcessPool:
+            # Processo filho morreu (ex.: falta de memória): descarta o pool e refaz sequencialmente
+            _descartar_pool()
+            paginas = []
+    for lote in lotes:
+        paginas.extend(extrair_paginas(caminho, lote))
+        _atualizar_job(job_id, paginas_lidas=len(paginas), progresso=int(90 * len(paginas) / total))
+    return paginas
+
+
+def _processar(job_id, caminho, arquivo_nome, sha256):
+    try:
+        try:
+            total = contar_paginas(caminho)
+        except ImportError:
+            _atualizar_job(job_id, status='erro', erro=MSG_SEM_BIBLIOTECA)
+            return
+        _atualizar_job(job_id, paginas_total=total)
+        if not total:
+            _atualizar_job(job_id, status='erro', erro="Nenhum texto encontrado no PDF.")
+            return
+
+        paginas = _extrair_em_paralelo(job_id, caminho, total)
+        eventos, erro = eventos_de_paginas(paginas)
+        if erro:
+            _atualizar_job(job_id, status='erro', erro=erro)
+            return
+        _guardar_cache(sha256, eventos, arquivo_nome)
+        _atualizar_job(job_id, status='concluido', progresso=100, total_eventos=len(eventos))
+    except Exception as e:
+        _atualizar_job(job_id, status='erro', erro=f"Erro ao ler PDF: {str(e)}")
+    finally:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def obter_job(job_id, usuario_id):
+    """Cópia do estado do job, apenas para o usuário que o iniciou."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if not job or job['usuario_id'] != usuario_id:
+            return None
+        return dict(job)
@@ -1,13 +1,24 @@
 # ============================================================
 # 🗓️ SISTEMA DE CALENDÁRIO HIERÁRQUICO
 # ============================================================
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, abort,
+    current_app, Response,
+)
 from flask_login import login_required, current_user
 from config import get_db_connection
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
+from itsdangerous import URLSafeSerializer, BadSignature
+from utils.ocorrencias import (
+    janela_mes, janela_ano, buscar_excecoes, ocorrencias,
+    agrupar_por_data, indexar_por_dia_semana, cruzar_dias_semana,
+)
+from utils import cache_calendario
+from utils.feriados import feriados_do_ano
+from utils.ics import calendario_ics
+from blueprints.calendario import importacao_pdf
 import mysql.connector.errors
 import hashlib
-import requests
 import json
 import re
 import os
@@ -18,20 +29,6 @@ bp_calendario = Blueprint('calendario', __name__, url_prefix='/calendario')
 # 🔹 HELPERS
 # ============================================================
 
-def _hora_para_sort(hora):
-    """Converte hora (time/timedelta/str) para string ordenável HH:MM."""
-    if hora is None:
-        return '00:00'
-    if hasattr(hora, 'strftime'):
-        return hora.strftime('%H:%M')
-    if hasattr(hora, 'total_seconds'):
-        s = int(hora.total_seconds())
-        h, m = divmod(s // 60, 60)
-        return f'{h:02d}:{m:02d}'
-    s = str(hora)
-    return s[:5] if len(s) >= 5 else '00:00'
-
-
 def _get_nivel_e_id_usuario():
     """Retorna o nível e ID do contexto atual do usuário baseado no modo_painel."""
     modo = session.get('modo_painel', 'academia')
@@ -94,70 +91,74 @@ def _get_academias_ids():
     return []
 
 
-def _sincronizar_feriados_nacionais(ano, nivel, nivel_id):
+def _locais_para_feriados(cur, nivel, nivel_id):
     """
-    Sincroniza feriados nacionais brasileiros para o ano especificado.
-    Usa a API pública do Brasil API (https://brasilapi.com.br/api/feriados/v1/{ano})
-    Quando nivel=associacao, também insere em todas as academias vinculadas.
+    [(nivel, nivel_id, uf, cidade)] onde inserir feriados: o próprio nível e, se for associação,
+    todas as academias vinculadas. UF/cidade escolhem as tabelas estaduais e municipais.
     """
+    locais = []
     try:
-        response = requests.get(f"https://brasilapi.com.br/api/feriados/v1/{ano}", timeout=10)
-        if response.status_code != 200:
-            return 0, "Erro ao buscar feriados da API"
-        
-        feriados = response.json()
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        eventos_criados = 0
-        
-        # Níveis onde inserir: associação + academias vinculadas (se for associação)
-        niveis_inserir = [(nivel, nivel_id)]
+        if nivel in ('associacao', 'academia'):
+            tabela = 'associacoes' if nivel == 'associacao' else 'academias'
+            cur.execute(f"SELECT uf, cidade FROM {tabela} WHERE id = %s", (nivel_id,))
+            r = cur.fetchone()
+            locais.append((nivel, nivel_id, r[0] if r else None, r[1] if r else None))
+        else:
+            locais.append((nivel, nivel_id, None, None))
+        if nivel == 'associacao':
+            cur.execute("SELECT id, uf, cidade FROM academias WHERE id_associacao = %s", (nivel_id,))
+            locais += [('academia', acad_id, uf, cidade) for acad_id, uf, cidade in cur.fetchall()]
+    except mysql.connector.errors.ProgrammingError:
+        # Bases sem colunas uf/cidade: só feriados nacionais
+        locais = [(nivel, nivel_id, None, None)]
         if nivel == 'associacao':
             cur.execute("SELECT id FROM academias WHERE id_associacao = %s", (nivel_id,))
-            academias = cur.fetchall()
-            for (acad_id,) in academias:
-                niveis_inserir.append(('academia', acad_id))
-        
-        for feriado in feriados:
-            data_feriado = feriado.get('date')
-            nome_feriado = feriado.get('name')
-            tipo_feriado = feriado.get('type', 'national')
-            
-            if not data_feriado or not nome_feriado:
-                continue
-            
-            for niv, niv_id in niveis_inserir:
-                cur.execute("""
-                    SELECT id FROM eventos 
-                    WHERE data_inicio = %s AND titulo = %s AND nivel = %s AND nivel_id = %s
-                """, (data_feriado, nome_feriado, niv, niv_id))
-                
-                if cur.fetchone():
-                    continue  # Já existe neste nível
-                
-                cur.execute("""
-                    INSERT INTO eventos 
-                    (titulo, descricao, data_inicio, tipo, nivel, nivel_id, 
-                     feriado_nacional, origem_sincronizacao, criado_por_usuario_id, cor)
-                    VALUES (%s, %s, %s, 'feriado', %s, %s, 1, 'api_brasilapi', %s, '#dc3545')
-                """, (
-                    nome_feriado,
-                    f"Feriado {tipo_feriado}",
-                    data_feriado,
+            locais += [('academia', acad_id, None, None) for (acad_id,) in cur.fetchall()]
+    return locais
+
+
+def _sincronizar_feriados_nacionais(ano, nivel, nivel_id):
+    """
+    Sincroniza feriados brasileiros para o ano especificado.
+    Calculados localmente (utils.feriados): nacionais + estaduais/municipais da UF/cidade de cada nível.
+    Quando nivel=associacao, também insere em todas as academias vinculadas.
+    Um único INSERT multi-linhas; feriados já existentes são ignorados pela chave única
+    (nivel, nivel_id, data_inicio, titulo) — ver migrations/add_eventos_chave_feriado.sql.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        linhas = []
+        for niv, niv_id, uf, cidade in _locais_para_feriados(cur, nivel, nivel_id):
+            for feriado in feriados_do_ano(ano, uf, cidade):
+                linhas.append((
+                    feriado['nome'],
+                    f"Feriado {feriado['tipo']}",
+                    feriado['data'],
                     niv,
                     niv_id,
-                    current_user.id
+                    1 if feriado['tipo'] == 'nacional' else 0,
+                    current_user.id,
                 ))
-                eventos_criados += 1
         
-        conn.commit()
-        cur.close()
-        conn.close()
+        eventos_criados = 0
+        if linhas:
+            cur.executemany("""
+                INSERT IGNORE INTO eventos
+                (titulo, descricao, data_inicio, tipo, nivel, nivel_id,
+                 feriado_nacional, origem_sincronizacao, criado_por_usuario_id, cor)
+                VALUES (%s, %s, %s, 'feriado', %s, %s, %s, 'feriados_local', %s, '#dc3545')
+            """, linhas)
+            eventos_criados = cur.rowcount
         
+        conn.commit()
         return eventos_criados, None
     except Exception as e:
+        conn.rollback()
         return 0, str(e)
+    finally:
+        cur.close()
+        conn.close()
 
 
 def _parsear_dias_de_diashorario(diashorario):
@@ -309,64 +310,69 @@ def _sincronizar_turmas_como_eventos(academia_id):
         conn.close()
 
 
-def _detectar_conflitos_aula_feriado(academia_id, ano):
+def _detectar_conflitos_aula_feriado(academia_ids, ano):
     """
     Detecta aulas recorrentes que caem em feriados e cria registros pendentes para o gestor resolver.
+    Aceita uma academia ou uma lista (ex.: todas da associação), processadas numa única passada:
+    feriados indexados por dia da semana x dias_semana de cada aula, e um único INSERT multi-linhas.
     Retorna quantidade de conflitos criados.
     """
+    if isinstance(academia_ids, int):
+        academia_ids = [academia_ids]
+    academia_ids = sorted({a for a in academia_ids if a})
+    if not academia_ids:
+        return 0
+    ph = ','.join(['%s'] * len(academia_ids))
+
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     criados = 0
     try:
-        data_ini = date(ano, 1, 1)
-        data_fim = date(ano, 12, 31)
+        data_ini, data_fim = janela_ano(ano)
 
-        cur.execute("""
-            SELECT id, titulo, dias_semana FROM eventos
-            WHERE nivel = 'academia' AND nivel_id = %s AND recorrente = 1
+        cur.execute(f"""
+            SELECT id, nivel_id, dias_semana FROM eventos
+            WHERE nivel = 'academia' AND nivel_id IN ({ph}) AND recorrente = 1
               AND tipo = 'aula' AND status = 'ativo' AND dias_semana IS NOT NULL
-        """, (academia_id,))
+        """, tuple(academia_ids))
         aulas = cur.fetchall()
+        if not aulas:
+            return 0
 
-        cur.execute("""
-            SELECT data_inicio, titulo FROM eventos
-            WHERE nivel = 'academia' AND nivel_id = %s
+        cur.execute(f"""
+            SELECT nivel_id, data_inicio, MIN(titulo) AS titulo FROM eventos
+            WHERE nivel = 'academia' AND nivel_id IN ({ph})
               AND (tipo = 'feriado' OR feriado_nacional = 1)
               AND status = 'ativo'
               AND data_inicio BETWEEN %s AND %s
-        """, (academia_id, data_ini, data_fim))
-        feriados_list = cur.fetchall()
-        datas_feriados = set()
-        feriados_por_data = {}
-        for r in feriados_list:
-            d = r['data_inicio']
-            data_str = d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d)[:10]
-            datas_feriados.add(data_str)
-            feriados_por_data[data_str] = r['titulo'] or 'Feriado'
-
+            GROUP BY nivel_id, data_inicio
+        """, tuple(academia_ids) + (data_ini, data_fim))
+        feriados_por_academia = {}
+        for r in cur.fetchall():
+            feriados_por_academia.setdefault(r['nivel_id'], []).append(r)
+        # {academia_id: {dia_semana: [feriados]}}
+        indices = {
+            acad_id: indexar_por_dia_semana(feriados, lambda f: f['data_inicio'])
+            for acad_id, feriados in feriados_por_academia.items()
+        }
+
+        linhas = []
         for aula in aulas:
-            dias_semana = [int(d) for d in aula['dias_semana'].split(',') if d.strip()]
-            if not dias_semana:
+            por_dia = indices.get(aula['nivel_id'])
+            if not por_dia:
                 continue
-
-            data_atual = data_ini
-            while data_atual <= data_fim:
-                dia_semana = data_atual.weekday()
-                dia_sistema = (dia_semana + 1) % 7
-                if dia_sistema in dias_semana:
-                    data_str = data_atual.strftime('%Y-%m-%d')
-                    if data_str in datas_feriados:
-                        try:
-                            cur.execute("""
-                                INSERT IGNORE INTO conflitos_aula_feriado
-                                (academia_id, evento_id, data_conflito, feriado_titulo, status)
-                                VALUES (%s, %s, %s, %s, 'pendente')
-                            """, (academia_id, aula['id'], data_atual, feriados_por_data.get(data_str, 'Feriado')))
-                            criados += cur.rowcount
-                        except Exception:
-                            pass
-                data_atual += timedelta(days=1)
-
+            for feriado in cruzar_dias_semana(por_dia, aula['dias_semana']):
+                linhas.append((aula['nivel_id'], aula['id'], feriado['data_inicio'],
+                               feriado['titulo'] or 'Feriado'))
+
+        if linhas:
+            # executemany em INSERT vira um único INSERT multi-linhas no mysql-connector
+            cur.executemany("""
+                INSERT IGNORE INTO conflitos_aula_feriado
+                (academia_id, evento_id, data_conflito, feriado_titulo, status)
+                VALUES (%s, %s, %s, %s, 'pendente')
+            """, linhas)
+            criados = cur.rowcount
         conn.commit()
     except Exception:
         conn.rollback()
@@ -445,15 +451,24 @@ def visualizar():
         nivel = nivel_usuario
         nivel_id = nivel_id_usuario
     
+    hoje_str = date.today().strftime('%Y-%m-%d')
+    chave = cache_calendario.chave_mes(nivel, nivel_id, ano, mes)
+    em_cache = cache_calendario.obter(chave)
+    if em_cache:
+        return render_template('calendario/visualizar.html',
+                              nivel=nivel,
+                              nivel_id=nivel_id,
+                              mes=mes,
+                              ano=ano,
+                              eventos_por_data=em_cache['eventos_por_data'],
+                              contexto=em_cache['contexto'],
+                              hoje_str=hoje_str)
+    
     # Busca eventos do mês
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     
-    data_inicio_mes = date(ano, mes, 1)
-    if mes == 12:
-        data_fim_mes = date(ano + 1, 1, 1) - timedelta(days=1)
-    else:
-        data_fim_mes = date(ano, mes + 1, 1) - timedelta(days=1)
+    data_inicio_mes, data_fim_mes = janela_mes(ano, mes)
     
     try:
         # Busca eventos normais (não recorrentes)
@@ -487,19 +502,7 @@ def visualizar():
             ORDER BY e.hora_inicio
         """, (nivel, nivel_id))
         eventos_recorrentes = cur.fetchall()
-        
-        # Busca exceções de eventos recorrentes
-        cur.execute("""
-            SELECT ee.*, e.titulo, e.turma_id
-            FROM eventos_excecoes ee
-            JOIN eventos e ON e.id = ee.evento_id
-            WHERE ee.data_excecao BETWEEN %s AND %s
-        """, (data_inicio_mes, data_fim_mes))
-        excecoes = cur.fetchall()
-        excecoes_dict = {}
-        for exc in excecoes:
-            key = f"{exc['evento_id']}_{exc['data_excecao']}"
-            excecoes_dict[key] = exc
+        excecoes_dict = buscar_excecoes(cur, [e['id'] for e in eventos_recorrentes], data_inicio_mes, data_fim_mes)
         
         # Busca informações do contexto
         contexto = {}
@@ -523,75 +526,11 @@ def visualizar():
         cur.close()
         conn.close()
     
-    # Expande eventos de múltiplos dias (data_inicio até data_fim) para aparecer em cada dia
-    eventos_normais_expandidos = []
-    for evento in eventos_normais:
-        d_ini = evento['data_inicio']
-        d_fim = evento.get('data_fim') or d_ini
-        if isinstance(d_ini, str):
-            d_ini = datetime.strptime(d_ini[:10], '%Y-%m-%d').date()
-        if isinstance(d_fim, str):
-            d_fim = datetime.strptime(d_fim[:10], '%Y-%m-%d').date() if d_fim else d_ini
-        if d_fim < d_ini:
-            d_fim = d_ini
-        data_atual = max(d_ini, data_inicio_mes)
-        fim_loop = min(d_fim, data_fim_mes)
-        while data_atual <= fim_loop:
-            ev = evento.copy()
-            ev['data_inicio'] = data_atual
-            ev['data_fim'] = d_fim
-            eventos_normais_expandidos.append(ev)
-            data_atual += timedelta(days=1)
-    
-    # Expande eventos recorrentes para o mês
-    eventos_expandidos = []
-    for evento in eventos_recorrentes:
-        if not evento.get('dias_semana'):
-            continue
-        
-        dias_permitidos = [int(d) for d in evento['dias_semana'].split(',') if d.strip()]
-        
-        data_atual = data_inicio_mes
-        while data_atual <= data_fim_mes:
-            dia_semana = data_atual.weekday()
-            # Converte: Python usa 0=segunda, mas nosso sistema usa 0=domingo
-            dia_semana_sistema = (dia_semana + 1) % 7
-            
-            if dia_semana_sistema in dias_permitidos:
-                # Verifica se há exceção para este dia
-                key_excecao = f"{evento['id']}_{data_atual}"
-                excecao = excecoes_dict.get(key_excecao)
-                
-                if excecao and excecao['tipo'] == 'cancelamento':
-                    data_atual += timedelta(days=1)
-                    continue  # Pula este dia
-                
-                evento_dia = evento.copy()
-                evento_dia['data_inicio'] = data_atual
-                evento_dia['data_fim'] = data_atual
-                
-                # Se houver alteração de horário
-                if excecao and excecao.get('nova_hora_inicio'):
-                    evento_dia['hora_inicio'] = excecao['nova_hora_inicio']
-                    evento_dia['hora_fim'] = excecao['nova_hora_fim']
-                
-                eventos_expandidos.append(evento_dia)
-            
-            data_atual += timedelta(days=1)
-    
-    # Combina todos os eventos
-    todos_eventos = eventos_normais_expandidos + eventos_expandidos
-    todos_eventos.sort(key=lambda x: (x['data_inicio'], _hora_para_sort(x.get('hora_inicio'))))
-    
-    # Agrupa eventos por data
-    eventos_por_data = {}
-    for evento in todos_eventos:
-        data_str = evento['data_inicio'].strftime('%Y-%m-%d') if isinstance(evento['data_inicio'], date) else str(evento['data_inicio'])
-        if data_str not in eventos_por_data:
-            eventos_por_data[data_str] = []
-        eventos_por_data[data_str].append(evento)
+    eventos_por_data = agrupar_por_data(
+        ocorrencias(eventos_normais, eventos_recorrentes, data_inicio_mes, data_fim_mes, excecoes_dict)
+    )
+    cache_calendario.guardar(chave, {'eventos_por_data': eventos_por_data, 'contexto': contexto})
     
-    hoje_str = date.today().strftime('%Y-%m-%d')
     return render_template('calendario/visualizar.html',
                           nivel=nivel,
                           nivel_id=nivel_id,
@@ -623,15 +562,24 @@ def aluno():
     mes = request.args.get('mes', type=int, default=datetime.now().month)
     ano = request.args.get('ano', type=int, default=datetime.now().year)
     
+    hoje_str = date.today().strftime('%Y-%m-%d')
+    chave = cache_calendario.chave_mes('academia', academia_id, ano, mes, aluno['id'])
+    em_cache = cache_calendario.obter(chave)
+    if em_cache:
+        cur.close()
+        conn.close()
+        return render_template('calendario/aluno.html',
+                              mes=mes,
+                              ano=ano,
+                              eventos_por_data=em_cache['eventos_por_data'],
+                              academia=em_cache['academia'],
+                              hoje_str=hoje_str)
+    
     # Busca informações da academia
     cur.execute("SELECT nome FROM academias WHERE id = %s", (academia_id,))
     academia = cur.fetchone()
     
-    data_inicio_mes = date(ano, mes, 1)
-    if mes == 12:
-        data_fim_mes = date(ano + 1, 1, 1) - timedelta(days=1)
-    else:
-        data_fim_mes = date(ano, mes + 1, 1) - timedelta(days=1)
+    data_inicio_mes, data_fim_mes = janela_mes(ano, mes)
     
     try:
         # Busca eventos da academia
@@ -663,20 +611,7 @@ def aluno():
             ORDER BY e.hora_inicio
         """, (aluno['id'], academia_id))
         eventos_recorrentes = cur.fetchall()
-        
-        # Busca exceções
-        cur.execute("""
-            SELECT ee.*, e.titulo, e.turma_id
-            FROM eventos_excecoes ee
-            JOIN eventos e ON e.id = ee.evento_id
-            WHERE ee.data_excecao BETWEEN %s AND %s
-        """, (data_inicio_mes, data_fim_mes))
-        excecoes = cur.fetchall()
-        excecoes_dict = {}
-        for exc in excecoes:
-            key = f"{exc['evento_id']}_{exc['data_excecao']}"
-            excecoes_dict[key] = exc
-        
+        excecoes_dict = buscar_excecoes(cur, [e['id'] for e in eventos_recorrentes], data_inicio_mes, data_fim_mes)
     except mysql.connector.errors.ProgrammingError:
         flash('Sistema de calendário não está configurado.', 'warning')
         cur.close()
@@ -686,72 +621,11 @@ def aluno():
     cur.close()
     conn.close()
     
-    # Expande eventos de múltiplos dias para aparecer em cada dia
-    eventos_normais_expandidos = []
-    for evento in eventos_normais:
-        d_ini = evento['data_inicio']
-        d_fim = evento.get('data_fim') or d_ini
-        if isinstance(d_ini, str):
-            d_ini = datetime.strptime(d_ini[:10], '%Y-%m-%d').date()
-        if isinstance(d_fim, str):
-            d_fim = datetime.strptime(d_fim[:10], '%Y-%m-%d').date() if d_fim else d_ini
-        if d_fim < d_ini:
-            d_fim = d_ini
-        data_atual = max(d_ini, data_inicio_mes)
-        fim_loop = min(d_fim, data_fim_mes)
-        while data_atual <= fim_loop:
-            ev = evento.copy()
-            ev['data_inicio'] = data_atual
-            ev['data_fim'] = d_fim
-            eventos_normais_expandidos.append(ev)
-            data_atual += timedelta(days=1)
-    
-    # Expande eventos recorrentes
-    eventos_expandidos = []
-    for evento in eventos_recorrentes:
-        if not evento.get('dias_semana'):
-            continue
-        
-        dias_permitidos = [int(d) for d in evento['dias_semana'].split(',') if d.strip()]
-        
-        data_atual = data_inicio_mes
-        while data_atual <= data_fim_mes:
-            dia_semana = data_atual.weekday()
-            dia_semana_sistema = (dia_semana + 1) % 7
-            
-            if dia_semana_sistema in dias_permitidos:
-                key_excecao = f"{evento['id']}_{data_atual}"
-                excecao = excecoes_dict.get(key_excecao)
-                
-                if excecao and excecao['tipo'] == 'cancelamento':
-                    data_atual += timedelta(days=1)
-                    continue
-                
-                evento_dia = evento.copy()
-                evento_dia['data_inicio'] = data_atual
-                evento_dia['data_fim'] = data_atual
-                
-                if excecao and excecao.get('nova_hora_inicio'):
-                    evento_dia['hora_inicio'] = excecao['nova_hora_inicio']
-                    evento_dia['hora_fim'] = excecao['nova_hora_fim']
-                
-                eventos_expandidos.append(evento_dia)
-            
-            data_atual += timedelta(days=1)
-    
-    # Combina eventos
-    todos_eventos = eventos_normais_expandidos + eventos_expandidos
-    todos_eventos.sort(key=lambda x: (x['data_inicio'], _hora_para_sort(x.get('hora_inicio'))))
-    
-    # Agrupa por data
-    eventos_por_data = {}
-    for evento in todos_eventos:
-        data_str = evento['data_inicio'].strftime('%Y-%m-%d') if isinstance(evento['data_inicio'], date) else str(evento['data_inicio'])
-        if data_str not in eventos_por_data:
-            eventos_por_data[data_str] = []
-        eventos_por_data[data_str].append(evento)
+    eventos_por_data = agrupar_por_data(
+        ocorrencias(eventos_normais, eventos_recorrentes, data_inicio_mes, data_fim_mes, excecoes_dict)
+    )
+    cache_calendario.guardar(chave, {'eventos_por_data': eventos_por_data, 'academia': academia})
     
-    hoje_str = date.today().strftime('%Y-%m-%d')
     return render_template('calendario/aluno.html',
                           mes=mes,
                           ano=ano,
@@ -810,14 +684,21 @@ def aluno_responsavel():
     mes = request.args.get('mes', type=int, default=datetime.now().month)
     ano = request.args.get('ano', type=int, default=datetime.now().year)
     
+    hoje_str = date.today().strftime('%Y-%m-%d')
+    chave = cache_calendario.chave_mes('academia', academia_id, ano, mes, aluno_id)
+    em_cache = cache_calendario.obter(chave)
+    if em_cache:
+        cur.close()
+        conn.close()
+        return render_template('calendario/aluno_responsavel.html',
+                              mes=mes, ano=ano, eventos_por_data=em_cache['eventos_por_data'],
+                              academia=em_cache['academia'], aluno=aluno, alunos=alunos,
+                              hoje_str=hoje_str)
+    
     cur.execute("SELECT nome FROM academias WHERE id = %s", (academia_id,))
     academia = cur.fetchone()
     
-    data_inicio_mes = date(ano, mes, 1)
-    if mes == 12:
-        data_fim_mes = date(ano + 1, 1, 1) - timedelta(days=1)
-    else:
-        data_fim_mes = date(ano, mes + 1, 1) - timedelta(days=1)
+    data_inicio_mes, data_fim_mes = janela_mes(ano, mes)
     
     try:
         cur.execute("""
@@ -843,14 +724,7 @@ def aluno_responsavel():
         """, (aluno_id, academia_id))
         eventos_recorrentes = cur.fetchall()
         
-        cur.execute("""
-            SELECT ee.*, e.titulo, e.turma_id
-            FROM eventos_excecoes ee
-            JOIN eventos e ON e.id = ee.evento_id
-            WHERE ee.data_excecao BETWEEN %s AND %s
-        """, (data_inicio_mes, data_fim_mes))
-        excecoes = cur.fetchall()
-        excecoes_dict = {f"{e['evento_id']}_{e['data_excecao']}": e for e in excecoes}
+        excecoes_dict = buscar_excecoes(cur, [e['id'] for e in eventos_recorrentes], data_inicio_mes, data_fim_mes)
     except mysql.connector.errors.ProgrammingError:
         flash('Sistema de calendário não está configurado.', 'warning')
         cur.close()
@@ -860,58 +734,11 @@ def aluno_responsavel():
     cur.close()
     conn.close()
     
-    eventos_normais_expandidos = []
-    for evento in eventos_normais:
-        d_ini = evento['data_inicio']
-        d_fim = evento.get('data_fim') or d_ini
-        if isinstance(d_ini, str):
-            d_ini = datetime.strptime(d_ini[:10], '%Y-%m-%d').date()
-        if isinstance(d_fim, str):
-            d_fim = datetime.strptime(d_fim[:10], '%Y-%m-%d').date() if d_fim else d_ini
-        if d_fim < d_ini:
-            d_fim = d_ini
-        data_atual = max(d_ini, data_inicio_mes)
-        fim_loop = min(d_fim, data_fim_mes)
-        while data_atual <= fim_loop:
-            ev = evento.copy()
-            ev['data_inicio'] = data_atual
-            ev['data_fim'] = d_fim
-            eventos_normais_expandidos.append(ev)
-            data_atual += timedelta(days=1)
-    
-    eventos_expandidos = []
-    for evento in eventos_recorrentes:
-        if not evento.get('dias_semana'):
-            continue
-        dias_permitidos = [int(d) for d in evento['dias_semana'].split(',') if d.strip()]
-        data_atual = data_inicio_mes
-        while data_atual <= data_fim_mes:
-            dia_semana_sistema = (data_atual.weekday() + 1) % 7
-            if dia_semana_sistema in dias_permitidos:
-                key_exc = f"{evento['id']}_{data_atual}"
-                excecao = excecoes_dict.get(key_exc)
-                if excecao and excecao['tipo'] == 'cancelamento':
-                    data_atual += timedelta(days=1)
-                    continue
-                ev = evento.copy()
-                ev['data_inicio'] = data_atual
-                ev['data_fim'] = data_atual
-                if excecao and excecao.get('nova_hora_inicio'):
-                    ev['hora_inicio'] = excecao['nova_hora_inicio']
-                    ev['hora_fim'] = excecao['nova_hora_fim']
-                eventos_expandidos.append(ev)
-            data_atual += timedelta(days=1)
-    
-    todos_eventos = eventos_normais_expandidos + eventos_expandidos
-    todos_eventos.sort(key=lambda x: (x['data_inicio'], _hora_para_sort(x.get('hora_inicio'))))
-    eventos_por_data = {}
-    for evento in todos_eventos:
-        data_str = evento['data_inicio'].strftime('%Y-%m-%d') if isinstance(evento['data_inicio'], date) else str(evento['data_inicio'])
-        if data_str not in eventos_por_data:
-            eventos_por_data[data_str] = []
-        eventos_por_data[data_str].append(evento)
+    eventos_por_data = agrupar_por_data(
+        ocorrencias(eventos_normais, eventos_recorrentes, data_inicio_mes, data_fim_mes, excecoes_dict)
+    )
+    cache_calendario.guardar(chave, {'eventos_por_data': eventos_por_data, 'academia': academia})
     
-    hoje_str = date.today().strftime('%Y-%m-%d')
     return render_template('calendario/aluno_responsavel.html',
                           mes=mes, ano=ano, eventos_por_data=eventos_por_data,
                           academia=academia, aluno=aluno, alunos=alunos,
@@ -996,15 +823,21 @@ def sincronizar_feriados():
         flash(f'Erro ao sincronizar feriados: {erro}', 'danger')
         return redirect(url_for('calendario.sincronizar'))
     
-    # Detecta conflitos aula x feriado nas academias
+    # Feriados da associação também são gravados nas academias vinculadas
+    if eventos_criados and nivel == 'associacao':
+        cache_calendario.invalidar()
+    elif eventos_criados:
+        cache_calendario.invalidar(nivel, nivel_id)
+    
+    # Detecta conflitos aula x feriado em todas as academias da associação numa só passada
     if nivel == 'associacao' and eventos_criados > 0:
         conn = get_db_connection()
         cur = conn.cursor()
         cur.execute("SELECT id FROM academias WHERE id_associacao = %s", (nivel_id,))
-        for (acad_id,) in cur.fetchall():
-            _detectar_conflitos_aula_feriado(acad_id, ano)
+        academia_ids = [acad_id for (acad_id,) in cur.fetchall()]
         cur.close()
         conn.close()
+        _detectar_conflitos_aula_feriado(academia_ids, ano)
     
     # Registra sincronização
     conn = get_db_connection()
@@ -1041,6 +874,8 @@ def sincronizar_turmas():
         flash(f'Erro ao sincronizar turmas: {erro}', 'danger')
         return redirect(url_for('calendario.sincronizar'))
     
+    cache_calendario.invalidar('academia', nivel_id)
+    
     # Registra sincronização
     conn = get_db_connection()
     cur = conn.cursor()
@@ -1057,6 +892,80 @@ def sincronizar_turmas():
     return redirect(url_for('calendario.sincronizar'))
 
 
+_SQL_PROPAGAR_SEDE = """
+    INSERT INTO eventos
+    (titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim,
+     tipo, recorrente, dias_semana, nivel, nivel_id, feriado_nacional,
+     origem_sincronizacao, evento_origem_id, criado_por_usuario_id, cor, status)
+    SELECT s.titulo, s.descricao, s.data_inicio, s.data_fim, s.hora_inicio, s.hora_fim,
+           COALESCE(s.tipo, 'evento'), COALESCE(s.recorrente, 0), s.dias_semana, 'academia', %s,
+           COALESCE(s.feriado_nacional, 0), COALESCE(s.origem_sincronizacao, 'sede'), s.id, %s,
+           COALESCE(s.cor, '#0d6efd'), 'ativo'
+    FROM eventos s
+    WHERE s.nivel = 'associacao' AND s.nivel_id = %s AND s.status = 'ativo'
+      AND s.titulo <> '' AND s.data_inicio IS NOT NULL
+      AND (%s IS NULL OR s.id = %s)
+      AND NOT EXISTS (
+          SELECT 1 FROM eventos d
+          WHERE d.nivel = 'academia' AND d.nivel_id = %s
+            AND (d.evento_origem_id = s.id
+                 OR (d.titulo = s.titulo AND d.data_inicio = s.data_inicio
+                     AND d.tipo = COALESCE(s.tipo, 'evento') AND d.data_fim <=> s.data_fim
+                     AND (d.status = 'ativo' OR d.tipo = 'feriado')))
+      )
+"""
+
+
+def _academias_que_seguem_sede(cur, id_associacao):
+    """
+    Academias da associação que já sincronizaram com a sede: passam a receber
+    automaticamente os novos eventos da associação (sem fluxo de aprovação).
+    """
+    try:
+        cur.execute("""
+            SELECT DISTINCT a.id
+            FROM academias a
+            JOIN calendario_sincronizacoes cs
+              ON cs.nivel = 'academia' AND cs.nivel_id = a.id AND cs.arquivo_nome = 'Eventos da Sede'
+            WHERE a.id_associacao = %s
+        """, (id_associacao,))
+    except mysql.connector.errors.ProgrammingError:
+        return []
+    return [r[0] if isinstance(r, tuple) else r['id'] for r in cur.fetchall()]
+
+
+def _propagar_eventos_sede(id_associacao, academia_ids=None, evento_id=None):
+    """
+    Copia os eventos ativos da associação (sede) para as academias, com um INSERT ... SELECT
+    anti-join por academia. Ignora o que a academia já tem: qualquer cópia do mesmo evento
+    (evento_origem_id, inclusive cancelada pela academia) ou um evento ativo com mesmo
+    titulo, data_inicio, data_fim e tipo.
+    academia_ids=None propaga para todas as academias da associação; evento_id limita a
+    um evento da sede (o recém-criado). Tudo numa transação.
+    Retorna ({academia_id: eventos_criados}, erro).
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if academia_ids is None:
+            cur.execute("SELECT id FROM academias WHERE id_associacao = %s", (id_associacao,))
+            academia_ids = [r[0] for r in cur.fetchall()]
+        contagem = {}
+        for academia_id in sorted(set(academia_ids)):
+            cur.execute(_SQL_PROPAGAR_SEDE, (academia_id, current_user.id, id_associacao,
+                                             evento_id, evento_id, academia_id))
+            contagem[academia_id] = cur.rowcount
+        conn.commit()
+        cache_calendario.invalidar_academias([a for a, n in contagem.items() if n])
+        return contagem, None
+    except Exception as e:
+        conn.rollback()
+        return {}, str(e)
+    finally:
+        cur.close()
+        conn.close()
+
+
 def _sincronizar_eventos_da_sede(academia_id):
     """
     Sincroniza todos os eventos e feriados da associação (sede) para a academia.
@@ -1068,71 +977,14 @@ def _sincronizar_eventos_da_sede(academia_id):
     try:
         cur.execute("SELECT id_associacao FROM academias WHERE id = %s", (academia_id,))
         row = cur.fetchone()
-        if not row or not row.get("id_associacao"):
-            return 0, "Academia não está vinculada a uma associação (sede)."
-        id_associacao = row["id_associacao"]
-
-        cur.execute("""
-            SELECT id, titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim,
-                   tipo, recorrente, dias_semana, feriado_nacional, origem_sincronizacao, cor
-            FROM eventos
-            WHERE nivel = 'associacao' AND nivel_id = %s AND status = 'ativo'
-            ORDER BY data_inicio
-        """, (id_associacao,))
-        eventos_sede = cur.fetchall()
-
-        eventos_criados = 0
-        for ev in eventos_sede:
-            titulo = ev.get("titulo") or ""
-            data_inicio = ev.get("data_inicio")
-            data_fim = ev.get("data_fim")
-            tipo = ev.get("tipo") or "evento"
-            if not titulo or not data_inicio:
-                continue
-
-            cur.execute("""
-                SELECT id FROM eventos
-                WHERE nivel = 'academia' AND nivel_id = %s AND status = 'ativo'
-                  AND titulo = %s AND data_inicio = %s AND tipo = %s
-                  AND ((data_fim IS NULL AND %s IS NULL) OR (data_fim <=> %s))
-            """, (academia_id, titulo, data_inicio, tipo, data_fim, data_fim))
-            if cur.fetchone():
-                continue
-
-            cur.execute("""
-                INSERT INTO eventos
-                (titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim,
-                 tipo, recorrente, dias_semana, nivel, nivel_id, feriado_nacional,
-                 origem_sincronizacao, evento_origem_id, criado_por_usuario_id, cor, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'academia', %s, %s, %s, %s, %s, %s, 'ativo')
-            """, (
-                titulo,
-                ev.get("descricao"),
-                data_inicio,
-                data_fim,
-                ev.get("hora_inicio"),
-                ev.get("hora_fim"),
-                tipo,
-                ev.get("recorrente") or 0,
-                ev.get("dias_semana"),
-                academia_id,
-                ev.get("feriado_nacional") or 0,
-                "sede" if not ev.get("origem_sincronizacao") else ev.get("origem_sincronizacao"),
-                ev.get("id"),
-                current_user.id,
-                ev.get("cor") or "#0d6efd",
-            ))
-            eventos_criados += 1
-
-        conn.commit()
-        cur.close()
-        conn.close()
-        return eventos_criados, None
-    except Exception as e:
-        conn.rollback()
+    finally:
         cur.close()
         conn.close()
-        return 0, str(e)
+    if not row or not row.get("id_associacao"):
+        return 0, "Academia não está vinculada a uma associação (sede)."
+
+    contagem, erro = _propagar_eventos_sede(row["id_associacao"], [academia_id])
+    return contagem.get(academia_id, 0), erro
 
 
 @bp_calendario.route('/sincronizar/sede', methods=['POST'])
@@ -1166,252 +1018,6 @@ def sincronizar_sede():
     return redirect(url_for('calendario.sincronizar'))
 
 
-MESES_ABREV = {'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6,
-               'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12}
-
-
-def _parsear_dias_evento(dia_str, mes_num, ano):
-    """
-    Converte string de dia(s) em lista de datas YYYY-MM-DD.
-    Ex: "24" -> [2026-01-24], "01 e 02" -> [2026-02-01, 2026-02-02],
-        "03 a 05" -> [2026-02-03, 2026-02-04, 2026-02-05],
-        "31/10 a 01/11" -> [2026-10-31, 2026-11-01]
-    """
-    if not dia_str or not isinstance(dia_str, str):
-        return []
-    dia_str = dia_str.strip()
-    if not dia_str or not dia_str[0].isdigit():
-        return []
-    
-    datas = []
-    
-    # Formato "31/10 a 01/11" (intervalo entre meses)
-    m_range = re.match(r'(\d{1,2})/(\d{1,2})\s+a\s+(\d{1,2})/(\d{1,2})', dia_str)
-    if m_range:
-        d1, m1, d2, m2 = int(m_range.group(1)), int(m_range.group(2)), int(m_range.group(3)), int(m_range.group(4))
-        if 1 <= d1 <= 31 and 1 <= m1 <= 12 and 1 <= d2 <= 31 and 1 <= m2 <= 12:
-            for d, m in [(d1, m1), (d2, m2)]:
-                try:
-                    dt = date(ano, m, d)
-                    datas.append(dt.strftime('%Y-%m-%d'))
-                except ValueError:
-                    pass
-        return datas
-    
-    # Formato "01 e 02" ou "22 e 23"
-    m_e = re.match(r'(\d{1,2})\s+e\s+(\d{1,2})', dia_str)
-    if m_e:
-        d1, d2 = int(m_e.group(1)), int(m_e.group(2))
-        for d in [d1, d2]:
-            if 1 <= d <= 31:
-                try:
-                    dt = date(ano, mes_num, d)
-                    datas.append(dt.strftime('%Y-%m-%d'))
-                except ValueError:
-                    pass
-        return datas
-    
-    # Formato "03 a 05" ou "27 a 29" ou "14 a 16" ou "17 a 20"
-    m_a = re.match(r'(\d{1,2})\s+a\s+(\d{1,2})', dia_str)
-    if m_a:
-        d1, d2 = int(m_a.group(1)), int(m_a.group(2))
-        for d in range(min(d1, d2), max(d1, d2) + 1):
-            if 1 <= d <= 31:
-                try:
-                    dt = date(ano, mes_num, d)
-                    datas.append(dt.strftime('%Y-%m-%d'))
-                except ValueError:
-                    pass
-        return datas
-    
-    # Dia único: "24", "31", "01", "07"
-    m_single = re.match(r'^(\d{1,2})(?:\s|$|/)', dia_str)
-    if m_single:
-        d = int(m_single.group(1))
-        if 1 <= d <= 31:
-            try:
-                dt = date(ano, mes_num, d)
-                datas.append(dt.strftime('%Y-%m-%d'))
-            except ValueError:
-                pass
-    return datas
-
-
-def _extrair_eventos_tabela_pdf(pdf_file):
-    """
-    Extrai eventos de PDF com estrutura de tabela (MÊS | DIA | EVENTO | REALIZAÇÃO | LOCAL).
-    Ex: Calendário FPJU.
-    """
-    try:
-        import pdfplumber
-    except ImportError:
-        return []
-    
-    try:
-        pdf_file.seek(0)
-        with pdfplumber.open(pdf_file) as pdf:
-            ano = date.today().year
-            # Tenta inferir ano do documento (ex: "2026" no título)
-            for page in pdf.pages[:2]:
-                txt = page.extract_text() or ''
-                m_ano = re.search(r'20[2-3][0-9]', txt)
-                if m_ano:
-                    ano = int(m_ano.group())
-                    break
-            
-            mes_atual = None
-            eventos = []
-            vistos = set()
-            
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    if not table or len(table) < 2:
-                        continue
-                    for row in table:
-                        if not row or len(row) < 3:
-                            continue
-                        mes_cel, dia_cel, evento_cel = (row[0] or ''), (row[1] or ''), (row[2] or '')
-                        
-                        # Pula cabeçalhos
-                        if mes_cel and ('MÊS' in str(mes_cel).upper() or 'DIA' in str(dia_cel).upper() or 'EVENTO' in str(evento_cel).upper()):
-                            continue
-                        if not evento_cel or len(str(evento_cel).strip()) < 3:
-                            continue
-                        
-                        # Atualiza mês atual quando há nova célula de mês
-                        if mes_cel and str(mes_cel).strip().upper() in MESES_ABREV:
-                            mes_atual = MESES_ABREV[str(mes_cel).strip().upper()]
-                        
-                        if mes_atual is None:
-                            continue
-                        
-                        titulo = re.sub(r'\s+', ' ', str(evento_cel).replace('\n', ' ')).strip()[:200]
-                        if not titulo or titulo.lower() in ('evento', 'local', 'realização'):
-                            continue
-                        
-                        datas = _parsear_dias_evento(str(dia_cel), mes_atual, ano)
-                        
-                        if not datas and dia_cel is None:
-                            # Linha sem dia (ex: Workshop) - usa último dia conhecido da tabela
-                            if eventos:
-                                ultima_data = eventos[-1]['data_str']
-                                datas = [ultima_data]
-                        
-                        for data_str in datas:
-                            chave = (data_str, titulo[:60])
-                            if chave not in vistos:
-                                vistos.add(chave)
-                                eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': f"{mes_cel} {dia_cel} {titulo}"})
-            
-            return eventos
-    except Exception:
-        return []
-
-
-def _extrair_eventos_do_pdf(pdf_file):
-    """
-    Extrai texto do PDF e identifica possíveis eventos (data + título).
-    Tenta primeiro extração por tabela (pdfplumber), depois por texto (pypdf).
-    Retorna lista de dicts: [{'data_str': 'YYYY-MM-DD', 'titulo': str, 'linha_raw': str}, ...]
-    """
-    # 1) Tenta extração por tabela (calendários estruturados como FPJU)
-    eventos_tabela = _extrair_eventos_tabela_pdf(pdf_file)
-    if eventos_tabela:
-        eventos_tabela.sort(key=lambda x: x['data_str'])
-        return eventos_tabela, None
-    
-    # 2) Fallback: extração por texto
-    try:
-        from pypdf import PdfReader
-    except ImportError:
-        return [], "Biblioteca pypdf não instalada. Execute: pip install pypdf"
-    
-    try:
-        pdf_file.seek(0)
-        reader = PdfReader(pdf_file)
-        texto_completo = []
-        for page in reader.pages:
-            txt = page.extract_text()
-            if txt:
-                texto_completo.append(txt)
-        
-        texto = "\n".join(texto_completo)
-        if not texto.strip():
-            return [], "Nenhum texto encontrado no PDF."
-    except Exception as e:
-        return [], f"Erro ao ler PDF: {str(e)}"
-    
-    padrao_data_completa = re.compile(r'\b(\d{1,2})[/\-\.](\d{1,2})[/\-\.](\d{2,4})\b', re.IGNORECASE)
-    padrao_data_parcial = re.compile(r'(?<!\d)\b(\d{1,2})[/\-\.](\d{1,2})\b(?!\d)')
-    meses_pt = {
-        'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
-        'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
-    }
-    padrao_data_extensa = re.compile(
-        r'\b(\d{1,2})\s+de\s+(' + '|'.join(meses_pt.keys()) + r')(?:\s+de\s+(\d{2,4}))?\b',
-        re.IGNORECASE
-    )
-    
-    ano_atual = date.today().year
-    m_ano = re.search(r'20[2-3][0-9]', texto)
-    if m_ano:
-        ano_atual = int(m_ano.group())
-    
-    eventos = []
-    vistos = set()
-    
-    for linha in texto.split('\n'):
-        linha = linha.strip()
-        if not linha or len(linha) < 3:
-            continue
-        
-        for m in padrao_data_completa.finditer(linha):
-            dia, mes, ano = int(m.group(1)), int(m.group(2)), int(m.group(3))
-            if ano < 100:
-                ano += 2000 if ano < 50 else 1900
-            if 1 <= dia <= 31 and 1 <= mes <= 12 and 2020 <= ano <= 2030:
-                data_str = f"{ano}-{mes:02d}-{dia:02d}"
-                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
-                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
-                if titulo and len(titulo) > 2 and not re.match(r'^\d+[/\-\.]\d+', titulo):
-                    chave = (data_str, titulo[:50])
-                    if chave not in vistos:
-                        vistos.add(chave)
-                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
-        
-        for m in padrao_data_extensa.finditer(linha):
-            dia = int(m.group(1))
-            mes = meses_pt.get(m.group(2).lower(), 1)
-            ano = int(m.group(3)) if m.group(3) else ano_atual
-            if ano < 100:
-                ano += 2000 if ano < 50 else 1900
-            if 1 <= dia <= 31 and 1 <= mes <= 12:
-                data_str = f"{ano}-{mes:02d}-{dia:02d}"
-                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
-                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
-                if titulo and len(titulo) > 2:
-                    chave = (data_str, titulo[:50])
-                    if chave not in vistos:
-                        vistos.add(chave)
-                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
-        
-        for m in padrao_data_parcial.finditer(linha):
-            dia, mes = int(m.group(1)), int(m.group(2))
-            if 1 <= dia <= 31 and 1 <= mes <= 12:
-                data_str = f"{ano_atual}-{mes:02d}-{dia:02d}"
-                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
-                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
-                if titulo and len(titulo) > 2 and not re.match(r'^\d+[/\-\.]', titulo):
-                    chave = (data_str, titulo[:50])
-                    if chave not in vistos:
-                        vistos.add(chave)
-                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
-    
-    eventos.sort(key=lambda x: x['data_str'])
-    return eventos, None
-
-
 @bp_calendario.route('/sincronizar/pdf', methods=['GET', 'POST'])
 @login_required
 def sincronizar_pdf():
@@ -1434,7 +1040,7 @@ def sincronizar_pdf():
     if request.method == 'POST':
         acao = request.form.get('acao')
         
-        # Ação: processar PDF enviado
+        # Ação: processar PDF enviado (em segundo plano; a página acompanha o progresso)
         if acao == 'upload' or acao is None:
             arquivo = request.files.get('arquivo_pdf')
             if not arquivo or arquivo.filename == '':
@@ -1445,47 +1051,26 @@ def sincronizar_pdf():
                 flash('O arquivo deve ser um PDF (.pdf).', 'warning')
                 return redirect(url_for('calendario.sincronizar_pdf'))
             
-            eventos, erro = _extrair_eventos_do_pdf(arquivo)
-            
-            if erro:
-                flash(erro, 'danger')
-                return redirect(url_for('calendario.sincronizar_pdf'))
-            
-            if not eventos:
-                flash('Nenhum evento foi detectado no PDF. Verifique se o documento contém datas no formato dd/mm/aaaa, dd-mm-aaaa ou "dd de mês".', 'warning')
-                return redirect(url_for('calendario.sincronizar_pdf'))
-            
-            arquivo_nome = arquivo.filename
-            session['calendario_pdf_eventos'] = eventos
-            session['calendario_pdf_nome'] = arquivo_nome
-            
-            return render_template('calendario/pdf_selecionar_eventos.html',
-                                   eventos=eventos,
-                                   arquivo_nome=arquivo_nome,
-                                   nivel=nivel,
-                                   nivel_id=nivel_id)
+            job_id = importacao_pdf.iniciar_importacao(arquivo, current_user.id)
+            return render_template('calendario/pdf_processando.html',
+                                   job_id=job_id,
+                                   arquivo_nome=arquivo.filename)
         
         # Ação: importar eventos selecionados
         if acao == 'importar':
+            sha256 = session.get('calendario_pdf_sha256')
+            resultado = importacao_pdf.resultado_em_cache(sha256) if sha256 else None
+            if not resultado:
+                flash('Sessão expirada. Faça o upload do PDF novamente.', 'warning')
+                return redirect(url_for('calendario.sincronizar_pdf'))
+            
             indices = request.form.getlist('evento_idx')
             if not indices:
                 flash('Selecione pelo menos um evento para importar.', 'warning')
-                eventos = session.get('calendario_pdf_eventos', [])
-                arquivo_nome = session.get('calendario_pdf_nome', 'PDF')
-                if eventos:
-                    return render_template('calendario/pdf_selecionar_eventos.html',
-                                           eventos=eventos,
-                                           arquivo_nome=arquivo_nome,
-                                           nivel=nivel,
-                                           nivel_id=nivel_id)
-                return redirect(url_for('calendario.sincronizar_pdf'))
-            
-            eventos = session.get('calendario_pdf_eventos', [])
-            arquivo_nome = session.get('calendario_pdf_nome', 'PDF')
+                return redirect(url_for('calendario.previa_pdf', sha256=sha256))
             
-            if not eventos:
-                flash('Sessão expirada. Faça o upload do PDF novamente.', 'warning')
-                return redirect(url_for('calendario.sincronizar_pdf'))
+            eventos = resultado['eventos']
+            arquivo_nome = resultado['arquivo_nome'] or 'PDF'
             
             conn = get_db_connection()
             cur = conn.cursor()
@@ -1545,8 +1130,8 @@ def sincronizar_pdf():
                 """, (arquivo_nome, nivel, nivel_id, importados, current_user.id))
                 
                 conn.commit()
-                session.pop('calendario_pdf_eventos', None)
-                session.pop('calendario_pdf_nome', None)
+                cache_calendario.invalidar_niveis(niveis_inserir)
+                session.pop('calendario_pdf_sha256', None)
                 if nivel == 'associacao' and importados > 0:
                     flash(f'{importados} evento(s) importado(s) e sincronizados na associação e em todas as academias vinculadas!', 'success')
                 else:
@@ -1563,6 +1148,68 @@ def sincronizar_pdf():
     return render_template('calendario/pdf_upload.html', nivel=nivel, nivel_id=nivel_id)
 
 
+@bp_calendario.route('/sincronizar/pdf/status/<job_id>')
+@login_required
+def status_pdf(job_id):
+    """Progresso do processamento do PDF (consultado pela página de acompanhamento)."""
+    job = importacao_pdf.obter_job(job_id, current_user.id)
+    if not job:
+        return jsonify({'status': 'erro', 'erro': 'Processamento não encontrado ou expirado.'}), 404
+    resposta = {k: job[k] for k in ('status', 'progresso', 'paginas_total', 'paginas_lidas',
+                                    'total_eventos', 'erro')}
+    if job['status'] == 'concluido':
+        resposta['url_previa'] = url_for('calendario.previa_pdf', sha256=job['sha256'])
+    return jsonify(resposta)
+
+
+@bp_calendario.route('/sincronizar/pdf/previa/<sha256>')
+@login_required
+def previa_pdf(sha256):
+    """
+    Prévia (simulação) da importação a partir do cache: marca os eventos que já existem
+    no calendário do nível, sem gravar nada. A importação usa este mesmo resultado.
+    """
+    nivel, nivel_id = _get_nivel_e_id_usuario()
+    if not nivel or not nivel_id or nivel == 'academia':
+        flash('Você não tem permissão para importar PDF.', 'warning')
+        return redirect(url_for('calendario.sincronizar'))
+    
+    resultado = importacao_pdf.resultado_em_cache(sha256)
+    if not resultado:
+        flash('Sessão expirada. Faça o upload do PDF novamente.', 'warning')
+        return redirect(url_for('calendario.sincronizar_pdf'))
+    session['calendario_pdf_sha256'] = sha256
+    
+    eventos = [dict(ev) for ev in resultado['eventos']]
+    total_academias = 0
+    if eventos:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT titulo, data_inicio FROM eventos
+                WHERE nivel = %s AND nivel_id = %s AND data_inicio BETWEEN %s AND %s
+            """, (nivel, nivel_id, eventos[0]['data_str'], eventos[-1]['data_str']))
+            existentes = {(t, d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d)[:10])
+                          for t, d in cur.fetchall()}
+            if nivel == 'associacao':
+                cur.execute("SELECT COUNT(*) FROM academias WHERE id_associacao = %s", (nivel_id,))
+                total_academias = cur.fetchone()[0]
+        finally:
+            cur.close()
+            conn.close()
+        for ev in eventos:
+            ev['ja_existe'] = (ev['titulo'], ev['data_str']) in existentes
+    
+    return render_template('calendario/pdf_selecionar_eventos.html',
+                           eventos=eventos,
+                           arquivo_nome=resultado['arquivo_nome'],
+                           total_novos=sum(1 for ev in eventos if not ev.get('ja_existe')),
+                           total_academias=total_academias,
+                           nivel=nivel,
+                           nivel_id=nivel_id)
+
+
 @bp_calendario.route('/conflitos')
 @login_required
 def conflitos_aula_feriado():
@@ -1634,6 +1281,7 @@ def resolver_conflito(conflito_id):
             WHERE id = %s
         """, ('cancelado' if acao == 'cancelar' else 'confirmado', current_user.id, conflito_id))
         conn.commit()
+        cache_calendario.invalidar('academia', nivel_id)
         flash('Conflito resolvido com sucesso!' if acao == 'cancelar' else 'Aula confirmada para a data.', 'success')
     except Exception as e:
         conn.rollback()
@@ -1694,10 +1342,15 @@ def novo_evento():
                     """, (evento_id, assoc[0]))
             
             # Se for associação, cria aprovações para academias
-            elif nivel == 'associacao':
+            # (as que já sincronizam com a sede recebem o evento diretamente)
+            seguem_sede = []
+            if nivel == 'associacao':
+                seguem_sede = set(_academias_que_seguem_sede(cur, nivel_id))
                 cur.execute("SELECT id FROM academias WHERE id_associacao = %s", (nivel_id,))
                 academias = cur.fetchall()
                 for acad in academias:
+                    if acad[0] in seguem_sede:
+                        continue
                     cur.execute("""
                         INSERT INTO eventos_aprovacoes
                         (evento_id, nivel_aprovador, nivel_aprovador_id)
@@ -1705,7 +1358,15 @@ def novo_evento():
                     """, (evento_id, acad[0]))
             
             conn.commit()
-            flash('Evento criado com sucesso!', 'success')
+            cache_calendario.invalidar(nivel, nivel_id)
+            msg = 'Evento criado com sucesso!'
+            if seguem_sede:
+                contagem, erro = _propagar_eventos_sede(nivel_id, seguem_sede, evento_id)
+                if erro:
+                    flash(f'Evento criado, mas houve erro ao propagar para as academias: {erro}', 'warning')
+                else:
+                    msg += f' Replicado em {sum(1 for n in contagem.values() if n)} academia(s) vinculada(s) à sede.'
+            flash(msg, 'success')
             return redirect(url_for('calendario.visualizar', nivel=nivel, nivel_id=nivel_id))
         
         except Exception as e:
@@ -1794,25 +1455,35 @@ def aprovar_evento(aprovacao_id):
         # Cria evento no calendário da entidade aprovadora (com evento_origem_id para cascata no cancelamento)
         evento_pai_id = aprovacao['evento_id']
         cur.execute("""
-            INSERT INTO eventos
-            (titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim,
-             tipo, nivel, nivel_id, criado_por_usuario_id, cor, origem_sincronizacao, evento_origem_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'aprovacao', %s)
-        """, (
-            aprovacao['titulo'],
-            aprovacao['descricao'],
-            aprovacao['data_inicio'],
-            aprovacao['data_fim'],
-            aprovacao['hora_inicio'],
-            aprovacao['hora_fim'],
-            aprovacao['tipo'],
-            nivel,
-            nivel_id,
-            current_user.id,
-            aprovacao.get('cor', '#0d6efd'),
-            evento_pai_id
-        ))
-        novo_evento_id = cur.lastrowid
+            SELECT id FROM eventos
+            WHERE evento_origem_id = %s AND nivel = %s AND nivel_id = %s AND status = 'ativo'
+            LIMIT 1
+        """, (evento_pai_id, nivel, nivel_id))
+        ja_recebido = cur.fetchone()
+        
+        if ja_recebido:
+            novo_evento_id = ja_recebido['id']
+        else:
+            cur.execute("""
+                INSERT INTO eventos
+                (titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim,
+                 tipo, nivel, nivel_id, criado_por_usuario_id, cor, origem_sincronizacao, evento_origem_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'aprovacao', %s)
+            """, (
+                aprovacao['titulo'],
+                aprovacao['descricao'],
+                aprovacao['data_inicio'],
+                aprovacao['data_fim'],
+                aprovacao['hora_inicio'],
+                aprovacao['hora_fim'],
+                aprovacao['tipo'],
+                nivel,
+                nivel_id,
+                current_user.id,
+                aprovacao.get('cor', '#0d6efd'),
+                evento_pai_id
+            ))
+            novo_evento_id = cur.lastrowid
         
         # Registra o evento criado na aprovação (para cascata no cancelamento via eventos_aprovacoes)
         try:
@@ -1822,16 +1493,25 @@ def aprovar_evento(aprovacao_id):
         except Exception:
             pass  # Coluna pode não existir em migrações antigas
         
+        seguem_sede = _academias_que_seguem_sede(cur, nivel_id) if nivel == 'associacao' and not ja_recebido else []
         conn.commit()
+        cache_calendario.invalidar(nivel, nivel_id)
         flash('Evento aprovado e adicionado ao seu calendário!', 'success')
     
     except Exception as e:
         conn.rollback()
         flash(f'Erro ao aprovar evento: {str(e)}', 'danger')
+        seguem_sede = []
     finally:
         cur.close()
         conn.close()
     
+    # Evento da federação aprovado pela associação vira evento da sede: segue para as academias vinculadas
+    if seguem_sede:
+        _, erro = _propagar_eventos_sede(nivel_id, seguem_sede, novo_evento_id)
+        if erro:
+            flash(f'Evento aprovado, mas houve erro ao propagar para as academias: {erro}', 'warning')
+    
     return redirect(url_for('calendario.aprovacoes'))
 
 
@@ -2025,6 +1705,11 @@ def cancelar_evento(evento_id):
                     ids_para_cancelar.append(r['id'])
         
         conn.commit()
+        # Cancelamento em cascata atinge calendários de outros níveis (aprovações/derivados)
+        if len(processados) > 1:
+            cache_calendario.invalidar()
+        else:
+            cache_calendario.invalidar(nivel, nivel_id)
         flash(f'Evento cancelado. {total_cancelados} registro(s) atualizado(s).', 'success')
     except Exception as e:
         conn.rollback()
@@ -2078,6 +1763,7 @@ def criar_excecao(evento_id):
             """, (evento_id, data_excecao, tipo, motivo, nova_hora_inicio, nova_hora_fim, current_user.id))
             
             conn.commit()
+            cache_calendario.invalidar(nivel, nivel_id)
             flash('Exceção criada com sucesso!', 'success')
             return redirect(url_for('calendario.visualizar', nivel=nivel, nivel_id=nivel_id))
         
@@ -2091,3 +1777,166 @@ def criar_excecao(evento_id):
     conn.close()
     
     return render_template('calendario/criar_excecao.html', evento=evento, nivel=nivel, nivel_id=nivel_id)
+
+
+# ============================================================
+# 🔹 FEEDS ICALENDAR (.ics)
+# ============================================================
+
+ICS_DIAS_PASSADOS = 90
+ICS_DIAS_FUTUROS = 400
+
+
+def _serializador_ics():
+    return URLSafeSerializer(current_app.secret_key, salt='calendario-ics')
+
+
+def _url_ics(tipo, ref_id, academia_id):
+    """URL assinada do feed: tipo academia/turma/aluno. O token carrega a academia (304 sem banco)."""
+    token = _serializador_ics().dumps([tipo, ref_id, academia_id])
+    return url_for('calendario.feed_ics', token=token, _external=True)
+
+
+@bp_calendario.route('/ics/<token>.ics')
+def feed_ics(token):
+    """
+    Feed iCalendar para assinatura em celular/agenda (sem login; autorizado pelo token assinado).
+    ETag/Last-Modified vêm da versão em memória do calendário da academia, então o 304 não toca no banco;
+    vale enquanto toda escrita em eventos passar por cache_calendario.invalidar* (ver utils/cache_calendario.py).
+    """
+    try:
+        tipo, ref_id, academia_id = _serializador_ics().loads(token)
+    except (BadSignature, ValueError, TypeError):
+        abort(404)
+    if tipo not in ('academia', 'turma', 'aluno'):
+        abort(404)
+
+    hoje = date.today()
+    marca, instante = cache_calendario.versao('academia', academia_id)
+    # A janela do feed anda com o dia, então o conteúdo também muda à meia-noite
+    instante = max(instante, datetime.combine(hoje, datetime.min.time()).timestamp())
+    ultima_alteracao = datetime.fromtimestamp(int(instante), tz=timezone.utc)
+    etag = hashlib.sha1(f"{token}:{marca}:{hoje}".encode()).hexdigest()[:20]
+
+    if request.if_none_match:
+        nao_modificado = request.if_none_match.contains(etag)
+    else:
+        nao_modificado = bool(request.if_modified_since and request.if_modified_since >= ultima_alteracao)
+    if nao_modificado:
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.last_modified = ultima_alteracao
+        return resp
+
+    inicio = hoje - timedelta(days=ICS_DIAS_PASSADOS)
+    fim = hoje + timedelta(days=ICS_DIAS_FUTUROS)
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        if tipo == 'academia':
+            cur.execute("SELECT nome FROM academias WHERE id = %s", (academia_id,))
+            r = cur.fetchone()
+            nome = r['nome'] if r else None
+        elif tipo == 'turma':
+            cur.execute("SELECT Nome AS nome FROM turmas WHERE TurmaID = %s AND id_academia = %s",
+                        (ref_id, academia_id))
+            r = cur.fetchone()
+            nome = f"Turma {r['nome']}" if r else None
+        else:
+            cur.execute("SELECT nome FROM alunos WHERE id = %s AND id_academia = %s AND ativo = 1",
+                        (ref_id, academia_id))
+            r = cur.fetchone()
+            nome = r['nome'] if r else None
+        if not nome:
+            abort(404)
+
+        cur.execute("""
+            SELECT id, titulo, descricao, data_inicio, data_fim, hora_inicio, hora_fim, tipo
+            FROM eventos
+            WHERE nivel = 'academia' AND nivel_id = %s
+              AND recorrente = 0 AND status = 'ativo'
+              AND data_inicio <= %s AND COALESCE(data_fim, data_inicio) >= %s
+            ORDER BY data_inicio, hora_inicio
+        """, (academia_id, fim, inicio))
+        eventos_normais = cur.fetchall()
+
+        sql_recorrentes = """
+            SELECT e.id, e.titulo, e.descricao, e.data_inicio, e.hora_inicio, e.hora_fim, e.tipo, e.dias_semana
+            FROM eventos e
+            {join}
+            WHERE e.nivel = 'academia' AND e.nivel_id = %s
+              AND e.recorrente = 1 AND e.status = 'ativo' AND e.dias_semana IS NOT NULL
+              {filtro}
+        """
+        if tipo == 'academia':
+            cur.execute(sql_recorrentes.format(join='', filtro=''), (academia_id,))
+        elif tipo == 'turma':
+            cur.execute(sql_recorrentes.format(join='', filtro='AND e.turma_id = %s'), (academia_id, ref_id))
+        else:
+            cur.execute(sql_recorrentes.format(join='JOIN aluno_turmas at ON at.TurmaID = e.turma_id',
+                                               filtro='AND at.aluno_id = %s'), (academia_id, ref_id))
+        eventos_recorrentes = cur.fetchall()
+
+        excecoes = buscar_excecoes(cur, [e['id'] for e in eventos_recorrentes], inicio, fim)
+    except mysql.connector.errors.ProgrammingError:
+        abort(404)
+    finally:
+        cur.close()
+        conn.close()
+
+    resp = Response(calendario_ics(nome, eventos_normais, eventos_recorrentes, excecoes),
+                    mimetype='text/calendar')
+    resp.headers['Content-Disposition'] = 'inline; filename="calendario.ics"'
+    resp.headers['Cache-Control'] = 'private, max-age=900'
+    resp.set_etag(etag)
+    resp.last_modified = ultima_alteracao
+    return resp
+
+
+@bp_calendario.route('/assinar')
+@login_required
+def assinar():
+    """Links de assinatura (.ics) dos calendários que o usuário pode ver."""
+    modo = session.get('modo_painel', 'academia')
+    feeds = []
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        if modo == 'responsavel':
+            cur.execute("""
+                SELECT a.id, a.nome, a.id_academia
+                FROM responsavel_alunos ra
+                JOIN alunos a ON a.id = ra.aluno_id
+                WHERE ra.usuario_id = %s AND a.ativo = 1 AND a.id_academia IS NOT NULL
+                ORDER BY a.nome
+            """, (current_user.id,))
+            for a in cur.fetchall():
+                feeds.append({'titulo': a['nome'], 'descricao': 'Aulas das turmas do aluno e eventos da academia',
+                              'url': _url_ics('aluno', a['id'], a['id_academia'])})
+        elif modo == 'aluno':
+            cur.execute("SELECT id, nome, id_academia FROM alunos WHERE usuario_id = %s LIMIT 1",
+                        (current_user.id,))
+            a = cur.fetchone()
+            if a and a.get('id_academia'):
+                feeds.append({'titulo': 'Meu calendário', 'descricao': 'Minhas aulas e eventos da academia',
+                              'url': _url_ics('aluno', a['id'], a['id_academia'])})
+        else:
+            nivel, nivel_id = _get_nivel_e_id_usuario()
+            if nivel == 'academia':
+                cur.execute("SELECT nome FROM academias WHERE id = %s", (nivel_id,))
+                acad = cur.fetchone()
+                feeds.append({'titulo': acad['nome'] if acad else 'Academia',
+                              'descricao': 'Todas as aulas e eventos da academia',
+                              'url': _url_ics('academia', nivel_id, nivel_id)})
+                cur.execute("SELECT TurmaID, Nome FROM turmas WHERE id_academia = %s ORDER BY Nome", (nivel_id,))
+                for t in cur.fetchall():
+                    feeds.append({'titulo': f"Turma {t['Nome']}", 'descricao': 'Aulas da turma e eventos da academia',
+                                  'url': _url_ics('turma', t['TurmaID'], nivel_id)})
+    finally:
+        cur.close()
+        conn.close()
+
+    if not feeds:
+        flash('Nenhum calendário disponível para assinatura.', 'warning')
+        return redirect(url_for('calendario.index'))
+    return render_template('calendario/assinar.html', feeds=feeds)
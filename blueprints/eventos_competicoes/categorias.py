@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Regras de categoria das competições: gênero, idade no ano civil e faixa de peso sobre a
+tabela categorias. A tabela é dado de referência (o sistema não a altera), então é lida
+uma vez por processo e filtrada em memória; o TTL é só uma rede de segurança para
+alterações feitas por SQL direto. Usado por buscar_categorias e pela pesagem.
+"""
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from utils import cache_formularios
+
+TTL_SEGUNDOS = 600
+GENEROS = {"M": "MASCULINO", "F": "FEMININO"}
+
+_lock = threading.Lock()
+_cache = {"expira_em": 0, "categorias": None}
+
+
+def listar(cur):
+    """Todas as categorias (cursor dictionary só é usado fora do cache), por nome_categoria."""
+    with _lock:
+        if _cache["categorias"] is not None and _cache["expira_em"] >= time.monotonic():
+            return _cache["categorias"]
+    id_classe = "id_classe" if cache_formularios.coluna_existe(cur, "categorias", "id_classe") else "NULL AS id_classe"
+    cur.execute(f"""
+        SELECT id, categoria, nome_categoria, {id_classe}, genero, peso_min, peso_max, idade_min, idade_max
+        FROM categorias
+        ORDER BY nome_categoria
+    """)
+    categorias = tuple(
+        {k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()}
+        for row in cur.fetchall()
+    )
+    with _lock:
+        _cache["categorias"] = categorias
+        _cache["expira_em"] = time.monotonic() + TTL_SEGUNDOS
+    return categorias
+
+
+def invalidar():
+    with _lock:
+        _cache["categorias"] = None
+
+
+def genero_db(sexo):
+    """"M"/"F" (ou "Masculino"/"Feminino") -> valor da coluna genero; None se não reconhecido."""
+    return GENEROS.get((sexo or "").strip()[:1].upper())
+
+
+def idade_ano_civil(nascimento, hoje=None):
+    return (hoje or date.today()).year - nascimento.year
+
+
+def elegiveis(cur, sexo, nascimento, peso, hoje=None):
+    """
+    Categorias em que o atleta se encaixa (mesma regra da consulta original de
+    buscar_categorias: limites nulos não restringem, limites inclusivos).
+    nascimento: date; peso: número. Sem gênero reconhecido ou peso <= 0, lista vazia.
+    """
+    genero = genero_db(sexo)
+    if not genero or not nascimento or not peso or peso <= 0:
+        return []
+    idade = idade_ano_civil(nascimento, hoje)
+    return [
+        {k: v for k, v in c.items() if k != "genero"}
+        for c in listar(cur)
+        if (c["genero"] or "").upper() == genero
+        and (c["idade_min"] is None or idade >= c["idade_min"])
+        and (c["idade_max"] is None or idade <= c["idade_max"])
+        and (c["peso_min"] is None or peso >= c["peso_min"])
+        and (c["peso_max"] is None or peso <= c["peso_max"])
+    ]
+
+
+def por_nome(cur, nome_categoria):
+    """Categoria pelo nome (o que fica gravado na inscrição) ou None."""
+    return next((c for c in listar(cur) if c["nome_categoria"] == nome_categoria), None)
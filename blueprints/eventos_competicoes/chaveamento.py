@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Chaveamento das competições: sorteio das chaves de uma categoria a partir das inscrições
+enviadas (consolidação) e registro dos resultados das lutas.
+O sorteio é determinístico: random.Random(semente) sobre os atletas em ordem de
+inscrição, então a mesma semente com os mesmos atletas e cabeças de chave gera a mesma
+chave (a semente fica gravada em eventos_competicoes_chaves).
+- eliminatória: chave com potência de 2 posições; cabeças de chave nas posições padrão
+  (1 x 8, 4 x 5, 2 x 7, 3 x 6...), byes com os primeiros cabeças, demais atletas
+  espalhados para que os da mesma academia se encontrem o mais tarde possível;
+- todos contra todos: método do círculo, com as lutas entre atletas da mesma academia
+  nas primeiras rodadas.
+Tabelas: migrations/create_chaveamentos.sql.
+"""
+import random
+
+TIPOS = ("eliminatoria", "todos_contra_todos")
+LIMITE_TODOS_CONTRA_TODOS = 5  # até 5 atletas o tipo automático é todos contra todos
+RESULTADO_BYE = "bye"
+
+
+def tipo_automatico(total_atletas):
+    return "todos_contra_todos" if total_atletas <= LIMITE_TODOS_CONTRA_TODOS else "eliminatoria"
+
+
+def nova_semente():
+    return random.SystemRandom().randrange(1, 2 ** 31)
+
+
+def _cabecas_por_posicao(tamanho):
+    """Índice (0 = primeiro cabeça) de quem ocupa cada posição da chave na ordem padrão."""
+    ordem = [0]
+    while len(ordem) < tamanho:
+        n = len(ordem) * 2
+        ordem = [c for s in ordem for c in (s, n - 1 - s)]
+    return ordem
+
+
+def rodada_encontro(posicao_a, posicao_b):
+    """Rodada (1 = primeira) em que as posições se enfrentam se ambos forem vencendo."""
+    return (posicao_a ^ posicao_b).bit_length()
+
+
+def _separar(atletas, semente):
+    """(cabeças de chave em ordem, demais atletas embaralhados pela semente)."""
+    rng = random.Random(semente)
+    atletas = sorted(atletas, key=lambda a: a["inscricao_id"])
+    cabecas = sorted((a for a in atletas if a.get("cabeca_chave")),
+                     key=lambda a: (a["cabeca_chave"], a["inscricao_id"]))
+    demais = [a for a in atletas if not a.get("cabeca_chave")]
+    rng.shuffle(demais)
+    return rng, cabecas, demais
+
+
+def sortear_eliminatoria(atletas, semente):
+    """
+    Chave eliminatória. Retorna dict com tipo, semente, tamanho, posicoes (atleta ou None
+    por posição) e lutas (rodada, posicao, a, b, vencedor, resultado; a/b/vencedor são
+    inscricao_id). Byes da primeira rodada já saem decididos e o atleta avança.
+    """
+    n = len(atletas)
+    tamanho = 1 << max(1, (n - 1).bit_length())
+    cabeca_em = _cabecas_por_posicao(tamanho)
+    posicao_da_cabeca = {c: p for p, c in enumerate(cabeca_em)}
+    # Byes ficam nas posições dos "cabeças" n+1..tamanho: adversários dos primeiros cabeças
+    livres = [p for p in range(tamanho) if cabeca_em[p] < n]
+    posicoes = [None] * tamanho
+
+    rng, cabecas, demais = _separar(atletas, semente)
+    for i, atleta in enumerate(cabecas):
+        posicoes[posicao_da_cabeca[i]] = atleta
+        livres.remove(posicao_da_cabeca[i])
+
+    # Academias com mais atletas primeiro (ordem sorteada entre as de mesmo tamanho)
+    por_academia = {}
+    for atleta in cabecas + demais:
+        por_academia.setdefault(atleta.get("academia_id"), []).append(atleta)
+    ordem_academias = list(por_academia)
+    rng.shuffle(ordem_academias)
+    ordem_academias.sort(key=lambda ac: -len(por_academia[ac]))
+    ocupadas = {}  # academia_id -> posições já ocupadas
+    for atleta in cabecas:
+        ocupadas.setdefault(atleta.get("academia_id"), []).append(posicoes.index(atleta))
+
+    sem_encontro = tamanho.bit_length() + 1
+    for academia_id in ordem_academias:
+        for atleta in por_academia[academia_id]:
+            if atleta.get("cabeca_chave"):
+                continue
+            candidatas = list(livres)
+            rng.shuffle(candidatas)
+            mesmas = ocupadas.get(academia_id, [])
+            posicao = max(candidatas, key=lambda p: min((rodada_encontro(p, q) for q in mesmas), default=sem_encontro))
+            posicoes[posicao] = atleta
+            livres.remove(posicao)
+            ocupadas.setdefault(academia_id, []).append(posicao)
+
+    lutas = []
+    rodadas = tamanho.bit_length() - 1
+    for rodada in range(1, rodadas + 1):
+        for posicao in range(tamanho >> rodada):
+            lutas.append({"rodada": rodada, "posicao": posicao, "a": None, "b": None,
+                          "vencedor": None, "resultado": None})
+    for luta in lutas[:tamanho // 2]:
+        a, b = posicoes[2 * luta["posicao"]], posicoes[2 * luta["posicao"] + 1]
+        luta["a"] = a["inscricao_id"] if a else None
+        luta["b"] = b["inscricao_id"] if b else None
+        if (a is None) != (b is None):
+            luta["vencedor"] = luta["a"] or luta["b"]
+            luta["resultado"] = RESULTADO_BYE
+            if rodadas > 1:
+                seguinte = lutas[tamanho // 2 + luta["posicao"] // 2]
+                seguinte["a" if luta["posicao"] % 2 == 0 else "b"] = luta["vencedor"]
+    return {"tipo": "eliminatoria", "semente": semente, "tamanho": tamanho,
+            "posicoes": posicoes, "lutas": lutas}
+
+
+def sortear_todos_contra_todos(atletas, semente):
+    """Todos contra todos (mesmo formato de sortear_eliminatoria; posições = ordem do sorteio)."""
+    _, cabecas, demais = _separar(atletas, semente)
+    posicoes = cabecas + demais
+    lista = posicoes + ([None] if len(posicoes) % 2 else [])
+    m = len(lista)
+    rodadas = []
+    for _ in range(m - 1):
+        rodadas.append([(lista[i], lista[m - 1 - i]) for i in range(m // 2) if lista[i] and lista[m - 1 - i]])
+        lista = [lista[0], lista[-1]] + lista[1:-1]
+    # Rodadas com lutas entre atletas da mesma academia primeiro (sort estável)
+    rodadas.sort(key=lambda pares: -sum(1 for a, b in pares if a.get("academia_id") == b.get("academia_id")))
+    lutas = [
+        {"rodada": r, "posicao": p, "a": a["inscricao_id"], "b": b["inscricao_id"], "vencedor": None, "resultado": None}
+        for r, pares in enumerate(rodadas, start=1) for p, (a, b) in enumerate(pares)
+    ]
+    return {"tipo": "todos_contra_todos", "semente": semente, "tamanho": len(posicoes),
+            "posicoes": posicoes, "lutas": lutas}
+
+
+def sortear(atletas, semente, tipo=None):
+    """Sorteia a chave (tipo None = automático pelo número de atletas). Exige ao menos 2 atletas."""
+    if len(atletas) < 2:
+        raise ValueError("A categoria precisa de pelo menos 2 atletas.")
+    tipo = tipo or tipo_automatico(len(atletas))
+    if tipo == "todos_contra_todos":
+        return sortear_todos_contra_todos(atletas, semente)
+    return sortear_eliminatoria(atletas, semente)
+
+
+def _categoria_efetiva(insc, ajustes):
+    """Categoria da inscrição depois da pesagem; None se desclassificado."""
+    situacao, categoria_nova = ajustes.get(insc["id"], (None, None))
+    if situacao == "desclassificado":
+        return None
+    return categoria_nova or insc["dados_form"].get("categoria") or "Sem categoria"
+
+
+def totais_por_categoria(consolidacao, ajustes=None):
+    """[(categoria, total de atletas)] por nome, já com os ajustes da pesagem."""
+    totais = {}
+    for insc in consolidacao.get("inscricoes", []):
+        categoria = _categoria_efetiva(insc, ajustes or {})
+        if categoria is not None:
+            totais[categoria] = totais.get(categoria, 0) + 1
+    return sorted(totais.items())
+
+
+def atletas_da_categoria(consolidacao, categoria, ajustes=None):
+    """
+    Atletas (inscrições enviadas) de uma categoria da consolidação, no formato do sorteio.
+    ajustes: inscricao_id -> (situacao, categoria_nova) da pesagem (pesagem.ajustes);
+    desclassificados ficam de fora e reclassificados entram na categoria nova.
+    """
+    ajustes = ajustes or {}
+    nomes_academias = {ac["academia_id"]: ac["academia_nome"] for ac in consolidacao.get("academias", [])}
+    atletas = []
+    for insc in consolidacao.get("inscricoes", []):
+        if _categoria_efetiva(insc, ajustes) != categoria:
+            continue
+        atletas.append({
+            "inscricao_id": insc["id"], "academia_id": insc.get("academia_id"), "aluno_id": insc.get("aluno_id"),
+            "aluno_nome": insc.get("aluno_nome") or insc["dados_form"].get("nome") or "Avulso",
+            "academia_nome": insc.get("academia_nome") or nomes_academias.get(insc.get("academia_id")),
+            "cabeca_chave": None,
+        })
+    return atletas
+
+
+# ---------------------------------------------------------------------------
+# Gravação e leitura (cursor dictionary, transação de quem chama)
+# ---------------------------------------------------------------------------
+
+def gravar(cur, evento_id, categoria, sorteio, usuario_id=None):
+    """Grava (substituindo a anterior da categoria) a chave sorteada. Retorna o id."""
+    cur.execute("DELETE FROM eventos_competicoes_chaves WHERE evento_id = %s AND categoria = %s",
+                (evento_id, categoria))
+    atletas = [(p, a) for p, a in enumerate(sorteio["posicoes"]) if a]
+    cur.execute("""
+        INSERT INTO eventos_competicoes_chaves (evento_id, categoria, tipo, semente, tamanho, total_atletas, usuario_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (evento_id, categoria, sorteio["tipo"], sorteio["semente"], sorteio["tamanho"], len(atletas), usuario_id))
+    chave_id = cur.lastrowid
+    cur.executemany("""
+        INSERT INTO eventos_competicoes_chaves_atletas
+            (chave_id, posicao, inscricao_id, academia_id, aluno_nome, academia_nome, cabeca_chave)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(chave_id, p, a["inscricao_id"], a.get("academia_id"), a.get("aluno_nome"), a.get("academia_nome"),
+           a.get("cabeca_chave")) for p, a in atletas])
+    cur.executemany("""
+        INSERT INTO eventos_competicoes_chaves_lutas
+            (chave_id, rodada, posicao, inscricao_a_id, inscricao_b_id, vencedor_inscricao_id, resultado)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(chave_id, lt["rodada"], lt["posicao"], lt["a"], lt["b"], lt["vencedor"], lt["resultado"])
+          for lt in sorteio["lutas"]])
+    return chave_id
+
+
+def tem_resultados(cur, evento_id, categoria):
+    """True se a chave da categoria já tem alguma luta decidida (byes não contam)."""
+    cur.execute("""
+        SELECT 1
+        FROM eventos_competicoes_chaves c
+        INNER JOIN eventos_competicoes_chaves_lutas l ON l.chave_id = c.id
+        WHERE c.evento_id = %s AND c.categoria = %s
+          AND l.vencedor_inscricao_id IS NOT NULL AND COALESCE(l.resultado, '') != %s
+        LIMIT 1
+    """, (evento_id, categoria, RESULTADO_BYE))
+    return cur.fetchone() is not None
+
+
+def listar(cur, evento_id):
+    """Chaves do evento por categoria, com total de lutas e de lutas decididas."""
+    cur.execute("""
+        SELECT c.id, c.categoria, c.tipo, c.semente, c.total_atletas, c.created_at,
+               COUNT(l.id) AS total_lutas,
+               COUNT(CASE WHEN l.vencedor_inscricao_id IS NOT NULL AND COALESCE(l.resultado, '') != %s THEN 1 END) AS lutas_decididas
+        FROM eventos_competicoes_chaves c
+        LEFT JOIN eventos_competicoes_chaves_lutas l ON l.chave_id = c.id
+        WHERE c.evento_id = %s
+        GROUP BY c.id
+        ORDER BY c.categoria
+    """, (RESULTADO_BYE, evento_id))
+    return cur.fetchall()
+
+
+def carregar(cur, evento_id, chave_id):
+    """Chave com atletas (por inscricao_id) e lutas agrupadas por rodada; None se não existe."""
+    cur.execute("SELECT * FROM eventos_competicoes_chaves WHERE id = %s AND evento_id = %s", (chave_id, evento_id))
+    chave = cur.fetchone()
+    if not chave:
+        return None
+    cur.execute("""
+        SELECT posicao, inscricao_id, academia_id, aluno_nome, academia_nome, cabeca_chave
+        FROM eventos_competicoes_chaves_atletas WHERE chave_id = %s ORDER BY posicao
+    """, (chave_id,))
+    chave["atletas"] = {a["inscricao_id"]: a for a in cur.fetchall()}
+    cur.execute("""
+        SELECT id, rodada, posicao, inscricao_a_id, inscricao_b_id, vencedor_inscricao_id, resultado
+        FROM eventos_competicoes_chaves_lutas WHERE chave_id = %s ORDER BY rodada, posicao
+    """, (chave_id,))
+    rodadas = {}
+    for luta in cur.fetchall():
+        rodadas.setdefault(luta["rodada"], []).append(luta)
+    chave["rodadas"] = rodadas
+    chave["classificacao"] = classificacao(chave)
+    return chave
+
+
+def classificacao(chave):
+    """
+    Todos contra todos: atletas por vitórias (empate pela ordem do sorteio).
+    Eliminatória: campeão e vice quando a final estiver decidida; senão lista vazia.
+    """
+    lutas = [lt for rodada in chave["rodadas"].values() for lt in rodada]
+    if chave["tipo"] == "todos_contra_todos":
+        vitorias = {i: 0 for i in chave["atletas"]}
+        for luta in lutas:
+            if luta["vencedor_inscricao_id"] in vitorias:
+                vitorias[luta["vencedor_inscricao_id"]] += 1
+        ordem = sorted(chave["atletas"].values(), key=lambda a: (-vitorias[a["inscricao_id"]], a["posicao"]))
+        return [dict(a, vitorias=vitorias[a["inscricao_id"]]) for a in ordem]
+    final = chave["rodadas"].get(max(chave["rodadas"], default=0), [None])[0]
+    if not final or not final["vencedor_inscricao_id"]:
+        return []
+    vice = final["inscricao_b_id"] if final["vencedor_inscricao_id"] == final["inscricao_a_id"] else final["inscricao_a_id"]
+    return [chave["atletas"][i] for i in (final["vencedor_inscricao_id"], vice) if i in chave["atletas"]]
+
+
+def registrar_resultado(cur, chave, luta_id, vencedor_inscricao_id, resultado, usuario_id=None):
+    """
+    Grava o vencedor da luta e, na eliminatória, leva-o à luta seguinte. Corrigir um
+    resultado só é possível enquanto a luta seguinte não tiver resultado.
+    ValueError com a mensagem para o usuário se a luta ou o vencedor forem inválidos.
+    """
+    lutas = {lt["id"]: lt for rodada in chave["rodadas"].values() for lt in rodada}
+    luta = lutas.get(luta_id)
+    if not luta:
+        raise ValueError("Luta não encontrada.")
+    if not luta["inscricao_a_id"] or not luta["inscricao_b_id"]:
+        raise ValueError("A luta ainda não tem os dois atletas.")
+    if vencedor_inscricao_id not in (luta["inscricao_a_id"], luta["inscricao_b_id"]):
+        raise ValueError("O vencedor precisa ser um dos atletas da luta.")
+
+    seguinte = None
+    if chave["tipo"] == "eliminatoria":
+        seguinte = next((lt for lt in chave["rodadas"].get(luta["rodada"] + 1, [])
+                         if lt["posicao"] == luta["posicao"] // 2), None)
+        if seguinte and seguinte["vencedor_inscricao_id"]:
+            raise ValueError("A luta seguinte já tem resultado; corrija-a primeiro.")
+
+    cur.execute("""
+        UPDATE eventos_competicoes_chaves_lutas
+        SET vencedor_inscricao_id = %s, resultado = %s, registrado_por = %s, registrado_em = NOW()
+        WHERE id = %s AND chave_id = %s
+    """, (vencedor_inscricao_id, (resultado or "")[:40] or None, usuario_id, luta_id, chave["id"]))
+    if seguinte:
+        lado = "inscricao_a_id" if luta["posicao"] % 2 == 0 else "inscricao_b_id"
+        cur.execute(f"UPDATE eventos_competicoes_chaves_lutas SET {lado} = %s WHERE id = %s",
+                    (vencedor_inscricao_id, seguinte["id"]))
+
+
+def linhas_folha(chave):
+    """Linhas da folha impressa (uma por luta) para utils.exportacao.gravar_pdf_tabela."""
+    atletas = chave["atletas"]
+
+    def nome(inscricao_id):
+        a = atletas.get(inscricao_id)
+        if not a:
+            return "—" if inscricao_id is None else str(inscricao_id)
+        return f"{a['aluno_nome'] or ''} ({a['academia_nome'] or ''})"
+
+    for rodada, lutas in sorted(chave["rodadas"].items()):
+        for luta in lutas:
+            if luta["resultado"] == RESULTADO_BYE:
+                continue
+            vencedor = atletas.get(luta["vencedor_inscricao_id"])
+            yield [chave["categoria"], rodada, luta["posicao"] + 1,
+                   nome(luta["inscricao_a_id"]), nome(luta["inscricao_b_id"]),
+                   vencedor["aluno_nome"] if vencedor else "", luta["resultado"] or ""]
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Consolidação das inscrições enviadas de um evento/competição.
+Montada uma vez (ao enviar inscrições e ao finalizar o evento) e gravada em
+eventos_competicoes_consolidacao; consolidar, imprimir e exportar leem daí em vez de
+reconsultar as inscrições, refazer json.loads de cada dados_form e reagrupar.
+Qualquer alteração em inscrições enviadas chama invalidar(), que sobe a versão e
+descarta os dados; a próxima leitura remonta.
+"""
+import json
+import logging
+from datetime import datetime
+
+import mysql.connector.errors
+
+from utils.exportacao import iterar_cursor
+
+# Campos do formulário materializados em colunas geradas indexadas
+# (migrations/add_inscricoes_campos_normalizados.sql)
+COLUNAS_NORMALIZADAS = {
+    "categoria": "campo_categoria",
+    "peso": "campo_peso",
+    "sexo": "campo_sexo",
+    "data_nascimento": "campo_data_nascimento",
+    "graduacao_id": "campo_graduacao_id",
+}
+
+
+SQL_INSCRICOES = """
+    SELECT i.id, i.academia_id, i.aluno_id, i.dados_form, i.inclusao_avulsa,
+           ac.nome as academia_nome, a.nome as aluno_nome
+    FROM eventos_competicoes_inscricoes i
+    INNER JOIN academias ac ON ac.id = i.academia_id
+    LEFT JOIN alunos a ON a.id = i.aluno_id
+    WHERE i.evento_id = %s AND i.status = 'enviada' AND ac.id_associacao = %s
+    ORDER BY {ordem}
+"""
+ORDEM_PADRAO = "ac.nome, a.nome"
+
+
+def _dados_form(valor):
+    if not valor:
+        return {}
+    if isinstance(valor, dict):
+        return valor
+    try:
+        dados = json.loads(valor)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return dados if isinstance(dados, dict) else {}
+
+
+def _inscricao(row):
+    return {
+        "id": row["id"],
+        "academia_id": row["academia_id"],
+        "aluno_id": row["aluno_id"],
+        "inclusao_avulsa": row.get("inclusao_avulsa"),
+        "academia_nome": row["academia_nome"],
+        "aluno_nome": row["aluno_nome"],
+        "dados_form": _dados_form(row.get("dados_form")),
+    }
+
+
+def agrupar(inscricoes, academias):
+    """
+    Agrupa inscrições (já na ordem desejada) por academia e por categoria.
+    Retorna (academias_com_inscricoes, categorias_com_inscricoes) no formato dos templates.
+    """
+    academias_com_inscricoes = {}
+    for ac in academias:
+        academias_com_inscricoes[ac["academia_id"]] = {
+            "academia_nome": ac["academia_nome"],
+            "categorias": {}
+        }
+
+    for insc in inscricoes:
+        ac_data = academias_com_inscricoes.get(insc.get("academia_id"))
+        if ac_data is None:
+            continue
+        categoria = insc["dados_form"].get("categoria") or "Sem categoria"
+        ac_data["categorias"].setdefault(categoria, []).append({
+            "id": insc.get("id"),
+            "aluno_id": insc.get("aluno_id"),
+            "aluno_nome": insc.get("aluno_nome") or "Avulso",
+            "dados_form": insc["dados_form"]
+        })
+
+    categorias_com_inscricoes = {}
+    for ac_data in academias_com_inscricoes.values():
+        total_por_categoria = {cat: len(alunos) for cat, alunos in ac_data["categorias"].items()}
+        ac_data["total_inscritos"] = sum(total_por_categoria.values())
+        ac_data["total_por_categoria"] = total_por_categoria
+        academia_nome = ac_data.get("academia_nome", "Academia Desconhecida")
+        for categoria, alunos in ac_data["categorias"].items():
+            cat_data = categorias_com_inscricoes.setdefault(categoria, {"academias": {}, "total_inscritos": 0})
+            cat_data["academias"].setdefault(academia_nome, []).extend(alunos)
+            cat_data["total_inscritos"] += len(alunos)
+
+    return academias_com_inscricoes, categorias_com_inscricoes
+
+
+def ordenar(inscricoes, campo, direcao="ASC"):
+    """Ordena (cópia) por um campo do formulário: números antes, depois texto sem caixa."""
+    def valor_ordenacao(insc):
+        valor = insc["dados_form"].get(campo, "")
+        try:
+            if isinstance(valor, (int, float)):
+                return (0, valor)
+            valor_str = str(valor).strip()
+            if valor_str.replace('.', '').replace('-', '').isdigit():
+                return (0, float(valor_str))
+        except (ValueError, TypeError):
+            pass
+        return (1, str(valor).lower())
+
+    return sorted(inscricoes, key=valor_ordenacao, reverse=(direcao == "DESC"))
+
+
+def ordenar_por_campo(conn, evento_id, inscricoes, campo, direcao="ASC"):
+    """
+    Ordena inscrições enviadas por um campo do formulário. Campos normalizados são
+    ordenados no banco pela coluna gerada (peso como número, data como data, vazios por
+    último); os demais, e bancos sem a migração, caem na ordenação em memória.
+    """
+    coluna = COLUNAS_NORMALIZADAS.get(campo)
+    if coluna is None:
+        return ordenar(inscricoes, campo, direcao)
+    direcao = "DESC" if direcao == "DESC" else "ASC"
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT i.id
+            FROM eventos_competicoes_inscricoes i
+            INNER JOIN academias ac ON ac.id = i.academia_id
+            LEFT JOIN alunos a ON a.id = i.aluno_id
+            WHERE i.evento_id = %s AND i.status = 'enviada'
+            ORDER BY i.{coluna} IS NULL, i.{coluna} {direcao}, ac.nome, a.nome
+        """, (evento_id,))
+        posicao = {row[0]: n for n, row in enumerate(cur.fetchall())}
+    except mysql.connector.errors.ProgrammingError:
+        return ordenar(inscricoes, campo, direcao)
+    finally:
+        cur.close()
+    fim = len(posicao)
+    return sorted(inscricoes, key=lambda insc: posicao.get(insc["id"], fim))
+
+
+def iterar_inscricoes(cur, evento_id, id_assoc, campo=None, direcao="ASC"):
+    """
+    Inscrições enviadas lidas sob demanda de `cur` (cursor não-bufferizado), já com
+    dados_form decodificado, para exportações grandes sem carregar tudo em memória.
+    Ordena no SQL pelo campo normalizado; outros campos (ou banco sem a migração)
+    ordenam em memória.
+    """
+    coluna = COLUNAS_NORMALIZADAS.get(campo)
+    if campo and coluna is None:
+        cur.execute(SQL_INSCRICOES.format(ordem=ORDEM_PADRAO), (evento_id, id_assoc))
+        return iter(ordenar([_inscricao(r) for r in cur.fetchall()], campo, direcao))
+    ordem = ORDEM_PADRAO
+    if coluna:
+        ordem = f"i.{coluna} IS NULL, i.{coluna} {'DESC' if direcao == 'DESC' else 'ASC'}, {ORDEM_PADRAO}"
+    try:
+        cur.execute(SQL_INSCRICOES.format(ordem=ordem), (evento_id, id_assoc))
+    except mysql.connector.errors.ProgrammingError:
+        cur.execute(SQL_INSCRICOES.format(ordem=ORDEM_PADRAO), (evento_id, id_assoc))
+        return iter(ordenar([_inscricao(r) for r in cur.fetchall()], campo, direcao))
+    return (_inscricao(r) for r in iterar_cursor(cur))
+
+
+def contar_inscricoes(cur, evento_id, id_assoc):
+    """Total de inscrições enviadas (o mesmo conjunto de iterar_inscricoes), com cursor dictionary."""
+    cur.execute("""
+        SELECT COUNT(*) AS total
+        FROM eventos_competicoes_inscricoes i
+        INNER JOIN academias ac ON ac.id = i.academia_id
+        WHERE i.evento_id = %s AND i.status = 'enviada' AND ac.id_associacao = %s
+    """, (evento_id, id_assoc))
+    return cur.fetchone()["total"]
+
+
+def montar(cur, evento_id, id_assoc):
+    """Lê inscrições enviadas, academias e graduações e monta o dicionário da consolidação."""
+    cur.execute("""
+        SELECT DISTINCT ac.id as academia_id, ac.nome as academia_nome
+        FROM academias ac
+        INNER JOIN eventos_competicoes_adesao ea ON ea.academia_id = ac.id AND ea.evento_id = %s AND ea.aderiu = 1
+        INNER JOIN eventos_competicoes_inscricoes i ON i.academia_id = ac.id AND i.evento_id = %s AND i.status = 'enviada'
+        WHERE ac.id_associacao = %s
+        ORDER BY ac.nome
+    """, (evento_id, evento_id, id_assoc))
+    academias = cur.fetchall()
+
+    cur.execute(SQL_INSCRICOES.format(ordem=ORDEM_PADRAO), (evento_id, id_assoc))
+    inscricoes = [_inscricao(r) for r in cur.fetchall()]
+
+    academias_map = {}
+    graduacoes_map = {}
+    try:
+        cur.execute("SELECT id, nome FROM academias WHERE id_associacao = %s", (id_assoc,))
+        for row in cur.fetchall():
+            academias_map[str(row["id"])] = row["nome"]
+        cur.execute("SELECT id, faixa, graduacao, categoria FROM graduacao")
+        for row in cur.fetchall():
+            graduacao_nome = f"{row.get('faixa', '')} {row.get('graduacao', '')} {row.get('categoria', '')}".strip()
+            graduacoes_map[str(row["id"])] = graduacao_nome if graduacao_nome else f"ID {row['id']}"
+    except Exception as e:
+        logging.warning(f"Erro ao buscar mapeamentos de academias/graduações: {e}")
+
+    academias_com_inscricoes, categorias_com_inscricoes = agrupar(inscricoes, academias)
+    return {
+        "gerado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "academias": academias,
+        "inscricoes": inscricoes,
+        # JSON só tem chaves texto: academias vão como pares [id, dados] para manter o id inteiro
+        "academias_com_inscricoes": list(academias_com_inscricoes.items()),
+        "categorias_com_inscricoes": categorias_com_inscricoes,
+        "total_geral_inscritos": len(inscricoes),
+        "academias_map": academias_map,
+        "graduacoes_map": graduacoes_map,
+    }
+
+
+def _restaurar(consolidacao):
+    consolidacao["academias_com_inscricoes"] = {
+        int(ac_id): ac_data for ac_id, ac_data in consolidacao["academias_com_inscricoes"]
+    }
+    return consolidacao
+
+
+def invalidar(cur, evento_id):
+    """Marca a consolidação como desatualizada (no mesmo commit da alteração nas inscrições)."""
+    try:
+        cur.execute("""
+            INSERT INTO eventos_competicoes_consolidacao (evento_id, versao, dados)
+            VALUES (%s, 1, NULL)
+            ON DUPLICATE KEY UPDATE versao = versao + 1, dados = NULL, gerado_em = NULL
+        """, (evento_id,))
+    except mysql.connector.errors.ProgrammingError:
+        pass  # Migração ainda não aplicada
+
+
+def versao(conn, evento_id):
+    """
+    Versão atual das inscrições enviadas do evento (sobe a cada envio, edição ou
+    cancelamento). None se a migração da consolidação não foi aplicada.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT versao FROM eventos_competicoes_consolidacao WHERE evento_id = %s", (evento_id,))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        cur.execute("""
+            INSERT IGNORE INTO eventos_competicoes_consolidacao (evento_id, versao, dados)
+            VALUES (%s, 1, NULL)
+        """, (evento_id,))
+        conn.commit()
+        return 1
+    except mysql.connector.errors.ProgrammingError:
+        return None
+    finally:
+        cur.close()
+
+
+def gerar(conn, evento_id):
+    """Invalida e remonta já (envio de inscrições, finalização). Retorna a consolidação ou None."""
+    cur = conn.cursor(dictionary=True)
+    try:
+        invalidar(cur, evento_id)
+        conn.commit()
+    finally:
+        cur.close()
+    return obter(conn, evento_id)
+
+
+def obter(conn, evento_id):
+    """
+    Consolidação atual do evento (com "versao"), montando e gravando se estiver desatualizada.
+    Sem a tabela da migração, monta a cada chamada. Retorna None se o evento não existe.
+    """
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("SELECT id_associacao FROM eventos_competicoes WHERE id = %s", (evento_id,))
+        ev = cur.fetchone()
+        if not ev:
+            return None
+        id_assoc = ev["id_associacao"]
+
+        try:
+            cur.execute("SELECT versao, dados FROM eventos_competicoes_consolidacao WHERE evento_id = %s", (evento_id,))
+            salvo = cur.fetchone()
+            tabela_existe = True
+        except mysql.connector.errors.ProgrammingError:
+            salvo, tabela_existe = None, False
+
+        if salvo and salvo.get("dados"):
+            try:
+                consolidacao = json.loads(salvo["dados"])
+                consolidacao["versao"] = salvo["versao"]
+                return _restaurar(consolidacao)
+            except (json.JSONDecodeError, TypeError, KeyError, ValueError):
+                pass
+
+        consolidacao = montar(cur, evento_id, id_assoc)
+        versao = salvo["versao"] if salvo else 1
+        if tabela_existe:
+            texto = json.dumps(consolidacao, ensure_ascii=False, default=str)
+            if salvo:
+                # Só grava se ninguém invalidou de novo enquanto montávamos
+                cur.execute("""
+                    UPDATE eventos_competicoes_consolidacao SET dados = %s, gerado_em = NOW()
+                    WHERE evento_id = %s AND versao = %s
+                """, (texto, evento_id, versao))
+            else:
+                cur.execute("""
+                    INSERT IGNORE INTO eventos_competicoes_consolidacao (evento_id, versao, dados, gerado_em)
+                    VALUES (%s, 1, %s, NOW())
+                """, (evento_id, texto))
+            conn.commit()
+        consolidacao["versao"] = versao
+        return _restaurar(consolidacao)
+    finally:
+        cur.close()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Envio em lote das inscrições de uma academia à associação.
+A seleção inteira (inscrições ainda não enviadas) é validada com consultas por conjunto:
+duplicidade (mesmo aluno e categoria), categoria (obrigatória no formulário e existente
+em categorias), prazo do evento e pagamento (quando o evento cobra taxa). Registros de
+pagamento que faltam são criados num único executemany e o status muda num único UPDATE,
+tudo na transação de quem chama. O número de idas ao banco não depende da quantidade de
+atletas. Se algum atleta tiver pendência nada é enviado: o envio é da academia inteira
+(depois dele a academia não edita mais as inscrições).
+"""
+import mysql.connector.errors
+
+SQL_INSCRICOES = """
+    SELECT i.id, i.aluno_id, i.status, {categoria} AS categoria,
+           COALESCE(a.nome, JSON_UNQUOTE(JSON_EXTRACT(i.dados_form, '$.nome'))) AS aluno_nome{pagamento}
+    FROM eventos_competicoes_inscricoes i
+    LEFT JOIN alunos a ON a.id = i.aluno_id{join_pagamento}
+    WHERE i.evento_id = %s AND i.academia_id = %s
+    ORDER BY i.id
+    FOR UPDATE
+"""
+CATEGORIA_JSON = "NULLIF(JSON_UNQUOTE(JSON_EXTRACT(i.dados_form, '$.categoria')), '')"
+
+
+def carregar(cur, evento_id, academia_id, com_pagamento=False):
+    """
+    Todas as inscrições da academia no evento (enviadas também, para checar duplicidade),
+    travadas até o fim da transação para que dois envios simultâneos não se cruzem.
+    """
+    pagamento, join_pagamento = "", ""
+    if com_pagamento:
+        pagamento = ", p.id AS pagamento_id, COALESCE(p.pago_academia, 0) AS pago_academia"
+        join_pagamento = ("\n    LEFT JOIN eventos_competicoes_inscricoes_pagamentos p ON p.id = ("
+                          "SELECT MIN(p2.id) FROM eventos_competicoes_inscricoes_pagamentos p2 "
+                          "WHERE p2.inscricao_id = i.id)")
+    params = (evento_id, academia_id)
+    try:
+        cur.execute(SQL_INSCRICOES.format(categoria="i.campo_categoria", pagamento=pagamento,
+                                          join_pagamento=join_pagamento), params)
+    except mysql.connector.errors.ProgrammingError:
+        # Sem a migração add_inscricoes_campos_normalizados
+        cur.execute(SQL_INSCRICOES.format(categoria=CATEGORIA_JSON, pagamento=pagamento,
+                                          join_pagamento=join_pagamento), params)
+    return cur.fetchall()
+
+
+def _categorias_existentes(cur, nomes):
+    if not nomes:
+        return set()
+    ph = ", ".join(["%s"] * len(nomes))
+    cur.execute(f"SELECT DISTINCT nome_categoria FROM categorias WHERE nome_categoria IN ({ph})", tuple(nomes))
+    return {r["nome_categoria"] for r in cur.fetchall()}
+
+
+def validar(cur, linhas, prazo_encerrado=False, categoria_obrigatoria=False, valor_taxa=None):
+    """
+    Resultado por atleta das inscrições pendentes de envio. Retorna (resultados, pagamentos):
+    resultados é uma lista de dicts (inscricao_id, aluno_nome, categoria, ok, motivos) e
+    pagamentos as linhas (inscricao_id, valor) a inserir para quem ainda não tem registro.
+    valor_taxa None = evento sem taxa (não valida pagamento).
+    """
+    pendentes = [r for r in linhas if r["status"] != "enviada"]
+    existentes = _categorias_existentes(cur, sorted({r["categoria"] for r in pendentes if r["categoria"]}))
+
+    # Primeira inscrição de cada (aluno, categoria): enviadas vêm antes, depois por id
+    primeira = {}
+    for r in sorted(linhas, key=lambda r: (r["status"] != "enviada", r["id"])):
+        primeira.setdefault((r["aluno_id"], r["categoria"] or ""), r["id"])
+
+    resultados, pagamentos = [], []
+    for r in pendentes:
+        motivos = []
+        if prazo_encerrado:
+            motivos.append("prazo do evento encerrado")
+        if primeira[(r["aluno_id"], r["categoria"] or "")] != r["id"]:
+            motivos.append("inscrição duplicada na mesma categoria")
+        if not r["categoria"]:
+            if categoria_obrigatoria:
+                motivos.append("sem categoria")
+        elif r["categoria"] not in existentes:
+            motivos.append("categoria não encontrada")
+        if valor_taxa is not None:
+            if not r.get("pagamento_id"):
+                pagamentos.append((r["id"], valor_taxa))
+                motivos.append("pagamento não confirmado")
+            elif not r.get("pago_academia"):
+                motivos.append("pagamento não confirmado")
+        resultados.append({
+            "inscricao_id": r["id"], "aluno_nome": r["aluno_nome"] or "—", "categoria": r["categoria"] or "",
+            "ok": not motivos, "motivos": motivos,
+        })
+    return resultados, pagamentos
+
+
+def criar_pagamentos(cur, pagamentos):
+    """Registros de pagamento (pago_academia = 0) das inscrições que ainda não têm, de uma vez."""
+    if pagamentos:
+        cur.executemany("""
+            INSERT INTO eventos_competicoes_inscricoes_pagamentos (inscricao_id, valor)
+            VALUES (%s, %s)
+        """, pagamentos)
+
+
+def enviar(cur, evento_id, academia_id, inscricao_ids):
+    """Marca as inscrições como enviadas num único UPDATE. Retorna quantas mudaram."""
+    if not inscricao_ids:
+        return 0
+    ph = ", ".join(["%s"] * len(inscricao_ids))
+    cur.execute(f"""
+        UPDATE eventos_competicoes_inscricoes SET status = 'enviada', data_envio = NOW()
+        WHERE evento_id = %s AND academia_id = %s AND status != 'enviada' AND id IN ({ph})
+    """, (evento_id, academia_id, *inscricao_ids))
+    return cur.rowcount
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Pesagem no dia da competição (eventos finalizados).
+A busca usa um índice em memória das inscrições enviadas do evento (nome sem acento,
+CPF só com dígitos e número da inscrição), montado a partir da consolidação e
+reaproveitado enquanto a versão da consolidação não mudar; cada busca só consulta o
+banco para ler a pesagem dos atletas encontrados. O peso medido recalcula a categoria
+pelas mesmas regras de buscar_categorias (categorias.elegiveis) e grava a situação em
+eventos_competicoes_pesagens (migrations/create_pesagens.sql).
+"""
+import threading
+import time
+import unicodedata
+
+import mysql.connector.errors
+
+from utils import cache_formularios
+from blueprints.eventos_competicoes import categorias as categorias_competicao
+from blueprints.eventos_competicoes import consolidacao as consolidacao_evento
+
+TTL_SEGUNDOS = 600
+MAX_EVENTOS = 20
+LIMITE_RESULTADOS = 20
+SITUACOES = ("ok", "reclassificado", "desclassificado")
+
+_lock = threading.Lock()
+_indices = {}  # evento_id -> (expira_em, versao, indice)
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).lower().split())
+
+
+def _digitos(texto):
+    return "".join(c for c in str(texto or "") if c.isdigit())
+
+
+def _atleta(insc):
+    dados = insc["dados_form"]
+    nascimento = None
+    if dados.get("data_nascimento"):
+        nascimento, _ = cache_formularios.VALIDADORES["data_nascimento"](str(dados["data_nascimento"]).strip())
+    nome = insc.get("aluno_nome") or dados.get("nome") or "Avulso"
+    return {
+        "inscricao_id": insc["id"],
+        "aluno_nome": nome,
+        "academia_id": insc.get("academia_id"),
+        "academia_nome": insc.get("academia_nome"),
+        "cpf": _digitos(dados.get("cpf")),
+        "sexo": dados.get("sexo") or "",
+        "data_nascimento": nascimento,
+        "categoria": dados.get("categoria") or "",
+        "peso_inscricao": dados.get("peso") or "",
+        "_nome": normalizar(nome),
+    }
+
+
+def _montar(consolidacao):
+    atletas = {}
+    for insc in consolidacao.get("inscricoes", []):
+        atleta = _atleta(insc)
+        atletas[atleta["inscricao_id"]] = atleta
+    por_cpf = {}
+    for atleta in atletas.values():
+        if atleta["cpf"]:
+            por_cpf.setdefault(atleta["cpf"], []).append(atleta["inscricao_id"])
+    return {
+        "atletas": atletas,
+        "por_nome": sorted(atletas.values(), key=lambda a: a["_nome"]),
+        "por_cpf": por_cpf,
+    }
+
+
+def indice(conn, evento_id):
+    """Índice de busca do evento, remontado quando a versão da consolidação muda."""
+    versao = consolidacao_evento.versao(conn, evento_id)
+    agora = time.monotonic()
+    with _lock:
+        item = _indices.get(evento_id)
+        if item and item[0] >= agora and item[1] == versao:
+            return item[2]
+    consolidacao = consolidacao_evento.obter(conn, evento_id) or {}
+    novo = _montar(consolidacao)
+    with _lock:
+        _indices[evento_id] = (agora + TTL_SEGUNDOS, consolidacao.get("versao", versao), novo)
+        while len(_indices) > MAX_EVENTOS:
+            del _indices[min(_indices, key=lambda k: _indices[k][0])]
+    return novo
+
+
+def buscar(indice_evento, termo, limite=LIMITE_RESULTADOS):
+    """
+    Atletas por número da inscrição, CPF (completo ou início, com ou sem pontuação) ou
+    partes do nome em qualquer ordem, sem acento. Nomes que começam com o termo vêm primeiro.
+    """
+    termo = (termo or "").strip()
+    if not termo:
+        return []
+    atletas = indice_evento["atletas"]
+    digitos = _digitos(termo)
+    if digitos and not any(c.isalpha() for c in termo):
+        encontrados = []
+        if int(digitos) in atletas:
+            encontrados.append(atletas[int(digitos)])
+        if len(digitos) >= 3:
+            cpfs = indice_evento["por_cpf"]
+            for cpf in sorted(cpfs):
+                if cpf.startswith(digitos):
+                    encontrados.extend(atletas[i] for i in cpfs[cpf] if atletas[i] not in encontrados)
+                    if len(encontrados) >= limite:
+                        break
+        return encontrados[:limite]
+    partes = normalizar(termo).split()
+    prefixo, contem = [], []
+    for atleta in indice_evento["por_nome"]:
+        nome = atleta["_nome"]
+        if all(p in nome for p in partes):
+            (prefixo if nome.startswith(partes[0]) else contem).append(atleta)
+            if len(prefixo) >= limite:
+                break
+    return (prefixo + contem)[:limite]
+
+
+def pesagens(cur, inscricao_ids):
+    """Pesagem registrada por inscricao_id (só os informados); vazio sem a migração."""
+    if not inscricao_ids:
+        return {}
+    ph = ", ".join(["%s"] * len(inscricao_ids))
+    try:
+        cur.execute(f"""
+            SELECT inscricao_id, peso_medido, categoria_nova, situacao, pesado_em
+            FROM eventos_competicoes_pesagens WHERE inscricao_id IN ({ph})
+        """, tuple(inscricao_ids))
+    except mysql.connector.errors.ProgrammingError:
+        return {}
+    return {r["inscricao_id"]: r for r in cur.fetchall()}
+
+
+def ajustes(cur, evento_id):
+    """inscricao_id -> (situacao, categoria_nova) das pesagens com mudança (para o chaveamento)."""
+    try:
+        cur.execute("""
+            SELECT inscricao_id, situacao, categoria_nova
+            FROM eventos_competicoes_pesagens
+            WHERE evento_id = %s AND situacao != 'ok'
+        """, (evento_id,))
+    except mysql.connector.errors.ProgrammingError:
+        return {}
+    return {r["inscricao_id"]: (r["situacao"], r["categoria_nova"]) for r in cur.fetchall()}
+
+
+def _sugerir(cur, categoria_inscricao, elegiveis):
+    """Entre as categorias elegíveis, a da mesma classe da inscrição e de menor peso máximo."""
+    original = categorias_competicao.por_nome(cur, categoria_inscricao) if categoria_inscricao else None
+    classe = original["categoria"] if original else None
+    return min(elegiveis, key=lambda c: (c["categoria"] != classe,
+                                         c["peso_max"] is None, c["peso_max"] or 0, c["nome_categoria"]))
+
+
+def avaliar(cur, atleta, peso):
+    """
+    Situação do atleta com o peso medido: ok (categoria da inscrição continua válida),
+    reclassificado (categoria_nova sugerida) ou desclassificado (nenhuma categoria serve).
+    """
+    elegiveis = categorias_competicao.elegiveis(cur, atleta["sexo"], atleta["data_nascimento"], peso)
+    nomes = [c["nome_categoria"] for c in elegiveis]
+    if atleta["categoria"] and atleta["categoria"] in nomes:
+        situacao, categoria_nova = "ok", None
+    elif elegiveis:
+        situacao, categoria_nova = "reclassificado", _sugerir(cur, atleta["categoria"], elegiveis)["nome_categoria"]
+    else:
+        situacao, categoria_nova = "desclassificado", None
+    return {"situacao": situacao, "categoria_nova": categoria_nova, "elegiveis": nomes}
+
+
+def registrar(cur, evento_id, atleta, peso, categoria=None, desclassificar=False, usuario_id=None):
+    """
+    Grava a pesagem (substitui a anterior do atleta). categoria escolhe outra categoria
+    elegível que não a sugerida; desclassificar força a desclassificação.
+    ValueError se a categoria escolhida não for elegível para o peso.
+    """
+    avaliacao = avaliar(cur, atleta, peso)
+    if desclassificar:
+        avaliacao.update(situacao="desclassificado", categoria_nova=None)
+    elif categoria and categoria != atleta["categoria"]:
+        if categoria not in avaliacao["elegiveis"]:
+            raise ValueError("Categoria não compatível com o peso medido.")
+        avaliacao.update(situacao="reclassificado", categoria_nova=categoria)
+    elif categoria and avaliacao["situacao"] == "reclassificado":
+        raise ValueError("A categoria da inscrição não é compatível com o peso medido.")
+    cur.execute("""
+        INSERT INTO eventos_competicoes_pesagens
+            (inscricao_id, evento_id, peso_medido, categoria_inscricao, categoria_nova, situacao, usuario_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE peso_medido = VALUES(peso_medido), categoria_inscricao = VALUES(categoria_inscricao),
+            categoria_nova = VALUES(categoria_nova), situacao = VALUES(situacao), usuario_id = VALUES(usuario_id),
+            pesado_em = NOW()
+    """, (atleta["inscricao_id"], evento_id, peso, atleta["categoria"] or None,
+          avaliacao["categoria_nova"], avaliacao["situacao"], usuario_id))
+    return avaliacao
+
+
+def resumo(atleta, pesagem=None):
+    """Atleta (com a pesagem, se houver) no formato da API JSON."""
+    nascimento = atleta["data_nascimento"]
+    item = {k: v for k, v in atleta.items() if not k.startswith("_") and k != "data_nascimento"}
+    item["data_nascimento"] = nascimento.strftime("%d/%m/%Y") if nascimento else ""
+    item["pesagem"] = None
+    if pesagem:
+        item["pesagem"] = {
+            "peso_medido": float(pesagem["peso_medido"]),
+            "categoria_nova": pesagem["categoria_nova"],
+            "situacao": pesagem["situacao"],
+            "pesado_em": pesagem["pesado_em"].strftime("%H:%M") if pesagem.get("pesado_em") else "",
+        }
+    return item
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Resumo financeiro por (evento, academia) em eventos_competicoes_academia_pagamentos.
+Os totais (inscrições enviadas, valor esperado, abatimentos, pagamentos confirmados
+por inscrição, pago, pendente e status) são sempre recalculados a partir das linhas
+de origem, por atualizar(), dentro da transação de quem alterou essas linhas:
+envio/cancelamento de inscrições, confirmação de pagamento de inscrição, abatimentos
+e mudança da taxa do evento. A tela de pagamentos só lê o resumo (listar()).
+scripts/reconciliar_pagamentos_eventos.py usa calcular() para conferir e corrigir.
+"""
+import logging
+
+import mysql.connector.errors
+
+logger = logging.getLogger(__name__)
+
+# Valor da taxa: valor_taxa_sugerido do evento (o que a academia repassa à associação).
+# valor_pago = abatimentos + taxa × inscrições com pagamento confirmado pela academia.
+SQL_CALCULO = """
+    SELECT t.evento_id, t.academia_id, t.pagamento_id, t.total_inscricoes,
+           t.valor_total_esperado, t.total_abatimentos, t.valor_confirmado,
+           t.total_abatimentos + t.valor_confirmado AS valor_pago,
+           t.valor_total_esperado - t.total_abatimentos - t.valor_confirmado AS valor_pendente,
+           CASE
+               WHEN t.valor_total_esperado - t.total_abatimentos - t.valor_confirmado <= 0 THEN 'quitado'
+               WHEN t.total_abatimentos + t.valor_confirmado > 0 THEN 'parcial'
+               ELSE 'pendente'
+           END AS status
+    FROM (
+        SELECT ec.id AS evento_id, x.academia_id, ap.id AS pagamento_id,
+               COALESCE(i.total_inscricoes, 0) AS total_inscricoes,
+               COALESCE(ec.valor_taxa_sugerido, 0) * COALESCE(i.total_inscricoes, 0) AS valor_total_esperado,
+               COALESCE(ab.total_abatimentos, 0) AS total_abatimentos,
+               COALESCE(ec.valor_taxa_sugerido, 0) * COALESCE(i.total_confirmadas, 0) AS valor_confirmado
+        FROM (
+            SELECT academia_id FROM eventos_competicoes_inscricoes
+            WHERE evento_id = %s{filtro}
+            UNION
+            SELECT academia_id FROM eventos_competicoes_academia_pagamentos
+            WHERE evento_id = %s{filtro}
+        ) x
+        INNER JOIN eventos_competicoes ec ON ec.id = %s
+        LEFT JOIN eventos_competicoes_academia_pagamentos ap
+               ON ap.evento_id = ec.id AND ap.academia_id = x.academia_id
+        LEFT JOIN (
+            SELECT i.academia_id,
+                   COUNT(DISTINCT IF(i.status = 'enviada', i.id, NULL)) AS total_inscricoes,
+                   COUNT(DISTINCT IF(p.pago_academia = 1, i.id, NULL)) AS total_confirmadas
+            FROM eventos_competicoes_inscricoes i
+            LEFT JOIN eventos_competicoes_inscricoes_pagamentos p ON p.inscricao_id = i.id
+            WHERE i.evento_id = %s{filtro_i}
+            GROUP BY i.academia_id
+        ) i ON i.academia_id = x.academia_id
+        LEFT JOIN (
+            SELECT apa.academia_id, SUM(ab.valor) AS total_abatimentos
+            FROM eventos_competicoes_academia_pagamentos apa
+            INNER JOIN eventos_competicoes_academia_pagamentos_abatimentos ab ON ab.pagamento_id = apa.id
+            WHERE apa.evento_id = %s{filtro_apa}
+            GROUP BY apa.academia_id
+        ) ab ON ab.academia_id = x.academia_id
+    ) t
+    WHERE t.pagamento_id IS NOT NULL OR t.total_inscricoes > 0 OR t.valor_confirmado > 0
+"""
+
+# Um único INSERT ... SELECT: o InnoDB lê as linhas de origem com bloqueio compartilhado
+# (sempre a versão confirmada mais recente, mesmo no meio de uma transação), então duas
+# alterações simultâneas na mesma academia não gravam um resumo desatualizado.
+SQL_ATUALIZAR = """
+    INSERT INTO eventos_competicoes_academia_pagamentos
+        (evento_id, academia_id, total_inscricoes, valor_total_esperado, total_abatimentos,
+         valor_confirmado, valor_pago, valor_pendente, status)
+    SELECT c.evento_id, c.academia_id, c.total_inscricoes, c.valor_total_esperado, c.total_abatimentos,
+           c.valor_confirmado, c.valor_pago, c.valor_pendente, c.status
+    FROM ({calculo}) c
+    ON DUPLICATE KEY UPDATE
+        total_inscricoes = VALUES(total_inscricoes),
+        valor_total_esperado = VALUES(valor_total_esperado),
+        total_abatimentos = VALUES(total_abatimentos),
+        valor_confirmado = VALUES(valor_confirmado),
+        valor_pago = VALUES(valor_pago),
+        valor_pendente = VALUES(valor_pendente),
+        status = VALUES(status)
+"""
+
+SQL_LISTAGEM = """
+    SELECT ap.id, ap.academia_id, ac.nome AS academia_nome, ap.total_inscricoes,
+           ap.valor_total_esperado, ap.valor_pago, ap.valor_pendente, ap.status,
+           ab.id AS abatimento_id, ab.valor AS abatimento_valor, ab.data_abatimento,
+           ab.observacoes AS abatimento_observacoes
+    FROM eventos_competicoes_academia_pagamentos ap
+    INNER JOIN academias ac ON ac.id = ap.academia_id
+    LEFT JOIN eventos_competicoes_academia_pagamentos_abatimentos ab ON ab.pagamento_id = ap.id
+    WHERE ap.evento_id = %s AND ap.total_inscricoes > 0
+    ORDER BY ac.nome, ap.academia_id, ab.data_abatimento DESC, ab.id DESC
+"""
+
+# Colunas comparadas pela reconciliação
+CAMPOS_RESUMO = (
+    "total_inscricoes", "valor_total_esperado", "total_abatimentos",
+    "valor_confirmado", "valor_pago", "valor_pendente", "status",
+)
+
+
+def _sql_calculo(evento_id, academia_id=None):
+    if academia_id is None:
+        sql = SQL_CALCULO.format(filtro="", filtro_i="", filtro_apa="")
+        return sql, (evento_id, evento_id, evento_id, evento_id, evento_id)
+    sql = SQL_CALCULO.format(
+        filtro=" AND academia_id = %s", filtro_i=" AND i.academia_id = %s", filtro_apa=" AND apa.academia_id = %s")
+    return sql, (evento_id, academia_id, evento_id, academia_id, evento_id,
+                 evento_id, academia_id, evento_id, academia_id)
+
+
+def calcular(cur, evento_id, academia_id=None):
+    """Resumo recalculado das linhas de origem (sem gravar), uma linha por academia."""
+    sql, params = _sql_calculo(evento_id, academia_id)
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+
+def atualizar(cur, evento_id, academia_id=None):
+    """
+    Regrava o resumo da academia (ou de todas as academias do evento) na transação
+    do chamador. Chamar depois de alterar inscrições, pagamentos ou abatimentos.
+    """
+    sql, params = _sql_calculo(evento_id, academia_id)
+    try:
+        cur.execute(SQL_ATUALIZAR.format(calculo=sql), params)
+    except mysql.connector.errors.ProgrammingError as e:
+        # Migração (taxas ou resumo) ainda não aplicada
+        logger.warning("Resumo de pagamentos não atualizado (evento %s): %s", evento_id, e)
+
+
+def _float(valor):
+    return float(valor or 0)
+
+
+def _pagamento(row, academia_nome):
+    return {
+        "id": row.get("id") or row.get("pagamento_id"),
+        "academia_id": row["academia_id"],
+        "academia_nome": academia_nome or "",
+        "total_inscricoes": int(row.get("total_inscricoes") or 0),
+        "valor_total_esperado": _float(row.get("valor_total_esperado")),
+        "valor_pago": _float(row.get("valor_pago")),
+        "valor_pendente": _float(row.get("valor_pendente")),
+        "status": row.get("status") or "pendente",
+        "abatimentos": [],
+    }
+
+
+def listar(cur, evento_id):
+    """
+    Pagamentos das academias com inscrições enviadas, com o histórico de abatimentos,
+    numa única consulta ao resumo. Sem a migração do resumo, calcula sem gravar.
+    """
+    try:
+        cur.execute(SQL_LISTAGEM, (evento_id,))
+        linhas = cur.fetchall()
+    except mysql.connector.errors.ProgrammingError:
+        return _listar_sem_resumo(cur, evento_id)
+
+    pagamentos = []
+    atual = None
+    for row in linhas:
+        if atual is None or atual["id"] != row["id"]:
+            atual = _pagamento(row, row["academia_nome"])
+            pagamentos.append(atual)
+        if row["abatimento_id"] is not None:
+            atual["abatimentos"].append({
+                "id": row["abatimento_id"],
+                "valor": row["abatimento_valor"],
+                "data_abatimento": row["data_abatimento"],
+                "observacoes": row["abatimento_observacoes"],
+            })
+    return pagamentos
+
+
+def _listar_sem_resumo(cur, evento_id):
+    try:
+        linhas = [r for r in calcular(cur, evento_id) if r["total_inscricoes"]]
+    except mysql.connector.errors.ProgrammingError:
+        # Nem a migração de taxas: só as academias e quantidades enviadas
+        cur.execute("""
+            SELECT i.academia_id, COUNT(*) AS total_inscricoes
+            FROM eventos_competicoes_inscricoes i
+            WHERE i.evento_id = %s AND i.status = 'enviada'
+            GROUP BY i.academia_id
+        """, (evento_id,))
+        linhas = cur.fetchall()
+    if not linhas:
+        return []
+    ids = [r["academia_id"] for r in linhas]
+    ph = ", ".join(["%s"] * len(ids))
+    cur.execute(f"SELECT id, nome FROM academias WHERE id IN ({ph})", ids)
+    nomes = {r["id"]: r["nome"] for r in cur.fetchall()}
+    pagamentos = [_pagamento(r, nomes.get(r["academia_id"])) for r in linhas]
+    pagamentos.sort(key=lambda p: p["academia_nome"])
+    return pagamentos
@@ -6,16 +6,33 @@ Visível em modo associação e academia.
 import json
 import os
 import uuid
+from itertools import chain, islice
+import mysql.connector.errors
 from datetime import datetime, date
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session, Response, jsonify, send_file, current_app
+from math import ceil
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, Response, jsonify, current_app
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from config import get_db_connection
 from utils.formularios_campos import CAMPOS_ALUNO_PADRAO, listar_campos_por_grupo, get_label
+from utils import cache_exportacoes
+from utils import armazenamento
+from utils import relatorios_jobs
+from utils import cache_formularios
+from utils import cache_calendario
+from utils.entrega_arquivos import enviar_upload
+from blueprints.eventos_competicoes import consolidacao as consolidacao_evento
+from blueprints.eventos_competicoes import resumo_pagamentos
+from blueprints.eventos_competicoes import envio_inscricoes
+from blueprints.eventos_competicoes import chaveamento
+from blueprints.eventos_competicoes import categorias as categorias_competicao
+from blueprints.eventos_competicoes import pesagem
 
 bp_eventos_competicoes = Blueprint("eventos_competicoes", __name__, url_prefix="/eventos-competicoes")
 
 UPLOAD_ANEXOS = "eventos_anexos"
+POR_PAGINA_EVENTOS = 20
+AMOSTRA_LARGURAS = 200  # linhas usadas para calcular a largura das colunas no XLSX
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'jpg', 'jpeg', 'png', 'gif', 'zip', 'rar', 'txt'}
 
 
@@ -36,13 +53,11 @@ def _salvar_anexo_evento(file_storage, evento_id):
     filename_original = secure_filename(file_storage.filename)
     filename_safe = f"evento_{evento_id}_{uuid.uuid4().hex[:12]}{ext}"
     
-    folder = os.path.join(current_app.root_path, "static", "uploads", UPLOAD_ANEXOS)
-    os.makedirs(folder, exist_ok=True)
-    filepath = os.path.join(folder, filename_safe)
+    destino = os.path.join(UPLOAD_ANEXOS, filename_safe)
     
     try:
-        file_storage.save(filepath)
-        tamanho = os.path.getsize(filepath)
+        armazenamento.salvar_arquivo(file_storage, destino)
+        tamanho = os.path.getsize(os.path.join(current_app.root_path, "static", "uploads", destino))
         return {
             "nome_original": filename_original,
             "caminho": filename_safe,
@@ -61,16 +76,66 @@ def _ids_academias_associacao(cursor, id_associacao):
 
 
 def _evento_encerrado(ev):
-    """True se data_fim já passou."""
+    """True se data_fim já passou (datetime/date do conector ou texto 'AAAA-MM-DD[ HH:MM:SS]')."""
     if not ev or not ev.get("data_fim"):
         return False
     df = ev["data_fim"]
-    if hasattr(df, "replace"):
+    if isinstance(df, str):
         try:
-            df = datetime.strptime(df[:19], "%Y-%m-%d %H:%M:%S")
-        except Exception:
+            df = datetime.strptime(df[:19], "%Y-%m-%d %H:%M:%S") if len(df) >= 19 else datetime.strptime(df[:10], "%Y-%m-%d")
+        except ValueError:
             return False
-    return datetime.now() > df
+    if isinstance(df, datetime):
+        return datetime.now() > df
+    if isinstance(df, date):
+        return date.today() > df
+    return False
+
+
+def _formatar_tamanho(tamanho):
+    tamanho = tamanho or 0
+    if tamanho < 1024:
+        return f"{tamanho} B"
+    if tamanho < 1024 * 1024:
+        return f"{tamanho / 1024:.1f} KB"
+    return f"{tamanho / (1024 * 1024):.1f} MB"
+
+
+def _anexos_por_evento(cur, evento_ids):
+    """Anexos de vários eventos numa consulta só: {evento_id: [anexos]}."""
+    por_evento = {evento_id: [] for evento_id in evento_ids}
+    if not evento_ids:
+        return por_evento
+    ph = ",".join(["%s"] * len(evento_ids))
+    cur.execute(f"""
+        SELECT id, evento_id, nome_arquivo, tamanho_bytes, descricao
+        FROM eventos_competicoes_anexos
+        WHERE evento_id IN ({ph})
+        ORDER BY created_at DESC
+    """, tuple(evento_ids))
+    for anexo in cur.fetchall():
+        anexo["tamanho_formatado"] = _formatar_tamanho(anexo.get("tamanho_bytes"))
+        por_evento[anexo["evento_id"]].append(anexo)
+    return por_evento
+
+
+def _totais_por_evento(cur, evento_ids):
+    """Academias aderidas e inscrições enviadas por evento, num único GROUP BY."""
+    if not evento_ids:
+        return {}
+    ph = ",".join(["%s"] * len(evento_ids))
+    cur.execute(f"""
+        SELECT evento_id, SUM(tipo = 'adesao') AS academias_aderidas, SUM(tipo = 'inscricao') AS inscricoes_enviadas
+        FROM (
+            SELECT evento_id, 'adesao' AS tipo FROM eventos_competicoes_adesao
+            WHERE evento_id IN ({ph}) AND aderiu = 1
+            UNION ALL
+            SELECT evento_id, 'inscricao' AS tipo FROM eventos_competicoes_inscricoes
+            WHERE evento_id IN ({ph}) AND status = 'enviada'
+        ) t
+        GROUP BY evento_id
+    """, tuple(evento_ids) * 2)
+    return {r["evento_id"]: r for r in cur.fetchall()}
 
 
 @bp_eventos_competicoes.route("/")
@@ -82,6 +147,9 @@ def lista():
         flash("Disponível apenas em modo associação ou academia.", "danger")
         return redirect(url_for("painel.home"))
 
+    page = max(request.args.get("page", 1, type=int) or 1, 1)
+    offset = (page - 1) * POR_PAGINA_EVENTOS
+
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
@@ -94,56 +162,36 @@ def lista():
                 return redirect(url_for("associacao.gerenciamento_associacao"))
             # Verificar se colunas de taxa existem
             tem_coluna_taxa, _ = _colunas_taxa_existem(cur)
-            if tem_coluna_taxa:
-                cur.execute("""
-                    SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.status, ec.id_formulario, f.nome as formulario_nome,
-                           COALESCE(ec.tem_taxa, 0) as tem_taxa, ec.valor_taxa_sugerido,
-                           (SELECT COUNT(*) FROM eventos_competicoes_adesao WHERE evento_id=ec.id AND aderiu=1) as academias_aderidas,
-                           (SELECT COUNT(*) FROM eventos_competicoes_inscricoes WHERE evento_id=ec.id AND status='enviada') as inscricoes_enviadas,
-                           (SELECT COUNT(*) FROM eventos_competicoes_anexos WHERE evento_id=ec.id) as total_anexos
-                    FROM eventos_competicoes ec
-                    LEFT JOIN formularios f ON f.id = ec.id_formulario
-                    WHERE ec.id_associacao = %s
-                    ORDER BY ec.data_fim DESC
-                """, (id_assoc,))
-            else:
-                cur.execute("""
-                    SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.status, ec.id_formulario, f.nome as formulario_nome,
-                           0 as tem_taxa, NULL as valor_taxa_sugerido,
-                           (SELECT COUNT(*) FROM eventos_competicoes_adesao WHERE evento_id=ec.id AND aderiu=1) as academias_aderidas,
-                           (SELECT COUNT(*) FROM eventos_competicoes_inscricoes WHERE evento_id=ec.id AND status='enviada') as inscricoes_enviadas,
-                           (SELECT COUNT(*) FROM eventos_competicoes_anexos WHERE evento_id=ec.id) as total_anexos
-                    FROM eventos_competicoes ec
-                    LEFT JOIN formularios f ON f.id = ec.id_formulario
-                    WHERE ec.id_associacao = %s
-                    ORDER BY ec.data_fim DESC
-                """, (id_assoc,))
+            colunas_taxa = "COALESCE(ec.tem_taxa, 0) as tem_taxa, ec.valor_taxa_sugerido" if tem_coluna_taxa \
+                else "0 as tem_taxa, NULL as valor_taxa_sugerido"
+            cur.execute("SELECT COUNT(*) AS total FROM eventos_competicoes WHERE id_associacao = %s", (id_assoc,))
+            total = cur.fetchone()["total"]
+            cur.execute(f"""
+                SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.status, ec.id_formulario, f.nome as formulario_nome,
+                       {colunas_taxa}
+                FROM eventos_competicoes ec
+                LEFT JOIN formularios f ON f.id = ec.id_formulario
+                WHERE ec.id_associacao = %s
+                ORDER BY ec.data_fim DESC
+                LIMIT %s OFFSET %s
+            """, (id_assoc, POR_PAGINA_EVENTOS, offset))
             eventos = cur.fetchall()
+            evento_ids = [ev["id"] for ev in eventos]
+            totais = _totais_por_evento(cur, evento_ids)
+            anexos = _anexos_por_evento(cur, evento_ids)
             for ev in eventos:
                 ev["encerrado"] = _evento_encerrado(ev)
                 # Garantir que tem_taxa seja int para comparação no template
-                if 'tem_taxa' in ev:
-                    ev['tem_taxa'] = int(ev['tem_taxa']) if ev['tem_taxa'] else 0
-                # Buscar anexos do evento
-                cur.execute("""
-                    SELECT id, nome_arquivo, tamanho_bytes, descricao
-                    FROM eventos_competicoes_anexos
-                    WHERE evento_id = %s
-                    ORDER BY created_at DESC
-                """, (ev["id"],))
-                anexos = cur.fetchall()
-                # Formatar tamanhos
-                for anexo in anexos:
-                    tamanho = anexo.get("tamanho_bytes") or 0
-                    if tamanho < 1024:
-                        anexo["tamanho_formatado"] = f"{tamanho} B"
-                    elif tamanho < 1024 * 1024:
-                        anexo["tamanho_formatado"] = f"{tamanho / 1024:.1f} KB"
-                    else:
-                        anexo["tamanho_formatado"] = f"{tamanho / (1024 * 1024):.1f} MB"
-                ev["anexos"] = anexos
+                ev["tem_taxa"] = int(ev["tem_taxa"]) if ev.get("tem_taxa") else 0
+                t = totais.get(ev["id"]) or {}
+                ev["academias_aderidas"] = int(t.get("academias_aderidas") or 0)
+                ev["inscricoes_enviadas"] = int(t.get("inscricoes_enviadas") or 0)
+                ev["anexos"] = anexos[ev["id"]]
+                ev["total_anexos"] = len(ev["anexos"])
             return render_template("eventos_competicoes/lista_associacao.html",
-                eventos=eventos, back_url=url_for("associacao.gerenciamento_associacao"))
+                eventos=eventos, pagina_atual=page,
+                total_paginas=ceil(total / POR_PAGINA_EVENTOS) if total > 0 else 1,
+                back_url=url_for("associacao.gerenciamento_associacao"))
 
         if modo == "academia" and (current_user.has_role("gestor_academia") or current_user.has_role("professor") or current_user.has_role("admin")):
             if not ids_acad:
@@ -155,55 +203,37 @@ def lista():
             # Verificar se colunas de taxa existem
             tem_coluna_taxa, tem_coluna_valor_taxa = _colunas_taxa_existem(cur)
             if tem_coluna_taxa and tem_coluna_valor_taxa:
-                cur.execute("""
-                    SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.id_formulario, f.nome as formulario_nome,
-                           COALESCE(ec.tem_taxa, 0) as tem_taxa, ec.valor_taxa_sugerido,
-                           COALESCE(ea.aderiu, 0) as aderiu, ea.academia_id, ea.valor_taxa
-                    FROM eventos_competicoes ec
-                    INNER JOIN academias ac ON ac.id_associacao = ec.id_associacao AND ac.id = %s
-                    LEFT JOIN formularios f ON f.id = ec.id_formulario
-                    LEFT JOIN eventos_competicoes_adesao ea ON ea.evento_id = ec.id AND ea.academia_id = %s
-                    ORDER BY ec.data_fim DESC
-                """, (academia_id, academia_id))
+                colunas_taxa = "COALESCE(ec.tem_taxa, 0) as tem_taxa, ec.valor_taxa_sugerido, COALESCE(ea.aderiu, 0) as aderiu, ea.academia_id, ea.valor_taxa"
             else:
-                cur.execute("""
-                    SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.id_formulario, f.nome as formulario_nome,
-                           0 as tem_taxa, NULL as valor_taxa_sugerido,
-                           COALESCE(ea.aderiu, 0) as aderiu, ea.academia_id, NULL as valor_taxa
-                    FROM eventos_competicoes ec
-                    INNER JOIN academias ac ON ac.id_associacao = ec.id_associacao AND ac.id = %s
-                    LEFT JOIN formularios f ON f.id = ec.id_formulario
-                    LEFT JOIN eventos_competicoes_adesao ea ON ea.evento_id = ec.id AND ea.academia_id = %s
-                    ORDER BY ec.data_fim DESC
-                """, (academia_id, academia_id))
+                colunas_taxa = "0 as tem_taxa, NULL as valor_taxa_sugerido, COALESCE(ea.aderiu, 0) as aderiu, ea.academia_id, NULL as valor_taxa"
+            cur.execute("""
+                SELECT COUNT(*) AS total
+                FROM eventos_competicoes ec
+                INNER JOIN academias ac ON ac.id_associacao = ec.id_associacao AND ac.id = %s
+            """, (academia_id,))
+            total = cur.fetchone()["total"]
+            cur.execute(f"""
+                SELECT ec.id, ec.nome, ec.descricao, ec.tipo, ec.data_inicio, ec.data_fim, ec.id_formulario, f.nome as formulario_nome,
+                       {colunas_taxa}
+                FROM eventos_competicoes ec
+                INNER JOIN academias ac ON ac.id_associacao = ec.id_associacao AND ac.id = %s
+                LEFT JOIN formularios f ON f.id = ec.id_formulario
+                LEFT JOIN eventos_competicoes_adesao ea ON ea.evento_id = ec.id AND ea.academia_id = %s
+                ORDER BY ec.data_fim DESC
+                LIMIT %s OFFSET %s
+            """, (academia_id, academia_id, POR_PAGINA_EVENTOS, offset))
             eventos = cur.fetchall()
+            anexos = _anexos_por_evento(cur, [ev["id"] for ev in eventos])
             for ev in eventos:
                 ev["encerrado"] = _evento_encerrado(ev)
                 # Garantir que tem_taxa seja int para comparação no template
-                if 'tem_taxa' in ev:
-                    ev['tem_taxa'] = int(ev['tem_taxa']) if ev['tem_taxa'] else 0
-                # Buscar anexos do evento
-                cur.execute("""
-                    SELECT id, nome_arquivo, tamanho_bytes, descricao
-                    FROM eventos_competicoes_anexos
-                    WHERE evento_id = %s
-                    ORDER BY created_at DESC
-                """, (ev["id"],))
-                anexos = cur.fetchall()
-                # Formatar tamanhos
-                for anexo in anexos:
-                    tamanho = anexo.get("tamanho_bytes") or 0
-                    if tamanho < 1024:
-                        anexo["tamanho_formatado"] = f"{tamanho} B"
-                    elif tamanho < 1024 * 1024:
-                        anexo["tamanho_formatado"] = f"{tamanho / 1024:.1f} KB"
-                    else:
-                        anexo["tamanho_formatado"] = f"{tamanho / (1024 * 1024):.1f} MB"
-                ev["anexos"] = anexos
+                ev["tem_taxa"] = int(ev["tem_taxa"]) if ev.get("tem_taxa") else 0
+                ev["anexos"] = anexos[ev["id"]]
             cur.execute("SELECT id, nome FROM academias WHERE id IN (%s) ORDER BY nome" % ",".join(["%s"] * len(ids_acad)), tuple(ids_acad))
             academias_sel = cur.fetchall()
             return render_template("eventos_competicoes/lista_academia.html",
                 eventos=eventos, academias=academias_sel, academias_ids=ids_acad, academia_id=academia_id,
+                pagina_atual=page, total_paginas=ceil(total / POR_PAGINA_EVENTOS) if total > 0 else 1,
                 back_url=url_for("academia.painel_academia", academia_id=academia_id) if academia_id else url_for("painel.home"))
 
         flash("Acesso negado.", "danger")
@@ -213,13 +243,23 @@ def lista():
         conn.close()
 
 
+_colunas_taxa_confirmadas = False
+
+
 def _colunas_taxa_existem(cur):
-    """Verifica se as colunas de taxa existem nas tabelas."""
+    """
+    Verifica se as colunas de taxa existem nas tabelas.
+    Depois que ambas existem, a resposta fica guardada no processo (migrações não removem colunas).
+    """
+    global _colunas_taxa_confirmadas
+    if _colunas_taxa_confirmadas:
+        return True, True
     try:
         cur.execute("SHOW COLUMNS FROM eventos_competicoes LIKE 'tem_taxa'")
         tem_taxa_exists = cur.fetchone() is not None
         cur.execute("SHOW COLUMNS FROM eventos_competicoes_adesao LIKE 'valor_taxa'")
         valor_taxa_exists = cur.fetchone() is not None
+        _colunas_taxa_confirmadas = tem_taxa_exists and valor_taxa_exists
         return tem_taxa_exists, valor_taxa_exists
     except Exception:
         return False, False
@@ -277,6 +317,25 @@ def _criar_pagamento_inscricao(cur, inscricao_id, evento_id, academia_id):
     return False
 
 
+def _categorias_inscritas(cur, evento_id, academia_id, aluno_id):
+    """
+    Categorias em que o aluno já está inscrito no evento e se há inscrição sem categoria.
+    Usa a coluna gerada campo_categoria; sem a migração, extrai do JSON no próprio SQL.
+    """
+    sql = """
+        SELECT {categoria} AS categoria
+        FROM eventos_competicoes_inscricoes
+        WHERE evento_id = %s AND academia_id = %s AND aluno_id = %s
+    """
+    try:
+        cur.execute(sql.format(categoria="campo_categoria"), (evento_id, academia_id, aluno_id))
+    except mysql.connector.errors.ProgrammingError:
+        cur.execute(sql.format(categoria="NULLIF(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.categoria')), '')"),
+                    (evento_id, academia_id, aluno_id))
+    categorias = [r["categoria"] for r in cur.fetchall()]
+    return {c for c in categorias if c}, any(not c for c in categorias)
+
+
 def _get_ids_academias(cur):
     """Ids das academias do usuário (modo academia)."""
     ids = []
@@ -504,6 +563,8 @@ def cadastro():
                     pass
 
             conn.commit()
+            cache_calendario.invalidar("associacao", id_assoc)
+            cache_calendario.invalidar_academias(academias_ids)
             flash("Evento criado. As academias podem aderir ao evento.", "success")
             return redirect(url_for("eventos_competicoes.lista"))
 
@@ -613,11 +674,9 @@ def editar(evento_id):
                                (anexo_id_int, evento_id))
                     anexo_row = cur.fetchone()
                     if anexo_row:
-                        # Deletar arquivo físico
-                        filepath = os.path.join(current_app.root_path, "static", "uploads", UPLOAD_ANEXOS, anexo_row["caminho_arquivo"])
+                        # Deletar o nome do arquivo (o blob é coletado quando ficar sem referências)
                         try:
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
+                            armazenamento.remover(os.path.join(UPLOAD_ANEXOS, anexo_row["caminho_arquivo"]))
                         except Exception:
                             pass
                         # Deletar registro no banco
@@ -704,6 +763,8 @@ def editar(evento_id):
                     flash(f"Erro ao salvar dados da taxa: {str(e)}", "danger")
                     return render_template("eventos_competicoes/editar.html", evento=evento, formularios=formularios,
                         anexos_existentes=anexos_existentes, back_url=url_for("eventos_competicoes.lista"))
+                # Taxa pode ter mudado: recalcular os pagamentos de todas as academias
+                resumo_pagamentos.atualizar(cur, evento_id)
             else:
                 # Se ainda não tem colunas, salvar sem elas
                 cur.execute("""
@@ -739,7 +800,10 @@ def editar(evento_id):
             hora_ini = dt_ini.time() if dt_ini and hasattr(dt_ini, "time") else None
             hora_fim = dt_fim.time() if dt_fim and hasattr(dt_fim, "time") else None
             tipo_cal = "competicao" if tipo == "competicao" else "evento"
+            niveis_calendario = []
             try:
+                cur.execute("SELECT nivel, nivel_id FROM eventos WHERE evento_competicao_id = %s", (evento_id,))
+                niveis_calendario = [(r["nivel"], r["nivel_id"]) for r in cur.fetchall()]
                 cur.execute("""
                     UPDATE eventos
                     SET titulo = %s, descricao = %s, data_inicio = %s, data_fim = %s, hora_inicio = %s, hora_fim = %s, tipo = %s
@@ -749,6 +813,7 @@ def editar(evento_id):
                 pass
 
             conn.commit()
+            cache_calendario.invalidar_niveis(niveis_calendario)
             flash("Evento atualizado.", "success")
             return redirect(url_for("eventos_competicoes.lista"))
 
@@ -803,8 +868,11 @@ def finalizar(evento_id):
 
         novo_status = "finalizado" if ev.get("status") != "finalizado" else "ativo"
         cur.execute("UPDATE eventos_competicoes SET status = %s WHERE id = %s", (novo_status, evento_id))
+        consolidacao_evento.invalidar(cur, evento_id)
         conn.commit()
         if novo_status == "finalizado":
+            # Inscrições não mudam mais: deixa a consolidação pronta para consolidar/imprimir/exportar
+            consolidacao_evento.obter(conn, evento_id)
             flash("Evento finalizado.", "success")
         else:
             flash("Evento reativado.", "success")
@@ -1058,9 +1126,7 @@ def inscritos(evento_id):
             else:
                 i["pago_academia"] = 0
 
-        cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-            (ev["id_formulario"] or 0,))
-        campos_form = cur.fetchall()
+        campos_form = cache_formularios.campos(cur, ev["id_formulario"])
 
         # Calcular valores financeiros
         valor_associacao = float(ev.get("valor_taxa_sugerido") or 0)
@@ -1116,7 +1182,11 @@ def inscritos(evento_id):
 @bp_eventos_competicoes.route("/<int:evento_id>/enviar-inscricoes", methods=["POST"])
 @login_required
 def enviar_inscricoes(evento_id):
-    """Gestor academia marca inscrições como enviadas à associação. Valida que todas estão pagas se evento tem taxa."""
+    """
+    Gestor academia envia as inscrições à associação, em lote (envio_inscricoes): valida a
+    seleção inteira, cria os registros de pagamento que faltam e muda o status numa só
+    transação. Mostra o resultado por atleta; com qualquer pendência nada é enviado.
+    """
     academia_id = request.form.get("academia_id", type=int)
     if not academia_id:
         flash("Academia não informada.", "danger")
@@ -1129,14 +1199,16 @@ def enviar_inscricoes(evento_id):
         tem_coluna_taxa, tem_coluna_valor_taxa = _colunas_taxa_existem(cur)
         if tem_coluna_taxa and tem_coluna_valor_taxa:
             cur.execute("""
-                SELECT ec.id, ec.data_fim, ec.tem_taxa, ec.valor_taxa_sugerido, ea.valor_taxa
+                SELECT ec.id, ec.nome, ec.id_formulario, ec.data_fim, ec.tem_taxa, ec.valor_taxa_sugerido, ea.valor_taxa,
+                       (ec.data_fim IS NOT NULL AND ec.data_fim < NOW()) AS prazo_encerrado
                 FROM eventos_competicoes ec
                 LEFT JOIN eventos_competicoes_adesao ea ON ea.evento_id = ec.id AND ea.academia_id = %s
                 WHERE ec.id = %s
             """, (academia_id, evento_id))
         else:
             cur.execute("""
-                SELECT ec.id, ec.data_fim, 0 as tem_taxa, NULL as valor_taxa_sugerido, NULL as valor_taxa
+                SELECT ec.id, ec.nome, ec.id_formulario, ec.data_fim, 0 as tem_taxa, NULL as valor_taxa_sugerido, NULL as valor_taxa,
+                       (ec.data_fim IS NOT NULL AND ec.data_fim < NOW()) AS prazo_encerrado
                 FROM eventos_competicoes ec
                 LEFT JOIN eventos_competicoes_adesao ea ON ea.evento_id = ec.id AND ea.academia_id = %s
                 WHERE ec.id = %s
@@ -1146,90 +1218,50 @@ def enviar_inscricoes(evento_id):
             flash("Evento encerrado.", "warning")
             return redirect(url_for("eventos_competicoes.lista"))
 
-        # Se evento tem taxa, validar que todas as inscrições estão pagas
+        # Se evento tem taxa, cada inscrição precisa de pagamento confirmado pela academia
+        valor_taxa = None
         tem_taxa_int = int(ev.get("tem_taxa") or 0) if ev.get("tem_taxa") else 0
-        if tem_taxa_int == 1 and ev.get("valor_taxa"):
+        if tem_taxa_int == 1 and ev.get("valor_taxa") and float(ev["valor_taxa"]) > 0:
             # Verificar se tabela de pagamentos existe
             try:
                 cur.execute("SHOW TABLES LIKE 'eventos_competicoes_inscricoes_pagamentos'")
-                tabela_pagamentos_existe = cur.fetchone() is not None
+                if cur.fetchone() is not None:
+                    valor_taxa = float(ev["valor_taxa"])
             except Exception:
-                tabela_pagamentos_existe = False
-            
-            if tabela_pagamentos_existe:
-                cur.execute("""
-                    SELECT COUNT(*) as total_inscricoes,
-                           COUNT(CASE WHEN p.pago_academia = 1 THEN 1 END) as total_pagas
-                    FROM eventos_competicoes_inscricoes i
-                    LEFT JOIN eventos_competicoes_inscricoes_pagamentos p ON p.inscricao_id = i.id
-                    WHERE i.evento_id = %s AND i.academia_id = %s AND i.status != 'enviada'
-                """, (evento_id, academia_id))
-                stats = cur.fetchone()
-                total_inscricoes = stats.get("total_inscricoes", 0) or 0
-                total_pagas = stats.get("total_pagas", 0) or 0
-                
-                if total_inscricoes > 0 and total_pagas < total_inscricoes:
-                    pendentes = total_inscricoes - total_pagas
-                    flash(f"Não é possível enviar. {pendentes} inscrição(ões) ainda não foram marcadas como pagas.", "danger")
-                    return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
+                pass
 
-        # Enviar inscrições
-        cur.execute("""
-            UPDATE eventos_competicoes_inscricoes SET status = 'enviada', data_envio = NOW()
-            WHERE evento_id = %s AND academia_id = %s AND status != 'enviada'
-        """, (evento_id, academia_id))
-        
-        # Se evento tem taxa, criar ou atualizar registro de pagamento da academia para associação
-        # Usar valor da associação (valor_taxa_sugerido) para calcular o que a academia deve pagar
-        if tem_taxa_int == 1 and ev.get("valor_taxa_sugerido"):
-            # Verificar se tabela de pagamentos existe
-            try:
-                cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos'")
-                tabela_pagamentos_academia_existe = cur.fetchone() is not None
-            except Exception:
-                tabela_pagamentos_academia_existe = False
-            
-            if tabela_pagamentos_academia_existe:
-                # Contar quantas inscrições foram enviadas
-                cur.execute("""
-                    SELECT COUNT(*) as total_enviadas
-                    FROM eventos_competicoes_inscricoes
-                    WHERE evento_id = %s AND academia_id = %s AND status = 'enviada'
-                """, (evento_id, academia_id))
-                total_enviadas = cur.fetchone().get("total_enviadas", 0) or 0
-                valor_total_esperado = float(ev.get("valor_taxa_sugerido", 0) or 0) * total_enviadas
-                
-                # Verificar se já existe registro de pagamento
-                cur.execute("""
-                    SELECT id, valor_pago FROM eventos_competicoes_academia_pagamentos
-                    WHERE evento_id = %s AND academia_id = %s
-                """, (evento_id, academia_id))
-                pagamento_existente = cur.fetchone()
-                
-                if pagamento_existente:
-                    # Atualizar valor total esperado
-                    valor_pago_atual = float(pagamento_existente.get("valor_pago", 0) or 0)
-                    valor_pendente = valor_total_esperado - valor_pago_atual
-                    status_pagamento = "quitado" if valor_pendente <= 0 else ("parcial" if valor_pago_atual > 0 else "pendente")
-                    cur.execute("""
-                        UPDATE eventos_competicoes_academia_pagamentos
-                        SET valor_total_esperado = %s, valor_pendente = %s, status = %s
-                        WHERE id = %s
-                    """, (valor_total_esperado, valor_pendente, status_pagamento, pagamento_existente["id"]))
-                else:
-                    # Criar novo registro
-                    cur.execute("""
-                        INSERT INTO eventos_competicoes_academia_pagamentos
-                        (evento_id, academia_id, valor_total_esperado, valor_pendente, status)
-                        VALUES (%s, %s, %s, %s, 'pendente')
-                    """, (evento_id, academia_id, valor_total_esperado, valor_total_esperado))
-        
-        conn.commit()
-        flash("Inscrições enviadas à associação.", "success")
+        campo_categoria = next((c for c in cache_formularios.obter(cur, ev["id_formulario"])["campos"]
+                                if c["campo_chave"] == "categoria"), None)
+        linhas = envio_inscricoes.carregar(cur, evento_id, academia_id, com_pagamento=valor_taxa is not None)
+        resultados, pagamentos = envio_inscricoes.validar(
+            cur, linhas, prazo_encerrado=bool(ev.get("prazo_encerrado")),
+            categoria_obrigatoria=bool(campo_categoria and campo_categoria["obrigatorio"]),
+            valor_taxa=valor_taxa)
+        if not resultados:
+            conn.rollback()
+            flash("Não há inscrições pendentes de envio.", "info")
+            return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
+
+        # Registros de pagamento que faltavam ficam gravados mesmo sem envio (a academia confirma depois)
+        envio_inscricoes.criar_pagamentos(cur, pagamentos)
+        pendencias = sum(1 for r in resultados if not r["ok"])
+        if pendencias:
+            conn.commit()
+            flash(f"Nenhuma inscrição foi enviada: {pendencias} atleta(s) com pendência.", "danger")
+        else:
+            envio_inscricoes.enviar(cur, evento_id, academia_id, [r["inscricao_id"] for r in resultados])
+            # Resumo de pagamentos da academia para associação (valor esperado pelas enviadas)
+            resumo_pagamentos.atualizar(cur, evento_id, academia_id)
+            consolidacao_evento.invalidar(cur, evento_id)
+            conn.commit()
+            consolidacao_evento.obter(conn, evento_id)
+            flash(f"{len(resultados)} inscrição(ões) enviada(s) à associação.", "success")
+        return render_template("eventos_competicoes/envio_resultado.html",
+            evento=ev, academia_id=academia_id, resultados=resultados, enviado=not pendencias,
+            back_url=url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
     finally:
         cur.close()
         conn.close()
-    return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
 
 
 @bp_eventos_competicoes.route("/<int:evento_id>/editar-inscricao/<int:inscricao_id>", methods=["GET", "POST"])
@@ -1277,35 +1309,9 @@ def editar_inscricao(evento_id, inscricao_id):
             flash("Evento encerrado.", "warning")
             return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
 
-        cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-            (ev["id_formulario"] or 0,))
-        campos_form = cur.fetchall()
-        
-        # Verificar se o formulário tem peso e data_nascimento mas não tem categoria
-        # Se sim, adicionar categoria automaticamente
-        campos_chaves = [c["campo_chave"] for c in campos_form]
-        tem_peso = "peso" in campos_chaves
-        tem_data_nasc = "data_nascimento" in campos_chaves
-        tem_categoria = "categoria" in campos_chaves
-        
-        if tem_peso and tem_data_nasc and not tem_categoria:
-            try:
-                # Adicionar categoria após peso
-                ordem_peso = next((c["ordem"] for c in campos_form if c["campo_chave"] == "peso"), len(campos_form))
-                from utils.formularios_campos import get_label
-                label_categoria = get_label("categoria")
-                cur.execute("""
-                    INSERT INTO formularios_campos (formulario_id, campo_chave, label, ordem)
-                    VALUES (%s, %s, %s, %s)
-                """, (ev["id_formulario"], "categoria", label_categoria, ordem_peso + 1))
-                conn.commit()
-                # Recarregar campos
-                cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                    (ev["id_formulario"] or 0,))
-                campos_form = cur.fetchall()
-            except Exception:
-                # Se já existe ou erro, continuar normalmente
-                pass
+        # Esquema em cache; "categoria" já é garantido ao salvar o formulário
+        esquema = cache_formularios.obter(cur, ev["id_formulario"])
+        campos_form = cache_formularios.campos(cur, ev["id_formulario"])
 
         cur.execute("SELECT id, faixa, graduacao, categoria FROM graduacao ORDER BY id")
         graduacoes = cur.fetchall()
@@ -1345,11 +1351,7 @@ def editar_inscricao(evento_id, inscricao_id):
                     
                     if genero_upper in ("M", "F") and peso_float > 0:
                         # Buscar id_classe também se existir na tabela
-                        try:
-                            cur.execute("SHOW COLUMNS FROM categorias LIKE 'id_classe'")
-                            tem_id_classe = cur.fetchone() is not None
-                        except Exception:
-                            tem_id_classe = False
+                        tem_id_classe = cache_formularios.coluna_existe(cur, "categorias", "id_classe")
                         
                         if tem_id_classe:
                             cur.execute("""
@@ -1377,28 +1379,20 @@ def editar_inscricao(evento_id, inscricao_id):
                 except Exception:
                     categorias_disponiveis = []
 
+        erros = []
         if request.method == "POST":
-            dados = {}
-            for c in campos_form:
-                chave = c["campo_chave"]
-                val = request.form.get(f"campo_{chave}", "")
-                if isinstance(val, str):
-                    val = val.strip()
-                # Converter data de formato BR para ISO se necessário
-                if chave in ("data_nascimento", "ultimo_exame_faixa", "rg_data_emissao", "data_cadastro_zempo") and val:
-                    try:
-                        from datetime import datetime as dt
-                        val_str = val[:10].strip()
-                        if val_str and '/' in val_str:
-                            partes = val_str.split('/')
-                            if len(partes) == 3:
-                                val = f"{partes[2]}-{partes[1]}-{partes[0]}"
-                    except Exception:
-                        pass
-                dados[chave] = val
+            dados, convertidos, erros = cache_formularios.validar(esquema, request.form, ignorar=())
+            if erros:
+                flash("Verifique os campos: " + "; ".join(erros), "warning")
+        if request.method == "POST" and not erros:
+            # Datas gravadas em ISO
+            for chave in cache_formularios.CAMPOS_DATA:
+                if chave in convertidos:
+                    dados[chave] = convertidos[chave].isoformat()
             cur.execute("""
                 UPDATE eventos_competicoes_inscricoes SET dados_form = %s WHERE id = %s
             """, (json.dumps(dados, ensure_ascii=False), inscricao_id))
+            consolidacao_evento.invalidar(cur, evento_id)
             conn.commit()
             flash("Inscrição atualizada.", "success")
             return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
@@ -1431,6 +1425,9 @@ def editar_inscricao(evento_id, inscricao_id):
                 # Usar academia_id atual
                 v = academia_id or v
             valores_iniciais[chave] = v
+        if erros:
+            # Reexibe o que foi digitado
+            valores_iniciais.update(dados)
 
         # Buscar nome da academia para exibição
         academia_nome = None
@@ -1493,32 +1490,6 @@ def marcar_pagamento(evento_id, inscricao_id):
             flash("Esta inscrição não possui registro de pagamento.", "warning")
             return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
         
-        # Buscar informações do evento para obter valor_taxa_sugerido
-        try:
-            cur.execute("SHOW COLUMNS FROM eventos_competicoes LIKE 'tem_taxa'")
-            tem_coluna_taxa = cur.fetchone() is not None
-        except Exception:
-            tem_coluna_taxa = False
-        
-        valor_taxa_associacao = 0.0
-        if tem_coluna_taxa:
-            cur.execute("""
-                SELECT tem_taxa, valor_taxa_sugerido
-                FROM eventos_competicoes
-                WHERE id = %s
-            """, (evento_id,))
-            evento_info = cur.fetchone()
-            if evento_info and evento_info.get("tem_taxa"):
-                valor_taxa_associacao = float(evento_info.get("valor_taxa_sugerido", 0) or 0)
-        
-        # Verificar se já estava marcado como pago antes (para não somar duas vezes)
-        cur.execute("""
-            SELECT pago_academia FROM eventos_competicoes_inscricoes_pagamentos
-            WHERE id = %s
-        """, (inscricao["pagamento_id"],))
-        pagamento_atual = cur.fetchone()
-        ja_estava_pago = pagamento_atual and pagamento_atual.get("pago_academia") == 1
-        
         # Marcar como pago na tabela de pagamentos de inscrições
         cur.execute("""
             UPDATE eventos_competicoes_inscricoes_pagamentos
@@ -1526,78 +1497,7 @@ def marcar_pagamento(evento_id, inscricao_id):
             WHERE id = %s
         """, (inscricao["pagamento_id"],))
         
-        # Atualizar tabela de pagamentos das academias (se evento tem taxa e valor > 0)
-        if valor_taxa_associacao > 0 and not ja_estava_pago:
-            # Verificar se tabela existe
-            try:
-                cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos'")
-                tabela_pagamentos_academias_existe = cur.fetchone() is not None
-            except Exception:
-                tabela_pagamentos_academias_existe = False
-            
-            if tabela_pagamentos_academias_existe:
-                # Buscar registro existente ou criar novo
-                cur.execute("""
-                    SELECT id, valor_pago, valor_total_esperado, valor_pendente, status
-                    FROM eventos_competicoes_academia_pagamentos
-                    WHERE evento_id = %s AND academia_id = %s
-                """, (evento_id, academia_id))
-                pagamento_academia = cur.fetchone()
-                
-                if pagamento_academia:
-                    # Atualizar valor_pago somando o valor da taxa da associação
-                    novo_valor_pago = float(pagamento_academia.get("valor_pago", 0) or 0) + valor_taxa_associacao
-                    valor_total_esperado = float(pagamento_academia.get("valor_total_esperado", 0) or 0)
-                    novo_valor_pendente = valor_total_esperado - novo_valor_pago
-                    
-                    # Atualizar status
-                    if novo_valor_pendente <= 0:
-                        novo_status = "quitado"
-                    elif novo_valor_pago > 0:
-                        novo_status = "parcial"
-                    else:
-                        novo_status = "pendente"
-                    
-                    cur.execute("""
-                        UPDATE eventos_competicoes_academia_pagamentos
-                        SET valor_pago = %s, valor_pendente = %s, status = %s
-                        WHERE id = %s
-                    """, (novo_valor_pago, novo_valor_pendente, novo_status, pagamento_academia["id"]))
-                else:
-                    # Criar novo registro se não existir
-                    # Contar total de inscrições enviadas para calcular valor_total_esperado
-                    cur.execute("""
-                        SELECT COUNT(*) as total
-                        FROM eventos_competicoes_inscricoes
-                        WHERE evento_id = %s AND academia_id = %s AND status = 'enviada'
-                    """, (evento_id, academia_id))
-                    total_result = cur.fetchone()
-                    total_inscricoes = (total_result.get("total", 0) or 0) if total_result else 0
-                    
-                    # Se não há inscrições enviadas ainda, contar as confirmadas
-                    if total_inscricoes == 0:
-                        cur.execute("""
-                            SELECT COUNT(*) as total
-                            FROM eventos_competicoes_inscricoes
-                            WHERE evento_id = %s AND academia_id = %s AND status = 'confirmada'
-                        """, (evento_id, academia_id))
-                        total_result = cur.fetchone()
-                        total_inscricoes = (total_result.get("total", 0) or 0) if total_result else 0
-                    
-                    valor_total_esperado = valor_taxa_associacao * total_inscricoes
-                    novo_valor_pago = valor_taxa_associacao  # Primeiro pagamento confirmado
-                    novo_valor_pendente = valor_total_esperado - novo_valor_pago
-                    
-                    if novo_valor_pendente <= 0:
-                        novo_status = "quitado"
-                    else:
-                        novo_status = "parcial"
-                    
-                    cur.execute("""
-                        INSERT INTO eventos_competicoes_academia_pagamentos
-                        (evento_id, academia_id, valor_total_esperado, valor_pago, valor_pendente, status)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (evento_id, academia_id, valor_total_esperado, novo_valor_pago, novo_valor_pendente, novo_status))
+        resumo_pagamentos.atualizar(cur, evento_id, academia_id)
         
         conn.commit()
         flash("Pagamento confirmado com sucesso.", "success")
@@ -1759,24 +1659,6 @@ def cancelar_pagamento(evento_id, inscricao_id):
             flash("Pagamento já está pendente.", "info")
             return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
         
-        # Buscar informações do evento para obter valor_taxa_sugerido
-        try:
-            cur.execute("SHOW COLUMNS FROM eventos_competicoes LIKE 'tem_taxa'")
-            tem_coluna_taxa = cur.fetchone() is not None
-        except Exception:
-            tem_coluna_taxa = False
-        
-        valor_taxa_associacao = 0.0
-        if tem_coluna_taxa:
-            cur.execute("""
-                SELECT tem_taxa, valor_taxa_sugerido
-                FROM eventos_competicoes
-                WHERE id = %s
-            """, (evento_id,))
-            evento_info = cur.fetchone()
-            if evento_info and evento_info.get("tem_taxa"):
-                valor_taxa_associacao = float(evento_info.get("valor_taxa_sugerido", 0) or 0)
-        
         # Cancelar confirmação de pagamento na tabela de pagamentos de inscrições
         cur.execute("""
             UPDATE eventos_competicoes_inscricoes_pagamentos
@@ -1784,44 +1666,7 @@ def cancelar_pagamento(evento_id, inscricao_id):
             WHERE id = %s
         """, (inscricao["pagamento_id"],))
         
-        # Atualizar tabela de pagamentos das academias (reverter valor_pago)
-        if valor_taxa_associacao > 0:
-            # Verificar se tabela existe
-            try:
-                cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos'")
-                tabela_pagamentos_academias_existe = cur.fetchone() is not None
-            except Exception:
-                tabela_pagamentos_academias_existe = False
-            
-            if tabela_pagamentos_academias_existe:
-                # Buscar registro existente
-                cur.execute("""
-                    SELECT id, valor_pago, valor_total_esperado, valor_pendente, status
-                    FROM eventos_competicoes_academia_pagamentos
-                    WHERE evento_id = %s AND academia_id = %s
-                """, (evento_id, academia_id))
-                pagamento_academia = cur.fetchone()
-                
-                if pagamento_academia:
-                    # Reverter valor_pago subtraindo o valor da taxa da associação
-                    valor_pago_atual = float(pagamento_academia.get("valor_pago", 0) or 0)
-                    novo_valor_pago = max(0, valor_pago_atual - valor_taxa_associacao)  # Não deixar negativo
-                    valor_total_esperado = float(pagamento_academia.get("valor_total_esperado", 0) or 0)
-                    novo_valor_pendente = valor_total_esperado - novo_valor_pago
-                    
-                    # Atualizar status
-                    if novo_valor_pendente <= 0:
-                        novo_status = "quitado"
-                    elif novo_valor_pago > 0:
-                        novo_status = "parcial"
-                    else:
-                        novo_status = "pendente"
-                    
-                    cur.execute("""
-                        UPDATE eventos_competicoes_academia_pagamentos
-                        SET valor_pago = %s, valor_pendente = %s, status = %s
-                        WHERE id = %s
-                    """, (novo_valor_pago, novo_valor_pendente, novo_status, pagamento_academia["id"]))
+        resumo_pagamentos.atualizar(cur, evento_id, academia_id)
         
         conn.commit()
         flash("Confirmação de pagamento cancelada. O pagamento voltou ao status pendente.", "success")
@@ -1877,6 +1722,7 @@ def cancelar_inscricao(evento_id, inscricao_id):
             pass
         
         cur.execute("DELETE FROM eventos_competicoes_inscricoes WHERE id = %s", (inscricao_id,))
+        consolidacao_evento.invalidar(cur, evento_id)
         conn.commit()
         flash("Inscrição cancelada.", "success")
     finally:
@@ -1910,9 +1756,8 @@ def incluir_avulso(evento_id):
             flash("Evento não encontrado ou encerrado.", "danger")
             return redirect(url_for("eventos_competicoes.lista"))
 
-        cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-            (ev["id_formulario"] or 0,))
-        campos_form = cur.fetchall()
+        esquema = cache_formularios.obter(cur, ev["id_formulario"])
+        campos_form = cache_formularios.campos(cur, ev["id_formulario"])
         if not campos_form:
             flash("Formulário sem campos configurados.", "warning")
             return redirect(url_for("eventos_competicoes.inscritos", evento_id=evento_id, academia_id=academia_id))
@@ -1949,6 +1794,8 @@ def incluir_avulso(evento_id):
         graduacoes = cur.fetchall()
         cur.execute("SELECT TurmaID, Nome, Classificacao, DiasHorario FROM turmas WHERE id_academia = %s ORDER BY Nome", (academia_id,))
         turmas = cur.fetchall()
+        cur.execute("SELECT id, nome FROM professores WHERE id_academia = %s AND ativo = 1 ORDER BY nome", (academia_id,))
+        professores = cur.fetchall()
 
         # Verificar se formulário tem categoria e buscar categorias disponíveis
         campos_chaves = [c["campo_chave"] for c in campos_form]
@@ -1966,11 +1813,7 @@ def incluir_avulso(evento_id):
                 
                 if genero_upper in ("M", "F") and peso_float > 0:
                     genero_db = "MASCULINO" if genero_upper == "M" else "FEMININO" if genero_upper == "F" else genero_upper
-                    try:
-                        cur.execute("SHOW COLUMNS FROM categorias LIKE 'id_classe'")
-                        tem_id_classe = cur.fetchone() is not None
-                    except Exception:
-                        tem_id_classe = False
+                    tem_id_classe = cache_formularios.coluna_existe(cur, "categorias", "id_classe")
                     
                     if tem_id_classe:
                         cur.execute("""
@@ -2006,21 +1849,15 @@ def incluir_avulso(evento_id):
             except Exception:
                 categorias_disponiveis = []
 
-        # POST: Processar formulário completo
+        # POST: Processar formulário completo (categoria é tratada separadamente)
+        erros = []
         if request.method == "POST" and request.form.get("formulario_completo"):
+            dados, _, erros = cache_formularios.validar(esquema, request.form)
+            if erros:
+                flash("Verifique os campos: " + "; ".join(erros), "warning")
+        if request.method == "POST" and request.form.get("formulario_completo") and not erros:
             # Processar categorias (pode ser múltipla)
             categorias_selecionadas = request.form.getlist("campo_categoria[]")
-            
-            # Coletar dados do formulário
-            dados = {}
-            for c in campos_form:
-                chave = c["campo_chave"]
-                if chave == "categoria":
-                    continue  # Categoria será tratada separadamente
-                val = request.form.get(f"campo_{chave}", "")
-                if isinstance(val, str):
-                    val = val.strip()
-                dados[chave] = val
 
             # Se há categorias selecionadas, criar uma inscrição para cada uma
             if categorias_selecionadas:
@@ -2079,6 +1916,9 @@ def incluir_avulso(evento_id):
                 # Manter ID para o value (o select já mostra o nome)
                 pass
             valores_iniciais[chave] = v or ""
+        if erros:
+            # Reexibe o que foi digitado
+            valores_iniciais.update(dados)
 
         return render_template("eventos_competicoes/incluir_avulso_form.html",
             evento=ev, aluno=aluno, academia_id=academia_id, academia_nome=academia_nome,
@@ -2159,50 +1999,18 @@ def inscrever(evento_id):
 
         # Removida verificação de "aluno já inscrito" pois agora pode haver múltiplas inscrições (uma por categoria)
 
-        cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-            (ev["id_formulario"] or 0,))
-        campos_form = cur.fetchall()
+        esquema = cache_formularios.obter(cur, ev["id_formulario"])
+        campos_form = cache_formularios.campos(cur, ev["id_formulario"])
         if not campos_form:
             flash("Formulário sem campos configurados.", "warning")
             return redirect(request.referrer or url_for("painel.home"))
-        
-        # Verificar se o formulário tem peso, data_nascimento e sexo mas não tem categoria
-        # Se sim, adicionar categoria automaticamente
-        campos_chaves = [c["campo_chave"] for c in campos_form]
-        tem_peso = "peso" in campos_chaves
-        tem_data_nasc = "data_nascimento" in campos_chaves
-        tem_sexo = "sexo" in campos_chaves
-        tem_categoria = "categoria" in campos_chaves
-        
-        if tem_peso and tem_data_nasc and tem_sexo and not tem_categoria:
-            try:
-                # Adicionar categoria após peso
-                ordem_peso = next((c["ordem"] for c in campos_form if c["campo_chave"] == "peso"), len(campos_form))
-                from utils.formularios_campos import get_label
-                label_categoria = get_label("categoria")
-                cur.execute("""
-                    INSERT INTO formularios_campos (formulario_id, campo_chave, label, ordem)
-                    VALUES (%s, %s, %s, %s)
-                """, (ev["id_formulario"], "categoria", label_categoria, ordem_peso + 1))
-                conn.commit()
-                # Recarregar campos
-                cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                    (ev["id_formulario"] or 0,))
-                campos_form = cur.fetchall()
-                # Atualizar lista de chaves
-                campos_chaves = [c["campo_chave"] for c in campos_form]
-                tem_categoria = "categoria" in campos_chaves
-            except Exception as e:
-                # Se já existe ou erro, continuar normalmente
-                import traceback
-                print(f"Erro ao adicionar categoria ao formulário: {e}")
-                print(traceback.format_exc())
-                pass
 
         cur.execute("SELECT id, faixa, graduacao, categoria FROM graduacao ORDER BY id")
         graduacoes = cur.fetchall()
         cur.execute("SELECT TurmaID, Nome, Classificacao, DiasHorario FROM turmas WHERE id_academia = %s ORDER BY Nome", (academia_id,))
         turmas = cur.fetchall()
+        cur.execute("SELECT id, nome FROM professores WHERE id_academia = %s AND ativo = 1 ORDER BY nome", (academia_id,))
+        professores = cur.fetchall()
         
         # Buscar categorias disponíveis se aluno tem peso, data_nascimento e sexo
         categorias_disponiveis = []
@@ -2219,11 +2027,7 @@ def inscrever(evento_id):
                     # Mapear M/F para MASCULINO/FEMININO
                     genero_db = "MASCULINO" if genero_upper == "M" else "FEMININO" if genero_upper == "F" else genero_upper
                     # Buscar id_classe também se existir na tabela
-                    try:
-                        cur.execute("SHOW COLUMNS FROM categorias LIKE 'id_classe'")
-                        tem_id_classe = cur.fetchone() is not None
-                    except Exception:
-                        tem_id_classe = False
+                    tem_id_classe = cache_formularios.coluna_existe(cur, "categorias", "id_classe")
                     
                     if tem_id_classe:
                         cur.execute("""
@@ -2259,58 +2063,17 @@ def inscrever(evento_id):
             except Exception:
                 categorias_disponiveis = []
 
+        erros = []
         if request.method == "POST":
-            # Processar categorias (pode ser múltipla)
+            # Categoria é tratada separadamente (pode ser múltipla)
+            dados_base, convertidos, erros = cache_formularios.validar(esquema, request.form)
+            if erros:
+                flash("Verifique os campos: " + "; ".join(erros), "warning")
+        if request.method == "POST" and not erros:
             categorias_selecionadas = request.form.getlist("campo_categoria[]")
-            
-            # Coletar dados base do formulário
-            dados_base = {}
-            for c in campos_form:
-                chave = c["campo_chave"]
-                if chave == "categoria":
-                    continue  # Categoria será tratada separadamente
-                val = request.form.get(f"campo_{chave}", "")
-                if isinstance(val, str):
-                    val = val.strip()
-                dados_base[chave] = val
-            
-            # Verificar inscrições existentes para prevenir duplicatas
-            cur.execute("""
-                SELECT id, dados_form, status
-                FROM eventos_competicoes_inscricoes
-                WHERE evento_id = %s AND academia_id = %s AND aluno_id = %s
-            """, (evento_id, academia_id, aluno_id))
-            inscricoes_existentes = cur.fetchall()
-            
-            # Extrair categorias já inscritas
-            categorias_ja_inscritas = set()
-            for insc_existente in inscricoes_existentes:
-                if insc_existente.get("dados_form"):
-                    try:
-                        dados_existentes = json.loads(insc_existente["dados_form"]) if isinstance(insc_existente["dados_form"], str) else insc_existente["dados_form"]
-                        if dados_existentes.get("categoria"):
-                            categorias_ja_inscritas.add(dados_existentes["categoria"])
-                    except Exception:
-                        pass
-            
-            # Se não há categoria no formulário, verificar se já existe inscrição sem categoria
-            tem_inscricao_sem_categoria = False
-            if not categorias_selecionadas:
-                for insc_existente in inscricoes_existentes:
-                    if insc_existente.get("dados_form"):
-                        try:
-                            dados_existentes = json.loads(insc_existente["dados_form"]) if isinstance(insc_existente["dados_form"], str) else insc_existente["dados_form"]
-                            if not dados_existentes.get("categoria"):
-                                tem_inscricao_sem_categoria = True
-                                break
-                        except Exception:
-                            # Se não conseguir parsear, considerar como sem categoria
-                            tem_inscricao_sem_categoria = True
-                            break
-                    else:
-                        # Se dados_form é None ou vazio, considerar como sem categoria
-                        tem_inscricao_sem_categoria = True
-                        break
+
+            # Verificar inscrições existentes para prevenir duplicatas (categoria já materializada)
+            categorias_ja_inscritas, tem_inscricao_sem_categoria = _categorias_inscritas(cur, evento_id, academia_id, aluno_id)
             
             # Validar duplicatas
             if not categorias_selecionadas and tem_inscricao_sem_categoria:
@@ -2385,33 +2148,9 @@ def inscrever(evento_id):
                 col = MAPEAMENTO_FORM_ALUNO.get(chave)
                 if not col or chave in ("id_academia", "aluno_modalidade_ids", "foto"):
                     continue
-                if col in ("graduacao_id", "TurmaID"):
-                    try:
-                        val = int(val) if val else None
-                    except (ValueError, TypeError):
-                        val = None
-                elif col == "peso":
-                    try:
-                        val = float(val) if val else None
-                    except (ValueError, TypeError):
-                        val = None
-                elif col in ("data_nascimento", "ultimo_exame_faixa", "rg_data_emissao", "data_cadastro_zempo"):
-                    try:
-                        from datetime import datetime as dt
-                        val_str = str(val)[:10].strip()
-                        if not val_str:
-                            val = None
-                        else:
-                            # Tentar formato BR primeiro (dd/mm/yyyy), depois ISO (yyyy-mm-dd)
-                            try:
-                                val = dt.strptime(val_str, "%d/%m/%Y").date()
-                            except ValueError:
-                                try:
-                                    val = dt.strptime(val_str, "%Y-%m-%d").date()
-                                except ValueError:
-                                    val = None
-                    except Exception:
-                        val = None
+                if col in ("graduacao_id", "TurmaID", "peso") or col in cache_formularios.CAMPOS_DATA:
+                    # Já validados: só grava os preenchidos e válidos
+                    val = convertidos.get(chave)
                 if val is not None:
                     try:
                         cur.execute(f"UPDATE alunos SET `{col}` = %s WHERE id = %s", (val, aluno_id))
@@ -2459,6 +2198,9 @@ def inscrever(evento_id):
                 pass
             valores_iniciais[chave] = v or ""
 
+        if erros:
+            valores_iniciais.update(dados_base)
+
         # Buscar nome da academia para exibição
         academia_nome = None
         if academia_id:
@@ -2513,284 +2255,8 @@ def pagamentos_academias(evento_id):
             flash("Evento não encontrado.", "danger")
             return redirect(url_for("eventos_competicoes.lista"))
         
-        # Verificar se tabelas de pagamentos existem
-        try:
-            cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos'")
-            tabela_pagamentos_existe = cur.fetchone() is not None
-        except Exception:
-            tabela_pagamentos_existe = False
-        
-        # Buscar academias que enviaram inscrições
-        cur.execute("""
-            SELECT DISTINCT i.academia_id, ac.nome as academia_nome,
-                   COUNT(*) as total_inscricoes
-            FROM eventos_competicoes_inscricoes i
-            INNER JOIN academias ac ON ac.id = i.academia_id
-            WHERE i.evento_id = %s AND i.status = 'enviada'
-            GROUP BY i.academia_id, ac.nome
-            ORDER BY ac.nome
-        """, (evento_id,))
-        academias_com_inscricoes = cur.fetchall()
-        
-        pagamentos = []
-        # Valor da associação para calcular o que a academia deve pagar
-        valor_taxa_associacao = float(evento.get("valor_taxa_sugerido", 0) or 0)
-        
-        if tabela_pagamentos_existe:
-            # Buscar pagamentos das academias
-            cur.execute("""
-                SELECT ap.id, ap.academia_id, 
-                       COALESCE(ap.valor_total_esperado, 0) as valor_total_esperado,
-                       COALESCE(ap.valor_pago, 0) as valor_pago,
-                       COALESCE(ap.valor_pendente, 0) as valor_pendente,
-                       ap.status
-                FROM eventos_competicoes_academia_pagamentos ap
-                WHERE ap.evento_id = %s
-            """, (evento_id,))
-            pagamentos_dict = {p["academia_id"]: p for p in cur.fetchall()}
-            
-            # Buscar histórico de abatimentos para cada pagamento
-            try:
-                cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos_abatimentos'")
-                tabela_abatimentos_existe = cur.fetchone() is not None
-            except Exception:
-                tabela_abatimentos_existe = False
-            
-            # Combinar dados de academias com inscrições e pagamentos
-            for ac in academias_com_inscricoes:
-                try:
-                    pagamento_data = pagamentos_dict.get(ac.get("academia_id"))
-                    if pagamento_data:
-                        pag = pagamento_data.copy()
-                        pag["academia_nome"] = ac.get("academia_nome", "")
-                        total_insc = ac.get("total_inscricoes", 0) or 0
-                        pag["total_inscricoes"] = total_insc
-                        
-                        # Garantir que valores sejam float
-                        pag["valor_total_esperado"] = float(pag.get("valor_total_esperado") or 0)
-                        pag["valor_pago"] = float(pag.get("valor_pago") or 0)
-                        pag["valor_pendente"] = float(pag.get("valor_pendente") or 0)
-                        
-                        # Recalcular valor_total_esperado baseado no valor da associação
-                        valor_total_esperado_correto = float(valor_taxa_associacao * total_insc)
-                        
-                        # Se o valor está incorreto ou zerado, atualizar o registro
-                        valor_atual = float(pag.get("valor_total_esperado", 0) or 0)
-                        valor_pago_atual = float(pag.get("valor_pago", 0) or 0)
-                        
-                        # Atualizar se valor está zerado ou diferente (com tolerância)
-                        # Só recalcular se valor_taxa_associacao > 0 (evento tem taxa)
-                        if valor_taxa_associacao > 0 and (valor_atual == 0 or abs(valor_atual - valor_total_esperado_correto) > 0.01):
-                            # Recalcular valor_pendente baseado no valor correto
-                            novo_valor_pendente = valor_total_esperado_correto - valor_pago_atual
-                            
-                            # Atualizar status se necessário
-                            if novo_valor_pendente <= 0:
-                                novo_status = "quitado"
-                            elif valor_pago_atual > 0:
-                                novo_status = "parcial"
-                            else:
-                                novo_status = "pendente"
-                            
-                            # Atualizar o registro no banco
-                            cur.execute("""
-                                UPDATE eventos_competicoes_academia_pagamentos
-                                SET valor_total_esperado = %s, valor_pendente = %s, status = %s
-                                WHERE id = %s
-                            """, (valor_total_esperado_correto, novo_valor_pendente, novo_status, pag["id"]))
-                            conn.commit()
-                            
-                            # Atualizar o valor no objeto pag
-                            pag["valor_total_esperado"] = valor_total_esperado_correto
-                            pag["valor_pago"] = valor_pago_atual
-                            pag["valor_pendente"] = novo_valor_pendente
-                            pag["status"] = novo_status
-                        else:
-                            # Mesmo que o valor esteja correto, garantir que valor_pendente está correto
-                            valor_pendente_atual = float(pag.get("valor_pendente", 0) or 0)
-                            valor_pendente_correto = valor_total_esperado_correto - valor_pago_atual
-                            # Sempre recalcular e atualizar valor_pendente para garantir consistência
-                            pag["valor_pendente"] = valor_pendente_correto
-                            # Atualizar no banco também
-                            cur.execute("""
-                                UPDATE eventos_competicoes_academia_pagamentos
-                                SET valor_pendente = %s
-                                WHERE id = %s
-                            """, (valor_pendente_correto, pag["id"]))
-                            conn.commit()
-                        
-                        # Buscar abatimentos se existir tabela
-                        if tabela_abatimentos_existe and pag.get("id"):
-                            try:
-                                cur.execute("""
-                                    SELECT id, valor, data_abatimento, observacoes
-                                    FROM eventos_competicoes_academia_pagamentos_abatimentos
-                                    WHERE pagamento_id = %s
-                                    ORDER BY data_abatimento DESC
-                                """, (pag["id"],))
-                                pag["abatimentos"] = cur.fetchall()
-                            except Exception:
-                                pag["abatimentos"] = []
-                        else:
-                            pag["abatimentos"] = []
-                        
-                        pagamentos.append(pag)
-                    else:
-                        # Academia enviou inscrições mas não tem registro de pagamento ainda
-                        # Usar valor da associação (valor_taxa_sugerido) para calcular o que a academia deve pagar
-                        # valor_taxa_associacao já foi definido antes do loop
-                        valor_total_esperado = valor_taxa_associacao * (ac.get("total_inscricoes", 0) or 0)
-                        
-                        # Criar registro de pagamento automaticamente se evento tem taxa
-                        tem_taxa_val = evento.get("tem_taxa", 0)
-                        tem_taxa_int = int(tem_taxa_val) if tem_taxa_val else 0
-                        # Criar sempre que houver valor esperado, mesmo se evento não tem taxa configurada
-                        if valor_total_esperado > 0:
-                            try:
-                                cur.execute("""
-                                    INSERT INTO eventos_competicoes_academia_pagamentos
-                                    (evento_id, academia_id, valor_total_esperado, valor_pendente, status)
-                                    VALUES (%s, %s, %s, %s, 'pendente')
-                                """, (evento_id, ac.get("academia_id"), valor_total_esperado, valor_total_esperado))
-                                pagamento_id = cur.lastrowid
-                                conn.commit()
-                                
-                                # Buscar o registro criado
-                                cur.execute("""
-                                    SELECT id, valor_total_esperado, valor_pago, valor_pendente, status
-                                    FROM eventos_competicoes_academia_pagamentos
-                                    WHERE id = %s
-                                """, (pagamento_id,))
-                                pag_data = cur.fetchone()
-                                
-                                if pag_data:
-                                    pag = {
-                                        "id": pag_data["id"],
-                                        "academia_id": ac.get("academia_id"),
-                                        "academia_nome": ac.get("academia_nome", ""),
-                                        "total_inscricoes": ac.get("total_inscricoes", 0) or 0,
-                                        "valor_total_esperado": float(pag_data.get("valor_total_esperado") or 0),
-                                        "valor_pago": float(pag_data.get("valor_pago") or 0),
-                                        "valor_pendente": float(pag_data.get("valor_pendente") or 0),
-                                        "status": pag_data.get("status", "pendente"),
-                                        "abatimentos": []
-                                    }
-                                else:
-                                    # Se não encontrou o registro, criar sem ID
-                                    pag = {
-                                        "id": None,
-                                        "academia_id": ac.get("academia_id"),
-                                        "academia_nome": ac.get("academia_nome", ""),
-                                        "total_inscricoes": ac.get("total_inscricoes", 0) or 0,
-                                        "valor_total_esperado": float(valor_total_esperado),
-                                        "valor_pago": 0.0,
-                                        "valor_pendente": float(valor_total_esperado),
-                                        "status": "pendente",
-                                        "abatimentos": []
-                                    }
-                            except Exception as e:
-                                # Se houver erro ao criar, usar registro sem ID
-                                try:
-                                    import traceback
-                                    error_msg = f"Erro ao criar registro de pagamento para academia {ac.get('academia_id')}: {e}\n{traceback.format_exc()}"
-                                    current_app.logger.error(error_msg)
-                                    print(error_msg)
-                                except:
-                                    pass
-                                pag = {
-                                    "id": None,
-                                    "academia_id": ac.get("academia_id"),
-                                    "academia_nome": ac.get("academia_nome", ""),
-                                    "total_inscricoes": ac.get("total_inscricoes", 0) or 0,
-                                    "valor_total_esperado": float(valor_total_esperado),
-                                    "valor_pago": 0.0,
-                                    "valor_pendente": float(valor_total_esperado),
-                                    "status": "pendente",
-                                    "abatimentos": []
-                                }
-                        else:
-                            # Se não tem valor esperado, ainda assim criar registro sem ID para exibição
-                            pag = {
-                                "id": None,
-                                "academia_id": ac.get("academia_id"),
-                                "academia_nome": ac.get("academia_nome", ""),
-                                "total_inscricoes": ac.get("total_inscricoes", 0),
-                                "valor_total_esperado": valor_total_esperado,
-                                "valor_pago": 0,
-                                "valor_pendente": valor_total_esperado,
-                                "status": "pendente",
-                                "abatimentos": []
-                            }
-                        pagamentos.append(pag)
-                except Exception as e:
-                    # Se houver erro ao processar esta academia, pular
-                    try:
-                        current_app.logger.error(f"Erro ao processar academia {ac.get('academia_id')}: {e}")
-                    except:
-                        pass
-                    continue
-        else:
-            # Se tabela não existe, mostrar apenas academias com inscrições
-            # Usar valor da associação (valor_taxa_sugerido) para calcular o que a academia deve pagar
-            valor_taxa_associacao = float(evento.get("valor_taxa_sugerido", 0) or 0)
-            for ac in academias_com_inscricoes:
-                try:
-                    total_insc = ac.get("total_inscricoes", 0) or 0
-                    valor_total_esperado = float(valor_taxa_associacao * total_insc)
-                    
-                    pag = {
-                        "id": None,
-                        "academia_id": ac.get("academia_id"),
-                        "academia_nome": ac.get("academia_nome", ""),
-                        "total_inscricoes": total_insc,
-                        "valor_total_esperado": valor_total_esperado,
-                        "valor_pago": 0.0,
-                        "valor_pendente": valor_total_esperado,
-                        "status": "pendente",
-                        "abatimentos": []
-                    }
-                    pagamentos.append(pag)
-                except Exception as e:
-                    # Se houver erro, pular esta academia
-                    try:
-                        current_app.logger.error(f"Erro ao processar academia {ac.get('academia_id')}: {e}")
-                    except:
-                        pass
-                    continue
-        
-        # Garantir que todos os valores estão definidos antes de passar para o template
-        if not isinstance(pagamentos, list):
-            pagamentos = []
-        
-        for pag in pagamentos:
-            if not isinstance(pag, dict):
-                continue
-            pag.setdefault("id", None)
-            pag.setdefault("academia_id", None)
-            pag.setdefault("academia_nome", "")
-            pag.setdefault("total_inscricoes", 0)
-            
-            # Garantir que valores financeiros sejam sempre float
-            valor_total_esperado_raw = pag.get("valor_total_esperado")
-            if valor_total_esperado_raw is None:
-                # Se não tem valor, calcular baseado no valor da associação
-                total_insc = pag.get("total_inscricoes", 0) or 0
-                pag["valor_total_esperado"] = float(valor_taxa_associacao * total_insc)
-            else:
-                pag["valor_total_esperado"] = float(valor_total_esperado_raw or 0)
-            
-            valor_pago_raw = pag.get("valor_pago")
-            pag["valor_pago"] = float(valor_pago_raw or 0) if valor_pago_raw is not None else 0.0
-            
-            valor_pendente_raw = pag.get("valor_pendente")
-            if valor_pendente_raw is None:
-                # Recalcular se não existe
-                pag["valor_pendente"] = pag["valor_total_esperado"] - pag["valor_pago"]
-            else:
-                pag["valor_pendente"] = float(valor_pendente_raw or 0)
-            
-            pag.setdefault("status", "pendente")
-            pag.setdefault("abatimentos", [])
+        # Resumo mantido por resumo_pagamentos.atualizar() nas alterações: aqui só leitura
+        pagamentos = resumo_pagamentos.listar(cur, evento_id)
         
         # Garantir que evento tem todas as propriedades necessárias
         if not isinstance(evento, dict):
@@ -2901,12 +2367,8 @@ def criar_registro_pagamento(evento_id):
             flash("Não é possível criar registro: valor total esperado é zero.", "warning")
             return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
         
-        # Criar registro
-        cur.execute("""
-            INSERT INTO eventos_competicoes_academia_pagamentos
-            (evento_id, academia_id, valor_total_esperado, valor_pendente, status)
-            VALUES (%s, %s, %s, %s, 'pendente')
-        """, (evento_id, academia_id, valor_total_esperado, valor_total_esperado))
+        # Criar registro (o resumo cria a linha da academia com as inscrições enviadas)
+        resumo_pagamentos.atualizar(cur, evento_id, academia_id)
         conn.commit()
         flash("Registro de pagamento criado com sucesso.", "success")
     except Exception as e:
@@ -2950,10 +2412,11 @@ def registrar_abatimento(evento_id, pagamento_id):
     try:
         # Verificar se pagamento pertence ao evento da associação
         cur.execute("""
-            SELECT ap.id, ap.valor_pendente, ap.valor_pago, ec.id_associacao
+            SELECT ap.id, ap.academia_id, ap.valor_pendente, ec.id_associacao
             FROM eventos_competicoes_academia_pagamentos ap
             INNER JOIN eventos_competicoes ec ON ec.id = ap.evento_id
             WHERE ap.id = %s AND ap.evento_id = %s AND ec.id_associacao = %s
+            FOR UPDATE
         """, (pagamento_id, evento_id, id_assoc))
         pagamento = cur.fetchone()
         
@@ -2962,7 +2425,6 @@ def registrar_abatimento(evento_id, pagamento_id):
             return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
         
         valor_pendente_atual = float(pagamento.get("valor_pendente", 0) or 0)
-        valor_pago_atual = float(pagamento.get("valor_pago", 0) or 0)
         
         if valor_abatimento > valor_pendente_atual:
             flash(f"O valor do abatimento não pode ser maior que o pendente (R$ {valor_pendente_atual:.2f}).", "danger")
@@ -2975,16 +2437,7 @@ def registrar_abatimento(evento_id, pagamento_id):
             VALUES (%s, %s, %s, %s)
         """, (pagamento_id, valor_abatimento, observacoes or None, current_user.id))
         
-        # Atualizar valores do pagamento
-        novo_valor_pago = valor_pago_atual + valor_abatimento
-        novo_valor_pendente = valor_pendente_atual - valor_abatimento
-        novo_status = "quitado" if novo_valor_pendente <= 0 else ("parcial" if novo_valor_pago > 0 else "pendente")
-        
-        cur.execute("""
-            UPDATE eventos_competicoes_academia_pagamentos
-            SET valor_pago = %s, valor_pendente = %s, status = %s
-            WHERE id = %s
-        """, (novo_valor_pago, novo_valor_pendente, novo_status, pagamento_id))
+        resumo_pagamentos.atualizar(cur, evento_id, pagamento["academia_id"])
         
         conn.commit()
         flash(f"Abatimento de R$ {valor_abatimento:.2f} registrado com sucesso.", "success")
@@ -3103,13 +2556,13 @@ def cancelar_pagamento_academia(evento_id, pagamento_id):
             return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
         
         valor_pago_atual = float(pagamento.get("valor_pago", 0) or 0)
-        valor_total_esperado = float(pagamento.get("valor_total_esperado", 0) or 0)
         
         if valor_pago_atual <= 0:
             flash("Não há pagamento para cancelar.", "warning")
             return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
         
-        # Se existe tabela de abatimentos, tentar remover o último abatimento
+        # Remover o último abatimento (o valor pago é recalculado pelo resumo)
+        ultimo_abatimento = None
         if tabela_abatimentos_existe:
             cur.execute("""
                 SELECT id, valor FROM eventos_competicoes_academia_pagamentos_abatimentos
@@ -3118,49 +2571,19 @@ def cancelar_pagamento_academia(evento_id, pagamento_id):
                 LIMIT 1
             """, (pagamento_id,))
             ultimo_abatimento = cur.fetchone()
-            
-            if ultimo_abatimento:
-                # Remover o último abatimento
-                valor_abatimento = float(ultimo_abatimento.get("valor", 0) or 0)
-                novo_valor_pago = valor_pago_atual - valor_abatimento
-                novo_valor_pendente = valor_total_esperado - novo_valor_pago
-                
-                cur.execute("DELETE FROM eventos_competicoes_academia_pagamentos_abatimentos WHERE id = %s", (ultimo_abatimento["id"],))
-                
-                # Atualizar status do pagamento
-                if novo_valor_pendente <= 0:
-                    novo_status = "quitado"
-                elif novo_valor_pago > 0:
-                    novo_status = "parcial"
-                else:
-                    novo_status = "pendente"
-                
-                cur.execute("""
-                    UPDATE eventos_competicoes_academia_pagamentos
-                    SET valor_pago = %s, valor_pendente = %s, status = %s
-                    WHERE id = %s
-                """, (novo_valor_pago, novo_valor_pendente, novo_status, pagamento_id))
-                
-                conn.commit()
-                flash(f"Último abatimento de R$ {valor_abatimento:.2f} foi cancelado. Pagamento revertido.", "success")
-            else:
-                # Se não há abatimentos, reverter pagamento total para zero
-                cur.execute("""
-                    UPDATE eventos_competicoes_academia_pagamentos
-                    SET valor_pago = 0, valor_pendente = %s, status = 'pendente'
-                    WHERE id = %s
-                """, (valor_total_esperado, pagamento_id))
-                conn.commit()
-                flash("Pagamento cancelado. Status revertido para pendente.", "success")
-        else:
-            # Se não há tabela de abatimentos, reverter pagamento total para zero
-            cur.execute("""
-                UPDATE eventos_competicoes_academia_pagamentos
-                SET valor_pago = 0, valor_pendente = %s, status = 'pendente'
-                WHERE id = %s
-            """, (valor_total_esperado, pagamento_id))
-            conn.commit()
-            flash("Pagamento cancelado. Status revertido para pendente.", "success")
+        
+        if not ultimo_abatimento:
+            # Sem abatimentos, o valor pago vem das inscrições confirmadas como pagas pela academia
+            flash("Não há abatimentos para cancelar. O valor pago restante corresponde às inscrições "
+                  "com pagamento confirmado pela academia.", "warning")
+            return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
+        
+        valor_abatimento = float(ultimo_abatimento.get("valor", 0) or 0)
+        cur.execute("DELETE FROM eventos_competicoes_academia_pagamentos_abatimentos WHERE id = %s", (ultimo_abatimento["id"],))
+        resumo_pagamentos.atualizar(cur, evento_id, pagamento["academia_id"])
+        
+        conn.commit()
+        flash(f"Último abatimento de R$ {valor_abatimento:.2f} foi cancelado. Pagamento revertido.", "success")
     except Exception as e:
         try:
             import traceback
@@ -3209,7 +2632,7 @@ def cancelar_abatimento(evento_id, pagamento_id, abatimento_id):
         
         # Verificar se abatimento pertence ao pagamento e evento da associação
         cur.execute("""
-            SELECT ab.id, ab.pagamento_id, ab.valor, ap.valor_pago, ap.valor_pendente, ap.valor_total_esperado, ec.id_associacao
+            SELECT ab.id, ab.pagamento_id, ab.valor, ap.academia_id, ec.id_associacao
             FROM eventos_competicoes_academia_pagamentos_abatimentos ab
             INNER JOIN eventos_competicoes_academia_pagamentos ap ON ap.id = ab.pagamento_id
             INNER JOIN eventos_competicoes ec ON ec.id = ap.evento_id
@@ -3222,29 +2645,10 @@ def cancelar_abatimento(evento_id, pagamento_id, abatimento_id):
             return redirect(url_for("eventos_competicoes.pagamentos_academias", evento_id=evento_id))
         
         valor_abatimento = float(abatimento.get("valor", 0) or 0)
-        valor_pago_atual = float(abatimento.get("valor_pago", 0) or 0)
-        valor_total_esperado = float(abatimento.get("valor_total_esperado", 0) or 0)
         
-        # Remover o abatimento
+        # Remover o abatimento e recalcular valores do pagamento
         cur.execute("DELETE FROM eventos_competicoes_academia_pagamentos_abatimentos WHERE id = %s", (abatimento_id,))
-        
-        # Recalcular valores do pagamento
-        novo_valor_pago = valor_pago_atual - valor_abatimento
-        novo_valor_pendente = valor_total_esperado - novo_valor_pago
-        
-        # Atualizar status do pagamento
-        if novo_valor_pendente <= 0:
-            novo_status = "quitado"
-        elif novo_valor_pago > 0:
-            novo_status = "parcial"
-        else:
-            novo_status = "pendente"
-        
-        cur.execute("""
-            UPDATE eventos_competicoes_academia_pagamentos
-            SET valor_pago = %s, valor_pendente = %s, status = %s
-            WHERE id = %s
-        """, (novo_valor_pago, novo_valor_pendente, novo_status, pagamento_id))
+        resumo_pagamentos.atualizar(cur, evento_id, abatimento["academia_id"])
         
         conn.commit()
         flash(f"Abatimento de R$ {valor_abatimento:.2f} foi cancelado. Valores recalculados.", "success")
@@ -3311,53 +2715,9 @@ def cancelar_envio(evento_id):
             WHERE evento_id = %s AND academia_id = %s AND status = 'enviada'
         """, (evento_id, academia_id))
         
-        # Se evento tem taxa, atualizar registro de pagamento (recalcular valores)
-        tem_coluna_taxa, _ = _colunas_taxa_existem(cur)
-        if tem_coluna_taxa:
-            cur.execute("SELECT valor_taxa_sugerido FROM eventos_competicoes WHERE id = %s", (evento_id,))
-            evento_data = cur.fetchone()
-            valor_taxa_associacao = float(evento_data.get("valor_taxa_sugerido", 0) or 0) if evento_data else 0
-            
-            if valor_taxa_associacao > 0:
-                try:
-                    cur.execute("SHOW TABLES LIKE 'eventos_competicoes_academia_pagamentos'")
-                    tabela_pagamentos_existe = cur.fetchone() is not None
-                except Exception:
-                    tabela_pagamentos_existe = False
-                
-                if tabela_pagamentos_existe:
-                    # Contar inscrições confirmadas (não enviadas)
-                    cur.execute("""
-                        SELECT COUNT(*) as total_confirmadas
-                        FROM eventos_competicoes_inscricoes
-                        WHERE evento_id = %s AND academia_id = %s AND status = 'confirmada'
-                    """, (evento_id, academia_id))
-                    total_confirmadas = cur.fetchone().get("total_confirmadas", 0) or 0
-                    novo_valor_total_esperado = valor_taxa_associacao * total_confirmadas
-                    
-                    # Atualizar registro de pagamento
-                    cur.execute("""
-                        SELECT id, valor_pago FROM eventos_competicoes_academia_pagamentos
-                        WHERE evento_id = %s AND academia_id = %s
-                    """, (evento_id, academia_id))
-                    pagamento = cur.fetchone()
-                    
-                    if pagamento:
-                        valor_pago_atual = float(pagamento.get("valor_pago", 0) or 0)
-                        novo_valor_pendente = novo_valor_total_esperado - valor_pago_atual
-                        
-                        if novo_valor_pendente <= 0:
-                            novo_status = "quitado"
-                        elif valor_pago_atual > 0:
-                            novo_status = "parcial"
-                        else:
-                            novo_status = "pendente"
-                        
-                        cur.execute("""
-                            UPDATE eventos_competicoes_academia_pagamentos
-                            SET valor_total_esperado = %s, valor_pendente = %s, status = %s
-                            WHERE id = %s
-                        """, (novo_valor_total_esperado, novo_valor_pendente, novo_status, pagamento["id"]))
+        # Recalcular registro de pagamento (valor esperado volta a zero sem inscrições enviadas)
+        resumo_pagamentos.atualizar(cur, evento_id, academia_id)
+        consolidacao_evento.invalidar(cur, evento_id)
         conn.commit()
         flash(f"Envio cancelado. {total_enviadas} inscrição(ões) voltaram ao status 'confirmada'. A academia pode editar novamente.", "success")
     except Exception as e:
@@ -3441,6 +2801,7 @@ def cancelar_inscricoes_academia(evento_id):
                 WHERE evento_id = %s AND academia_id = %s
             """, (evento_id, academia_id))
         
+        consolidacao_evento.invalidar(cur, evento_id)
         conn.commit()
         flash(f"Todas as inscrições da academia {academia['nome']} foram canceladas. {total_inscricoes} inscrição(ões) removida(s).", "success")
     except Exception as e:
@@ -3506,101 +2867,27 @@ def consolidar(evento_id):
     cur = conn.cursor(dictionary=True)
     try:
         cur.execute("""
-            SELECT ec.id, ec.nome, ec.data_fim, ec.id_formulario
+            SELECT ec.id, ec.nome, ec.data_fim, ec.id_formulario, ec.status
             FROM eventos_competicoes ec WHERE ec.id = %s AND ec.id_associacao = %s
         """, (evento_id, id_assoc))
         ev = cur.fetchone()
         if not ev:
             flash("Evento não encontrado.", "danger")
             return redirect(url_for("eventos_competicoes.lista"))
+        ev["encerrado"] = _evento_encerrado(ev)
 
-        # Buscar academias com inscrições
-        cur.execute("""
-            SELECT DISTINCT ac.id as academia_id, ac.nome as academia_nome
-            FROM academias ac
-            INNER JOIN eventos_competicoes_adesao ea ON ea.academia_id = ac.id AND ea.evento_id = %s AND ea.aderiu = 1
-            INNER JOIN eventos_competicoes_inscricoes i ON i.academia_id = ac.id AND i.evento_id = %s AND i.status = 'enviada'
-            WHERE ac.id_associacao = %s
-            ORDER BY ac.nome
-        """, (evento_id, evento_id, id_assoc))
-        academias = cur.fetchall()
-
-        # Buscar todas as inscrições com dados do aluno e categoria
-        cur.execute("""
-            SELECT i.id, i.academia_id, i.aluno_id, i.dados_form, 
-                   ac.nome as academia_nome, a.nome as aluno_nome
-            FROM eventos_competicoes_inscricoes i
-            INNER JOIN academias ac ON ac.id = i.academia_id
-            LEFT JOIN alunos a ON a.id = i.aluno_id
-            WHERE i.evento_id = %s AND i.status = 'enviada' AND ac.id_associacao = %s
-            ORDER BY ac.nome, a.nome
-        """, (evento_id, id_assoc))
-        inscricoes = cur.fetchall()
-
-        # Agrupar inscrições por academia e categoria
-        academias_com_inscricoes = {}
-        for ac in academias:
-            academias_com_inscricoes[ac["academia_id"]] = {
-                "academia_nome": ac["academia_nome"],
-                "categorias": {}
-            }
-
-        for insc in inscricoes:
-            try:
-                academia_id = insc.get("academia_id")
-                if not academia_id:
-                    continue
-                    
-                dados_form_str = insc.get("dados_form")
-                if dados_form_str:
-                    try:
-                        if isinstance(dados_form_str, str):
-                            dados = json.loads(dados_form_str)
-                        else:
-                            dados = dados_form_str
-                    except (json.JSONDecodeError, TypeError):
-                        dados = {}
-                else:
-                    dados = {}
-                    
-                categoria = dados.get("categoria") or "Sem categoria"
-                
-                if academia_id not in academias_com_inscricoes:
-                    continue
-                
-                if categoria not in academias_com_inscricoes[academia_id]["categorias"]:
-                    academias_com_inscricoes[academia_id]["categorias"][categoria] = []
-                
-                academias_com_inscricoes[academia_id]["categorias"][categoria].append({
-                    "id": insc.get("id"),
-                    "aluno_id": insc.get("aluno_id"),
-                    "aluno_nome": insc.get("aluno_nome") or "Avulso",
-                    "dados_form": dados
-                })
-            except Exception as e:
-                import logging
-                logging.error(f"Erro ao processar inscrição {insc.get('id')}: {e}")
-                continue
-
-        # Calcular totais
-        for ac_id, ac_data in academias_com_inscricoes.items():
-            try:
-                total_por_categoria = {cat: len(alunos) for cat, alunos in ac_data.get("categorias", {}).items()}
-                ac_data["total_inscritos"] = sum(total_por_categoria.values())
-                ac_data["total_por_categoria"] = total_por_categoria
-            except Exception as e:
-                import logging
-                logging.error(f"Erro ao calcular totais para academia {ac_id}: {e}")
-                ac_data["total_inscritos"] = 0
-                ac_data["total_por_categoria"] = {}
+        consolidacao = consolidacao_evento.obter(conn, evento_id)
+        academias_com_inscricoes = consolidacao["academias_com_inscricoes"]
+        categorias_com_inscricoes = consolidacao["categorias_com_inscricoes"]
+        total_geral_inscritos = consolidacao["total_geral_inscritos"]
+        academias_map = consolidacao["academias_map"]
+        graduacoes_map = consolidacao["graduacoes_map"]
 
         # Buscar campos do formulário
         campos_form = []
         if ev.get("id_formulario"):
             try:
-                cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                    (ev["id_formulario"],))
-                campos_form = cur.fetchall()
+                campos_form = cache_formularios.campos(cur, ev["id_formulario"])
             except Exception as e:
                 import logging
                 logging.error(f"Erro ao buscar campos_form: {e}")
@@ -3629,48 +2916,6 @@ def consolidar(evento_id):
             logging.warning(f"Erro ao buscar configuracao_exportacao: {e}")
             pass
 
-        # Preparar agrupamento por categoria também
-        categorias_com_inscricoes = {}
-        for ac_id, ac_data in academias_com_inscricoes.items():
-            for categoria, alunos in ac_data.get("categorias", {}).items():
-                if categoria not in categorias_com_inscricoes:
-                    categorias_com_inscricoes[categoria] = {
-                        "academias": {},
-                        "total_inscritos": 0
-                    }
-                # Agrupar alunos por academia dentro da categoria
-                for aluno in alunos:
-                    academia_nome = ac_data.get("academia_nome", "Academia Desconhecida")
-                    if academia_nome not in categorias_com_inscricoes[categoria]["academias"]:
-                        categorias_com_inscricoes[categoria]["academias"][academia_nome] = []
-                    categorias_com_inscricoes[categoria]["academias"][academia_nome].append(aluno)
-        
-        # Calcular totais por categoria
-        for categoria, cat_data in categorias_com_inscricoes.items():
-            total = sum(len(alunos) for alunos in cat_data["academias"].values())
-            cat_data["total_inscritos"] = total
-        
-        # Calcular total geral de inscritos
-        total_geral_inscritos = len(inscricoes)
-        
-        # Buscar mapeamento de academias e graduações para exibir nomes ao invés de IDs
-        academias_map = {}
-        graduacoes_map = {}
-        try:
-            # Buscar todas as academias da associação
-            cur.execute("SELECT id, nome FROM academias WHERE id_associacao = %s", (id_assoc,))
-            for row in cur.fetchall():
-                academias_map[str(row["id"])] = row["nome"]
-            
-            # Buscar todas as graduações
-            cur.execute("SELECT id, faixa, graduacao, categoria FROM graduacao")
-            for row in cur.fetchall():
-                graduacao_nome = f"{row.get('faixa', '')} {row.get('graduacao', '')} {row.get('categoria', '')}".strip()
-                graduacoes_map[str(row["id"])] = graduacao_nome if graduacao_nome else f"ID {row['id']}"
-        except Exception as e:
-            import logging
-            logging.warning(f"Erro ao buscar mapeamentos de academias/graduações: {e}")
-        
         # Obter tipo de agrupamento (padrão: academia)
         agrupamento = request.args.get("agrupamento", "academia")
         
@@ -3698,80 +2943,19 @@ def consolidar(evento_id):
 @login_required
 def download_anexo(anexo_id):
     """Download de anexo de evento/competição."""
+    condicao, params = _condicao_acesso_anexo()
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     
     try:
-        # Buscar anexo
-        cur.execute("""
-            SELECT eca.*, ec.id_associacao
+        # Anexo e permissão numa consulta: associação (criador), academia (aderiu) ou aluno/responsável (academia aderiu)
+        cur.execute(f"""
+            SELECT eca.nome_arquivo, eca.caminho_arquivo, eca.tipo_mime, ({condicao}) AS pode_baixar
             FROM eventos_competicoes_anexos eca
             INNER JOIN eventos_competicoes ec ON ec.id = eca.evento_id
             WHERE eca.id = %s
-        """, (anexo_id,))
+        """, (*params, anexo_id))
         anexo = cur.fetchone()
-        
-        if not anexo:
-            flash("Anexo não encontrado.", "danger")
-            return redirect(url_for("painel.home"))
-        
-        # Verificar permissão: associação (criador), academia (aderiu) ou aluno/responsável (aderiu)
-        pode_baixar = False
-        id_assoc = getattr(current_user, "id_associacao", None)
-        
-        if current_user.has_role("gestor_associacao") or current_user.has_role("admin"):
-            # Associação pode baixar seus próprios eventos
-            pode_baixar = (id_assoc == anexo["id_associacao"])
-        elif current_user.has_role("gestor_academia") or current_user.has_role("professor"):
-            # Academia pode baixar se aderiu ao evento
-            academia_id = getattr(current_user, "id_academia", None)
-            if academia_id:
-                cur.execute("""
-                    SELECT 1 FROM eventos_competicoes_adesao
-                    WHERE evento_id = %s AND academia_id = %s AND aderiu = 1
-                """, (anexo["evento_id"], academia_id))
-                pode_baixar = cur.fetchone() is not None
-        elif current_user.has_role("aluno") or current_user.has_role("responsavel"):
-            # Aluno/responsável pode baixar se a academia aderiu
-            if current_user.has_role("aluno"):
-                cur.execute("SELECT id_academia FROM alunos WHERE usuario_id = %s LIMIT 1", (current_user.id,))
-            else:
-                aluno_id = request.args.get("aluno_id", type=int)
-                if aluno_id:
-                    cur.execute("SELECT id_academia FROM alunos WHERE id = %s", (aluno_id,))
-                else:
-                    cur.execute("""
-                        SELECT a.id_academia FROM alunos a
-                        INNER JOIN responsavel_alunos ra ON ra.aluno_id = a.id AND ra.usuario_id = %s
-                        LIMIT 1
-                    """, (current_user.id,))
-            aluno_row = cur.fetchone()
-            if aluno_row and aluno_row.get("id_academia"):
-                academia_id = aluno_row["id_academia"]
-                cur.execute("""
-                    SELECT 1 FROM eventos_competicoes_adesao
-                    WHERE evento_id = %s AND academia_id = %s AND aderiu = 1
-                """, (anexo["evento_id"], academia_id))
-                pode_baixar = cur.fetchone() is not None
-        
-        if not pode_baixar:
-            flash("Você não tem permissão para baixar este anexo.", "danger")
-            return redirect(url_for("painel.home"))
-        
-        # Caminho do arquivo
-        filepath = os.path.join(current_app.root_path, "static", "uploads", UPLOAD_ANEXOS, anexo["caminho_arquivo"])
-        
-        if not os.path.exists(filepath):
-            flash("Arquivo não encontrado no servidor.", "danger")
-            return redirect(url_for("painel.home"))
-        
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=anexo["nome_arquivo"],
-            mimetype=anexo.get("tipo_mime") or "application/octet-stream"
-        )
-        
     except Exception as e:
         current_app.logger.error(f"Erro ao baixar anexo: {e}", exc_info=True)
         flash("Erro ao baixar anexo.", "danger")
@@ -3779,6 +2963,56 @@ def download_anexo(anexo_id):
     finally:
         cur.close()
         conn.close()
+    
+    if not anexo:
+        flash("Anexo não encontrado.", "danger")
+        return redirect(url_for("painel.home"))
+    
+    if not anexo["pode_baixar"]:
+        flash("Você não tem permissão para baixar este anexo.", "danger")
+        return redirect(url_for("painel.home"))
+    
+    resp = enviar_upload(
+        os.path.join(UPLOAD_ANEXOS, anexo["caminho_arquivo"]),
+        nome_download=anexo["nome_arquivo"],
+        mimetype=anexo.get("tipo_mime"),
+    )
+    if resp is None:
+        flash("Arquivo não encontrado no servidor.", "danger")
+        return redirect(url_for("painel.home"))
+    return resp
+
+
+def _condicao_acesso_anexo():
+    """
+    Expressão SQL (sobre eca/ec) que diz se o usuário atual pode baixar o anexo, e seus
+    parâmetros. Mesmas regras por papel: associação dona do evento; academia que aderiu;
+    aluno ou responsável cuja academia aderiu.
+    """
+    aderiu = """
+        EXISTS (SELECT 1 FROM eventos_competicoes_adesao ad {join}
+                WHERE ad.evento_id = eca.evento_id AND ad.aderiu = 1 AND {filtro})
+    """
+    if current_user.has_role("gestor_associacao") or current_user.has_role("admin"):
+        return "ec.id_associacao = %s", (getattr(current_user, "id_associacao", None),)
+    if current_user.has_role("gestor_academia") or current_user.has_role("professor"):
+        academia_id = getattr(current_user, "id_academia", None)
+        if not academia_id:
+            return "0", ()
+        return aderiu.format(join="", filtro="ad.academia_id = %s"), (academia_id,)
+    if current_user.has_role("aluno"):
+        return aderiu.format(
+            join="INNER JOIN alunos a ON a.id_academia = ad.academia_id",
+            filtro="a.usuario_id = %s",
+        ), (current_user.id,)
+    if current_user.has_role("responsavel"):
+        join = """INNER JOIN alunos a ON a.id_academia = ad.academia_id
+                  INNER JOIN responsavel_alunos ra ON ra.aluno_id = a.id"""
+        aluno_id = request.args.get("aluno_id", type=int)
+        if aluno_id:
+            return aderiu.format(join=join, filtro="ra.usuario_id = %s AND a.id = %s"), (current_user.id, aluno_id)
+        return aderiu.format(join=join, filtro="ra.usuario_id = %s"), (current_user.id,)
+    return "0", ()
 
 
 @bp_eventos_competicoes.route("/disponiveis")
@@ -4149,9 +3383,7 @@ def configurar_impressao(evento_id):
             campos_form = []
             if ev.get("id_formulario"):
                 try:
-                    cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                        (ev["id_formulario"],))
-                    campos_form = cur.fetchall()
+                    campos_form = cache_formularios.campos(cur, ev["id_formulario"])
                 except Exception as e:
                     import logging
                     logging.error(f"Erro ao buscar campos_form: {e}")
@@ -4265,146 +3497,20 @@ def imprimir(evento_id):
         campos_form = []
         if ev.get("id_formulario"):
             try:
-                cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                    (ev["id_formulario"],))
-                campos_form = cur.fetchall()
+                campos_form = cache_formularios.campos(cur, ev["id_formulario"])
             except Exception:
                 campos_form = []
 
-        # Buscar academias e inscrições (mesma lógica do consolidar)
-        cur.execute("""
-            SELECT DISTINCT ac.id as academia_id, ac.nome as academia_nome
-            FROM academias ac
-            INNER JOIN eventos_competicoes_adesao ea ON ea.academia_id = ac.id AND ea.evento_id = %s AND ea.aderiu = 1
-            INNER JOIN eventos_competicoes_inscricoes i ON i.academia_id = ac.id AND i.evento_id = %s AND i.status = 'enviada'
-            WHERE ac.id_associacao = %s
-            ORDER BY ac.nome
-        """, (evento_id, evento_id, id_assoc))
-        academias = cur.fetchall()
-        
-        cur.execute("""
-            SELECT i.id, i.academia_id, i.aluno_id, i.dados_form, 
-                   ac.nome as academia_nome, a.nome as aluno_nome
-            FROM eventos_competicoes_inscricoes i
-            INNER JOIN academias ac ON ac.id = i.academia_id
-            LEFT JOIN alunos a ON a.id = i.aluno_id
-            WHERE i.evento_id = %s AND i.status = 'enviada' AND ac.id_associacao = %s
-            ORDER BY ac.nome, a.nome
-        """, (evento_id, id_assoc))
-        inscricoes = cur.fetchall()
-        
-        # Aplicar ordenação por campo do formulário se especificado
+        # Inscrições e agrupamentos vêm da consolidação; reagrupa só se houver ordenação
+        consolidacao = consolidacao_evento.obter(conn, evento_id)
+        inscricoes = consolidacao["inscricoes"]
+        academias_com_inscricoes = consolidacao["academias_com_inscricoes"]
+        categorias_com_inscricoes = consolidacao["categorias_com_inscricoes"]
         if ordenar_por and ordenar_por in {c["campo_chave"] for c in campos_form}:
-            def get_sort_value(row):
-                dados_form_str = row.get("dados_form")
-                if dados_form_str:
-                    try:
-                        if isinstance(dados_form_str, str):
-                            dados = json.loads(dados_form_str)
-                        else:
-                            dados = dados_form_str
-                    except (json.JSONDecodeError, TypeError):
-                        dados = {}
-                else:
-                    dados = {}
-                valor = dados.get(ordenar_por, "")
-                # Tentar converter para número se possível
-                try:
-                    if isinstance(valor, (int, float)):
-                        return (0, valor)
-                    valor_str = str(valor).strip()
-                    if valor_str.replace('.', '').replace('-', '').isdigit():
-                        return (0, float(valor_str))
-                except (ValueError, TypeError):
-                    pass
-                return (1, str(valor).lower())
-            
-            inscricoes.sort(key=get_sort_value, reverse=(ordenar_direcao == "DESC"))
-
-        # Agrupar inscrições (mesma lógica do consolidar)
-        academias_com_inscricoes = {}
-        for ac in academias:
-            academias_com_inscricoes[ac["academia_id"]] = {
-                "academia_nome": ac["academia_nome"],
-                "categorias": {}
-            }
-
-        for insc in inscricoes:
-            try:
-                academia_id = insc.get("academia_id")
-                if not academia_id:
-                    continue
-                    
-                dados_form_str = insc.get("dados_form")
-                if dados_form_str:
-                    try:
-                        if isinstance(dados_form_str, str):
-                            dados = json.loads(dados_form_str)
-                        else:
-                            dados = dados_form_str
-                    except (json.JSONDecodeError, TypeError):
-                        dados = {}
-                else:
-                    dados = {}
-                    
-                categoria = dados.get("categoria") or "Sem categoria"
-                
-                if academia_id not in academias_com_inscricoes:
-                    continue
-                
-                if categoria not in academias_com_inscricoes[academia_id]["categorias"]:
-                    academias_com_inscricoes[academia_id]["categorias"][categoria] = []
-                
-                academias_com_inscricoes[academia_id]["categorias"][categoria].append({
-                    "id": insc.get("id"),
-                    "aluno_id": insc.get("aluno_id"),
-                    "aluno_nome": insc.get("aluno_nome") or "Avulso",
-                    "dados_form": dados
-                })
-            except Exception as e:
-                import logging
-                logging.error(f"Erro ao processar inscrição {insc.get('id')}: {e}")
-                continue
+            inscricoes = consolidacao_evento.ordenar_por_campo(conn, evento_id, inscricoes, ordenar_por, ordenar_direcao)
+            academias_com_inscricoes, categorias_com_inscricoes = consolidacao_evento.agrupar(
+                inscricoes, consolidacao["academias"])
 
-        # Calcular totais
-        for ac_id, ac_data in academias_com_inscricoes.items():
-            try:
-                total_por_categoria = {cat: len(alunos) for cat, alunos in ac_data.get("categorias", {}).items()}
-                ac_data["total_inscritos"] = sum(total_por_categoria.values())
-                ac_data["total_por_categoria"] = total_por_categoria
-            except Exception:
-                ac_data["total_inscritos"] = 0
-                ac_data["total_por_categoria"] = {}
-
-        # Preparar agrupamento por categoria também
-        categorias_com_inscricoes = {}
-        for ac_id, ac_data in academias_com_inscricoes.items():
-            for categoria, alunos in ac_data.get("categorias", {}).items():
-                if categoria not in categorias_com_inscricoes:
-                    categorias_com_inscricoes[categoria] = {
-                        "academias": {},
-                        "total_inscritos": 0
-                    }
-                for aluno in alunos:
-                    academia_nome = ac_data.get("academia_nome", "Academia Desconhecida")
-                    if academia_nome not in categorias_com_inscricoes[categoria]["academias"]:
-                        categorias_com_inscricoes[categoria]["academias"][academia_nome] = []
-                    categorias_com_inscricoes[categoria]["academias"][academia_nome].append(aluno)
-        
-        for categoria, cat_data in categorias_com_inscricoes.items():
-            total = sum(len(alunos) for alunos in cat_data["academias"].values())
-            cat_data["total_inscritos"] = total
-
-        # Buscar campos do formulário
-        campos_form = []
-        if ev.get("id_formulario"):
-            try:
-                cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-                    (ev["id_formulario"],))
-                campos_form = cur.fetchall()
-            except Exception:
-                campos_form = []
-        
         # Filtrar campos se selecionados e manter ordem da URL
         campos_para_imprimir = []
         if campos_selecionados:
@@ -4418,31 +3524,12 @@ def imprimir(evento_id):
             campos_para_imprimir = campos_form
         
         # Preparar inscrições simples para impressão (sem agrupamento complexo)
-        inscricoes_para_imprimir = []
-        for insc in inscricoes:
-            try:
-                dados_form_str = insc.get("dados_form")
-                if dados_form_str:
-                    try:
-                        if isinstance(dados_form_str, str):
-                            dados = json.loads(dados_form_str)
-                        else:
-                            dados = dados_form_str
-                    except (json.JSONDecodeError, TypeError):
-                        dados = {}
-                else:
-                    dados = {}
-                
-                inscricoes_para_imprimir.append({
-                    "id": insc.get("id"),
-                    "aluno_nome": insc.get("aluno_nome") or "Avulso",
-                    "academia_nome": insc.get("academia_nome") or "Academia Desconhecida",
-                    "dados_form": dados
-                })
-            except Exception as e:
-                import logging
-                logging.error(f"Erro ao processar inscrição para impressão {insc.get('id')}: {e}")
-                continue
+        inscricoes_para_imprimir = [{
+            "id": insc.get("id"),
+            "aluno_nome": insc.get("aluno_nome") or "Avulso",
+            "academia_nome": insc.get("academia_nome") or "Academia Desconhecida",
+            "dados_form": insc["dados_form"]
+        } for insc in inscricoes]
 
         # Função helper para formatação de valores (mesma lógica do consolidar)
         def _formatar_valor(campo_chave, valor):
@@ -4477,22 +3564,53 @@ def imprimir(evento_id):
         conn.close()
 
 
-@bp_eventos_competicoes.route("/<int:evento_id>/exportar")
-@login_required
-def exportar(evento_id):
-    """Exporta inscrições em PDF ou Excel conforme formato."""
-    fmt = request.args.get("formato", "excel").lower()
-    campos_selecionados = request.args.getlist("campos")  # Lista de campos selecionados
-    
+def _formatar_valor_exportacao(chave, val):
+    """Formata valor: sexo M/F -> Masculino/Feminino; datas -> dd/mm/yyyy."""
+    if val is None or val == "":
+        return ""
+    s = str(val).strip()
+    if chave == "sexo":
+        if s.upper() == "M":
+            return "Masculino"
+        if s.upper() == "F":
+            return "Feminino"
+        return s
+    if chave in ("data_nascimento", "ultimo_exame_faixa", "rg_data_emissao", "data_cadastro_zempo"):
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+            try:
+                d = datetime.strptime(s[:10], fmt)
+                return d.strftime("%d/%m/%Y")
+            except (ValueError, TypeError):
+                continue
+    return s
+
+
+def _linha_exportacao(numero, r, chaves):
+    """Linha já formatada: número (como na prévia) + APENAS os campos selecionados, na ordem."""
+    dados = r["dados_form"]
+    linha = [str(numero)]
+    for k in chaves:
+        valor = dados.get(k, "")
+        if valor == "" and k == "id_academia":
+            # Se for id_academia e não tiver valor, usar nome da academia do join
+            valor = r.get("academia_nome", "")
+        elif valor == "" and k == "nome":
+            # Se for nome e não tiver valor, usar nome do aluno do join
+            valor = r.get("aluno_nome", "")
+        linha.append(_formatar_valor_exportacao(k, valor))
+    return linha
+
+
+def _parametros_exportacao(evento_id, id_assoc, args):
+    """
+    Resolve a exportação a partir da URL (ou da configuração salva do evento): campos na
+    ordem, ordenação, orientação e configurações do PDF, nomes e versão das inscrições.
+    Tudo serializável — o PDF em segundo plano refaz o relatório só com este dicionário.
+    None se o evento não pertence à associação.
+    """
+    campos_selecionados = args.getlist("campos")  # Lista de campos selecionados
     # Filtrar campos vazios ou inválidos
     campos_selecionados = [c for c in campos_selecionados if c and c.strip() and c.strip().lower() not in ("aluno", "academia")]
-    
-    if session.get("modo_painel") != "associacao" or not (current_user.has_role("gestor_associacao") or current_user.has_role("admin")):
-        flash("Acesso negado.", "danger")
-        return redirect(url_for("painel.home"))
-    id_assoc = getattr(current_user, "id_associacao", None) or session.get("associacao_gerenciamento_id")
-    if not id_assoc:
-        return redirect(url_for("associacao.gerenciamento_associacao"))
 
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
@@ -4501,33 +3619,28 @@ def exportar(evento_id):
             (evento_id, id_assoc))
         ev = cur.fetchone()
         if not ev:
-            return redirect(url_for("eventos_competicoes.lista"))
+            return None
+
+        campos_form = cache_formularios.campos(cur, ev["id_formulario"])
 
-        cur.execute("SELECT campo_chave, label, ordem FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem",
-            (ev["id_formulario"] or 0,))
-        campos_form = cur.fetchall()
-        
         # Se campos foram selecionados via URL, usar eles; senão, usar configuração salva ou todos
+        config = None
         if campos_selecionados:
             # Filtrar campos_form pelos selecionados e manter ordem
             campos_para_exportar = []
             for chave in campos_selecionados:
-                # Ignorar campos vazios ou inválidos
-                if not chave or chave.strip() == "":
-                    continue
                 campo = next((c for c in campos_form if c["campo_chave"] == chave), None)
                 if campo:
                     campos_para_exportar.append(campo)
                 # Se campo não encontrado, não adicionar (evitar campos inválidos)
         else:
             # Tentar usar configuração salva
-            config = None
             if ev.get("configuracao_exportacao"):
                 try:
                     config = json.loads(ev["configuracao_exportacao"]) if isinstance(ev["configuracao_exportacao"], str) else ev["configuracao_exportacao"]
                 except Exception:
                     pass
-            
+
             if config and config.get("campos"):
                 # Ordenar campos_form conforme configuração
                 ordem_map = {c["chave"]: idx for idx, c in enumerate(config["campos"])}
@@ -4538,302 +3651,527 @@ def exportar(evento_id):
             else:
                 # Usar todos os campos na ordem padrão
                 campos_para_exportar = campos_form
-        
+
         # Obter orientação do PDF (da configuração salva ou da URL, padrão: paisagem)
         orientacao_pdf = "paisagem"
         if campos_selecionados:
             # Se há campos na URL, tentar pegar orientação da URL também
-            orientacao_url = request.args.get("orientacao", "").lower()
+            orientacao_url = args.get("orientacao", "").lower()
             if orientacao_url in ("paisagem", "retrato"):
                 orientacao_pdf = orientacao_url
         elif config and config.get("orientacao_pdf"):
             orientacao_pdf = config.get("orientacao_pdf", "paisagem")
-        
+
         # Garantir que labels e chaves correspondem APENAS aos campos selecionados
         # Remover qualquer campo que não esteja na lista de campos do formulário
         campos_validos_chaves = {c["campo_chave"] for c in campos_form}
         campos_para_exportar = [c for c in campos_para_exportar if c["campo_chave"] in campos_validos_chaves]
-        
-        labels = [c["label"] for c in campos_para_exportar]
-        chaves = [c["campo_chave"] for c in campos_para_exportar]
 
         cur.execute("SELECT nome FROM associacoes WHERE id = %s", (id_assoc,))
         assoc_row = cur.fetchone()
-        assoc_nome = assoc_row["nome"] if assoc_row else ""
 
         # Obter parâmetros de ordenação
-        ordenar_por = request.args.get("ordenar_por", "")
-        ordenar_direcao = request.args.get("ordenar_direcao", "asc").upper()
-        
-        # Construir ORDER BY dinâmico
-        order_by = "ac.nome, a.nome"  # Padrão
-        if ordenar_por:
-            # Validar campo de ordenação (precisa estar nos campos do formulário)
-            campos_validos = {c["campo_chave"] for c in campos_form}
-            if ordenar_por in campos_validos:
-                # Ordenação será feita após parsear JSON, então manteremos ordem padrão aqui
-                # e ordenaremos depois no Python
-                order_by = "ac.nome, a.nome"
-            else:
-                order_by = "ac.nome, a.nome"
-        
-        cur.execute("""
-            SELECT i.id, i.aluno_id, i.dados_form, i.inclusao_avulsa, ac.nome as academia_nome, a.nome as aluno_nome
-            FROM eventos_competicoes_inscricoes i
-            INNER JOIN academias ac ON ac.id = i.academia_id
-            LEFT JOIN alunos a ON a.id = i.aluno_id
-            WHERE i.evento_id = %s AND i.status = 'enviada' AND ac.id_associacao = %s
-            ORDER BY ac.nome, a.nome
-        """, (evento_id, id_assoc))
-        rows = cur.fetchall()
-        
-        # Aplicar ordenação por campo do formulário se especificado
-        if ordenar_por and ordenar_por in {c["campo_chave"] for c in campos_form}:
-            def get_sort_value(row):
-                dados_form_str = row.get("dados_form")
-                if dados_form_str:
-                    try:
-                        if isinstance(dados_form_str, str):
-                            dados = json.loads(dados_form_str)
-                        else:
-                            dados = dados_form_str
-                    except (json.JSONDecodeError, TypeError):
-                        dados = {}
-                else:
-                    dados = {}
-                valor = dados.get(ordenar_por, "")
-                # Tentar converter para número se possível
-                try:
-                    if isinstance(valor, (int, float)):
-                        return (0, valor)
-                    valor_str = str(valor).strip()
-                    if valor_str.replace('.', '').replace('-', '').isdigit():
-                        return (0, float(valor_str))
-                except (ValueError, TypeError):
-                    pass
-                return (1, str(valor).lower())
-            
-            rows.sort(key=get_sort_value, reverse=(ordenar_direcao == "DESC"))
+        ordenar_por = args.get("ordenar_por", "")
+        if ordenar_por not in campos_validos_chaves:
+            ordenar_por = ""
+
+        return {
+            "evento_id": evento_id,
+            "id_assoc": id_assoc,
+            "evento_nome": ev["nome"],
+            "assoc_nome": assoc_row["nome"] if assoc_row else "",
+            "labels": [c["label"] for c in campos_para_exportar],
+            "chaves": [c["campo_chave"] for c in campos_para_exportar],
+            "ordenar_por": ordenar_por,
+            "ordenar_direcao": args.get("ordenar_direcao", "asc").upper(),
+            "orientacao": orientacao_pdf,
+            # Configurações de impressão da URL (PDF)
+            "escala": args.get("escala", "100", type=int),
+            "tamanho_fonte": args.get("tamanho_fonte", "10", type=int),
+            "margem_vertical": args.get("margem_vertical", "20", type=int),
+            "margem_horizontal": args.get("margem_horizontal", "20", type=int),
+            "versao": consolidacao_evento.versao(conn, evento_id),
+        }
     finally:
         cur.close()
         conn.close()
 
-    def _formatar_valor(chave, val):
-        """Formata valor: sexo M/F -> Masculino/Feminino; datas -> dd/mm/yyyy."""
-        if val is None or val == "":
-            return ""
-        s = str(val).strip()
-        if chave == "sexo":
-            if s.upper() == "M":
-                return "Masculino"
-            if s.upper() == "F":
-                return "Feminino"
-            return s
-        if chave in ("data_nascimento", "ultimo_exame_faixa", "rg_data_emissao", "data_cadastro_zempo"):
-            for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
-                try:
-                    d = datetime.strptime(s[:10], fmt)
-                    return d.strftime("%d/%m/%Y")
-                except (ValueError, TypeError):
-                    continue
-        return s
 
-    if fmt == "excel":
+def _chave_cache_exportacao(p, fmt):
+    """Mesmo arquivo enquanto as inscrições enviadas (versão) e a configuração não mudarem."""
+    if p["versao"] is None:
+        return None
+    return cache_exportacoes.chave(
+        "inscricoes", p["evento_id"], p["versao"], fmt, p["chaves"], p["ordenar_por"], p["ordenar_direcao"],
+        p["orientacao"], p["escala"], p["tamanho_fonte"], p["margem_vertical"], p["margem_horizontal"],
+        p["evento_nome"], p["assoc_nome"])
+
+
+@relatorios_jobs.registrar("inscricoes_pdf")
+def _gerar_pdf_inscricoes(p, progresso=None):
+    """
+    PDF das inscrições desenhado página a página (utils.exportacao.gravar_pdf_tabela) a partir
+    do cursor não-bufferizado. Roda no job em segundo plano; sem a fila, na própria requisição.
+    Sem versão das inscrições o arquivo fica como temporário da pasta do cache (removido em 1 h).
+    """
+    from utils.exportacao import gravar_pdf_tabela, MIME_PDF
+    sufixo = ".pdf"
+    resultado = {"nome_download": f"inscricoes_{p['evento_nome'][:30]}{sufixo}", "mimetype": MIME_PDF}
+    chave_cache = _chave_cache_exportacao(p, "pdf")
+    em_cache = cache_exportacoes.obter(chave_cache, sufixo) if chave_cache else None
+    if em_cache:
+        return dict(resultado, caminho=em_cache)
+
+    n_campos = len(p["labels"])
+    # Coluna "#" estreita; a escala age sobre o texto (como no zoom da impressão)
+    tamanho_fonte = max(4, p["tamanho_fonte"] * p["escala"] / 100.0)
+    mm = 2.83465  # mm -> pontos
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        total = consolidacao_evento.contar_inscricoes(cur, p["evento_id"], p["id_assoc"])
+        if progresso:
+            progresso(0, total)
+        inscricoes = consolidacao_evento.iterar_inscricoes(
+            cur, p["evento_id"], p["id_assoc"], p["ordenar_por"], p["ordenar_direcao"])
+        linhas = (_linha_exportacao(numero, r, p["chaves"]) for numero, r in enumerate(inscricoes, start=1))
+        caminho = gravar_pdf_tabela(
+            ["#"] + p["labels"], linhas, titulo=p["evento_nome"], subtitulo=p["assoc_nome"],
+            paisagem=p["orientacao"] != "retrato",
+            larguras=[30] + [max(30, 750.0 / n_campos)] * n_campos if n_campos else None,
+            tamanho_fonte=tamanho_fonte,
+            margem=max(10, p["margem_horizontal"] * mm), margem_vertical=max(10, p["margem_vertical"] * mm),
+            caminho=cache_exportacoes.novo_arquivo(sufixo),
+            progresso=(lambda feitas: progresso(feitas, total)) if progresso else None)
+    finally:
+        cur.close()
+        conn.close()
+    if chave_cache:
+        caminho = cache_exportacoes.guardar(chave_cache, sufixo, caminho)
+    return dict(resultado, caminho=caminho)
+
+
+def _exportacao_permitida():
+    """id da associação se o usuário pode exportar/gerar relatórios de eventos; senão None."""
+    if session.get("modo_painel") != "associacao" or not (current_user.has_role("gestor_associacao") or current_user.has_role("admin")):
+        return None
+    return getattr(current_user, "id_associacao", None) or session.get("associacao_gerenciamento_id")
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/exportar")
+@login_required
+def exportar(evento_id):
+    """
+    Exporta inscrições em PDF, Excel ou CSV conforme formato (Excel/CSV em streaming).
+    PDF fora do cache abre a página de acompanhamento, que pede a geração em segundo plano.
+    """
+    fmt = request.args.get("formato", "excel").lower()
+    if session.get("modo_painel") != "associacao" or not (current_user.has_role("gestor_associacao") or current_user.has_role("admin")):
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+    id_assoc = getattr(current_user, "id_associacao", None) or session.get("associacao_gerenciamento_id")
+    if not id_assoc:
+        return redirect(url_for("associacao.gerenciamento_associacao"))
+
+    p = _parametros_exportacao(evento_id, id_assoc, request.args)
+    if p is None:
+        return redirect(url_for("eventos_competicoes.lista"))
+
+    from utils.exportacao import gravar_xlsx, gravar_csv, resposta_arquivo, MIME_XLSX, MIME_CSV, MIME_PDF
+    cabecalho = ["#"] + p["labels"]
+    sufixo, mimetype = {"csv": (".csv", MIME_CSV), "excel": (".xlsx", MIME_XLSX)}.get(fmt, (".pdf", MIME_PDF))
+    nome_download = f"inscricoes_{p['evento_nome'][:30]}{sufixo}"
+
+    chave_cache = _chave_cache_exportacao(p, fmt)
+    if chave_cache is not None:
+        em_cache = cache_exportacoes.obter(chave_cache, sufixo)
+        if em_cache:
+            return resposta_arquivo(em_cache, nome_download, mimetype, remover=False)
+
+    if sufixo == ".pdf":
+        if not request.args.get("sincrono"):
+            return render_template("eventos_competicoes/relatorio_processando.html",
+                evento={"id": evento_id, "nome": p["evento_nome"]},
+                url_gerar=url_for("eventos_competicoes.gerar_relatorio_pdf", evento_id=evento_id, **request.args.to_dict(flat=False)),
+                back_url=url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+        # Sem a fila de relatórios (migração não aplicada): gera na própria requisição
         try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment
-            from io import BytesIO
-            
-            # Criar workbook e worksheet
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Inscrições"
-            
-            # Estilizar cabeçalho
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF", size=11)
-            header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            
-            # Montar header APENAS com os campos selecionados (incluindo coluna # como na prévia)
-            # Adicionar coluna "#" no início
-            cell_numero = ws.cell(row=1, column=1, value="#")
-            cell_numero.fill = header_fill
-            cell_numero.font = header_font
-            cell_numero.alignment = header_alignment
-            
-            # Adicionar labels dos campos
-            for col_idx, label in enumerate(labels, start=2):
-                cell = ws.cell(row=1, column=col_idx, value=label)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = header_alignment
-            
-            # Ajustar largura das colunas automaticamente baseado no conteúdo
-            max_widths = {}
-            # Coluna "#" - largura fixa pequena
-            col_letter_numero = ws.cell(row=1, column=1).column_letter
-            max_widths[col_letter_numero] = 8  # Largura pequena para coluna "#"
-            ws.column_dimensions[col_letter_numero].width = max_widths[col_letter_numero]
-            
-            # Ajustar largura das outras colunas
-            for col_idx, campo in enumerate(campos_para_exportar, start=2):
-                col_letter = ws.cell(row=1, column=col_idx).column_letter
-                # Começar com largura do cabeçalho
-                max_width = len(str(labels[col_idx - 2])) + 2
-                # Verificar conteúdo das células para encontrar maior valor
-                for r in rows:
-                    dados = json.loads(r["dados_form"]) if r.get("dados_form") else {}
-                    k = campo["campo_chave"]
-                    valor = dados.get(k, "")
-                    if valor == "" and k == "id_academia":
-                        valor = r.get("academia_nome", "")
-                    elif valor == "" and k == "nome":
-                        valor = r.get("aluno_nome", "")
-                    valor_formatado = _formatar_valor(k, valor)
-                    max_width = max(max_width, len(str(valor_formatado)) + 2)
-                # Limitar entre mínimo e máximo
-                max_widths[col_letter] = min(max(max_width, 10), 50)
-                ws.column_dimensions[col_letter].width = max_widths[col_letter]
-            
-            # Adicionar dados nas linhas
-            for row_idx, r in enumerate(rows, start=2):
-                dados = json.loads(r["dados_form"]) if r.get("dados_form") else {}
-                
-                # Adicionar número da linha na primeira coluna
-                cell_numero = ws.cell(row=row_idx, column=1, value=str(row_idx - 1))
-                cell_numero.alignment = Alignment(vertical="top", horizontal="center")
-                
-                # Adicionar APENAS os campos selecionados
-                for col_idx, campo in enumerate(campos_para_exportar, start=2):
-                    k = campo["campo_chave"]
-                    # Se o campo não estiver em dados_form, tentar buscar de outras fontes apenas se necessário
-                    valor = dados.get(k, "")
-                    if valor == "" and k == "id_academia":
-                        # Se for id_academia e não tiver valor, buscar nome da academia do join
-                        valor = r.get("academia_nome", "")
-                    elif valor == "" and k == "nome":
-                        # Se for nome e não tiver valor, buscar nome do aluno do join
-                        valor = r.get("aluno_nome", "")
-                    
-                    # Formatar valor
-                    valor_formatado = _formatar_valor(k, valor)
-                    
-                    # Adicionar célula
-                    cell = ws.cell(row=row_idx, column=col_idx, value=valor_formatado)
-                    cell.alignment = Alignment(vertical="top", wrap_text=True)
-            
-            # Congelar primeira linha (cabeçalho)
-            ws.freeze_panes = "A2"
-            
-            # Salvar em BytesIO
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            resp = Response(output.getvalue(), mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            resp.headers["Content-Disposition"] = f'attachment; filename="inscricoes_{ev["nome"][:30]}.xlsx"'
-            return resp
+            resultado = _gerar_pdf_inscricoes(p)
         except ImportError:
-            flash("Biblioteca openpyxl não instalada. Execute: pip install openpyxl", "warning")
+            flash("Biblioteca reportlab não instalada. Use exportar em Excel.", "warning")
             return redirect(url_for("eventos_competicoes.consolidar", evento_id=evento_id))
         except Exception as e:
-            flash(f"Erro ao exportar: {e}", "danger")
+            flash(f"Erro ao gerar PDF: {e}", "danger")
             return redirect(url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+        return resposta_arquivo(resultado["caminho"], nome_download, mimetype, remover=chave_cache is None)
+
+    def _entregar(caminho):
+        if chave_cache is None:
+            return resposta_arquivo(caminho, nome_download, mimetype)
+        return resposta_arquivo(cache_exportacoes.guardar(chave_cache, sufixo, caminho),
+                                nome_download, mimetype, remover=False)
 
-    # PDF: tabela única, orientação configurável (paisagem/retrato), evento no título, associação abaixo
+    # Cursor padrão do mysql-connector é não-bufferizado: linhas vão do socket direto para o arquivo
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
     try:
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
-        buffer = BytesIO()
-        
-        # Obter configurações de impressão da URL
-        escala_pdf = request.args.get("escala", "100", type=int)
-        tamanho_fonte_pdf = request.args.get("tamanho_fonte", "10", type=int)
-        margem_vertical = request.args.get("margem_vertical", "20", type=int)
-        margem_horizontal = request.args.get("margem_horizontal", "20", type=int)
-        
-        # Usar orientação configurada (paisagem ou retrato)
-        if orientacao_pdf == "retrato":
-            page_size = A4
-        else:
-            page_size = landscape(A4)
-        
-        # Aplicar margens configuradas (converter mm para pontos: 1mm = 2.83465 pontos)
-        left_margin = max(10, margem_horizontal * 2.83465)
-        right_margin = max(10, margem_horizontal * 2.83465)
-        top_margin = max(10, margem_vertical * 2.83465)
-        bottom_margin = max(10, margem_vertical * 2.83465)
-        
-        doc = SimpleDocTemplate(buffer, pagesize=page_size, 
-                                leftMargin=left_margin, rightMargin=right_margin, 
-                                topMargin=top_margin, bottomMargin=bottom_margin)
-        styles = getSampleStyleSheet()
-        elements = []
-        elements.append(Paragraph(f"<b>{ev['nome']}</b>", styles["Title"]))
-        elements.append(Paragraph(assoc_nome, styles["Heading3"]))
-        elements.append(Spacer(1, 12))
-        
-        # Montar header APENAS com os campos selecionados (incluindo coluna # como na prévia)
-        tbl_header = ["#"] + labels  # Adicionar coluna "#" no início como na prévia
-        tbl_rows = [tbl_header]
-        for idx, r in enumerate(rows, start=1):
-            dados = json.loads(r["dados_form"]) if r.get("dados_form") else {}
-            linha = [str(idx)]  # Adicionar número da linha no início
-            
-            # Adicionar APENAS os campos selecionados na ordem correta
-            for campo in campos_para_exportar:
-                k = campo["campo_chave"]
-                # Se o campo não estiver em dados_form, tentar buscar de outras fontes apenas se necessário
-                valor = dados.get(k, "")
-                if valor == "" and k == "id_academia":
-                    # Se for id_academia e não tiver valor, buscar nome da academia do join
-                    valor = r.get("academia_nome", "")
-                elif valor == "" and k == "nome":
-                    # Se for nome e não tiver valor, buscar nome do aluno do join
-                    valor = r.get("aluno_nome", "Avulso")
-                linha.append(_formatar_valor(k, valor))
-            tbl_rows.append(linha)
-        if len(tbl_rows) > 1:
-            n_cols = len(tbl_header)
-            # Calcular largura disponível considerando margens
-            available_width = page_size[0] - left_margin - right_margin
-            
-            # Aplicar escala às larguras das colunas
-            escala_factor = escala_pdf / 100.0
-            # A coluna "#" deve ser menor (30 pontos), as outras dividem o espaço restante
-            col_width_numero = 30 * escala_factor  # Coluna "#"
-            largura_restante = (available_width - col_width_numero) * escala_factor
-            base_col_width = largura_restante / (n_cols - 1) if n_cols > 1 else largura_restante
-            col_widths = [max(20, col_width_numero)] + [max(30, base_col_width)] * (n_cols - 1)
-            
-            t = Table(tbl_rows, repeatRows=1, colWidths=col_widths)
-            t.setStyle(TableStyle([
-                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                ("FONTSIZE", (0, 0), (-1, -1), tamanho_fonte_pdf),
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e0e0e0")),
-                ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ]))
-            elements.append(t)
-        else:
-            elements.append(Paragraph("Nenhuma inscrição enviada.", styles["Normal"]))
-        doc.build(elements)
-        buffer.seek(0)
-        resp = Response(buffer.getvalue(), mimetype="application/pdf")
-        resp.headers["Content-Disposition"] = f'attachment; filename="inscricoes_{ev["nome"][:30]}.pdf"'
-        return resp
+        inscricoes = consolidacao_evento.iterar_inscricoes(
+            cur, evento_id, id_assoc, p["ordenar_por"], p["ordenar_direcao"])
+        linhas = (_linha_exportacao(numero, r, p["chaves"]) for numero, r in enumerate(inscricoes, start=1))
+        if fmt == "csv":
+            return _entregar(gravar_csv(cabecalho, linhas, caminho=cache_exportacoes.novo_arquivo(sufixo)))
+        # Larguras pelo conteúdo das primeiras linhas (entre 10 e 50; coluna "#" fixa)
+        amostra = list(islice(linhas, AMOSTRA_LARGURAS))
+        larguras = [8]
+        for col_idx, label in enumerate(p["labels"], start=1):
+            maior = max([len(str(label))] + [len(str(linha[col_idx])) for linha in amostra]) + 2
+            larguras.append(min(max(maior, 10), 50))
+        return _entregar(gravar_xlsx(cabecalho, chain(amostra, linhas), titulo="Inscrições", larguras=larguras,
+                                     caminho=cache_exportacoes.novo_arquivo(sufixo)))
     except ImportError:
-        flash("Biblioteca reportlab não instalada. Use exportar em Excel.", "warning")
+        flash("Biblioteca openpyxl não instalada. Execute: pip install openpyxl", "warning")
         return redirect(url_for("eventos_competicoes.consolidar", evento_id=evento_id))
     except Exception as e:
-        flash(f"Erro ao gerar PDF: {e}", "danger")
+        flash(f"Erro ao exportar: {e}", "danger")
         return redirect(url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/relatorios/pdf", methods=["POST"])
+@login_required
+def gerar_relatorio_pdf(evento_id):
+    """Coloca o PDF das inscrições na fila (parâmetros da exportação na URL). Retorna JSON."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        return jsonify({"status": "erro", "erro": "Acesso negado."}), 403
+    p = _parametros_exportacao(evento_id, id_assoc, request.args)
+    if p is None:
+        return jsonify({"status": "erro", "erro": "Evento não encontrado."}), 404
+
+    job_id = relatorios_jobs.enfileirar(current_app._get_current_object(), "inscricoes_pdf",
+                                        current_user.id, p, evento_id=evento_id)
+    if job_id is None:
+        args = request.args.to_dict(flat=False)
+        args.update(formato="pdf", sincrono="1")
+        return jsonify({"status": "sincrono",
+                        "url_download": url_for("eventos_competicoes.exportar", evento_id=evento_id, **args)})
+    return jsonify({"status": "pendente", "job_id": job_id,
+                    "url_status": url_for("eventos_competicoes.status_relatorio", job_id=job_id)}), 202
+
+
+@bp_eventos_competicoes.route("/relatorios/<job_id>/status")
+@login_required
+def status_relatorio(job_id):
+    """Progresso do relatório (linhas desenhadas / total), consultado pela página de acompanhamento."""
+    job = relatorios_jobs.obter(job_id, current_user.id)
+    if not job:
+        return jsonify({"status": "erro", "erro": "Relatório não encontrado ou expirado."}), 404
+    resposta = {k: job[k] for k in ("status", "progresso", "linhas_total", "linhas_processadas", "erro")}
+    if job["status"] == "concluido":
+        resposta["url_download"] = url_for("eventos_competicoes.baixar_relatorio", job_id=job_id)
+    return jsonify(resposta)
+
+
+@bp_eventos_competicoes.route("/relatorios/<job_id>/download")
+@login_required
+def baixar_relatorio(job_id):
+    """Arquivo do relatório concluído, servido do disco."""
+    from utils.exportacao import resposta_arquivo
+    job = relatorios_jobs.obter(job_id, current_user.id)
+    caminho = relatorios_jobs.caminho_arquivo(current_app, job)
+    if not caminho:
+        flash("Relatório não encontrado ou expirado. Gere novamente.", "warning")
+        if job and job.get("evento_id"):
+            return redirect(url_for("eventos_competicoes.consolidar", evento_id=job["evento_id"]))
+        return redirect(url_for("eventos_competicoes.lista"))
+    return resposta_arquivo(caminho, job["nome_download"], job["mimetype"], remover=False)
+
+
+def _evento_da_associacao(cur, evento_id, id_assoc):
+    cur.execute("SELECT id, nome, data_fim, status FROM eventos_competicoes WHERE id = %s AND id_associacao = %s",
+                (evento_id, id_assoc))
+    return cur.fetchone()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/chaves")
+@login_required
+def chaves(evento_id):
+    """Associação: categorias com inscrições enviadas e as chaves já sorteadas."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        ev = _evento_da_associacao(cur, evento_id, id_assoc)
+        if not ev:
+            flash("Evento não encontrado.", "danger")
+            return redirect(url_for("eventos_competicoes.lista"))
+        consolidacao = consolidacao_evento.obter(conn, evento_id)
+        categorias = chaveamento.totais_por_categoria(consolidacao, pesagem.ajustes(cur, evento_id))
+        try:
+            chaves_evento = {c["categoria"]: c for c in chaveamento.listar(cur, evento_id)}
+        except mysql.connector.errors.ProgrammingError:
+            flash("Chaveamento não disponível. Execute a migration create_chaveamentos.sql", "warning")
+            chaves_evento = None
+        return render_template("eventos_competicoes/chaves.html",
+            evento=ev, categorias=categorias, chaves=chaves_evento,
+            limite_todos_contra_todos=chaveamento.LIMITE_TODOS_CONTRA_TODOS,
+            back_url=url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/chaves/gerar", methods=["POST"])
+@login_required
+def gerar_chave(evento_id):
+    """
+    Sorteia (ou refaz) a chave de uma categoria. Semente em branco sorteia uma nova;
+    cabeças de chave vêm dos campos cabeca_<inscricao_id> (1 = primeiro).
+    """
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+    categoria = (request.form.get("categoria") or "").strip()
+    tipo = request.form.get("tipo") or None
+    if not categoria or (tipo and tipo not in chaveamento.TIPOS):
+        flash("Categoria ou tipo de chave inválido.", "danger")
+        return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+    semente = request.form.get("semente", type=int) or chaveamento.nova_semente()
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        if not _evento_da_associacao(cur, evento_id, id_assoc):
+            flash("Evento não encontrado.", "danger")
+            return redirect(url_for("eventos_competicoes.lista"))
+        atletas = chaveamento.atletas_da_categoria(consolidacao_evento.obter(conn, evento_id), categoria,
+                                                   pesagem.ajustes(cur, evento_id))
+        for atleta in atletas:
+            atleta["cabeca_chave"] = request.form.get(f"cabeca_{atleta['inscricao_id']}", type=int) or None
+        try:
+            sorteio = chaveamento.sortear(atletas, semente, tipo)
+        except ValueError as e:
+            flash(str(e), "warning")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        try:
+            if chaveamento.tem_resultados(cur, evento_id, categoria) and not request.form.get("refazer"):
+                flash("A chave desta categoria já tem resultados. Confirme para sortear de novo.", "warning")
+                return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+            chave_id = chaveamento.gravar(cur, evento_id, categoria, sorteio, current_user.id)
+            conn.commit()
+        except mysql.connector.errors.ProgrammingError:
+            conn.rollback()
+            flash("Chaveamento não disponível. Execute a migration create_chaveamentos.sql", "warning")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        flash(f"Chave de {categoria} sorteada (semente {semente}).", "success")
+        return redirect(url_for("eventos_competicoes.ver_chave", evento_id=evento_id, chave_id=chave_id))
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/chaves/<int:chave_id>")
+@login_required
+def ver_chave(evento_id, chave_id):
+    """Associação: chave por rodada, registro de resultados e novo sorteio com cabeças de chave."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        ev = _evento_da_associacao(cur, evento_id, id_assoc)
+        chave = chaveamento.carregar(cur, evento_id, chave_id) if ev else None
+        if not chave:
+            flash("Chave não encontrada.", "danger")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        return render_template("eventos_competicoes/chave.html",
+            evento=ev, chave=chave, resultado_bye=chaveamento.RESULTADO_BYE,
+            back_url=url_for("eventos_competicoes.chaves", evento_id=evento_id))
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/chaves/<int:chave_id>/lutas/<int:luta_id>", methods=["POST"])
+@login_required
+def registrar_luta(evento_id, chave_id, luta_id):
+    """Associação registra o vencedor (e o resultado) de uma luta."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        chave = chaveamento.carregar(cur, evento_id, chave_id) if _evento_da_associacao(cur, evento_id, id_assoc) else None
+        if not chave:
+            flash("Chave não encontrada.", "danger")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        try:
+            chaveamento.registrar_resultado(cur, chave, luta_id, request.form.get("vencedor", type=int),
+                                            (request.form.get("resultado") or "").strip(), current_user.id)
+            conn.commit()
+            flash("Resultado registrado.", "success")
+        except ValueError as e:
+            conn.rollback()
+            flash(str(e), "warning")
+    finally:
+        cur.close()
+        conn.close()
+    return redirect(url_for("eventos_competicoes.ver_chave", evento_id=evento_id, chave_id=chave_id))
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/chaves/pdf")
+@login_required
+def imprimir_chaves(evento_id):
+    """Folha das lutas em PDF (utils.exportacao.gravar_pdf_tabela): uma chave (chave_id) ou todas."""
+    from utils.exportacao import gravar_pdf_tabela, resposta_arquivo, MIME_PDF
+
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+    chave_id = request.args.get("chave_id", type=int)
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        ev = _evento_da_associacao(cur, evento_id, id_assoc)
+        if not ev:
+            flash("Evento não encontrado.", "danger")
+            return redirect(url_for("eventos_competicoes.lista"))
+        try:
+            ids = [chave_id] if chave_id else [c["id"] for c in chaveamento.listar(cur, evento_id)]
+            chaves_evento = [c for c in (chaveamento.carregar(cur, evento_id, i) for i in ids) if c]
+        except mysql.connector.errors.ProgrammingError:
+            flash("Chaveamento não disponível. Execute a migration create_chaveamentos.sql", "warning")
+            return redirect(url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+        if not chaves_evento:
+            flash("Nenhuma chave sorteada.", "warning")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        cabecalho = ["Categoria", "Rodada", "Luta", "Atleta A", "Atleta B", "Vencedor", "Resultado"]
+        linhas = chain.from_iterable(chaveamento.linhas_folha(c) for c in chaves_evento)
+        subtitulo = chaves_evento[0]["categoria"] if chave_id else f"{len(chaves_evento)} chave(s)"
+        try:
+            caminho = gravar_pdf_tabela(cabecalho, linhas, titulo=f"Chaves — {ev['nome']}", subtitulo=subtitulo,
+                                        larguras=[14, 5, 4, 24, 24, 16, 10])
+        except ImportError:
+            flash("Biblioteca reportlab não instalada.", "warning")
+            return redirect(url_for("eventos_competicoes.chaves", evento_id=evento_id))
+        return resposta_arquivo(caminho, f"chaves_evento_{evento_id}.pdf", MIME_PDF)
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/pesagem")
+@login_required
+def pesagem_evento(evento_id):
+    """Associação: estação de pesagem (página única; busca e registro pela API JSON abaixo)."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        ev = _evento_da_associacao(cur, evento_id, id_assoc)
+    finally:
+        cur.close()
+        conn.close()
+    if not ev:
+        flash("Evento não encontrado.", "danger")
+        return redirect(url_for("eventos_competicoes.lista"))
+    if ev.get("status") != "finalizado" and not _evento_encerrado(ev):
+        flash("A pesagem fica disponível depois de encerrar o evento.", "warning")
+        return redirect(url_for("eventos_competicoes.lista"))
+    return render_template("eventos_competicoes/pesagem.html",
+        evento=ev, back_url=url_for("eventos_competicoes.consolidar", evento_id=evento_id))
+
+
+def _pesagem_api(evento_id):
+    """(conn, cur, erro): conexão aberta se o usuário pode pesar neste evento; senão resposta JSON de erro."""
+    id_assoc = _exportacao_permitida()
+    if not id_assoc:
+        return None, None, (jsonify({"erro": "Acesso negado."}), 403)
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    ev = _evento_da_associacao(cur, evento_id, id_assoc)
+    if not ev or (ev.get("status") != "finalizado" and not _evento_encerrado(ev)):
+        cur.close()
+        conn.close()
+        return None, None, (jsonify({"erro": "Evento não encontrado ou não encerrado."}), 404)
+    return conn, cur, None
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/pesagem/buscar")
+@login_required
+def pesagem_buscar(evento_id):
+    """JSON: atletas por nome, CPF ou número da inscrição (?q=), com a pesagem já registrada."""
+    conn, cur, erro = _pesagem_api(evento_id)
+    if erro:
+        return erro
+    try:
+        encontrados = pesagem.buscar(pesagem.indice(conn, evento_id), request.args.get("q"))
+        registros = pesagem.pesagens(cur, [a["inscricao_id"] for a in encontrados])
+        return jsonify({"resultados": [pesagem.resumo(a, registros.get(a["inscricao_id"])) for a in encontrados]})
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_eventos_competicoes.route("/<int:evento_id>/pesagem/<int:inscricao_id>", methods=["POST"])
+@login_required
+def pesagem_registrar(evento_id, inscricao_id):
+    """
+    JSON: registra o peso medido ({"peso": 61.4}) e devolve a situação recalculada.
+    "categoria" escolhe outra categoria elegível; "desclassificar": true desclassifica.
+    """
+    dados = request.get_json(silent=True) or request.form
+    try:
+        peso = float(str(dados.get("peso") or "").replace(",", "."))
+    except ValueError:
+        peso = 0
+    if not 0 < peso < 400:
+        return jsonify({"erro": "Peso inválido."}), 400
+
+    conn, cur, erro = _pesagem_api(evento_id)
+    if erro:
+        return erro
+    try:
+        atleta = pesagem.indice(conn, evento_id)["atletas"].get(inscricao_id)
+        if not atleta:
+            return jsonify({"erro": "Inscrição não encontrada neste evento."}), 404
+        try:
+            avaliacao = pesagem.registrar(cur, evento_id, atleta, peso, (dados.get("categoria") or "").strip() or None,
+                                          bool(dados.get("desclassificar")), current_user.id)
+            conn.commit()
+        except ValueError as e:
+            conn.rollback()
+            return jsonify({"erro": str(e)}), 400
+        except mysql.connector.errors.ProgrammingError:
+            conn.rollback()
+            return jsonify({"erro": "Pesagem não disponível. Execute a migration create_pesagens.sql"}), 503
+        registro = pesagem.pesagens(cur, [inscricao_id]).get(inscricao_id)
+        return jsonify(dict(avaliacao, atleta=pesagem.resumo(atleta, registro)))
+    finally:
+        cur.close()
+        conn.close()
 
 
 @bp_eventos_competicoes.route("/buscar-categorias", methods=["POST"])
@@ -4848,67 +4186,19 @@ def buscar_categorias():
         if not peso or not data_nascimento or not genero:
             return Response(json.dumps({"categorias": []}), mimetype="application/json")
         
-        # Calcular idade em ano civil
         try:
             from datetime import datetime as dt
             nasc = dt.strptime(data_nascimento[:10], "%Y-%m-%d").date()
-            hoje = date.today()
-            idade_ano_civil = hoje.year - nasc.year
         except Exception:
             return Response(json.dumps({"categorias": []}), mimetype="application/json")
         
         conn = get_db_connection()
         cur = conn.cursor(dictionary=True)
         try:
-            genero_upper = genero.upper()
-            if genero_upper not in ("M", "F"):
+            if genero.upper() not in ("M", "F"):
                 return Response(json.dumps({"categorias": []}), mimetype="application/json")
-            
-            peso_float = float(peso)
-            
-            # Mapear M/F para MASCULINO/FEMININO
-            genero_db = "MASCULINO" if genero_upper == "M" else "FEMININO" if genero_upper == "F" else genero_upper
-            
-            # Verificar se coluna id_classe existe
-            try:
-                cur.execute("SHOW COLUMNS FROM categorias LIKE 'id_classe'")
-                tem_id_classe = cur.fetchone() is not None
-            except Exception:
-                tem_id_classe = False
-            
-            if tem_id_classe:
-                cur.execute("""
-                    SELECT id, categoria, nome_categoria, id_classe, peso_min, peso_max, idade_min, idade_max
-                    FROM categorias
-                    WHERE UPPER(genero) = UPPER(%s)
-                    AND (
-                        (idade_min IS NULL OR %s >= idade_min)
-                        AND (idade_max IS NULL OR %s <= idade_max)
-                    )
-                    AND (
-                        (peso_min IS NULL OR %s >= peso_min)
-                        AND (peso_max IS NULL OR %s <= peso_max)
-                    )
-                    ORDER BY nome_categoria
-                """, (genero_db, idade_ano_civil, idade_ano_civil, peso_float, peso_float))
-            else:
-                cur.execute("""
-                    SELECT id, categoria, nome_categoria, NULL as id_classe, peso_min, peso_max, idade_min, idade_max
-                    FROM categorias
-                    WHERE UPPER(genero) = UPPER(%s)
-                    AND (
-                        (idade_min IS NULL OR %s >= idade_min)
-                        AND (idade_max IS NULL OR %s <= idade_max)
-                    )
-                    AND (
-                        (peso_min IS NULL OR %s >= peso_min)
-                        AND (peso_max IS NULL OR %s <= peso_max)
-                    )
-                    ORDER BY nome_categoria
-                """, (genero_db, idade_ano_civil, idade_ano_civil, peso_float, peso_float))
-            
-            categorias = cur.fetchall()
-            return Response(json.dumps({"categorias": categorias}), mimetype="application/json")
+            lista = categorias_competicao.elegiveis(cur, genero, nasc, float(peso))
+            return Response(json.dumps({"categorias": lista}), mimetype="application/json")
         finally:
             cur.close()
             conn.close()
@@ -3,6 +3,7 @@ import os
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from config import get_db_connection
+from utils import armazenamento
 
 federacao_bp = Blueprint("federacao", __name__, url_prefix="/federacao")
 
@@ -13,23 +14,23 @@ def _pasta_logos():
     return os.path.join(current_app.root_path, "static", "uploads", "logos")
 
 
+def _remover_logos(prefixo, entidade_id):
+    for ext in LOGO_EXTENSOES:
+        try:
+            armazenamento.remover(os.path.join("logos", f"{prefixo}_{entidade_id}{ext}"))
+        except OSError:
+            pass
+
+
 def salvar_logo(file_storage, prefixo, entidade_id):
     if not file_storage or file_storage.filename == "":
         return None
     ext = os.path.splitext(file_storage.filename)[1].lower()
     if ext not in LOGO_EXTENSOES:
         return None
-    pasta = _pasta_logos()
-    os.makedirs(pasta, exist_ok=True)
-    for ext_item in LOGO_EXTENSOES:
-        existente = os.path.join(pasta, f"{prefixo}_{entidade_id}{ext_item}")
-        if os.path.exists(existente):
-            try:
-                os.remove(existente)
-            except OSError:
-                pass
+    _remover_logos(prefixo, entidade_id)
     filename = f"{prefixo}_{entidade_id}{ext}"
-    file_storage.save(os.path.join(pasta, filename))
+    armazenamento.salvar_arquivo(file_storage, os.path.join("logos", filename))
     return filename
 
 
@@ -3,11 +3,13 @@
 # ======================================================
 import os
 import uuid
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
 from datetime import date
 from decimal import Decimal, InvalidOperation
 from config import get_db_connection
+from utils import armazenamento
+from utils.entrega_arquivos import enviar_upload
 
 bp_financeiro = Blueprint("financeiro", __name__, url_prefix="/financeiro")
 
@@ -182,11 +184,11 @@ def _get_academia_id():
 
 def _financeiro_exige_modo_academia():
     """Garante que o módulo financeiro (gestão) só seja acessível em modo academia.
-    Exceção: informar_pagamento_mensalidade (usado pelo painel do aluno)."""
+    Exceções: informar_pagamento_mensalidade e comprovante_mensalidade (usados pelo painel do aluno)."""
     if not current_user.is_authenticated:
         return None
     endpoint = request.endpoint or ""
-    if endpoint == "financeiro.informar_pagamento_mensalidade":
+    if endpoint in ("financeiro.informar_pagamento_mensalidade", "financeiro.comprovante_mensalidade"):
         return None
     if not endpoint.startswith("financeiro."):
         return None
@@ -1552,10 +1554,7 @@ def informar_pagamento_mensalidade():
         ext = (os.path.splitext(arquivo.filename)[1] or ".png").lower()
         if ext.lstrip(".") in COMPROVANTE_EXT:
             fn = f"comprovantes/comprovante_{registro_id}_{uuid.uuid4().hex[:12]}{ext}"
-            folder = os.path.join(current_app.root_path, "static", "uploads", "comprovantes")
-            os.makedirs(folder, exist_ok=True)
-            arquivo.save(os.path.join(current_app.root_path, "static", "uploads", fn))
-            comprovante_fn = fn
+            comprovante_fn = armazenamento.salvar_arquivo(arquivo, fn)
 
     try:
         if comprovante_fn:
@@ -1595,6 +1594,48 @@ def informar_pagamento_mensalidade():
     return redirect(request.referrer or url_for("painel_aluno.minhas_mensalidades"))
 
 
+@bp_financeiro.route("/mensalidades/comprovante/<int:registro_id>")
+@login_required
+def comprovante_mensalidade(registro_id):
+    """Comprovante enviado pelo aluno: o próprio aluno, responsáveis e a gestão da academia."""
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT ma.comprovante_url,
+                   (a.usuario_id = %s
+                    OR EXISTS (SELECT 1 FROM responsavel_alunos ra WHERE ra.aluno_id = a.id AND ra.usuario_id = %s)
+                    OR EXISTS (SELECT 1 FROM usuarios_academias ua WHERE ua.academia_id = m.id_academia AND ua.usuario_id = %s)
+                    OR %s
+                    OR ac.id_associacao = %s
+                    OR ass.id_federacao = %s) AS pode_ver
+            FROM mensalidade_aluno ma
+            JOIN alunos a ON a.id = ma.aluno_id
+            JOIN mensalidades m ON m.id = ma.mensalidade_id
+            JOIN academias ac ON ac.id = m.id_academia
+            LEFT JOIN associacoes ass ON ass.id = ac.id_associacao
+            WHERE ma.id = %s
+        """, (
+            current_user.id, current_user.id, current_user.id,
+            1 if current_user.has_role("admin") else 0,
+            getattr(current_user, "id_associacao", None) if current_user.has_role("gestor_associacao") else None,
+            getattr(current_user, "id_federacao", None) if current_user.has_role("gestor_federacao") else None,
+            registro_id,
+        ))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    if not row or not row.get("pode_ver") or not row.get("comprovante_url"):
+        flash("Comprovante não encontrado.", "warning")
+        return redirect(request.referrer or url_for("painel.home"))
+    resp = enviar_upload(row["comprovante_url"], como_anexo=False)
+    if resp is None:
+        flash("Arquivo do comprovante não encontrado no servidor.", "warning")
+        return redirect(request.referrer or url_for("painel.home"))
+    return resp
+
+
 @bp_financeiro.route("/mensalidades/confirmar-pagamento/<int:registro_id>", methods=["POST"])
 @login_required
 def confirmar_pagamento_mensalidade(registro_id):
@@ -1682,7 +1723,7 @@ def api_mensalidades_por_status():
         ma["desconto_nome"] = desconto_nome
         ma["tem_desconto"] = vd > 0
         ma["foto_url"] = url_for("static", filename="uploads/" + ma["aluno_foto"]) if ma.get("aluno_foto") else None
-        ma["comprovante_url"] = url_for("static", filename="uploads/" + ma["comprovante_url"]) if ma.get("comprovante_url") else None
+        ma["comprovante_url"] = url_for("financeiro.comprovante_mensalidade", registro_id=ma["id"]) if ma.get("comprovante_url") else None
         resultado.append(ma)
     return jsonify(resultado)
 
@@ -6,7 +6,8 @@ Visível apenas em modo federação e associação.
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_required, current_user
 from config import get_db_connection
-from utils.formularios_campos import CAMPOS_ALUNO_PADRAO, listar_campos_por_grupo, get_label
+from utils.formularios_campos import CAMPOS_ALUNO_PADRAO, listar_campos_por_grupo, get_label, completar_campos
+from utils import cache_formularios
 
 bp_formularios = Blueprint("formularios", __name__, url_prefix="/formularios")
 
@@ -118,8 +119,8 @@ def cadastro():
                     (nome, id_ent),
                 )
             formulario_id = cur.lastrowid
-            for ordem, chave in enumerate(campo_chaves):
-                if chave and chave in CAMPOS_ALUNO_PADRAO:
+            for ordem, chave in enumerate(completar_campos(campo_chaves)):
+                if chave in CAMPOS_ALUNO_PADRAO:
                     label = get_label(chave)
                     cur.execute(
                         "INSERT INTO formularios_campos (formulario_id, campo_chave, label, ordem) VALUES (%s, %s, %s, %s)",
@@ -208,14 +209,15 @@ def editar(formulario_id):
                 (nome, ativo, formulario_id),
             )
             cur.execute("DELETE FROM formularios_campos WHERE formulario_id = %s", (formulario_id,))
-            for ordem, chave in enumerate(campo_chaves):
-                if chave and chave in CAMPOS_ALUNO_PADRAO:
+            for ordem, chave in enumerate(completar_campos(campo_chaves)):
+                if chave in CAMPOS_ALUNO_PADRAO:
                     label = get_label(chave)
                     cur.execute(
                         "INSERT INTO formularios_campos (formulario_id, campo_chave, label, ordem) VALUES (%s, %s, %s, %s)",
                         (formulario_id, chave, label, ordem),
                     )
             conn.commit()
+            cache_formularios.invalidar(formulario_id)
             flash("Formulário atualizado!", "success")
             return redirect(url_for("formularios.lista"))
         except Exception as e:
@@ -260,6 +262,7 @@ def excluir(formulario_id):
                 (formulario_id, id_ent),
             )
         conn.commit()
+        cache_formularios.invalidar(formulario_id)
         if cur.rowcount:
             flash("Formulário excluído.", "success")
         else:
@@ -10,6 +10,7 @@ from datetime import datetime, date
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify
 from flask_login import login_required, current_user
 from config import get_db_connection
+from utils import armazenamento
 from math import ceil
 from werkzeug.security import generate_password_hash
 
@@ -38,10 +39,7 @@ def _salvar_foto_precad_file(file_storage, prefix):
     if ext not in (".jpg", ".jpeg", ".png", ".gif", ".webp"):
         return None
     filename = f"{prefix}_{uuid.uuid4().hex[:12]}{ext}"
-    folder = os.path.join(current_app.root_path, "static", "uploads", UPLOAD_PRECAD)
-    os.makedirs(folder, exist_ok=True)
-    filepath = os.path.join(folder, filename)
-    file_storage.save(filepath)
+    armazenamento.salvar_arquivo(file_storage, os.path.join(UPLOAD_PRECAD, filename))
     return filename
 
 
@@ -58,11 +56,7 @@ def _salvar_foto_precad_base64(data_url, prefix):
     except Exception:
         return None
     filename = f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-    folder = os.path.join(current_app.root_path, "static", "uploads", UPLOAD_PRECAD)
-    os.makedirs(folder, exist_ok=True)
-    filepath = os.path.join(folder, filename)
-    with open(filepath, "wb") as f:
-        f.write(img_data)
+    armazenamento.salvar_bytes(img_data, os.path.join(UPLOAD_PRECAD, filename))
     return filename
 
 
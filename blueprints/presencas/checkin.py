@@ -0,0 +1,322 @@
+# ======================================================
+# 🧩 Check-in por totem (quiosque) — chamada em memória + gravação em lote
+# ======================================================
+"""
+Chamada do dia em memória por academia e fila write-behind de presenças.
+
+- A chamada (turmas com aula hoje + alunos vinculados) é montada com poucas
+  consultas e fica em memória por alguns minutos; a identificação do aluno
+  (nº de registro, final do CPF ou token QR) é só consulta a dicionários.
+- Cada check-in entra numa fila; uma thread grava em lote em `presencas`
+  (mesmo upsert do registro de presença) a cada poucos segundos.
+Processo único (Waitress com threads): estado compartilhado protegido por lock.
+"""
+import atexit
+import re
+import secrets
+import threading
+import time
+from datetime import date, datetime
+
+from config import get_db_connection
+from utils.ocorrencias import ocorre_em, buscar_excecoes
+
+TTL_CHAMADA = 300          # segundos até remontar a chamada do dia
+INTERVALO_FLUSH = 3.0      # segundos entre gravações da fila
+TAMANHO_LOTE_FLUSH = 200   # grava antes do intervalo se a fila atingir este tamanho
+MIN_DIGITOS_CPF = 4
+
+_lock = threading.Lock()
+_chamadas = {}             # (academia_id, data) -> ChamadaDoDia
+_fila = []                 # [(aluno_id, turma_id, data_str, responsavel_id, responsavel_nome)]
+_evento_flush = threading.Event()
+_thread_flush = None
+
+
+def _so_digitos(valor):
+    return re.sub(r"\D", "", str(valor or ""))
+
+
+def _minutos(hora):
+    """time/timedelta/str -> minutos desde 00:00 (None se vazio)."""
+    if hora is None:
+        return None
+    if hasattr(hora, "hour"):
+        return hora.hour * 60 + hora.minute
+    if hasattr(hora, "total_seconds"):
+        return int(hora.total_seconds()) // 60
+    partes = str(hora).split(":")
+    try:
+        return int(partes[0]) * 60 + int(partes[1])
+    except (ValueError, IndexError):
+        return None
+
+
+class ChamadaDoDia:
+    """Índices em memória das turmas de hoje de uma academia."""
+
+    def __init__(self, academia_id, dia):
+        self.academia_id = academia_id
+        self.dia = dia
+        self.criada_em = time.monotonic()
+        self.turmas = {}             # TurmaID -> {"id", "nome", "inicio", "fim"}
+        self.alunos = {}             # aluno_id -> {"id", "nome", "foto", "cpf", "turmas": [TurmaID]}
+        self.por_registro = {}       # zempo / id -> aluno_id
+        self.por_cpf = {}            # cpf (só dígitos) -> aluno_id
+        self.por_cpf_final = {}      # últimos 4 dígitos do cpf -> [aluno_id]
+        self.por_token = {}          # token_checkin -> aluno_id
+        self.registrados = set()     # (aluno_id, TurmaID) já com check-in hoje (TurmaID None: presença sem turma)
+
+    def expirada(self):
+        return time.monotonic() - self.criada_em > TTL_CHAMADA
+
+    def localizar(self, identificador):
+        """Retorna lista de aluno_ids candidatos para o identificador informado."""
+        ident = str(identificador or "").strip()
+        if not ident:
+            return []
+        if ident in self.por_token:
+            return [self.por_token[ident]]
+        if ident.startswith("#") and ident[1:].isdigit():
+            # Escolha explícita na lista de candidatos do totem
+            return [int(ident[1:])] if int(ident[1:]) in self.alunos else []
+        digitos = _so_digitos(ident)
+        if not digitos:
+            return []
+        if len(digitos) == 11 and digitos in self.por_cpf:
+            return [self.por_cpf[digitos]]
+        # Nº de registro e final do CPF podem coincidir: nesse caso o totem pede confirmação
+        candidatos = []
+        if digitos in self.por_registro:
+            candidatos.append(self.por_registro[digitos])
+        if len(digitos) >= MIN_DIGITOS_CPF:
+            for aid in self.por_cpf_final.get(digitos[-MIN_DIGITOS_CPF:], []):
+                if aid not in candidatos and self.alunos[aid]["cpf"].endswith(digitos):
+                    candidatos.append(aid)
+        return candidatos
+
+    def turma_para(self, aluno_id, agora_min):
+        """Turma de hoje do aluno mais próxima do horário atual (em andamento ou a seguir)."""
+        turmas = [self.turmas[t] for t in self.alunos[aluno_id]["turmas"] if t in self.turmas]
+        if not turmas:
+            return None
+
+        def _distancia(t):
+            ini, fim = t.get("inicio"), t.get("fim")
+            if ini is None:
+                return 24 * 60
+            if fim is not None and ini <= agora_min <= fim:
+                return 0
+            return abs(ini - agora_min)
+
+        return min(turmas, key=_distancia)
+
+
+def _montar_chamada(academia_id, dia):
+    """Monta a chamada do dia com um número fixo de consultas (turmas, exceções, alunos)."""
+    chamada = ChamadaDoDia(academia_id, dia)
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT t.TurmaID, t.Nome, t.dias_semana AS turma_dias,
+                   e.id AS evento_id, e.dias_semana AS evento_dias,
+                   COALESCE(e.hora_inicio, t.hora_inicio) AS hora_inicio,
+                   COALESCE(e.hora_fim, t.hora_fim) AS hora_fim
+            FROM turmas t
+            LEFT JOIN eventos e ON e.turma_id = t.TurmaID AND e.recorrente = 1
+                 AND e.tipo = 'aula' AND e.status = 'ativo'
+            WHERE t.id_academia = %s
+        """, (academia_id,))
+        linhas = cur.fetchall()
+
+        excecoes = buscar_excecoes(cur, [r.get("evento_id") for r in linhas], dia, dia)
+
+        for r in linhas:
+            if not ocorre_em(r.get("evento_dias") or r.get("turma_dias"), dia):
+                continue
+            exc = excecoes.get((r.get("evento_id"), dia))
+            if exc and exc.get("tipo") == "cancelamento":
+                continue
+            inicio, fim = r.get("hora_inicio"), r.get("hora_fim")
+            if exc and exc.get("nova_hora_inicio"):
+                inicio, fim = exc["nova_hora_inicio"], exc.get("nova_hora_fim")
+            chamada.turmas[r["TurmaID"]] = {
+                "id": r["TurmaID"], "nome": r["Nome"],
+                "inicio": _minutos(inicio), "fim": _minutos(fim),
+            }
+
+        if chamada.turmas:
+            ids = list(chamada.turmas)
+            ph = ",".join(["%s"] * len(ids))
+            cur.execute(f"""
+                SELECT a.id, a.nome, a.foto, a.cpf, a.zempo, a.token_checkin, a.TurmaID, at.TurmaID AS turma_vinculo
+                FROM alunos a
+                LEFT JOIN aluno_turmas at ON at.aluno_id = a.id AND at.TurmaID IN ({ph})
+                WHERE a.id_academia = %s AND COALESCE(a.ativo, 1) = 1
+                  AND (at.TurmaID IS NOT NULL OR a.TurmaID IN ({ph}))
+            """, tuple(ids) + (academia_id,) + tuple(ids))
+            for r in cur.fetchall():
+                aluno = chamada.alunos.setdefault(r["id"], {
+                    "id": r["id"], "nome": r["nome"], "foto": r.get("foto"), "turmas": [],
+                    "cpf": _so_digitos(r.get("cpf")),
+                })
+                for tid in (r.get("turma_vinculo"), r.get("TurmaID")):
+                    if tid in chamada.turmas and tid not in aluno["turmas"]:
+                        aluno["turmas"].append(tid)
+                chamada.por_registro[str(r["id"])] = r["id"]
+                zempo = _so_digitos(r.get("zempo"))
+                if zempo:
+                    chamada.por_registro[zempo] = r["id"]
+                cpf = aluno["cpf"]
+                if cpf and chamada.por_cpf.get(cpf) != r["id"]:
+                    chamada.por_cpf[cpf] = r["id"]
+                    chamada.por_cpf_final.setdefault(cpf[-MIN_DIGITOS_CPF:], []).append(r["id"])
+                if r.get("token_checkin"):
+                    chamada.por_token[r["token_checkin"]] = r["id"]
+
+            if chamada.alunos:
+                ids_alunos = list(chamada.alunos)
+                ph = ",".join(["%s"] * len(ids_alunos))
+                cur.execute(
+                    f"SELECT aluno_id, turma_id FROM presencas WHERE data_presenca = %s AND presente = 1 AND aluno_id IN ({ph})",
+                    (dia,) + tuple(ids_alunos),
+                )
+                chamada.registrados = {(r["aluno_id"], r.get("turma_id")) for r in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+    return chamada
+
+
+def obter_chamada(academia_id, dia=None, recarregar=False):
+    """Retorna a chamada em memória (monta/remonta se não existir ou estiver expirada)."""
+    dia = dia or date.today()
+    chave = (academia_id, dia)
+    with _lock:
+        chamada = _chamadas.get(chave)
+    if chamada and not recarregar and not chamada.expirada():
+        return chamada
+    nova = _montar_chamada(academia_id, dia)
+    with _lock:
+        # Check-ins ainda na fila continuam valendo na chamada remontada
+        if chamada:
+            nova.registrados |= chamada.registrados
+        _chamadas[chave] = nova
+        for k in [k for k in _chamadas if k[1] != dia]:
+            _chamadas.pop(k, None)
+    return nova
+
+
+def registrar_checkin(academia_id, identificador, responsavel_id, responsavel_nome, turma_id=None):
+    """
+    Identifica o aluno e enfileira a presença. Não acessa o banco (exceto ao remontar a chamada).
+    Retorna dict com status: ok, ja_registrado, ambiguo, nao_encontrado, sem_aula.
+    """
+    chamada = obter_chamada(academia_id)
+    candidatos = chamada.localizar(identificador)
+    if not candidatos:
+        return {"status": "nao_encontrado", "msg": "Aluno não encontrado nas turmas de hoje."}
+    if len(candidatos) > 1:
+        return {
+            "status": "ambiguo",
+            "msg": "Mais de um aluno encontrado. Informe mais dígitos.",
+            "alunos": [{"id": a, "nome": chamada.alunos[a]["nome"]} for a in candidatos[:10]],
+        }
+    aluno_id = candidatos[0]
+    aluno = chamada.alunos[aluno_id]
+    if turma_id and turma_id in aluno["turmas"]:
+        turma = chamada.turmas[turma_id]
+    else:
+        agora = datetime.now()
+        turma = chamada.turma_para(aluno_id, agora.hour * 60 + agora.minute)
+    if not turma:
+        return {"status": "sem_aula", "msg": "Nenhuma aula hoje para este aluno."}
+
+    resposta = {"aluno": {"id": aluno_id, "nome": aluno["nome"], "foto": aluno.get("foto")},
+                "turma": {"id": turma["id"], "nome": turma["nome"]}}
+    with _lock:
+        if (aluno_id, turma["id"]) in chamada.registrados or (aluno_id, None) in chamada.registrados:
+            resposta.update(status="ja_registrado", msg="Presença já registrada nesta aula.")
+            return resposta
+        chamada.registrados.add((aluno_id, turma["id"]))
+        _fila.append((aluno_id, turma["id"], chamada.dia.strftime("%Y-%m-%d"), responsavel_id, responsavel_nome))
+        cheia = len(_fila) >= TAMANHO_LOTE_FLUSH
+    _garantir_thread_flush()
+    if cheia:
+        _evento_flush.set()
+    resposta.update(status="ok", msg="Presença registrada!")
+    return resposta
+
+
+def descarregar_fila():
+    """Grava a fila pendente em `presencas` (um lote por responsável). Retorna quantidade gravada."""
+    from blueprints.presencas.presencas import _upsert_presencas
+
+    with _lock:
+        pendentes = list(_fila)
+        _fila.clear()
+    if not pendentes:
+        return 0
+    por_responsavel = {}
+    for aluno_id, turma_id, data_str, resp_id, resp_nome in pendentes:
+        por_responsavel.setdefault((resp_id, resp_nome), []).append((aluno_id, turma_id, data_str, 1))
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        for (resp_id, resp_nome), linhas in por_responsavel.items():
+            _upsert_presencas(cur, linhas, resp_id, resp_nome)
+        conn.commit()
+        cur.close()
+        return len(pendentes)
+    except Exception:
+        # Devolve para a fila; nova tentativa no próximo ciclo
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        with _lock:
+            _fila[:0] = pendentes
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+
+def _loop_flush():
+    while True:
+        _evento_flush.wait(INTERVALO_FLUSH)
+        _evento_flush.clear()
+        descarregar_fila()
+
+
+def _garantir_thread_flush():
+    global _thread_flush
+    if _thread_flush and _thread_flush.is_alive():
+        return
+    with _lock:
+        if _thread_flush and _thread_flush.is_alive():
+            return
+        _thread_flush = threading.Thread(target=_loop_flush, name="checkin-flush", daemon=True)
+        _thread_flush.start()
+
+
+atexit.register(descarregar_fila)
+
+
+def obter_token_checkin(cursor, aluno_id):
+    """Retorna o token QR do aluno, gerando um novo se ainda não existir (cursor dictionary)."""
+    cursor.execute("SELECT token_checkin FROM alunos WHERE id = %s", (aluno_id,))
+    row = cursor.fetchone()
+    if row and row.get("token_checkin"):
+        return row["token_checkin"]
+    token = secrets.token_urlsafe(16)
+    cursor.execute("UPDATE alunos SET token_checkin = %s WHERE id = %s AND token_checkin IS NULL", (token, aluno_id))
+    if cursor.rowcount == 0:
+        # Outra requisição gerou o token ao mesmo tempo
+        cursor.execute("SELECT token_checkin FROM alunos WHERE id = %s", (aluno_id,))
+        row = cursor.fetchone()
+        token = row.get("token_checkin") if row else None
+    return token
@@ -2,10 +2,14 @@
 # 🧩 Blueprint: Presenças
 # ======================================================
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
 from config import get_db_connection
 from datetime import date, datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 import re # Necessário para o histórico/ajax se mantiver a lógica original
 
 # ⚠️ O nome 'presencas' será usado para referenciar as rotas: url_for('presencas.registro_presenca')
@@ -64,6 +68,17 @@ def _get_ids_turmas_professor(professor_id_or_ids):
         return set()
 
 
+def _filtro_turmas_professor(ids_turmas):
+    """
+    (trecho SQL, parâmetros) que restringe a alunos das turmas do professor: turma
+    principal (alunos.TurmaID) ou vínculo em aluno_turmas. Usa o alias a para alunos.
+    """
+    ph = ",".join(["%s"] * len(ids_turmas))
+    ids_list = list(ids_turmas)
+    return (f"(a.TurmaID IN ({ph}) OR a.id IN (SELECT aluno_id FROM aluno_turmas WHERE TurmaID IN ({ph})))",
+            ids_list + ids_list)
+
+
 def _get_academias_presenca():
     """Retorna (academia_id, academias) para o painel de presenças."""
     try:
@@ -168,7 +183,13 @@ def painel_presenca():
 # ======================================================
 def _get_academia_filtro_presencas():
     """Retorna academia_id para filtrar (ata, historico, registro)."""
-    aid = request.args.get("academia_id", type=int) or request.form.get("academia_id", type=int) or session.get("academia_gerenciamento_id")
+    aid = request.args.get("academia_id", type=int) or request.form.get("academia_id", type=int)
+    if not aid and request.is_json:
+        try:
+            aid = int((request.get_json(silent=True) or {}).get("academia_id") or 0) or None
+        except (TypeError, ValueError):
+            aid = None
+    aid = aid or session.get("academia_gerenciamento_id")
     if not aid:
         aid, _ = _get_academias_presenca()
     if not aid:
@@ -205,6 +226,71 @@ def _get_academia_filtro_presencas():
         return None
 
 
+# ======================================================
+# 🔹 Gravação em lote (formulário e API de sincronização)
+# ======================================================
+_SQL_UPSERT_PRESENCA = """
+    INSERT INTO presencas (aluno_id, turma_id, data_presenca, responsavel_id, responsavel_nome, presente)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        turma_id = VALUES(turma_id),
+        presente = VALUES(presente),
+        responsavel_id = VALUES(responsavel_id),
+        responsavel_nome = VALUES(responsavel_nome),
+        registrado_em = CURRENT_TIMESTAMP
+"""
+
+
+def _upsert_presencas(cursor, linhas, responsavel_id, responsavel_nome):
+    """
+    Grava presenças em lote: linhas = [(aluno_id, turma_id, data_presenca, presente), ...].
+    Um único executemany (o conector reescreve como INSERT multi-linhas).
+    Em caso de linhas repetidas para o mesmo aluno/data, a última prevalece.
+    """
+    params = [(a, t, d, responsavel_id, responsavel_nome, p) for a, t, d, p in linhas]
+    if params:
+        cursor.executemany(_SQL_UPSERT_PRESENCA, params)
+    return len(params)
+
+
+def _turmas_origem_visita(cursor, aluno_ids, turma_id, data_presenca):
+    """Retorna {aluno_id: TurmaID original} dos alunos em visita aprovada nesta turma/data (uma consulta)."""
+    aluno_ids = [a for a in aluno_ids if isinstance(a, int)]
+    if not aluno_ids:
+        return {}
+    ph = ",".join(["%s"] * len(aluno_ids))
+    cursor.execute(f"""
+        SELECT s.aluno_id, a.TurmaID
+        FROM solicitacoes_aprovacao s
+        INNER JOIN alunos a ON a.id = s.aluno_id
+        WHERE s.aluno_id IN ({ph}) AND s.data_visita = %s AND s.status = 'aprovado_destino'
+          AND s.tipo = 'visita' AND s.turma_id = %s
+    """, tuple(aluno_ids) + (data_presenca, turma_id))
+    return {r["aluno_id"]: r["TurmaID"] for r in cursor.fetchall() if r.get("TurmaID")}
+
+
+def _atualizar_aulas_experimentais(cursor, visitantes, turma_id, data_presenca, usuario_id):
+    """visitantes = [(visitante_id, presente), ...]. Atualiza aulas e recalcula contadores dos presentes."""
+    if not visitantes:
+        return
+    cursor.executemany("""
+        UPDATE aulas_experimentais
+        SET presente = %s, registrado_por = %s
+        WHERE visitante_id = %s AND turma_id = %s AND data_aula = %s
+    """, [(p, usuario_id, vid, turma_id, data_presenca) for vid, p in visitantes])
+    presentes = sorted({vid for vid, p in visitantes if p})
+    if presentes:
+        ph = ",".join(["%s"] * len(presentes))
+        cursor.execute(f"""
+            UPDATE visitantes v
+            SET v.aulas_experimentais_realizadas = (
+                SELECT COUNT(*) FROM aulas_experimentais ae
+                WHERE ae.visitante_id = v.id AND ae.presente = 1 AND ae.data_aula <= CURDATE()
+            )
+            WHERE v.id IN ({ph})
+        """, tuple(presentes))
+
+
 @bp_presencas.route('/registro_presenca', methods=['GET', 'POST'])
 @login_required
 def registro_presenca():
@@ -280,67 +366,23 @@ def registro_presenca():
                 else:
                     alunos_ids.append(aluno_id)
             
-            # Registrar presenças de alunos
+            # Registrar presenças de alunos (lote único; aluno em visita também na turma original)
+            turmas_origem = _turmas_origem_visita(cursor, alunos_ids, turma_selecionada, data_presenca)
+            linhas = []
             for aluno_id in alunos_ids:
                 presente = 1 if aluno_id in alunos_selecionados else 0
-                # Verificar se é aluno em visita (registrar também na turma original dele)
-                cursor.execute("""
-                    SELECT s.academia_origem_id, a.TurmaID, a.id_academia
-                    FROM solicitacoes_aprovacao s
-                    INNER JOIN alunos a ON a.id = s.aluno_id
-                    WHERE s.aluno_id = %s AND s.data_visita = %s AND s.status = 'aprovado_destino' 
-                      AND s.tipo = 'visita' AND s.turma_id = %s
-                    LIMIT 1
-                """, (aluno_id, data_presenca, turma_selecionada))
-                visita_info = cursor.fetchone()
-                
-                # Registrar presença na turma atual (academia visitada)
-                cursor.execute("""
-                    INSERT INTO presencas (aluno_id, turma_id, data_presenca, responsavel_id, responsavel_nome, presente)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        turma_id = VALUES(turma_id),
-                        presente = VALUES(presente),
-                        responsavel_id = VALUES(responsavel_id),
-                        responsavel_nome = VALUES(responsavel_nome),
-                        registrado_em = CURRENT_TIMESTAMP
-                """, (aluno_id, turma_selecionada, data_presenca, current_user.id, current_user.nome, presente))
-                
-                # Se é aluno em visita, registrar também na turma original dele
-                if visita_info and visita_info.get("TurmaID"):
-                    turma_original_id = visita_info["TurmaID"]
-                    cursor.execute("""
-                        INSERT INTO presencas (aluno_id, turma_id, data_presenca, responsavel_id, responsavel_nome, presente)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                            turma_id = VALUES(turma_id),
-                            presente = VALUES(presente),
-                            responsavel_id = VALUES(responsavel_id),
-                            responsavel_nome = VALUES(responsavel_nome),
-                            registrado_em = CURRENT_TIMESTAMP
-                    """, (aluno_id, turma_original_id, data_presenca, current_user.id, current_user.nome, presente))
-            
+                linhas.append((aluno_id, turma_selecionada, data_presenca, presente))
+                if turmas_origem.get(aluno_id):
+                    linhas.append((aluno_id, turmas_origem[aluno_id], data_presenca, presente))
+            _upsert_presencas(cursor, linhas, current_user.id, current_user.nome)
+
             # Registrar presenças de visitantes (atualizar aulas_experimentais)
-            for visitante_id in visitantes_ids:
-                presente = 1 if f"visitante_{visitante_id}" in alunos_selecionados else 0
-                # Atualizar aula experimental
-                cursor.execute("""
-                    UPDATE aulas_experimentais 
-                    SET presente = %s, registrado_por = %s
-                    WHERE visitante_id = %s AND turma_id = %s AND data_aula = %s
-                """, (presente, current_user.id, visitante_id, turma_selecionada, data_presenca))
-                
-                # Se presente, atualizar contador de aulas realizadas
-                if presente:
-                    cursor.execute("""
-                        UPDATE visitantes 
-                        SET aulas_experimentais_realizadas = (
-                            SELECT COUNT(*) FROM aulas_experimentais 
-                            WHERE visitante_id = %s AND presente = 1 AND data_aula <= CURDATE()
-                        )
-                        WHERE id = %s
-                    """, (visitante_id, visitante_id))
-            
+            _atualizar_aulas_experimentais(
+                cursor,
+                [(vid, 1 if f"visitante_{vid}" in alunos_selecionados else 0) for vid in visitantes_ids],
+                turma_selecionada, data_presenca, current_user.id,
+            )
+
             db.commit()
             flash("Presenças registradas com sucesso!", "success")
         except Exception as e:
@@ -533,6 +575,360 @@ def registro_presenca():
         back_url=back_url,
     )
 
+
+# ======================================================
+# 🔹 API de sincronização em lote (tablets no tatame)
+# ======================================================
+_MAX_REGISTROS_SYNC = 2000
+_MAX_VERSOES_CHAMADA = 1000
+
+# versao -> {id: entrada} das chamadas já enviadas aos tablets (base do delta; LRU em memória)
+_versoes_chamada = OrderedDict()
+_lock_versoes = threading.Lock()
+
+
+def _roster_turma(cursor, turma_id, data_presenca, academia_id):
+    """
+    Chamada da turma/data: alunos da turma, visitantes (aulas experimentais aprovadas)
+    e alunos de outras academias em visita aprovada, com o estado de presença atual.
+    Retorna (lista, versao) — versao é um hash estável do conteúdo.
+    """
+    roster = []
+    cursor.execute(
+        """SELECT a.id, a.nome FROM alunos a
+           LEFT JOIN aluno_turmas at ON at.aluno_id = a.id AND at.TurmaID = %s
+           WHERE (at.TurmaID IS NOT NULL OR a.TurmaID = %s) AND a.id_academia = %s""",
+        (turma_id, turma_id, academia_id),
+    )
+    for r in cursor.fetchall():
+        roster.append({"id": r["id"], "nome": r["nome"], "tipo": "aluno"})
+    ids_turma = {r["id"] for r in roster}
+
+    cursor.execute("""
+        SELECT a.id, a.nome, ac_orig.nome AS academia_origem_nome
+        FROM alunos a
+        INNER JOIN solicitacoes_aprovacao s ON s.aluno_id = a.id
+        INNER JOIN academias ac_orig ON ac_orig.id = s.academia_origem_id
+        WHERE s.turma_id = %s AND s.data_visita = %s AND s.academia_destino_id = %s
+          AND s.status = 'aprovado_destino' AND s.tipo = 'visita'
+    """, (turma_id, data_presenca, academia_id))
+    for r in cursor.fetchall():
+        if r["id"] not in ids_turma:
+            roster.append({"id": r["id"], "nome": r["nome"], "tipo": "aluno_visita",
+                           "academia_origem": r.get("academia_origem_nome")})
+
+    cursor.execute("""
+        SELECT v.id, v.nome, ae.presente
+        FROM visitantes v
+        INNER JOIN aulas_experimentais ae ON ae.visitante_id = v.id
+        WHERE ae.turma_id = %s AND ae.data_aula = %s AND v.id_academia = %s
+          AND v.ativo = 1 AND ae.aprovado = 1
+    """, (turma_id, data_presenca, academia_id))
+    for r in cursor.fetchall():
+        roster.append({"id": f"visitante_{r['id']}", "nome": r["nome"], "tipo": "visitante",
+                       "presente": bool(r.get("presente"))})
+
+    _marcar_presentes(cursor, roster, data_presenca)
+    roster.sort(key=lambda x: ((x.get("nome") or "").lower(), str(x["id"])))
+    return roster, _versao_roster(roster)
+
+
+def _marcar_presentes(cursor, roster, data_presenca):
+    """(Re)lê de presencas o estado dos alunos da chamada (visitantes ficam como estão)."""
+    ids_alunos = [r["id"] for r in roster if r["tipo"] != "visitante"]
+    presentes = set()
+    if ids_alunos:
+        ph = ",".join(["%s"] * len(ids_alunos))
+        cursor.execute(
+            f"SELECT aluno_id FROM presencas WHERE data_presenca = %s AND presente = 1 AND aluno_id IN ({ph})",
+            (data_presenca,) + tuple(ids_alunos),
+        )
+        presentes = {r["aluno_id"] for r in cursor.fetchall()}
+    for r in roster:
+        if r["tipo"] != "visitante":
+            r["presente"] = r["id"] in presentes
+
+
+def _versao_roster(roster):
+    """Hash estável do conteúdo da chamada (já ordenada)."""
+    return hashlib.sha1(json.dumps(roster, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _delta_roster(roster, versao, versao_cliente):
+    """
+    Guarda a chamada sob a versão atual e devolve (alteradas, removidos) em relação à versão
+    do cliente: entradas novas ou diferentes e ids que saíram. None se a versão do cliente
+    não é conhecida neste processo (reinício, LRU) — aí o cliente recebe a chamada completa.
+    """
+    atual = {str(r["id"]): r for r in roster}
+    with _lock_versoes:
+        _versoes_chamada[versao] = atual
+        _versoes_chamada.move_to_end(versao)
+        while len(_versoes_chamada) > _MAX_VERSOES_CHAMADA:
+            _versoes_chamada.popitem(last=False)
+        anterior = _versoes_chamada.get(versao_cliente) if versao_cliente else None
+    if anterior is None:
+        return None
+    alteradas = [r for k, r in atual.items() if anterior.get(k) != r]
+    removidos = [anterior[k]["id"] for k in anterior if k not in atual]
+    return alteradas, removidos
+
+
+def _parse_registro_sync(reg, turmas_permitidas):
+    """Valida um registro da API. Retorna (chave, turma_id, data_str, aluno_id, presente) ou levanta ValueError."""
+    chave = str(reg.get("chave") or "").strip()
+    if not chave or len(chave) > 64:
+        raise ValueError("chave de idempotência inválida")
+    try:
+        turma_id = int(reg.get("turma_id"))
+    except (TypeError, ValueError):
+        raise ValueError("turma_id inválido")
+    if turma_id not in turmas_permitidas:
+        raise ValueError("turma não permitida")
+    try:
+        data_str = datetime.strptime(str(reg.get("data") or "")[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError("data inválida (use AAAA-MM-DD)")
+    aluno_id = reg.get("aluno_id")
+    if isinstance(aluno_id, str) and aluno_id.startswith("visitante_"):
+        if not aluno_id[len("visitante_"):].isdigit():
+            raise ValueError("aluno_id inválido")
+    else:
+        try:
+            aluno_id = int(aluno_id)
+        except (TypeError, ValueError):
+            raise ValueError("aluno_id inválido")
+    return chave, turma_id, data_str, aluno_id, 1 if reg.get("presente") else 0
+
+
+@bp_presencas.route('/api/presencas/sincronizar', methods=['POST'])
+@login_required
+def api_sincronizar_presencas():
+    """
+    Sincronização idempotente de presenças em lote.
+    Entrada (JSON):
+        {"academia_id": 1,
+         "registros": [{"chave": "uuid", "turma_id": 3, "data": "2026-10-19", "aluno_id": 10 | "visitante_4", "presente": true}],
+         "turmas": [{"turma_id": 3, "data": "2026-10-19", "versao": "<versao conhecida>"}]}
+    Saída: chaves aplicadas/duplicadas/rejeitadas e, por turma/data, a versão atual da chamada.
+    Com a versão do cliente desatualizada vão só "alteracoes" (entradas novas ou mudadas) e
+    "removidos" (ids que saíram) desde aquela versão; se ela não é conhecida pelo servidor
+    (ou o cliente não mandou versão), vai a "chamada" completa.
+    """
+    payload = request.get_json(silent=True) or {}
+    academia_id = _get_academia_filtro_presencas()
+    if not academia_id:
+        return jsonify({"ok": False, "msg": "Academia não informada ou acesso negado"}), 403
+    registros = payload.get("registros") or []
+    if not isinstance(registros, list) or len(registros) > _MAX_REGISTROS_SYNC:
+        return jsonify({"ok": False, "msg": f"Envie no máximo {_MAX_REGISTROS_SYNC} registros por lote"}), 400
+
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT TurmaID FROM turmas WHERE id_academia = %s", (academia_id,))
+        turmas_permitidas = {r["TurmaID"] for r in cursor.fetchall()}
+        if session.get("modo_painel") == "professor":
+            ids_turmas_professor = _get_ids_turmas_professor(_get_todos_professor_ids())
+            if ids_turmas_professor:
+                turmas_permitidas &= ids_turmas_professor
+
+        rejeitados = []
+        validos = []
+        vistos = set()
+        for reg in registros:
+            if not isinstance(reg, dict):
+                rejeitados.append({"chave": None, "motivo": "registro inválido"})
+                continue
+            try:
+                item = _parse_registro_sync(reg, turmas_permitidas)
+            except ValueError as e:
+                rejeitados.append({"chave": reg.get("chave"), "motivo": str(e)})
+                continue
+            if item[0] in vistos:
+                continue
+            vistos.add(item[0])
+            validos.append(item)
+
+        duplicados = set()
+        if validos:
+            chaves = [v[0] for v in validos]
+            ph = ",".join(["%s"] * len(chaves))
+            cursor.execute(f"SELECT chave FROM presencas_sync_chaves WHERE chave IN ({ph})", tuple(chaves))
+            duplicados = {r["chave"] for r in cursor.fetchall()}
+        pendentes = [v for v in validos if v[0] not in duplicados]
+
+        # Agrupar por turma/data: valida contra a chamada e grava em lote
+        grupos = {}
+        for v in pendentes:
+            grupos.setdefault((v[1], v[2]), []).append(v)
+        rosters = {}
+        aplicados = []
+        linhas = []
+        for (turma_id, data_str), itens in grupos.items():
+            roster, _ = _roster_turma(cursor, turma_id, data_str, academia_id)
+            rosters[(turma_id, data_str)] = roster
+            ids_roster = {r["id"] for r in roster}
+            alunos_grupo = []
+            visitantes_grupo = []
+            for chave, _t, _d, aluno_id, presente in itens:
+                if aluno_id not in ids_roster:
+                    rejeitados.append({"chave": chave, "motivo": "aluno fora da chamada desta turma/data"})
+                    continue
+                aplicados.append((chave, turma_id, data_str))
+                if isinstance(aluno_id, str):
+                    visitantes_grupo.append((int(aluno_id[len("visitante_"):]), presente))
+                else:
+                    alunos_grupo.append((aluno_id, presente))
+            origem = _turmas_origem_visita(cursor, [a for a, _ in alunos_grupo], turma_id, data_str)
+            for aluno_id, presente in alunos_grupo:
+                linhas.append((aluno_id, turma_id, data_str, presente))
+                if origem.get(aluno_id):
+                    linhas.append((aluno_id, origem[aluno_id], data_str, presente))
+            _atualizar_aulas_experimentais(cursor, visitantes_grupo, turma_id, data_str, current_user.id)
+            if visitantes_grupo:
+                estado = {f"visitante_{vid}": bool(p) for vid, p in visitantes_grupo}
+                for r in roster:
+                    if r["id"] in estado:
+                        r["presente"] = estado[r["id"]]
+
+        _upsert_presencas(cursor, linhas, current_user.id, current_user.nome)
+        if aplicados:
+            cursor.executemany(
+                "INSERT IGNORE INTO presencas_sync_chaves (chave, usuario_id, turma_id, data_presenca) VALUES (%s, %s, %s, %s)",
+                [(chave, current_user.id, t, d) for chave, t, d in aplicados],
+            )
+        db.commit()
+
+        # Delta da chamada: turmas pedidas pelo cliente + turmas alteradas neste lote
+        conhecidas = {}
+        for t in payload.get("turmas") or []:
+            try:
+                k = (int(t.get("turma_id")), datetime.strptime(str(t.get("data"))[:10], "%Y-%m-%d").strftime("%Y-%m-%d"))
+            except (TypeError, ValueError, AttributeError):
+                continue
+            if k[0] in turmas_permitidas:
+                conhecidas[k] = t.get("versao")
+        for k in grupos:
+            conhecidas.setdefault(k, None)
+        turmas_resp = []
+        for (turma_id, data_str), versao_cliente in conhecidas.items():
+            roster = rosters.get((turma_id, data_str))
+            if roster is None:
+                roster, versao = _roster_turma(cursor, turma_id, data_str, academia_id)
+            else:
+                # Chamada já montada neste lote: basta reler a presença dos alunos
+                _marcar_presentes(cursor, roster, data_str)
+                versao = _versao_roster(roster)
+            item = {"turma_id": turma_id, "data": data_str, "versao": versao, "alterado": versao != versao_cliente}
+            if item["alterado"]:
+                delta = _delta_roster(roster, versao, versao_cliente)
+                if delta is None:
+                    item["chamada"] = roster
+                else:
+                    item["alteracoes"], item["removidos"] = delta
+            else:
+                _delta_roster(roster, versao, None)
+            turmas_resp.append(item)
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "msg": f"Erro ao sincronizar: {e}"}), 500
+    finally:
+        cursor.close()
+        db.close()
+
+    return jsonify({
+        "ok": True,
+        "aplicados": [a[0] for a in aplicados],
+        "duplicados": sorted(duplicados),
+        "rejeitados": rejeitados,
+        "turmas": turmas_resp,
+    })
+
+
+# ======================================================
+# 🔹 Check-in por totem (quiosque)
+# ======================================================
+@bp_presencas.route('/presencas/checkin', methods=['GET'])
+@login_required
+def checkin_totem():
+    """Tela do totem: valida a academia uma vez e deixa a chamada do dia em memória."""
+    from blueprints.presencas.checkin import obter_chamada
+
+    academia_id = _get_academia_filtro_presencas()
+    if not academia_id:
+        flash("Selecione uma academia para abrir o totem de check-in.", "warning")
+        return redirect(url_for("presencas.painel_presenca"))
+    # Credencial do totem na sessão (cookie assinado): o check-in não precisa recarregar o usuário do banco
+    session["checkin_totem"] = {"academia_id": academia_id, "responsavel_id": current_user.id,
+                                "responsavel_nome": current_user.nome}
+    try:
+        chamada = obter_chamada(academia_id, recarregar=True)
+    except Exception as e:
+        flash(f"Erro ao carregar as turmas de hoje: {e}", "danger")
+        return redirect(url_for("presencas.painel_presenca", academia_id=academia_id))
+    turmas_hoje = sorted(chamada.turmas.values(), key=lambda t: (t.get("inicio") is None, t.get("inicio") or 0))
+    return render_template(
+        "presencas/checkin_totem.html",
+        academia_id=academia_id,
+        turmas_hoje=turmas_hoje,
+        total_alunos=len(chamada.alunos),
+        back_url=url_for("presencas.painel_presenca", academia_id=academia_id),
+    )
+
+
+@bp_presencas.route('/presencas/checkin/registrar', methods=['POST'])
+def checkin_registrar():
+    """
+    Check-in do aluno pelo totem. Consulta só a chamada em memória; gravação é em lote.
+    Sem @login_required de propósito: a autorização vem da credencial gravada na sessão
+    por checkin_totem (usuário autenticado), evitando o user_loader (consultas) a cada check-in.
+    """
+    from blueprints.presencas.checkin import registrar_checkin
+
+    totem = session.get("checkin_totem") or {}
+    academia_id = totem.get("academia_id")
+    if not academia_id:
+        return jsonify({"status": "erro", "msg": "Totem não inicializado"}), 403
+    dados = request.get_json(silent=True) or request.form
+    try:
+        turma_id = int(dados.get("turma_id") or 0) or None
+    except (TypeError, ValueError):
+        turma_id = None
+    try:
+        resultado = registrar_checkin(
+            academia_id, dados.get("identificador"), totem.get("responsavel_id"), totem.get("responsavel_nome"),
+            turma_id=turma_id,
+        )
+    except Exception:
+        # Falha ao (re)montar a chamada no banco: o totem mostra a mensagem em vez de uma página 500
+        return jsonify({"status": "erro", "msg": "Não foi possível consultar as turmas de hoje. Tente novamente."}), 503
+    return jsonify(resultado), (200 if resultado["status"] in ("ok", "ja_registrado", "ambiguo") else 404)
+
+
+@bp_presencas.route('/presencas/checkin/meu-token', methods=['GET'])
+@login_required
+def checkin_meu_token():
+    """Token do QR de check-in do aluno logado (gerado na primeira consulta)."""
+    from blueprints.presencas.checkin import obter_token_checkin
+
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id FROM alunos WHERE usuario_id = %s LIMIT 1", (current_user.id,))
+        aluno = cursor.fetchone()
+        if not aluno:
+            return jsonify({"ok": False, "msg": "Aluno não vinculado."}), 404
+        token = obter_token_checkin(cursor, aluno["id"])
+        db.commit()
+        return jsonify({"ok": True, "token": token})
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "msg": f"Erro: {e}"}), 500
+    finally:
+        cursor.close()
+        db.close()
+
 # ======================================================
 # 🔹 Ata de Presença
 # ======================================================
@@ -610,10 +1006,9 @@ def ata_presenca():
             query += " AND a.TurmaID = %s"
             params.append(turma_selecionada)
         if modo_professor and ids_turmas_professor:
-            ph = ",".join(["%s"] * len(ids_turmas_professor))
-            ids_list = list(ids_turmas_professor)
-            query += f" AND (a.TurmaID IN ({ph}) OR a.id IN (SELECT aluno_id FROM aluno_turmas WHERE TurmaID IN ({ph})))"
-            params.extend(ids_list + ids_list)
+            filtro_turmas, params_turmas = _filtro_turmas_professor(ids_turmas_professor)
+            query += f" AND {filtro_turmas}"
+            params.extend(params_turmas)
         if academia_id:
             query += " AND a.id_academia = %s"
             params.append(academia_id)
@@ -683,6 +1078,134 @@ def ata_presenca():
                             back_url=back_url,
                             academia_id=academia_id)
 
+
+# ======================================================
+# 🔹 Exportação da Ata (XLSX / PDF em streaming)
+# ======================================================
+_ANO_MIN_EXPORTACAO, _ANO_MAX_EXPORTACAO = 1900, 2100
+
+
+@bp_presencas.route('/ata_presenca/exportar', methods=['GET'])
+@login_required
+def exportar_ata_presenca():
+    """
+    Exporta a ata para XLSX (write-only) ou PDF paginado.
+    Aceita intervalo de anos (ano_inicio..ano_fim) para auditorias plurianuais;
+    as linhas vêm de um cursor não-bufferizado direto para o arquivo.
+    """
+    from utils.exportacao import (
+        iterar_cursor, gravar_xlsx, gravar_pdf_tabela, resposta_arquivo, novo_temporario, remover_arquivo,
+        MIME_XLSX, MIME_PDF,
+    )
+
+    academia_id = _get_academia_filtro_presencas()
+    modo_professor = session.get("modo_painel") == "professor"
+    ids_turmas_professor = set()
+    if modo_professor:
+        ids_turmas_professor = _get_ids_turmas_professor(_get_todos_professor_ids())
+
+    hoje = datetime.today()
+    formato = (request.args.get("formato") or "xlsx").lower()
+    ano = request.args.get("ano", hoje.year, type=int)
+    ano_inicio = request.args.get("ano_inicio", ano, type=int)
+    ano_fim = request.args.get("ano_fim", ano_inicio, type=int)
+    if ano_fim < ano_inicio:
+        ano_inicio, ano_fim = ano_fim, ano_inicio
+    mes = request.args.get("mes", 0, type=int)
+    turma_selecionada = request.args.get("turma", 0, type=int)
+    url_ata = url_for("presencas.ata_presenca", academia_id=academia_id) if academia_id else url_for("presencas.ata_presenca")
+    if not 0 <= mes <= 12 or not (_ANO_MIN_EXPORTACAO <= ano_inicio and ano_fim <= _ANO_MAX_EXPORTACAO):
+        flash(f"Período inválido: mês de 1 a 12 e ano entre {_ANO_MIN_EXPORTACAO} e {_ANO_MAX_EXPORTACAO}.", "danger")
+        return redirect(url_ata)
+
+    # Intervalo de datas (usa índice idx_data em vez de YEAR()/MONTH())
+    if mes and ano_inicio == ano_fim:
+        inicio = date(ano_inicio, mes, 1)
+        fim = date(ano_inicio + (mes == 12), mes % 12 + 1, 1)
+    else:
+        inicio = date(ano_inicio, 1, 1)
+        fim = date(ano_fim + 1, 1, 1)
+    ultimo_dia = date.fromordinal(fim.toordinal() - 1)
+
+    query = """
+        SELECT p.data_presenca, COALESCE(t.Nome, '-') AS turma_nome, a.nome AS aluno_nome,
+               p.presente, COALESCE(u.nome, p.responsavel_nome, '-') AS responsavel, p.registrado_em
+        FROM presencas p
+        JOIN alunos a ON a.id = p.aluno_id
+        LEFT JOIN turmas t ON t.TurmaID = COALESCE(p.turma_id, a.TurmaID)
+        LEFT JOIN usuarios u ON u.id = p.responsavel_id
+        WHERE p.data_presenca >= %s AND p.data_presenca < %s
+    """
+    params = [inicio, fim]
+    if turma_selecionada:
+        query += " AND COALESCE(p.turma_id, a.TurmaID) = %s"
+        params.append(turma_selecionada)
+    if modo_professor and ids_turmas_professor:
+        # Mesmo critério da ata na tela (turma principal ou aluno_turmas)
+        filtro_turmas, params_turmas = _filtro_turmas_professor(ids_turmas_professor)
+        query += f" AND {filtro_turmas}"
+        params.extend(params_turmas)
+    if academia_id:
+        query += " AND a.id_academia = %s"
+        params.append(academia_id)
+    query += " ORDER BY p.data_presenca, turma_nome, a.nome"
+
+    cabecalho = ["Data", "Turma", "Aluno", "Status", "Responsável", "Registrado em"]
+
+    def _linhas(cursor):
+        for p in iterar_cursor(cursor):
+            dp = p.get("data_presenca")
+            reg = p.get("registrado_em")
+            yield [
+                dp.strftime("%d/%m/%Y") if hasattr(dp, "strftime") else str(dp or ""),
+                p.get("turma_nome") or "-",
+                p.get("aluno_nome") or "-",
+                "Presente" if p.get("presente") == 1 else "Falta",
+                p.get("responsavel") or "-",
+                reg.strftime("%d/%m/%Y %H:%M") if hasattr(reg, "strftime") else "",
+            ]
+
+    periodo = f"{ano_inicio}" if ano_inicio == ano_fim else f"{ano_inicio}-{ano_fim}"
+    if mes and ano_inicio == ano_fim:
+        periodo = f"{mes:02d}-{ano_inicio}"
+
+    # Cursor padrão do mysql-connector é não-bufferizado: as linhas são lidas do socket sob demanda
+    # O temporário é criado aqui para que uma falha no meio da gravação não o deixe em disco
+    caminho = novo_temporario(".pdf" if formato == "pdf" else ".xlsx")
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(query, tuple(params))
+        if formato == "pdf":
+            gravar_pdf_tabela(
+                cabecalho, _linhas(cursor),
+                titulo="Ata de Presença",
+                subtitulo=f"Período: {inicio.strftime('%d/%m/%Y')} a {ultimo_dia.strftime('%d/%m/%Y')}",
+                larguras=[2, 4, 6, 2, 4, 3],
+                caminho=caminho,
+            )
+            nome, mimetype = f"ata_presenca_{periodo}.pdf", MIME_PDF
+        else:
+            gravar_xlsx(cabecalho, _linhas(cursor), titulo="Ata de Presença",
+                        larguras=[12, 25, 40, 12, 25, 18], caminho=caminho)
+            nome, mimetype = f"ata_presenca_{periodo}.xlsx", MIME_XLSX
+    except ImportError:
+        remover_arquivo(caminho)
+        flash("Biblioteca de exportação não instalada (openpyxl/reportlab).", "warning")
+        return redirect(url_ata)
+    except Exception as e:
+        remover_arquivo(caminho)
+        flash(f"Erro ao exportar ata: {e}", "danger")
+        return redirect(url_ata)
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        db.close()
+
+    return resposta_arquivo(caminho, nome, mimetype)
+
 # ======================================================
 # 🔹 Histórico de Presença (Lista de Cards)
 # ======================================================
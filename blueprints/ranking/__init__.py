@@ -0,0 +1,4 @@
+# blueprints/ranking/__init__.py
+from .routes import bp_ranking
+
+__all__ = ["bp_ranking"]
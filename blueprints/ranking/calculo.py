@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+Ranking por temporada a partir dos resultados das competições.
+Cada registro de resultados de uma categoria (colocações vindas da chave ou informadas)
+substitui os anteriores em ranking_resultados, com os pontos da tabela da associação
+para o nível do evento gravados junto (mudar a tabela depois não altera o passado; mudar
+o nível do evento reaplica a tabela aos resultados dele). Os totais por atleta/categoria
+(ranking_atletas) e por academia (ranking_academias) são atualizados na mesma transação
+só com a diferença entre os resultados antigos e os novos, então as páginas leem os
+totais prontos. recalcular/divergencias/reconstruir refazem os totais a partir de
+ranking_resultados (scripts/recalcular_ranking.py).
+Resultados são por aluno_id: inscrições avulsas sem aluno não pontuam.
+Tabelas: migrations/create_ranking.sql.
+"""
+from decimal import Decimal
+
+import mysql.connector.errors
+
+NIVEIS = (("regional", "Regional"), ("estadual", "Estadual"), ("nacional", "Nacional"))
+COLOCACOES = tuple(range(1, 9))
+_BASE = {1: 10, 2: 7, 3: 5, 4: 4, 5: 3, 6: 2, 7: 1, 8: 1}
+_FATOR = {"regional": 1, "estadual": 2, "nacional": 4}
+# Tabela usada enquanto a associação não configurar a sua (nível -> colocação -> pontos)
+PONTOS_PADRAO = {nivel: {c: Decimal(p * _FATOR[nivel]) for c, p in _BASE.items()} for nivel, _ in NIVEIS}
+# Eliminatória: perdedor da final = 2º, das semifinais = 3º, das quartas = 5º, das oitavas = 7º
+_COLOCACAO_PERDEDOR = {0: 2, 1: 3, 2: 5, 3: 7}
+_CONTADORES = ("pontos", "resultados", "ouros", "pratas", "bronzes")
+
+
+def nivel_valido(nivel):
+    return nivel in _FATOR
+
+
+def temporada_evento(evento):
+    """Ano da temporada: data de início do evento (ou de fim); None sem datas."""
+    data = evento.get("data_inicio") or evento.get("data_fim")
+    return data.year if data else None
+
+
+# ---------------------------------------------------------------------------
+# Tabelas de pontos
+# ---------------------------------------------------------------------------
+
+def tabelas_pontos(cur, id_associacao):
+    """nível -> colocação -> pontos da associação; colocações não configuradas usam PONTOS_PADRAO."""
+    tabelas = {nivel: dict(pontos) for nivel, pontos in PONTOS_PADRAO.items()}
+    try:
+        cur.execute("SELECT nivel, colocacao, pontos FROM ranking_pontos WHERE id_associacao = %s", (id_associacao,))
+    except mysql.connector.errors.ProgrammingError:
+        return tabelas
+    for row in cur.fetchall():
+        if row["nivel"] in tabelas:
+            tabelas[row["nivel"]][row["colocacao"]] = Decimal(row["pontos"])
+    return tabelas
+
+
+def salvar_tabelas_pontos(cur, id_associacao, tabelas):
+    """Substitui a tabela de pontos da associação (não altera resultados já registrados)."""
+    cur.execute("DELETE FROM ranking_pontos WHERE id_associacao = %s", (id_associacao,))
+    cur.executemany("""
+        INSERT INTO ranking_pontos (id_associacao, nivel, colocacao, pontos) VALUES (%s, %s, %s, %s)
+    """, [(id_associacao, nivel, colocacao, pontos)
+          for nivel, por_colocacao in tabelas.items() for colocacao, pontos in sorted(por_colocacao.items())])
+
+
+def pontos_da_colocacao(tabelas, nivel, colocacao):
+    return tabelas.get(nivel, {}).get(colocacao, Decimal(0))
+
+
+# ---------------------------------------------------------------------------
+# Colocações a partir da chave (chaveamento.carregar)
+# ---------------------------------------------------------------------------
+
+def colocacoes_da_chave(chave):
+    """
+    inscricao_id -> colocação de uma chave encerrada; vazio enquanto faltar luta.
+    Eliminatória: 1º e 2º da final, 3º para os perdedores das semifinais, 5º e 7º nas
+    rodadas anteriores (demais sem colocação). Todos contra todos: ordem por vitórias,
+    empatados com a mesma colocação.
+    """
+    lutas = [lt for rodada in chave["rodadas"].values() for lt in rodada]
+    if not lutas or any(lt["inscricao_a_id"] and lt["inscricao_b_id"] and not lt["vencedor_inscricao_id"]
+                        for lt in lutas):
+        return {}
+    if chave["tipo"] == "todos_contra_todos":
+        colocacoes, anterior = {}, None
+        for i, atleta in enumerate(chave["classificacao"], start=1):
+            if atleta["vitorias"] != anterior:
+                colocacao, anterior = i, atleta["vitorias"]
+            colocacoes[atleta["inscricao_id"]] = colocacao
+        return colocacoes
+    final = max(chave["rodadas"])
+    colocacoes = {}
+    for luta in lutas:
+        if not (luta["inscricao_a_id"] and luta["inscricao_b_id"]):
+            continue  # bye
+        vencedor = luta["vencedor_inscricao_id"]
+        perdedor = luta["inscricao_b_id"] if vencedor == luta["inscricao_a_id"] else luta["inscricao_a_id"]
+        colocacao = _COLOCACAO_PERDEDOR.get(final - luta["rodada"])
+        if colocacao:
+            colocacoes[perdedor] = colocacao
+        if luta["rodada"] == final:
+            colocacoes[vencedor] = 1
+    return colocacoes
+
+
+# ---------------------------------------------------------------------------
+# Registro de resultados e manutenção incremental dos totais
+# (cursor dictionary, transação de quem chama)
+# ---------------------------------------------------------------------------
+
+def _somar(totais, chave, linha, sinal, academia_id=None):
+    atual = totais.setdefault(chave, {"pontos": Decimal(0), "resultados": 0, "ouros": 0, "pratas": 0,
+                                      "bronzes": 0, "academia_id": None})
+    atual["pontos"] += Decimal(linha["pontos"]) * sinal
+    atual["resultados"] += sinal
+    for campo, colocacao in (("ouros", 1), ("pratas", 2), ("bronzes", 3)):
+        atual[campo] += sinal if linha["colocacao"] == colocacao else 0
+    if sinal > 0 and academia_id:
+        atual["academia_id"] = academia_id
+
+
+def _aplicar_diferenca(cur, antigos, novos):
+    """Soma aos totais (-antigos +novos) e remove as linhas que ficaram sem resultados."""
+    atletas, academias = {}, {}
+    for sinal, linhas in ((-1, antigos), (1, novos)):
+        for r in linhas:
+            _somar(atletas, (r["temporada"], r["id_associacao"], r["categoria"], r["aluno_id"]), r, sinal,
+                   r["academia_id"])
+            if r["academia_id"]:
+                _somar(academias, (r["temporada"], r["id_associacao"], r["academia_id"]), r, sinal)
+
+    def mudou(t):
+        return any(t[c] for c in _CONTADORES)
+
+    cur.executemany("""
+        INSERT INTO ranking_atletas (temporada, id_associacao, categoria, aluno_id, academia_id,
+                                     pontos, resultados, ouros, pratas, bronzes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE academia_id = COALESCE(VALUES(academia_id), academia_id),
+            pontos = pontos + VALUES(pontos), resultados = resultados + VALUES(resultados),
+            ouros = ouros + VALUES(ouros), pratas = pratas + VALUES(pratas), bronzes = bronzes + VALUES(bronzes)
+    """, [k + (t["academia_id"],) + tuple(t[c] for c in _CONTADORES) for k, t in atletas.items() if mudou(t)])
+    cur.executemany("""
+        INSERT INTO ranking_academias (temporada, id_associacao, academia_id, pontos, resultados, ouros, pratas, bronzes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE pontos = pontos + VALUES(pontos), resultados = resultados + VALUES(resultados),
+            ouros = ouros + VALUES(ouros), pratas = pratas + VALUES(pratas), bronzes = bronzes + VALUES(bronzes)
+    """, [k + tuple(t[c] for c in _CONTADORES) for k, t in academias.items() if mudou(t)])
+    for temporada, id_associacao in {k[:2] for k in atletas}:
+        cur.execute("DELETE FROM ranking_atletas WHERE temporada = %s AND id_associacao = %s AND resultados <= 0",
+                    (temporada, id_associacao))
+        cur.execute("DELETE FROM ranking_academias WHERE temporada = %s AND id_associacao = %s AND resultados <= 0",
+                    (temporada, id_associacao))
+
+
+def resultados_do_evento(cur, evento_id, categoria=None, bloquear=False):
+    """Resultados registrados do evento (de uma categoria, se informada), por categoria e colocação."""
+    filtro, params = "evento_id = %s", [evento_id]
+    if categoria is not None:
+        filtro += " AND categoria = %s"
+        params.append(categoria)
+    cur.execute(f"""
+        SELECT id, evento_id, id_associacao, temporada, nivel, categoria, inscricao_id, aluno_id,
+               academia_id, colocacao, pontos
+        FROM ranking_resultados WHERE {filtro}
+        ORDER BY categoria, colocacao, id
+        {"FOR UPDATE" if bloquear else ""}
+    """, tuple(params))
+    return cur.fetchall()
+
+
+def registrar(cur, evento, categoria, colocacoes, tabelas, usuario_id=None):
+    """
+    Substitui os resultados da categoria no evento. evento: id, id_associacao, temporada e
+    ranking_nivel; colocacoes: dicts com inscricao_id, aluno_id, academia_id e colocacao
+    (sem aluno_id ficam de fora). Um resultado por aluno na categoria (uk_ranking_resultado):
+    se a pesagem pôs duas inscrições do mesmo aluno na categoria, vale a melhor colocação.
+    Retorna (gravados, descartados) — descartados são as colocações repetidas do mesmo aluno.
+    """
+    antigos = resultados_do_evento(cur, evento["id"], categoria, bloquear=True)
+    melhores = {}
+    descartados = 0
+    for c in sorted(colocacoes, key=lambda c: c.get("colocacao") or 0):
+        if not c.get("aluno_id") or not c.get("colocacao"):
+            continue
+        if c["aluno_id"] in melhores:
+            descartados += 1
+            continue
+        melhores[c["aluno_id"]] = c
+    novos = []
+    for c in melhores.values():
+        novos.append({
+            "evento_id": evento["id"], "id_associacao": evento["id_associacao"], "temporada": evento["temporada"],
+            "nivel": evento["ranking_nivel"], "categoria": categoria, "inscricao_id": c.get("inscricao_id"),
+            "aluno_id": c["aluno_id"], "academia_id": c.get("academia_id"), "colocacao": c["colocacao"],
+            "pontos": pontos_da_colocacao(tabelas, evento["ranking_nivel"], c["colocacao"]),
+        })
+    cur.execute("DELETE FROM ranking_resultados WHERE evento_id = %s AND categoria = %s", (evento["id"], categoria))
+    cur.executemany("""
+        INSERT INTO ranking_resultados (evento_id, id_associacao, temporada, nivel, categoria, inscricao_id,
+                                        aluno_id, academia_id, colocacao, pontos, registrado_por)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(r["evento_id"], r["id_associacao"], r["temporada"], r["nivel"], r["categoria"], r["inscricao_id"],
+           r["aluno_id"], r["academia_id"], r["colocacao"], r["pontos"], usuario_id) for r in novos])
+    _aplicar_diferenca(cur, antigos, novos)
+    return len(novos), descartados
+
+
+def definir_nivel(cur, evento, nivel, tabelas):
+    """
+    Muda o nível do evento e reaplica a tabela de pontos aos resultados já registrados.
+    nivel None tira o evento do ranking (os resultados dele são removidos).
+    """
+    cur.execute("UPDATE eventos_competicoes SET ranking_nivel = %s WHERE id = %s", (nivel, evento["id"]))
+    antigos = resultados_do_evento(cur, evento["id"], bloquear=True)
+    if nivel is None:
+        cur.execute("DELETE FROM ranking_resultados WHERE evento_id = %s", (evento["id"],))
+        novos = []
+    else:
+        novos = [dict(r, nivel=nivel, pontos=pontos_da_colocacao(tabelas, nivel, r["colocacao"])) for r in antigos]
+        cur.executemany("UPDATE ranking_resultados SET nivel = %s, pontos = %s WHERE id = %s",
+                        [(r["nivel"], r["pontos"], r["id"]) for r in novos])
+    _aplicar_diferenca(cur, antigos, novos)
+
+
+# ---------------------------------------------------------------------------
+# Consultas das páginas (totais prontos; federação soma as suas associações)
+# ---------------------------------------------------------------------------
+
+def _filtro(id_associacao=None, id_federacao=None):
+    if id_federacao:
+        return "r.id_associacao IN (SELECT id FROM associacoes WHERE id_federacao = %s)", [id_federacao]
+    return "r.id_associacao = %s", [id_associacao]
+
+
+def _com_posicao(linhas, grupo=None):
+    """Posição por pontos (empates com a mesma posição), reiniciando a cada grupo."""
+    anterior_grupo, anterior, posicao = object(), None, 0
+    for i, linha in enumerate(linhas):
+        g = linha[grupo] if grupo else None
+        if g != anterior_grupo:
+            anterior_grupo, anterior, inicio = g, None, i
+        chave = tuple(linha[c] for c in ("pontos", "ouros", "pratas", "bronzes"))
+        if chave != anterior:
+            posicao, anterior = i - inicio + 1, chave
+        linha["posicao"] = posicao
+    return linhas
+
+
+def temporadas(cur, id_associacao=None, id_federacao=None):
+    filtro, params = _filtro(id_associacao, id_federacao)
+    cur.execute(f"SELECT DISTINCT r.temporada FROM ranking_academias r WHERE {filtro} ORDER BY r.temporada DESC",
+                tuple(params))
+    return [r["temporada"] for r in cur.fetchall()]
+
+
+def categorias(cur, temporada, id_associacao=None, id_federacao=None):
+    filtro, params = _filtro(id_associacao, id_federacao)
+    cur.execute(f"""
+        SELECT DISTINCT r.categoria FROM ranking_atletas r
+        WHERE r.temporada = %s AND {filtro} ORDER BY r.categoria
+    """, tuple([temporada] + params))
+    return [r["categoria"] for r in cur.fetchall()]
+
+
+def atletas(cur, temporada, id_associacao=None, id_federacao=None, categoria=None):
+    """Atletas por categoria e pontos, com posição na categoria."""
+    filtro, params = _filtro(id_associacao, id_federacao)
+    params = [temporada] + params
+    if categoria:
+        filtro += " AND r.categoria = %s"
+        params.append(categoria)
+    cur.execute(f"""
+        SELECT r.categoria, r.aluno_id, MAX(a.nome) AS aluno_nome, MAX(ac.nome) AS academia_nome,
+               SUM(r.pontos) AS pontos, SUM(r.resultados) AS resultados,
+               SUM(r.ouros) AS ouros, SUM(r.pratas) AS pratas, SUM(r.bronzes) AS bronzes
+        FROM ranking_atletas r
+        LEFT JOIN alunos a ON a.id = r.aluno_id
+        LEFT JOIN academias ac ON ac.id = r.academia_id
+        WHERE r.temporada = %s AND {filtro}
+        GROUP BY r.categoria, r.aluno_id
+        ORDER BY r.categoria, pontos DESC, ouros DESC, pratas DESC, bronzes DESC, aluno_nome
+    """, tuple(params))
+    return _com_posicao(cur.fetchall(), grupo="categoria")
+
+
+def academias(cur, temporada, id_associacao=None, id_federacao=None):
+    """Academias por pontos (soma de todas as categorias), com posição."""
+    filtro, params = _filtro(id_associacao, id_federacao)
+    cur.execute(f"""
+        SELECT r.academia_id, MAX(ac.nome) AS academia_nome,
+               SUM(r.pontos) AS pontos, SUM(r.resultados) AS resultados,
+               SUM(r.ouros) AS ouros, SUM(r.pratas) AS pratas, SUM(r.bronzes) AS bronzes
+        FROM ranking_academias r
+        LEFT JOIN academias ac ON ac.id = r.academia_id
+        WHERE r.temporada = %s AND {filtro}
+        GROUP BY r.academia_id
+        ORDER BY pontos DESC, ouros DESC, pratas DESC, bronzes DESC, academia_nome
+    """, tuple([temporada] + params))
+    return _com_posicao(cur.fetchall())
+
+
+# ---------------------------------------------------------------------------
+# Recálculo completo (conferência dos totais incrementais)
+# ---------------------------------------------------------------------------
+
+_SOMAS = """SUM(pontos) AS pontos, COUNT(*) AS resultados, SUM(colocacao = 1) AS ouros,
+            SUM(colocacao = 2) AS pratas, SUM(colocacao = 3) AS bronzes"""
+_CHAVES = {
+    "ranking_atletas": ("temporada", "id_associacao", "categoria", "aluno_id"),
+    "ranking_academias": ("temporada", "id_associacao", "academia_id"),
+}
+
+
+def _onde(temporada, *condicoes):
+    """(cláusula WHERE, parâmetros) com a temporada, se informada, e as condições extras."""
+    condicoes = (("temporada = %s",) if temporada else ()) + condicoes
+    return ("WHERE " + " AND ".join(condicoes) if condicoes else ""), ((temporada,) if temporada else ())
+
+
+def recalcular(cur, temporada=None):
+    """Totais calculados de ranking_resultados: tabela -> chave -> contadores."""
+    totais = {}
+    for tabela, chave in _CHAVES.items():
+        onde, params = _onde(temporada, *(("academia_id IS NOT NULL",) if tabela == "ranking_academias" else ()))
+        cur.execute(f"""
+            SELECT {", ".join(chave)}, {_SOMAS}
+            FROM ranking_resultados {onde}
+            GROUP BY {", ".join(chave)}
+        """, params)
+        totais[tabela] = {tuple(r[c] for c in chave): tuple(Decimal(r[c] or 0) for c in _CONTADORES)
+                          for r in cur.fetchall()}
+    return totais
+
+
+def gravados(cur, temporada=None):
+    """Totais mantidos de forma incremental, no mesmo formato de recalcular."""
+    onde, params = _onde(temporada)
+    totais = {}
+    for tabela, chave in _CHAVES.items():
+        cur.execute(f"SELECT {', '.join(chave)}, {', '.join(_CONTADORES)} FROM {tabela} {onde}", params)
+        totais[tabela] = {tuple(r[c] for c in chave): tuple(Decimal(r[c] or 0) for c in _CONTADORES)
+                          for r in cur.fetchall()}
+    return totais
+
+
+def divergencias(cur, temporada=None):
+    """[(tabela, chave, gravado, calculado)] onde os totais incrementais diferem do recálculo."""
+    calculado, gravado = recalcular(cur, temporada), gravados(cur, temporada)
+    saida = []
+    for tabela in _CHAVES:
+        for chave in sorted(set(calculado[tabela]) | set(gravado[tabela]), key=str):
+            g, c = gravado[tabela].get(chave), calculado[tabela].get(chave)
+            if g != c:
+                saida.append((tabela, chave, g, c))
+    return saida
+
+
+def reconstruir(cur, temporada=None):
+    """Refaz ranking_atletas e ranking_academias a partir de ranking_resultados."""
+    onde, params = _onde(temporada)
+    cur.execute(f"DELETE FROM ranking_atletas {onde}", params)
+    cur.execute(f"DELETE FROM ranking_academias {onde}", params)
+    cur.execute(f"""
+        INSERT INTO ranking_atletas (temporada, id_associacao, categoria, aluno_id, academia_id,
+                                     pontos, resultados, ouros, pratas, bronzes)
+        SELECT temporada, id_associacao, categoria, aluno_id,
+               SUBSTRING_INDEX(GROUP_CONCAT(academia_id ORDER BY id DESC), ',', 1),
+               {_SOMAS}
+        FROM ranking_resultados {onde}
+        GROUP BY temporada, id_associacao, categoria, aluno_id
+    """, params)
+    cur.execute(f"""
+        INSERT INTO ranking_academias (temporada, id_associacao, academia_id, pontos, resultados, ouros, pratas, bronzes)
+        SELECT temporada, id_associacao, academia_id, {_SOMAS}
+        FROM ranking_resultados {_onde(temporada, "academia_id IS NOT NULL")[0]}
+        GROUP BY temporada, id_associacao, academia_id
+    """, params)
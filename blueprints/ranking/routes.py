@@ -0,0 +1,336 @@
+# ============================================================
+# 🏅 RANKING DA TEMPORADA (resultados das competições)
+# ============================================================
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import mysql.connector.errors
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask_login import login_required, current_user
+
+from config import get_db_connection
+from blueprints.eventos_competicoes import consolidacao as consolidacao_evento
+from blueprints.eventos_competicoes import chaveamento
+from blueprints.eventos_competicoes import pesagem
+from blueprints.ranking import calculo
+
+bp_ranking = Blueprint("ranking", __name__, url_prefix="/ranking")
+
+AVISO_MIGRATION = "Ranking não disponível. Execute a migration create_ranking.sql"
+
+
+def _contexto_ranking():
+    """(modo, id da associação/federação, back_url) do painel atual; modo None sem acesso."""
+    modo = session.get("modo_painel") or ""
+    if modo == "associacao" and (current_user.has_role("gestor_associacao") or current_user.has_role("admin")):
+        aid = getattr(current_user, "id_associacao", None) or session.get("associacao_gerenciamento_id")
+        return ("associacao", aid, url_for("associacao.gerenciamento_associacao"))
+    if modo == "federacao" and (current_user.has_role("gestor_federacao") or current_user.has_role("admin")):
+        fid = getattr(current_user, "id_federacao", None) or session.get("federacao_gerenciamento_id")
+        return ("federacao", fid, url_for("federacao.gerenciamento_federacao"))
+    return (None, None, url_for("painel.home"))
+
+
+def _id_associacao():
+    """id da associação se o usuário gerencia o ranking dela (modo associação); senão None."""
+    modo, id_ent, _ = _contexto_ranking()
+    return id_ent if modo == "associacao" else None
+
+
+def _temporada_e_categoria(cur, temporadas, **filtro):
+    temporada = request.args.get("temporada", type=int) or (temporadas[0] if temporadas else date.today().year)
+    categorias = calculo.categorias(cur, temporada, **filtro)
+    categoria = request.args.get("categoria") or None
+    if categoria not in categorias:
+        categoria = None
+    return temporada, categorias, categoria
+
+
+def _agrupar_por_categoria(atletas):
+    grupos = {}
+    for atleta in atletas:
+        grupos.setdefault(atleta["categoria"], []).append(atleta)
+    return list(grupos.items())
+
+
+def _evento(cur, evento_id, id_assoc):
+    cur.execute("""
+        SELECT id, nome, id_associacao, data_inicio, data_fim, status, ranking_nivel
+        FROM eventos_competicoes WHERE id = %s AND id_associacao = %s
+    """, (evento_id, id_assoc))
+    ev = cur.fetchone()
+    if ev:
+        ev["temporada"] = calculo.temporada_evento(ev)
+    return ev
+
+
+@bp_ranking.route("/")
+@login_required
+def index():
+    """Ranking da temporada: associação (suas competições) ou federação (todas as associações dela)."""
+    modo, id_ent, back_url = _contexto_ranking()
+    if not modo:
+        flash("Acesso negado. Disponível apenas em modo federação ou associação.", "danger")
+        return redirect(url_for("painel.home"))
+    if not id_ent:
+        flash("Selecione a federação." if modo == "federacao" else "Associação não identificada.", "warning")
+        return redirect(back_url)
+    filtro = {"id_federacao": id_ent} if modo == "federacao" else {"id_associacao": id_ent}
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        try:
+            temporadas = calculo.temporadas(cur, **filtro)
+        except mysql.connector.errors.ProgrammingError:
+            flash(AVISO_MIGRATION, "warning")
+            return redirect(back_url)
+        temporada, categorias, categoria = _temporada_e_categoria(cur, temporadas, **filtro)
+        eventos = []
+        if modo == "associacao":
+            cur.execute("""
+                SELECT id, nome, data_inicio, data_fim, status, ranking_nivel
+                FROM eventos_competicoes
+                WHERE id_associacao = %s AND YEAR(COALESCE(data_inicio, data_fim)) = %s
+                ORDER BY COALESCE(data_inicio, data_fim) DESC
+            """, (id_ent, temporada))
+            eventos = cur.fetchall()
+        return render_template("ranking/index.html",
+            modo=modo, temporada=temporada, temporadas=temporadas, categorias=categorias, categoria=categoria,
+            atletas=_agrupar_por_categoria(calculo.atletas(cur, temporada, categoria=categoria, **filtro)),
+            academias=calculo.academias(cur, temporada, **filtro),
+            eventos=eventos, niveis=dict(calculo.NIVEIS), id_associacao=id_ent if modo == "associacao" else None,
+            back_url=back_url)
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_ranking.route("/pontos", methods=["GET", "POST"])
+@login_required
+def pontos():
+    """Associação: pontos por colocação para cada nível de evento."""
+    id_assoc = _id_associacao()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        if request.method == "POST":
+            tabelas = {}
+            try:
+                for nivel, _ in calculo.NIVEIS:
+                    tabelas[nivel] = {}
+                    for colocacao in calculo.COLOCACOES:
+                        valor = (request.form.get(f"pontos_{nivel}_{colocacao}") or "0").strip().replace(",", ".")
+                        tabelas[nivel][colocacao] = Decimal(valor or "0")
+                        if tabelas[nivel][colocacao] < 0:
+                            raise InvalidOperation
+            except InvalidOperation:
+                flash("Informe os pontos com números não negativos.", "danger")
+                return redirect(url_for("ranking.pontos"))
+            try:
+                calculo.salvar_tabelas_pontos(cur, id_assoc, tabelas)
+                conn.commit()
+            except mysql.connector.errors.ProgrammingError:
+                conn.rollback()
+                flash(AVISO_MIGRATION, "warning")
+                return redirect(url_for("ranking.index"))
+            flash("Tabela de pontos salva. Vale para os próximos registros de resultados "
+                  "(ou ao mudar o nível de um evento).", "success")
+            return redirect(url_for("ranking.pontos"))
+        return render_template("ranking/pontos.html",
+            tabelas=calculo.tabelas_pontos(cur, id_assoc), niveis=calculo.NIVEIS,
+            colocacoes=calculo.COLOCACOES, back_url=url_for("ranking.index"))
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_ranking.route("/evento/<int:evento_id>")
+@login_required
+def evento(evento_id):
+    """
+    Associação: nível do evento e colocações por categoria. As colocações vêm dos
+    resultados já registrados ou, se não houver, da chave encerrada da categoria.
+    """
+    id_assoc = _id_associacao()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        try:
+            ev = _evento(cur, evento_id, id_assoc)
+            registrados = calculo.resultados_do_evento(cur, evento_id)
+        except mysql.connector.errors.ProgrammingError:
+            flash(AVISO_MIGRATION, "warning")
+            return redirect(url_for("ranking.index"))
+        if not ev:
+            flash("Evento não encontrado.", "danger")
+            return redirect(url_for("ranking.index"))
+        if ev["status"] != "finalizado":
+            flash("Os resultados só podem ser registrados depois que as inscrições forem encerradas.", "warning")
+            return redirect(url_for("ranking.index"))
+
+        consolidacao = consolidacao_evento.obter(conn, evento_id) or {}
+        ajustes = pesagem.ajustes(cur, evento_id)
+        por_categoria = {}
+        for r in registrados:
+            por_categoria.setdefault(r["categoria"], {})[r["inscricao_id"]] = r["colocacao"]
+        try:
+            chaves_evento = {c["categoria"]: c for c in chaveamento.listar(cur, evento_id)}
+        except mysql.connector.errors.ProgrammingError:
+            chaves_evento = {}
+
+        categorias = []
+        for categoria, _ in chaveamento.totais_por_categoria(consolidacao, ajustes):
+            atletas = chaveamento.atletas_da_categoria(consolidacao, categoria, ajustes)
+            colocacoes, origem = por_categoria.get(categoria), "registrado"
+            if colocacoes is None and categoria in chaves_evento:
+                chave = chaveamento.carregar(cur, evento_id, chaves_evento[categoria]["id"])
+                colocacoes, origem = calculo.colocacoes_da_chave(chave), "chave"
+            for atleta in atletas:
+                atleta["colocacao"] = (colocacoes or {}).get(atleta["inscricao_id"])
+            atletas.sort(key=lambda a: (a["colocacao"] is None, a["colocacao"] or 0, a["aluno_nome"]))
+            categorias.append({"nome": categoria, "atletas": atletas,
+                               "origem": origem if colocacoes else None})
+        return render_template("ranking/evento.html",
+            evento=ev, categorias=categorias, niveis=calculo.NIVEIS, colocacoes=calculo.COLOCACOES,
+            pontos=calculo.tabelas_pontos(cur, id_assoc).get(ev["ranking_nivel"] or "", {}),
+            back_url=url_for("ranking.index", temporada=ev["temporada"]))
+    finally:
+        cur.close()
+        conn.close()
+
+
+@bp_ranking.route("/evento/<int:evento_id>/nivel", methods=["POST"])
+@login_required
+def definir_nivel(evento_id):
+    """Define o nível do evento (vazio = não conta) e reaplica os pontos aos resultados dele."""
+    id_assoc = _id_associacao()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+    nivel = request.form.get("nivel") or None
+    if nivel and not calculo.nivel_valido(nivel):
+        flash("Nível inválido.", "danger")
+        return redirect(url_for("ranking.evento", evento_id=evento_id))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        try:
+            ev = _evento(cur, evento_id, id_assoc)
+            if not ev:
+                flash("Evento não encontrado.", "danger")
+                return redirect(url_for("ranking.index"))
+            if not ev["temporada"]:
+                flash("O evento precisa ter data para contar no ranking.", "warning")
+                return redirect(url_for("ranking.evento", evento_id=evento_id))
+            calculo.definir_nivel(cur, ev, nivel, calculo.tabelas_pontos(cur, id_assoc))
+            conn.commit()
+        except mysql.connector.errors.ProgrammingError:
+            conn.rollback()
+            flash(AVISO_MIGRATION, "warning")
+            return redirect(url_for("ranking.index"))
+        flash("Nível do evento atualizado." if nivel else "Evento retirado do ranking.", "success")
+    finally:
+        cur.close()
+        conn.close()
+    return redirect(url_for("ranking.evento", evento_id=evento_id))
+
+
+@bp_ranking.route("/evento/<int:evento_id>/resultados", methods=["POST"])
+@login_required
+def registrar_resultados(evento_id):
+    """Grava as colocações de uma categoria (campos colocacao_<inscricao_id>) e atualiza o ranking."""
+    id_assoc = _id_associacao()
+    if not id_assoc:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("painel.home"))
+    categoria = (request.form.get("categoria") or "").strip()
+    if not categoria:
+        flash("Categoria não informada.", "danger")
+        return redirect(url_for("ranking.evento", evento_id=evento_id))
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        try:
+            ev = _evento(cur, evento_id, id_assoc)
+        except mysql.connector.errors.ProgrammingError:
+            flash(AVISO_MIGRATION, "warning")
+            return redirect(url_for("ranking.index"))
+        if not ev or ev["status"] != "finalizado":
+            flash("Evento não encontrado ou com inscrições abertas.", "danger")
+            return redirect(url_for("ranking.index"))
+        if not ev["ranking_nivel"]:
+            flash("Defina o nível do evento antes de registrar resultados.", "warning")
+            return redirect(url_for("ranking.evento", evento_id=evento_id))
+
+        atletas = chaveamento.atletas_da_categoria(consolidacao_evento.obter(conn, evento_id) or {}, categoria,
+                                                   pesagem.ajustes(cur, evento_id))
+        colocacoes = []
+        for atleta in atletas:
+            colocacao = request.form.get(f"colocacao_{atleta['inscricao_id']}", type=int)
+            if colocacao and colocacao not in calculo.COLOCACOES:
+                flash(f"Colocação inválida para {atleta['aluno_nome']}.", "danger")
+                return redirect(url_for("ranking.evento", evento_id=evento_id))
+            if colocacao:
+                colocacoes.append(dict(atleta, colocacao=colocacao))
+        try:
+            gravados, descartados = calculo.registrar(cur, ev, categoria, colocacoes,
+                                                      calculo.tabelas_pontos(cur, id_assoc), current_user.id)
+            conn.commit()
+        except mysql.connector.errors.ProgrammingError:
+            conn.rollback()
+            flash(AVISO_MIGRATION, "warning")
+            return redirect(url_for("ranking.index"))
+        except mysql.connector.errors.IntegrityError:
+            conn.rollback()
+            flash(f"{categoria}: resultados não registrados (conflito com resultados já gravados). Tente novamente.",
+                  "danger")
+            return redirect(url_for("ranking.evento", evento_id=evento_id))
+        sem_aluno = sum(1 for c in colocacoes if not c.get("aluno_id"))
+        flash(f"{categoria}: {gravados} resultado(s) registrado(s)."
+              + (f" {sem_aluno} inscrição(ões) avulsa(s) sem aluno não pontuam." if sem_aluno else ""), "success")
+        if descartados:
+            flash(f"{categoria}: {descartados} colocação(ões) de aluno com mais de uma inscrição na categoria "
+                  "ignorada(s); vale a melhor colocação de cada aluno.", "warning")
+    finally:
+        cur.close()
+        conn.close()
+    return redirect(url_for("ranking.evento", evento_id=evento_id))
+
+
+@bp_ranking.route("/publico/<int:id_associacao>")
+def publico(id_associacao):
+    """Ranking público da associação — sem login (temporada e categoria pela query string)."""
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("SELECT id, nome FROM associacoes WHERE id = %s", (id_associacao,))
+        associacao = cur.fetchone()
+        if not associacao:
+            return "<h1>Associação não encontrada</h1>", 404
+        try:
+            temporadas = calculo.temporadas(cur, id_associacao=id_associacao)
+        except mysql.connector.errors.ProgrammingError:
+            temporadas = None
+        if temporadas is None:
+            return "<h1>Ranking não disponível</h1>", 404
+        temporada, categorias, categoria = _temporada_e_categoria(cur, temporadas, id_associacao=id_associacao)
+        return render_template("ranking/publico.html",
+            associacao=associacao, temporada=temporada, temporadas=temporadas,
+            categorias=categorias, categoria=categoria,
+            atletas=_agrupar_por_categoria(calculo.atletas(cur, temporada, id_associacao=id_associacao,
+                                                            categoria=categoria)),
+            academias=calculo.academias(cur, temporada, id_associacao=id_associacao))
+    finally:
+        cur.close()
+        conn.close()
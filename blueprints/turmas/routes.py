@@ -7,6 +7,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from config import get_db_connection
 from utils.modalidades import filtro_visibilidade_sql
+from utils import cache_calendario
 
 bp_turmas = Blueprint("turmas", __name__)
 
@@ -640,6 +641,8 @@ def editar_turma(turma_id):
                 )
         db.commit()
         db.close()
+        # Nome/horário da turma aparecem no calendário (academia antiga e nova)
+        cache_calendario.invalidar_academias([academia_turma, id_academia])
         flash("Turma atualizada com sucesso!", "success")
         redirect_url = request.form.get("next") or back_url
         return redirect(redirect_url)
@@ -875,6 +878,7 @@ def matricular_aluno(turma_id, aluno_id):
     )
     db.commit()
     db.close()
+    cache_calendario.invalidar_academias([turma.get("id_academia")])
     return jsonify({"ok": True, "msg": "Aluno matriculado com sucesso!"})
 
 
@@ -978,4 +982,5 @@ def remover_aluno_turma(turma_id, aluno_id):
     cursor.execute("UPDATE alunos SET TurmaID = NULL WHERE id = %s AND TurmaID = %s", (aluno_id, turma_id))
     db.commit()
     db.close()
+    cache_calendario.invalidar_academias([turma.get("id_academia")])
     return jsonify({"ok": True, "msg": "Aluno removido da turma."})
\ No newline at end of file
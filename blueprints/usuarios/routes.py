@@ -761,8 +761,8 @@ def sincronizar_foto_aluno():
 
         # Copiar o arquivo de foto do aluno para o usuário
         import os
-        import shutil
         from datetime import datetime
+        from utils import armazenamento
 
         foto_aluno = aluno["foto"]
         upload_folder = os.path.join(current_app.root_path, "static", "uploads")
@@ -779,10 +779,9 @@ def sincronizar_foto_aluno():
         if not ext:
             ext = ".png"
         nova_foto = f"usuario_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}{ext.lower()}"
-        arquivo_destino = os.path.join(upload_folder, nova_foto)
 
-        # Copiar arquivo
-        shutil.copy2(arquivo_origem, arquivo_destino)
+        # Mesmo conteúdo: novo nome para o blob da foto do aluno, sem duplicar no disco
+        armazenamento.copiar(foto_aluno, nova_foto)
 
         # Atualizar foto do usuário no banco
         cursor.execute("UPDATE usuarios SET foto=%s WHERE id=%s", (nova_foto, user_id))
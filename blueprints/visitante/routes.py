@@ -5,6 +5,7 @@ from datetime import date, datetime, timedelta
 from flask import render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
 from config import get_db_connection
+from utils import armazenamento
 from werkzeug.security import generate_password_hash
 import os
 import uuid
@@ -112,14 +113,8 @@ def _salvar_foto_base64(data_url, prefixo="visitante"):
     except Exception:
         return None
     
-    upload_dir = os.path.join("static", "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
     filename = f"{prefixo}_{uuid.uuid4().hex[:8]}.png"
-    filepath = os.path.join(upload_dir, filename)
-    
-    with open(filepath, "wb") as f:
-        f.write(img_data)
-    return filename
+    return armazenamento.salvar_bytes(img_data, filename)
 
 
 # ======================================================
@@ -629,11 +624,8 @@ def pagar_diaria(pagamento_id):
             if "comprovante" in request.files:
                 file = request.files["comprovante"]
                 if file and file.filename:
-                    upload_dir = os.path.join("static", "uploads", "comprovantes")
-                    os.makedirs(upload_dir, exist_ok=True)
                     filename = f"diaria_{pagamento_id}_{uuid.uuid4().hex[:8]}.{file.filename.rsplit('.', 1)[1].lower()}"
-                    filepath = os.path.join(upload_dir, filename)
-                    file.save(filepath)
+                    armazenamento.salvar_arquivo(file, os.path.join("comprovantes", filename))
                     comprovante = f"uploads/comprovantes/{filename}"
             
             observacoes = request.form.get("observacoes", "").strip() or None
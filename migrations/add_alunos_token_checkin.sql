@@ -0,0 +1,5 @@
+-- Token do QR de check-in no totem (perfil do aluno)
+-- Gerado sob demanda em /presencas/checkin/meu-token
+
+ALTER TABLE alunos ADD COLUMN token_checkin VARCHAR(32) NULL DEFAULT NULL COMMENT 'Token do QR de check-in (totem)';
+ALTER TABLE alunos ADD UNIQUE KEY uk_alunos_token_checkin (token_checkin);
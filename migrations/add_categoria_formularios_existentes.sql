@@ -0,0 +1,24 @@
+-- Garante o campo "categoria" logo após "peso" nos formulários que têm peso, data de
+-- nascimento e sexo (sem algum deles a categoria não tem como ser calculada). Até aqui isso era feito ao abrir a página de inscrição (INSERT num GET,
+-- com corrida entre atletas abrindo ao mesmo tempo); agora o cadastro/edição do
+-- formulário já grava o campo (utils.formularios_campos.completar_campos) e este
+-- script corrige os formulários existentes, uma vez. Pode ser executado de novo.
+USE unimaster;
+
+-- Abre espaço depois de peso
+UPDATE formularios_campos fc
+INNER JOIN formularios_campos fc_peso ON fc_peso.formulario_id = fc.formulario_id AND fc_peso.campo_chave = 'peso'
+INNER JOIN formularios_campos fc_data ON fc_data.formulario_id = fc.formulario_id AND fc_data.campo_chave = 'data_nascimento'
+INNER JOIN formularios_campos fc_sexo ON fc_sexo.formulario_id = fc.formulario_id AND fc_sexo.campo_chave = 'sexo'
+LEFT JOIN formularios_campos fc_cat ON fc_cat.formulario_id = fc.formulario_id AND fc_cat.campo_chave = 'categoria'
+SET fc.ordem = fc.ordem + 1
+WHERE fc_cat.id IS NULL AND fc.ordem > fc_peso.ordem;
+
+INSERT IGNORE INTO formularios_campos (formulario_id, campo_chave, label, ordem)
+SELECT fc_peso.formulario_id, 'categoria', 'Categoria', fc_peso.ordem + 1
+FROM formularios_campos fc_peso
+INNER JOIN formularios_campos fc_data ON fc_data.formulario_id = fc_peso.formulario_id
+    AND fc_data.campo_chave = 'data_nascimento'
+INNER JOIN formularios_campos fc_sexo ON fc_sexo.formulario_id = fc_peso.formulario_id
+    AND fc_sexo.campo_chave = 'sexo'
+WHERE fc_peso.campo_chave = 'peso';
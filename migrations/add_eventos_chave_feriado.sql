@@ -0,0 +1,21 @@
+-- Chave única de feriados por calendário: (nivel, nivel_id, data_inicio, titulo)
+-- A coluna gerada vale 1 para feriados e NULL para os demais tipos, então a unicidade
+-- só se aplica a feriados (aulas/eventos com mesmo título e data continuam permitidos).
+-- Permite a sincronização de feriados em lote com INSERT IGNORE.
+USE unimaster;
+
+-- Remove feriados duplicados no mesmo calendário (mantém o registro mais antigo)
+DELETE e1 FROM eventos e1
+JOIN eventos e2
+  ON e2.nivel = e1.nivel
+ AND e2.nivel_id = e1.nivel_id
+ AND e2.data_inicio = e1.data_inicio
+ AND e2.titulo = e1.titulo
+ AND e2.tipo = 'feriado'
+ AND e2.id < e1.id
+WHERE e1.tipo = 'feriado';
+
+ALTER TABLE eventos
+    ADD COLUMN IF NOT EXISTS feriado_chave TINYINT(1) AS (IF(tipo = 'feriado', 1, NULL)) PERSISTENT
+        COMMENT '1 para feriados; entra na chave única uk_evento_feriado',
+    ADD UNIQUE KEY IF NOT EXISTS uk_evento_feriado (nivel, nivel_id, data_inicio, titulo, feriado_chave);
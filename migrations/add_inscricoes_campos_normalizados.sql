@@ -0,0 +1,49 @@
+-- Campos mais usados do formulário de inscrição materializados a partir de dados_form,
+-- como colunas geradas indexadas: ordenação, filtro e agrupamento por categoria, peso,
+-- sexo, data de nascimento e graduação passam a ser feitos no SQL, sem json.loads por linha.
+-- Valores fora do formato esperado viram NULL (nunca erro no INSERT/UPDATE, também em
+-- modo estrito): datas só são convertidas depois de conferir mês e dia (inclusive 31/02),
+-- sem CAST/STR_TO_DATE sobre data inválida, e o peso tem no máximo 3 dígitos inteiros
+-- (cabe em DECIMAL(6,2)). fix_inscricoes_campos_normalizados.sql corrige bancos que já
+-- rodaram a versão anterior desta migration.
+USE unimaster;
+
+ALTER TABLE eventos_competicoes_inscricoes
+    ADD COLUMN IF NOT EXISTS campo_categoria VARCHAR(191)
+        AS (NULLIF(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.categoria')), '')) PERSISTENT
+        COMMENT 'dados_form.categoria',
+    ADD COLUMN IF NOT EXISTS campo_peso DECIMAL(6,2)
+        AS (IF(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.peso')) REGEXP '^[0-9]{1,3}([.,][0-9]+)?$',
+               CAST(REGEXP_SUBSTR(REPLACE(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.peso')), ',', '.'), '^[0-9]{1,3}([.][0-9]{1,2})?') AS DECIMAL(6,2)),
+               NULL)) PERSISTENT
+        COMMENT 'dados_form.peso em kg (aceita vírgula decimal; até 999, casas além da 2ª são descartadas)',
+    ADD COLUMN IF NOT EXISTS campo_sexo CHAR(1)
+        AS (IF(UPPER(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.sexo'))) IN ('M', 'F'),
+               UPPER(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.sexo'))),
+               NULL)) PERSISTENT
+        COMMENT 'dados_form.sexo (M/F)',
+    ADD COLUMN IF NOT EXISTS campo_data_nascimento DATE
+        AS (CASE
+                WHEN JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')) REGEXP '^[12][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])'
+                    THEN CASE WHEN CAST(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 9, 2) AS UNSIGNED)
+                                   <= DAYOFMONTH(LAST_DAY(CONCAT(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7), '-01')))
+                              THEN CAST(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 10) AS DATE) END
+                WHEN JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')) REGEXP '^(0[1-9]|[12][0-9]|3[01])/(0[1-9]|1[0-2])/[12][0-9]{3}'
+                    THEN CASE WHEN CAST(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 2) AS UNSIGNED)
+                                   <= DAYOFMONTH(LAST_DAY(CONCAT(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7, 4), '-', SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 4, 2), '-01')))
+                              THEN CAST(CONCAT(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7, 4), '-', SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 4, 2), '-', LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 2)) AS DATE) END
+            END) PERSISTENT
+        COMMENT 'dados_form.data_nascimento (ISO ou dd/mm/aaaa)',
+    ADD COLUMN IF NOT EXISTS campo_graduacao_id INT
+        AS (IF(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.graduacao_id')) REGEXP '^[0-9]{1,9}$',
+               CAST(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.graduacao_id')) AS UNSIGNED),
+               NULL)) PERSISTENT
+        COMMENT 'dados_form.graduacao_id';
+
+ALTER TABLE eventos_competicoes_inscricoes
+    ADD INDEX IF NOT EXISTS idx_insc_evento_categoria (evento_id, status, campo_categoria, campo_peso),
+    ADD INDEX IF NOT EXISTS idx_insc_evento_peso (evento_id, status, campo_peso),
+    ADD INDEX IF NOT EXISTS idx_insc_evento_sexo (evento_id, status, campo_sexo),
+    ADD INDEX IF NOT EXISTS idx_insc_evento_nascimento (evento_id, status, campo_data_nascimento),
+    ADD INDEX IF NOT EXISTS idx_insc_evento_graduacao (evento_id, status, campo_graduacao_id),
+    ADD INDEX IF NOT EXISTS idx_insc_aluno_categoria (evento_id, academia_id, aluno_id, campo_categoria);
@@ -0,0 +1,16 @@
+-- Chaves de idempotência da API de sincronização de presenças (tablets)
+-- Cada registro enviado pelo cliente traz uma chave única; reenvios da mesma chave são ignorados.
+
+CREATE TABLE IF NOT EXISTS presencas_sync_chaves (
+    chave VARCHAR(64) NOT NULL,
+    usuario_id INT(11) NULL DEFAULT NULL,
+    turma_id INT(11) NULL DEFAULT NULL,
+    data_presenca DATE NULL DEFAULT NULL,
+    criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chave),
+    INDEX idx_psc_criado_em (criado_em),
+    CONSTRAINT fk_psc_usuario FOREIGN KEY (usuario_id) REFERENCES usuarios (id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+-- Limpeza periódica sugerida (chaves antigas não precisam ser mantidas):
+-- DELETE FROM presencas_sync_chaves WHERE criado_em < NOW() - INTERVAL 90 DAY;
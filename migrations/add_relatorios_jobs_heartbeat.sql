@@ -0,0 +1,7 @@
+-- Lease dos relatórios em segundo plano (utils/relatorios_jobs.py): o processo que gera o
+-- relatório grava heartbeat_em periodicamente; só jobs 'processando' sem heartbeat recente
+-- (lease vencido) voltam para a fila ao subir o servidor ou na verificação periódica.
+USE unimaster;
+
+ALTER TABLE relatorios_jobs
+    ADD COLUMN IF NOT EXISTS heartbeat_em DATETIME NULL DEFAULT NULL COMMENT 'Último sinal do processo que gera o relatório' AFTER iniciado_em;
@@ -0,0 +1,18 @@
+-- eventos_competicoes_academia_pagamentos passa a ser o resumo financeiro de cada
+-- (evento, academia): totais recalculados a partir das linhas de origem (inscrições
+-- enviadas, confirmações de pagamento por inscrição e abatimentos) na mesma transação
+-- de cada alteração. A tela de pagamentos só lê daqui.
+-- Depois de aplicar, preencher/conferir os resumos com:
+--   python scripts/reconciliar_pagamentos_eventos.py --corrigir
+USE unimaster;
+
+ALTER TABLE eventos_competicoes_academia_pagamentos
+    ADD COLUMN IF NOT EXISTS total_inscricoes INT NOT NULL DEFAULT 0
+        COMMENT 'Inscrições enviadas da academia no evento' AFTER academia_id,
+    ADD COLUMN IF NOT EXISTS total_abatimentos DECIMAL(10,2) NOT NULL DEFAULT 0
+        COMMENT 'Soma dos abatimentos registrados pela associação' AFTER valor_total_esperado,
+    ADD COLUMN IF NOT EXISTS valor_confirmado DECIMAL(10,2) NOT NULL DEFAULT 0
+        COMMENT 'Taxa × inscrições com pagamento confirmado pela academia' AFTER total_abatimentos;
+
+ALTER TABLE eventos_competicoes_academia_pagamentos
+    ADD INDEX IF NOT EXISTS idx_pag_acad_evento_inscricoes (evento_id, total_inscricoes);
@@ -0,0 +1,47 @@
+-- Chaveamento das competições: uma chave por (evento, categoria), gerada a partir das
+-- inscrições enviadas (consolidação). A semente do sorteio fica gravada: a mesma
+-- semente com os mesmos atletas e cabeças de chave gera exatamente a mesma chave.
+USE unimaster;
+
+CREATE TABLE IF NOT EXISTS eventos_competicoes_chaves (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    evento_id INT NOT NULL,
+    categoria VARCHAR(191) NOT NULL,
+    tipo ENUM('eliminatoria','todos_contra_todos') NOT NULL DEFAULT 'eliminatoria',
+    semente INT UNSIGNED NOT NULL COMMENT 'Semente do sorteio (reproduz a chave)',
+    tamanho INT NOT NULL COMMENT 'Posições da chave (potência de 2 na eliminatória)',
+    total_atletas INT NOT NULL,
+    usuario_id INT NULL DEFAULT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_chave_evento FOREIGN KEY (evento_id) REFERENCES eventos_competicoes(id) ON DELETE CASCADE,
+    UNIQUE KEY uk_chave_evento_categoria (evento_id, categoria)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+CREATE TABLE IF NOT EXISTS eventos_competicoes_chaves_atletas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    chave_id INT NOT NULL,
+    posicao INT NOT NULL COMMENT 'Posição na chave (0 = topo)',
+    inscricao_id INT NOT NULL,
+    academia_id INT NULL DEFAULT NULL,
+    aluno_nome VARCHAR(255) NULL DEFAULT NULL,
+    academia_nome VARCHAR(255) NULL DEFAULT NULL,
+    cabeca_chave INT NULL DEFAULT NULL COMMENT '1 = primeiro cabeça de chave',
+    CONSTRAINT fk_chave_atleta_chave FOREIGN KEY (chave_id) REFERENCES eventos_competicoes_chaves(id) ON DELETE CASCADE,
+    UNIQUE KEY uk_chave_atleta_posicao (chave_id, posicao),
+    UNIQUE KEY uk_chave_atleta_inscricao (chave_id, inscricao_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+CREATE TABLE IF NOT EXISTS eventos_competicoes_chaves_lutas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    chave_id INT NOT NULL,
+    rodada INT NOT NULL COMMENT '1 = primeira rodada',
+    posicao INT NOT NULL COMMENT 'Ordem da luta na rodada (0 = topo)',
+    inscricao_a_id INT NULL DEFAULT NULL,
+    inscricao_b_id INT NULL DEFAULT NULL,
+    vencedor_inscricao_id INT NULL DEFAULT NULL,
+    resultado VARCHAR(40) NULL DEFAULT NULL COMMENT 'ippon, waza-ari, decisão, W.O., bye...',
+    registrado_por INT NULL DEFAULT NULL,
+    registrado_em DATETIME NULL DEFAULT NULL,
+    CONSTRAINT fk_chave_luta_chave FOREIGN KEY (chave_id) REFERENCES eventos_competicoes_chaves(id) ON DELETE CASCADE,
+    UNIQUE KEY uk_chave_luta (chave_id, rodada, posicao)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,14 @@
+-- Consolidação pré-calculada das inscrições enviadas de cada evento/competição
+-- (agrupamentos por academia e categoria, totais e mapas de nomes), usada por
+-- consolidar, imprimir e exportar. "versao" sobe a cada alteração nas inscrições
+-- enviadas; "dados" NULL = precisa ser recalculada.
+USE unimaster;
+
+CREATE TABLE IF NOT EXISTS eventos_competicoes_consolidacao (
+    evento_id INT(11) NOT NULL,
+    versao INT(11) NOT NULL DEFAULT 1,
+    dados LONGTEXT NULL DEFAULT NULL COMMENT 'JSON da consolidação (texto para preservar a ordem das chaves)',
+    gerado_em DATETIME NULL DEFAULT NULL,
+    PRIMARY KEY (evento_id),
+    CONSTRAINT fk_consolidacao_evento FOREIGN KEY (evento_id) REFERENCES eventos_competicoes(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,18 @@
+-- Pesagem no dia da competição: peso medido de cada inscrição enviada e a situação
+-- resultante (categoria mantida, reclassificado para outra categoria ou desclassificado).
+-- A inscrição em si não muda; o chaveamento aplica reclassificação/desclassificação.
+USE unimaster;
+
+CREATE TABLE IF NOT EXISTS eventos_competicoes_pesagens (
+    inscricao_id INT NOT NULL PRIMARY KEY,
+    evento_id INT NOT NULL,
+    peso_medido DECIMAL(6,2) NOT NULL,
+    categoria_inscricao VARCHAR(191) NULL DEFAULT NULL COMMENT 'Categoria da inscrição no momento da pesagem',
+    categoria_nova VARCHAR(191) NULL DEFAULT NULL COMMENT 'Categoria após reclassificação',
+    situacao ENUM('ok','reclassificado','desclassificado') NOT NULL,
+    usuario_id INT NULL DEFAULT NULL,
+    pesado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT fk_pesagem_inscricao FOREIGN KEY (inscricao_id) REFERENCES eventos_competicoes_inscricoes(id) ON DELETE CASCADE,
+    CONSTRAINT fk_pesagem_evento FOREIGN KEY (evento_id) REFERENCES eventos_competicoes(id) ON DELETE CASCADE,
+    INDEX idx_pesagem_evento_situacao (evento_id, situacao)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,68 @@
+-- Ranking por temporada a partir dos resultados das competições.
+-- ranking_resultados guarda a colocação (e os pontos, pela tabela vigente no registro)
+-- de cada atleta por evento/categoria; ranking_atletas e ranking_academias são os
+-- totais mantidos de forma incremental a cada registro (blueprints/ranking/calculo.py).
+-- scripts/recalcular_ranking.py recalcula os totais dos resultados e confere.
+USE unimaster;
+
+-- Nível do evento para a tabela de pontos (NULL = não conta para o ranking)
+ALTER TABLE eventos_competicoes
+    ADD COLUMN IF NOT EXISTS ranking_nivel VARCHAR(30) NULL DEFAULT NULL COMMENT 'regional, estadual, nacional...';
+
+CREATE TABLE IF NOT EXISTS ranking_pontos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    id_associacao INT NOT NULL,
+    nivel VARCHAR(30) NOT NULL,
+    colocacao INT NOT NULL,
+    pontos DECIMAL(8,2) NOT NULL,
+    CONSTRAINT fk_ranking_pontos_assoc FOREIGN KEY (id_associacao) REFERENCES associacoes(id) ON DELETE CASCADE,
+    UNIQUE KEY uk_ranking_pontos (id_associacao, nivel, colocacao)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+CREATE TABLE IF NOT EXISTS ranking_resultados (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    evento_id INT NOT NULL,
+    id_associacao INT NOT NULL,
+    temporada SMALLINT NOT NULL,
+    nivel VARCHAR(30) NOT NULL,
+    categoria VARCHAR(191) NOT NULL,
+    inscricao_id INT NULL DEFAULT NULL,
+    aluno_id INT NOT NULL,
+    academia_id INT NULL DEFAULT NULL,
+    colocacao INT NOT NULL,
+    pontos DECIMAL(8,2) NOT NULL DEFAULT 0,
+    registrado_por INT NULL DEFAULT NULL,
+    registrado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_ranking_resultado (evento_id, categoria, aluno_id),
+    INDEX idx_ranking_resultado_temporada (temporada, id_associacao, categoria)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+CREATE TABLE IF NOT EXISTS ranking_atletas (
+    temporada SMALLINT NOT NULL,
+    id_associacao INT NOT NULL,
+    categoria VARCHAR(191) NOT NULL,
+    aluno_id INT NOT NULL,
+    academia_id INT NULL DEFAULT NULL COMMENT 'Academia do resultado mais recente',
+    pontos DECIMAL(10,2) NOT NULL DEFAULT 0,
+    resultados INT NOT NULL DEFAULT 0,
+    ouros INT NOT NULL DEFAULT 0,
+    pratas INT NOT NULL DEFAULT 0,
+    bronzes INT NOT NULL DEFAULT 0,
+    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (temporada, id_associacao, categoria, aluno_id),
+    INDEX idx_ranking_atletas_pontos (temporada, id_associacao, categoria, pontos)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
+
+CREATE TABLE IF NOT EXISTS ranking_academias (
+    temporada SMALLINT NOT NULL,
+    id_associacao INT NOT NULL,
+    academia_id INT NOT NULL,
+    pontos DECIMAL(10,2) NOT NULL DEFAULT 0,
+    resultados INT NOT NULL DEFAULT 0,
+    ouros INT NOT NULL DEFAULT 0,
+    pratas INT NOT NULL DEFAULT 0,
+    bronzes INT NOT NULL DEFAULT 0,
+    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (temporada, id_associacao, academia_id),
+    INDEX idx_ranking_academias_pontos (temporada, id_associacao, pontos)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,28 @@
+-- Fila de relatórios gerados em segundo plano (utils/relatorios_jobs.py).
+-- Persistida para sobreviver a reinícios: o servidor recoloca na fila os jobs interrompidos
+-- (lease vencido, ver add_relatorios_jobs_heartbeat.sql) até o limite de tentativas e marca
+-- os demais como erro.
+USE unimaster;
+
+CREATE TABLE IF NOT EXISTS relatorios_jobs (
+    id CHAR(32) NOT NULL,
+    tipo VARCHAR(50) NOT NULL COMMENT 'Gerador registrado (ex.: inscricoes_pdf)',
+    usuario_id INT(11) NOT NULL,
+    evento_id INT(11) NULL DEFAULT NULL,
+    parametros LONGTEXT NOT NULL COMMENT 'JSON com tudo que o gerador precisa para refazer o relatório',
+    status ENUM('pendente', 'processando', 'concluido', 'erro') NOT NULL DEFAULT 'pendente',
+    tentativas TINYINT NOT NULL DEFAULT 0,
+    linhas_total INT NOT NULL DEFAULT 0,
+    linhas_processadas INT NOT NULL DEFAULT 0,
+    arquivo VARCHAR(255) NULL DEFAULT NULL COMMENT 'Caminho relativo à pasta instance da aplicação',
+    nome_download VARCHAR(255) NULL DEFAULT NULL,
+    mimetype VARCHAR(100) NULL DEFAULT NULL,
+    erro TEXT NULL DEFAULT NULL,
+    criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    iniciado_em DATETIME NULL DEFAULT NULL,
+    concluido_em DATETIME NULL DEFAULT NULL,
+    PRIMARY KEY (id),
+    INDEX idx_relatorios_jobs_status (status),
+    INDEX idx_relatorios_jobs_usuario (usuario_id, criado_em),
+    CONSTRAINT fk_relatorios_jobs_usuario FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
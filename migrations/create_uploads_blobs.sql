@@ -0,0 +1,15 @@
+-- Contagem de referências do armazenamento de uploads por conteúdo (utils/armazenamento.py).
+-- Cada linha é um blob em static/uploads/blobs/<aa>/<bb>/<sha256>; referencias é o número de
+-- nomes (fotos, logos, anexos, comprovantes) que apontam para ele.
+-- Depois de aplicar, deduplicar os arquivos existentes e montar a contagem com:
+--   python scripts/armazenamento_uploads.py importar
+USE unimaster;
+
+CREATE TABLE IF NOT EXISTS uploads_blobs (
+    sha256 CHAR(64) NOT NULL PRIMARY KEY,
+    tamanho BIGINT NOT NULL DEFAULT 0,
+    referencias INT NOT NULL DEFAULT 0,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_uploads_blobs_referencias (referencias)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,24 @@
+-- Corrige as colunas geradas de add_inscricoes_campos_normalizados.sql em bancos que já
+-- rodaram a versão anterior: em modo estrito, datas que passavam no formato mas não
+-- existem (ex.: 31/02/2010) e pesos acima de 9999,99 faziam o INSERT/UPDATE da inscrição
+-- falhar. Mesmas expressões da migration atualizada.
+USE unimaster;
+
+ALTER TABLE eventos_competicoes_inscricoes
+    MODIFY COLUMN campo_peso DECIMAL(6,2)
+        AS (IF(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.peso')) REGEXP '^[0-9]{1,3}([.,][0-9]+)?$',
+               CAST(REGEXP_SUBSTR(REPLACE(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.peso')), ',', '.'), '^[0-9]{1,3}([.][0-9]{1,2})?') AS DECIMAL(6,2)),
+               NULL)) PERSISTENT
+        COMMENT 'dados_form.peso em kg (aceita vírgula decimal; até 999, casas além da 2ª são descartadas)',
+    MODIFY COLUMN campo_data_nascimento DATE
+        AS (CASE
+                WHEN JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')) REGEXP '^[12][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])'
+                    THEN CASE WHEN CAST(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 9, 2) AS UNSIGNED)
+                                   <= DAYOFMONTH(LAST_DAY(CONCAT(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7), '-01')))
+                              THEN CAST(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 10) AS DATE) END
+                WHEN JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')) REGEXP '^(0[1-9]|[12][0-9]|3[01])/(0[1-9]|1[0-2])/[12][0-9]{3}'
+                    THEN CASE WHEN CAST(LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 2) AS UNSIGNED)
+                                   <= DAYOFMONTH(LAST_DAY(CONCAT(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7, 4), '-', SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 4, 2), '-01')))
+                              THEN CAST(CONCAT(SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 7, 4), '-', SUBSTRING(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 4, 2), '-', LEFT(JSON_UNQUOTE(JSON_EXTRACT(dados_form, '$.data_nascimento')), 2)) AS DATE) END
+            END) PERSISTENT
+        COMMENT 'dados_form.data_nascimento (ISO ou dd/mm/aaaa)';
@@ -7,13 +7,22 @@ Usado pelo systemd ao ativar o serviço.
 Variáveis de ambiente:
   UNIMASTER_HOST  - IP para escutar (default: 127.0.0.1 para uso com Nginx)
   UNIMASTER_PORT  - Porta (default: 5000)
+  UNIMASTER_X_ACCEL_UPLOADS - Location interna do nginx para downloads protegidos
+                  (ex.: /_uploads_protegidos/); sem ela a app envia os arquivos
 """
 import os
-from waitress import serve
-from app import app
 
 host = os.environ.get("UNIMASTER_HOST", "127.0.0.1")
 port = int(os.environ.get("UNIMASTER_PORT", "5000"))
 
 if __name__ == "__main__":
+    # Imports sob o guard: os processos 'spawn' (pool da importação de calendário em PDF)
+    # reexecutam este módulo como __mp_main__ e não devem carregar a aplicação Flask
+    from waitress import serve
+    from app import app
+
+    # Só no processo do servidor (não ao importar app.py): retoma os relatórios em
+    # segundo plano cujo lease venceu e passa a vigiar os leases
+    from utils import relatorios_jobs
+    relatorios_jobs.retomar(app)
     serve(app, host=host, port=port)
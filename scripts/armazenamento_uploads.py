@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Manutenção do armazenamento de uploads por conteúdo (utils/armazenamento.py).
+
+Comandos:
+    importar  Deduplica os arquivos já existentes em static/uploads: cada conteúdo vira um
+              blob em static/uploads/blobs/ e os nomes passam a ser hard links para ele.
+              Em seguida recalcula as referências (como recontar).
+    recontar  Regrava uploads_blobs a partir do disco (referências = links do blob - 1).
+    gc        Lista os blobs sem referência, mais antigos que a carência; com --remover, apaga.
+
+Uso:
+    python scripts/armazenamento_uploads.py importar
+    python scripts/armazenamento_uploads.py recontar
+    python scripts/armazenamento_uploads.py gc [--carencia-horas 24] [--remover]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Adiciona o diretório raiz ao path
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from config import get_db_connection
+from utils import armazenamento
+
+BASE_UPLOADS = armazenamento.pasta_uploads(RAIZ)
+PASTA_BLOBS = os.path.join(BASE_UPLOADS, armazenamento.PASTA_BLOBS)
+
+
+def _blobs():
+    """(sha256, caminho, stat) de cada blob no disco."""
+    for raiz, dirs, arquivos in os.walk(PASTA_BLOBS):
+        dirs[:] = [d for d in dirs if d != ".tmp"]
+        for nome in arquivos:
+            if len(nome) == 64:
+                caminho = os.path.join(raiz, nome)
+                yield nome, caminho, os.stat(caminho)
+
+
+def _nomes():
+    """Arquivos de static/uploads fora da pasta de blobs."""
+    for raiz, dirs, arquivos in os.walk(BASE_UPLOADS):
+        if os.path.abspath(raiz) == os.path.abspath(BASE_UPLOADS):
+            dirs[:] = [d for d in dirs if d != armazenamento.PASTA_BLOBS]
+        for nome in arquivos:
+            if ".tmp-" not in nome:
+                yield os.path.join(raiz, nome)
+
+
+def importar():
+    novos = economizados = 0
+    for caminho in _nomes():
+        if os.stat(caminho).st_nlink > 1:
+            continue  # já é um nome de blob
+        sha = armazenamento._hash_arquivo(caminho)
+        blob = armazenamento.caminho_blob(BASE_UPLOADS, sha)
+        if os.path.exists(blob):
+            economizados += os.path.getsize(caminho)
+            armazenamento._vincular(blob, caminho)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(caminho, blob)
+            novos += 1
+    print(f"{novos} blob(s) criado(s); {economizados / 1024 / 1024:.1f} MB de duplicatas liberados.")
+
+
+def recontar():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    total = 0
+    try:
+        cur.execute("UPDATE uploads_blobs SET referencias = 0")
+        for sha, _, st in _blobs():
+            cur.execute("""
+                INSERT INTO uploads_blobs (sha256, tamanho, referencias) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE tamanho = VALUES(tamanho), referencias = VALUES(referencias)
+            """, (sha, st.st_size, st.st_nlink - 1))
+            total += 1
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    print(f"{total} blob(s) recontado(s).")
+
+
+def gc(carencia_horas, remover):
+    limite = time.time() - carencia_horas * 3600
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    quantidade = liberado = 0
+    try:
+        cur.execute("SELECT sha256, referencias FROM uploads_blobs")
+        referencias = {r["sha256"]: r["referencias"] for r in cur.fetchall()}
+        for sha, caminho, st in _blobs():
+            # st_nlink > 1: algum nome ainda aponta para o blob, independente da contagem;
+            # a contagem só importa quando os nomes são cópias (sem suporte a hard link).
+            if st.st_nlink > 1 or referencias.get(sha, 0) > 0 or st.st_mtime > limite:
+                continue
+            quantidade += 1
+            liberado += st.st_size
+            print(f"{'Removendo' if remover else 'Órfão'}: {sha} ({st.st_size} bytes)")
+            if remover:
+                os.remove(caminho)
+                cur.execute("DELETE FROM uploads_blobs WHERE sha256 = %s AND referencias <= 0", (sha,))
+                conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    print("=" * 80)
+    acao = "removido(s)" if remover else "sem referência (use --remover para apagar)"
+    print(f"{quantidade} blob(s) {acao}, {liberado / 1024 / 1024:.1f} MB.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("importar", help="Deduplicar os uploads existentes")
+    sub.add_parser("recontar", help="Recalcular as referências a partir do disco")
+    p_gc = sub.add_parser("gc", help="Coletar blobs sem referência")
+    p_gc.add_argument("--carencia-horas", type=float, default=24,
+                      help="Ignorar blobs gravados/usados há menos que isto (padrão: 24)")
+    p_gc.add_argument("--remover", action="store_true", help="Apagar os blobs órfãos")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        importar()
+        recontar()
+    elif args.comando == "recontar":
+        recontar()
+    else:
+        gc(args.carencia_horas, args.remover)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Recálculo completo do ranking das competições (ranking_atletas e ranking_academias).
+
+Os totais são mantidos de forma incremental a cada registro de resultados; este script
+os recalcula do zero a partir de ranking_resultados e lista as diferenças em relação ao
+que está gravado. Com --corrigir, reconstrói os totais da temporada (ou de todas).
+
+Uso:
+    python scripts/recalcular_ranking.py [--temporada ANO] [--corrigir]
+
+Sai com código 1 se encontrar divergências e --corrigir não foi usado.
+"""
+import argparse
+import os
+import sys
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_db_connection
+from blueprints.ranking import calculo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--temporada", type=int, help="Verificar apenas esta temporada (ano)")
+    parser.add_argument("--corrigir", action="store_true", help="Reconstruir os totais a partir dos resultados")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        divergencias = calculo.divergencias(cur, args.temporada)
+        for tabela, chave, gravado, calculado in divergencias:
+            print(f"{tabela} {chave}:")
+            print(f"    gravado={gravado} calculado={calculado}  (pontos, resultados, ouros, pratas, bronzes)")
+        if divergencias and args.corrigir:
+            calculo.reconstruir(cur, args.temporada)
+            conn.commit()
+        else:
+            conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+
+    print("=" * 80)
+    escopo = f"temporada {args.temporada}" if args.temporada else "todas as temporadas"
+    print(f"Ranking verificado ({escopo}): {len(divergencias)} total(is) divergente(s).")
+    if divergencias and args.corrigir:
+        print("Totais reconstruídos.")
+    return 1 if divergencias and not args.corrigir else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
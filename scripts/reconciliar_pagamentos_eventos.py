@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Reconciliação do resumo de pagamentos das academias em eventos/competições
+(eventos_competicoes_academia_pagamentos).
+
+Recalcula cada (evento, academia) a partir das linhas de origem — inscrições enviadas,
+confirmações de pagamento por inscrição e abatimentos — e lista as diferenças em
+relação ao que está gravado. Com --corrigir, regrava os resumos divergentes.
+
+Uso:
+    python scripts/reconciliar_pagamentos_eventos.py [--evento ID] [--corrigir]
+
+Sai com código 1 se encontrar divergências e --corrigir não foi usado.
+"""
+import argparse
+import os
+import sys
+from decimal import Decimal
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_db_connection
+from blueprints.eventos_competicoes import resumo_pagamentos
+
+TOLERANCIA = Decimal("0.005")
+
+
+def _eventos(cur, evento_id):
+    if evento_id:
+        return [evento_id]
+    cur.execute("""
+        SELECT evento_id FROM eventos_competicoes_inscricoes
+        UNION
+        SELECT evento_id FROM eventos_competicoes_academia_pagamentos
+        ORDER BY evento_id
+    """)
+    return [r["evento_id"] for r in cur.fetchall()]
+
+
+def _diferente(campo, gravado, calculado):
+    if campo == "status":
+        return gravado != calculado
+    return abs(Decimal(gravado or 0) - Decimal(calculado or 0)) > TOLERANCIA
+
+
+def _divergencias(cur, evento_id):
+    """[(academia_id, [(campo, gravado, calculado), ...]), ...] do evento."""
+    calculados = resumo_pagamentos.calcular(cur, evento_id)
+    campos = ", ".join(resumo_pagamentos.CAMPOS_RESUMO)
+    cur.execute(f"""
+        SELECT academia_id, {campos}
+        FROM eventos_competicoes_academia_pagamentos
+        WHERE evento_id = %s
+    """, (evento_id,))
+    gravados = {r["academia_id"]: r for r in cur.fetchall()}
+
+    divergencias = []
+    for calc in calculados:
+        gravado = gravados.get(calc["academia_id"])
+        if gravado is None:
+            diffs = [(campo, None, calc[campo]) for campo in resumo_pagamentos.CAMPOS_RESUMO]
+        else:
+            diffs = [
+                (campo, gravado[campo], calc[campo])
+                for campo in resumo_pagamentos.CAMPOS_RESUMO
+                if _diferente(campo, gravado[campo], calc[campo])
+            ]
+        if diffs:
+            divergencias.append((calc["academia_id"], diffs))
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--evento", type=int, help="Reconciliar apenas este evento")
+    parser.add_argument("--corrigir", action="store_true", help="Regravar os resumos divergentes")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    total_divergencias = 0
+    try:
+        eventos = _eventos(cur, args.evento)
+        for evento_id in eventos:
+            divergencias = _divergencias(cur, evento_id)
+            for academia_id, diffs in divergencias:
+                total_divergencias += 1
+                print(f"Evento {evento_id} / academia {academia_id}:")
+                for campo, gravado, calculado in diffs:
+                    print(f"    {campo}: gravado={gravado} calculado={calculado}")
+            if divergencias and args.corrigir:
+                resumo_pagamentos.atualizar(cur, evento_id)
+                conn.commit()
+            else:
+                conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+
+    print("=" * 80)
+    print(f"{len(eventos)} evento(s) verificado(s), {total_divergencias} resumo(s) divergente(s).")
+    if total_divergencias and args.corrigir:
+        print("Resumos corrigidos.")
+    return 1 if total_divergencias and not args.corrigir else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento dos arquivos enviados (static/uploads) endereçado por conteúdo.
+
+Cada conteúdo é gravado uma única vez em static/uploads/blobs/<aa>/<bb>/<sha256>; o nome
+que o sistema já usa (ex.: "eventos_anexos/evento_3_x.pdf", "logos/academia_7.png",
+"aluno_12_20240101.png") vira um hard link para esse blob. O banco, os templates e o nginx
+continuam vendo os mesmos caminhos, e o mesmo regulamento anexado a todos os eventos da
+temporada ocupa o disco uma vez só.
+
+uploads_blobs guarda o número de referências (nomes) de cada blob; salvar_*/copiar somam,
+remover subtrai. Blobs sem referência são apagados por scripts/armazenamento_uploads.py gc.
+Se o sistema de arquivos não aceitar hard link, o nome recebe uma cópia (sem deduplicação,
+mas nada quebra: apagar um blob nunca afeta um nome já criado).
+Todo arquivo enviado deve passar por aqui: gravar direto por cima de um nome existente
+alteraria o conteúdo do blob compartilhado.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+import mysql.connector
+from flask import current_app
+
+from config import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+PASTA_UPLOADS = os.path.join("static", "uploads")
+PASTA_BLOBS = "blobs"
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def pasta_uploads(raiz=None):
+    return os.path.join(raiz or current_app.root_path, PASTA_UPLOADS)
+
+
+def caminho_blob(base_uploads, sha):
+    return os.path.join(base_uploads, PASTA_BLOBS, sha[:2], sha[2:4], sha)
+
+
+def _absoluto(base_uploads, destino):
+    base = os.path.realpath(base_uploads)
+    caminho = os.path.realpath(os.path.join(base, destino))
+    if not caminho.startswith(base + os.sep) or caminho.startswith(os.path.join(base, PASTA_BLOBS) + os.sep):
+        raise ValueError(f"Destino de upload inválido: {destino}")
+    return caminho
+
+
+def _blocos_stream(stream):
+    return iter(lambda: stream.read(TAMANHO_BLOCO), b"")
+
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in _blocos_stream(f):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def contar_referencias(sha, tamanho, delta):
+    """Soma delta às referências do blob (conexão própria, commit imediato)."""
+    try:
+        conn = get_db_connection()
+    except mysql.connector.Error as e:
+        logger.warning("uploads_blobs indisponível (%s): %s", sha, e)
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO uploads_blobs (sha256, tamanho, referencias)
+            VALUES (%s, %s, GREATEST(%s, 0))
+            ON DUPLICATE KEY UPDATE referencias = GREATEST(referencias + %s, 0), atualizado_em = NOW()
+        """, (sha, tamanho, delta, delta))
+        conn.commit()
+    except mysql.connector.Error as e:
+        # Migração ainda não aplicada: o gc --recontar reconstrói a contagem pelo disco
+        logger.warning("Referências do blob %s não atualizadas: %s", sha, e)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _gravar_blob(base_uploads, blocos):
+    """Grava os blocos num temporário calculando o SHA-256 e move para o lugar do blob."""
+    pasta_tmp = os.path.join(base_uploads, PASTA_BLOBS, ".tmp")
+    os.makedirs(pasta_tmp, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=pasta_tmp)
+    h = hashlib.sha256()
+    tamanho = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for bloco in blocos:
+                h.update(bloco)
+                f.write(bloco)
+                tamanho += len(bloco)
+        sha = h.hexdigest()
+        blob = caminho_blob(base_uploads, sha)
+        if os.path.exists(blob):
+            os.remove(tmp)
+            os.utime(blob)  # o gc respeita a carência pelo mtime
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp, blob)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return sha, blob, tamanho
+
+
+def _vincular(blob, caminho):
+    """Cria (ou troca atomicamente) o nome apontando para o blob."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tmp = f"{caminho}.tmp-{uuid.uuid4().hex}"
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        shutil.copyfile(blob, tmp)
+    try:
+        os.replace(tmp, caminho)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _salvar(blocos, destino, base_uploads=None):
+    base_uploads = base_uploads or pasta_uploads()
+    caminho = _absoluto(base_uploads, destino)
+    sha, blob, tamanho = _gravar_blob(base_uploads, blocos)
+    if os.path.isfile(caminho):
+        _liberar(caminho)
+    _vincular(blob, caminho)
+    contar_referencias(sha, tamanho, 1)
+    return destino
+
+
+def salvar_arquivo(file_storage, destino):
+    """
+    Grava um upload (werkzeug FileStorage) em static/uploads/<destino>, lendo em blocos.
+    Retorna destino.
+    """
+    return _salvar(_blocos_stream(file_storage.stream), destino)
+
+
+def salvar_bytes(dados, destino):
+    """Grava conteúdo já em memória (ex.: imagem base64 da câmera). Retorna destino."""
+    return _salvar([dados], destino)
+
+
+def copiar(origem, destino):
+    """Novo nome para o conteúdo de origem (ambos relativos a static/uploads)."""
+    base_uploads = pasta_uploads()
+    with open(_absoluto(base_uploads, origem), "rb") as f:
+        return _salvar(_blocos_stream(f), destino, base_uploads)
+
+
+def _liberar(caminho):
+    sha = _hash_arquivo(caminho)
+    tamanho = os.path.getsize(caminho)
+    os.remove(caminho)
+    contar_referencias(sha, tamanho, -1)
+
+
+def remover(destino):
+    """Apaga o nome (relativo a static/uploads) e libera a referência ao blob."""
+    try:
+        caminho = _absoluto(pasta_uploads(), destino)
+    except ValueError:
+        return False
+    if not os.path.isfile(caminho):
+        return False
+    _liberar(caminho)
+    return True
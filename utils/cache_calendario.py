@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em memória das visões mensais do calendário.
+Chave: (nivel, nivel_id, ano, mes, aluno_id) — aluno_id é None nas visões de gestor.
+As entradas guardam o resultado já expandido (eventos_por_data + contexto) e são
+invalidadas pelas rotas que alteram eventos, exceções ou turmas. O TTL é só uma rede
+de segurança para alterações feitas fora do sistema (SQL direto, outro processo).
+Cada invalidação também avança a versão do calendário (versao()), usada como base de
+ETag/Last-Modified nos feeds .ics sem consultar o banco — por isso toda escrita em
+eventos/eventos_excecoes feita pelo sistema (calendário, turmas, alunos e também as
+competições de eventos_competicoes) precisa chamar invalidar*() depois do commit; sem
+isso o feed responde 304 com conteúdo velho até a virada do dia.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+TTL_SEGUNDOS = 600
+MAX_ENTRADAS = 2000
+
+_lock = threading.Lock()
+_entradas = OrderedDict()  # chave -> (expira_em, valor)
+_inicio = time.time()
+_epoca = [0, _inicio]  # invalidações gerais: [contador, instante]
+_versoes = {}  # (nivel, nivel_id) -> (contador, instante)
+
+
+def chave_mes(nivel, nivel_id, ano, mes, aluno_id=None):
+    return (nivel, int(nivel_id), int(ano), int(mes), int(aluno_id) if aluno_id else None)
+
+
+def obter(chave):
+    """Valor em cache ou None. Entradas expiradas são descartadas."""
+    with _lock:
+        item = _entradas.get(chave)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del _entradas[chave]
+            return None
+        _entradas.move_to_end(chave)
+        return item[1]
+
+
+def guardar(chave, valor):
+    with _lock:
+        _entradas[chave] = (time.monotonic() + TTL_SEGUNDOS, valor)
+        _entradas.move_to_end(chave)
+        while len(_entradas) > MAX_ENTRADAS:
+            _entradas.popitem(last=False)
+
+
+def invalidar(nivel=None, nivel_id=None):
+    """
+    Remove as entradas de um calendário (todos os meses e alunos).
+    Sem argumentos limpa tudo — usado quando a alteração se propaga entre níveis.
+    """
+    with _lock:
+        if nivel is None or not nivel_id:
+            _epoca[0] += 1
+            _epoca[1] = time.time()
+        else:
+            chave_versao = (nivel, int(nivel_id))
+            _versoes[chave_versao] = (_versoes.get(chave_versao, (0, 0))[0] + 1, time.time())
+        if nivel is None:
+            _entradas.clear()
+            return
+        nivel_id = int(nivel_id) if nivel_id else None
+        for chave in [c for c in _entradas if c[0] == nivel and (nivel_id is None or c[1] == nivel_id)]:
+            del _entradas[chave]
+
+
+def invalidar_niveis(niveis):
+    """niveis: [(nivel, nivel_id), ...]"""
+    for nivel, nivel_id in set(niveis):
+        if nivel and nivel_id:
+            invalidar(nivel, nivel_id)
+
+
+def invalidar_academias(academia_ids):
+    invalidar_niveis(('academia', a) for a in academia_ids)
+
+
+def versao(nivel, nivel_id):
+    """
+    (marca, instante) da última alteração conhecida do calendário neste processo.
+    A marca muda a cada invalidação (e a cada reinício); o instante serve de Last-Modified.
+    """
+    with _lock:
+        contador, instante = _versoes.get((nivel, int(nivel_id)), (0, _inicio))
+        return f"{int(_inicio)}.{_epoca[0]}.{contador}", max(instante, _epoca[1])
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco de arquivos exportados (XLSX / CSV / PDF), em <instance>/cache_exportacoes.
+A chave inclui a versão dos dados exportados (ex.: versão das inscrições do evento),
+então um arquivo desatualizado nunca é servido: só deixa de ser pedido e sai pela
+remoção dos menos usados quando a pasta passa do limite de tamanho.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+MAX_BYTES = int(os.environ.get("CACHE_EXPORTACOES_MB", "200")) * 1024 * 1024
+TEMPORARIO_TTL_SEGUNDOS = 3600  # temporários de exportações que falharam no meio
+PASTA = "cache_exportacoes"
+
+_lock = threading.Lock()
+
+
+def _pasta():
+    pasta = os.path.join(current_app.instance_path, PASTA)
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def chave(*partes):
+    """Chave estável a partir de qualquer combinação de valores serializáveis."""
+    texto = json.dumps(partes, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def novo_arquivo(sufixo):
+    """Caminho temporário dentro da pasta do cache (mesmo disco: guardar() só renomeia)."""
+    return os.path.join(_pasta(), f".tmp-{uuid.uuid4().hex}{sufixo}")
+
+
+def obter(chave_cache, sufixo):
+    """Caminho do arquivo em cache, ou None. Atualiza o mtime (usado como "último acesso")."""
+    caminho = os.path.join(_pasta(), chave_cache + sufixo)
+    try:
+        os.utime(caminho)
+    except OSError:
+        return None
+    return caminho
+
+
+def guardar(chave_cache, sufixo, caminho_temporario):
+    """Move o arquivo gerado para o cache e remove os menos usados se passar do limite."""
+    caminho = os.path.join(_pasta(), chave_cache + sufixo)
+    os.replace(caminho_temporario, caminho)
+    _remover_excedente(manter=caminho)
+    return caminho
+
+
+def _remover_excedente(manter=None):
+    with _lock:
+        arquivos = []
+        total = 0
+        limite_temporarios = time.time() - TEMPORARIO_TTL_SEGUNDOS
+        with os.scandir(_pasta()) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file():
+                    continue
+                st = entrada.stat()
+                if entrada.name.startswith(".tmp-"):
+                    if st.st_mtime < limite_temporarios:
+                        try:
+                            os.remove(entrada.path)
+                        except OSError:
+                            pass
+                    continue
+                arquivos.append((st.st_mtime, st.st_size, entrada.path))
+                total += st.st_size
+        if total <= MAX_BYTES:
+            return
+        for _, tamanho, caminho in sorted(arquivos):
+            if caminho == manter:
+                continue
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            if total <= MAX_BYTES:
+                break
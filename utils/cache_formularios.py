@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em memória do esquema dos formulários de inscrição, por formulario_id.
+Cada entrada guarda os campos (formularios_campos, na ordem) e o validador de cada
+campo, escolhido uma vez na montagem; inscrever, incluir avulso, editar inscrição e as
+telas de consolidação/exportação leem daqui sem consultar o esquema no banco.
+blueprints/formularios invalida a entrada ao salvar ou excluir um formulário. O TTL é
+só uma rede de segurança para alterações feitas fora do sistema (SQL direto).
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from utils.formularios_campos import get_label
+
+TTL_SEGUNDOS = 600
+MAX_ENTRADAS = 500
+
+CAMPOS_DATA = ("data_nascimento", "ultimo_exame_faixa", "rg_data_emissao", "data_cadastro_zempo")
+
+_lock = threading.Lock()
+_entradas = OrderedDict()  # formulario_id -> (expira_em, esquema)
+_colunas = {}  # (tabela, coluna) -> bool; estrutura do banco só muda com migração + reinício
+
+_RE_DATA_BR = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_RE_DATA_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_RE_DECIMAL = re.compile(r"^\d{1,3}(?:[.,]\d{1,3})?$")
+_RE_INTEIRO = re.compile(r"^\d+$")
+_RE_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_RE_NAO_DIGITO = re.compile(r"\D")
+
+
+# Validadores: texto (já sem espaços nas pontas, não vazio) -> (valor convertido, erro).
+# O valor convertido é o que vai para a coluna do aluno; dados_form guarda o texto.
+def _validar_data(texto):
+    m = _RE_DATA_BR.match(texto[:10]) or _RE_DATA_ISO.match(texto[:10])
+    if m:
+        partes = m.groups()
+        dia, mes, ano = (partes[0], partes[1], partes[2]) if "/" in texto[:10] else (partes[2], partes[1], partes[0])
+        try:
+            return datetime(int(ano), int(mes), int(dia)).date(), None
+        except ValueError:
+            pass
+    return None, "data inválida (use dd/mm/aaaa)"
+
+
+def _validar_peso(texto):
+    if _RE_DECIMAL.match(texto):
+        return float(texto.replace(",", ".")), None
+    return None, "número inválido"
+
+
+def _validar_id(texto):
+    if _RE_INTEIRO.match(texto):
+        return int(texto), None
+    return None, "opção inválida"
+
+
+def _validar_email(texto):
+    if _RE_EMAIL.match(texto):
+        return texto, None
+    return None, "e-mail inválido"
+
+
+def _validar_digitos(quantidade, mensagem):
+    def validar(texto):
+        if len(_RE_NAO_DIGITO.sub("", texto)) == quantidade:
+            return texto, None
+        return None, mensagem
+    return validar
+
+
+def _sem_validacao(texto):
+    return texto, None
+
+
+VALIDADORES = {
+    "peso": _validar_peso,
+    "graduacao_id": _validar_id,
+    "TurmaID": _validar_id,
+    "professor_id": _validar_id,
+    "email": _validar_email,
+    "cpf": _validar_digitos(11, "CPF deve ter 11 dígitos"),
+    "responsavel_financeiro_cpf": _validar_digitos(11, "CPF deve ter 11 dígitos"),
+    "cep": _validar_digitos(8, "CEP deve ter 8 dígitos"),
+}
+VALIDADORES.update({chave: _validar_data for chave in CAMPOS_DATA})
+
+
+def _montar(formulario_id, linhas):
+    campos = tuple(
+        {"campo_chave": r["campo_chave"], "label": r["label"] or get_label(r["campo_chave"]),
+         "ordem": r["ordem"], "obrigatorio": bool(r.get("obrigatorio"))}
+        for r in linhas
+    )
+    return {
+        "formulario_id": formulario_id,
+        "campos": campos,
+        "chaves": frozenset(c["campo_chave"] for c in campos),
+        "validadores": tuple(
+            (c["campo_chave"], c["label"], c["obrigatorio"], VALIDADORES.get(c["campo_chave"], _sem_validacao))
+            for c in campos
+        ),
+    }
+
+
+def obter(cur, formulario_id):
+    """Esquema do formulário (cursor dictionary só é usado se não estiver em cache)."""
+    formulario_id = int(formulario_id or 0)
+    with _lock:
+        item = _entradas.get(formulario_id)
+        if item is not None and item[0] >= time.monotonic():
+            _entradas.move_to_end(formulario_id)
+            return item[1]
+    cur.execute("""
+        SELECT campo_chave, label, ordem, obrigatorio
+        FROM formularios_campos WHERE formulario_id = %s ORDER BY ordem, id
+    """, (formulario_id,))
+    esquema = _montar(formulario_id, cur.fetchall())
+    with _lock:
+        _entradas[formulario_id] = (time.monotonic() + TTL_SEGUNDOS, esquema)
+        _entradas.move_to_end(formulario_id)
+        while len(_entradas) > MAX_ENTRADAS:
+            _entradas.popitem(last=False)
+    return esquema
+
+
+def campos(cur, formulario_id):
+    """Lista de campos (cópias: quem chama pode alterar) no formato das telas."""
+    return [dict(c) for c in obter(cur, formulario_id)["campos"]]
+
+
+def invalidar(formulario_id=None):
+    """Descarta o esquema de um formulário (sem argumento, de todos)."""
+    with _lock:
+        if formulario_id is None:
+            _entradas.clear()
+        else:
+            _entradas.pop(int(formulario_id), None)
+
+
+def validar(esquema, form, ignorar=("categoria",)):
+    """
+    Lê os campos do formulário enviado (campo_<chave>) com os validadores do esquema.
+    Retorna (dados, convertidos, erros): dados é o texto de cada campo (para dados_form),
+    convertidos o valor tipado dos campos preenchidos e válidos (data, número, id) e
+    erros a lista de mensagens "Label: motivo".
+    """
+    dados, convertidos, erros = {}, {}, []
+    for chave, label, obrigatorio, validador in esquema["validadores"]:
+        if chave in ignorar:
+            continue
+        texto = (form.get(f"campo_{chave}") or "").strip()
+        dados[chave] = texto
+        if not texto:
+            if obrigatorio:
+                erros.append(f"{label}: obrigatório")
+            continue
+        valor, erro = validador(texto)
+        if erro:
+            erros.append(f"{label}: {erro}")
+        else:
+            convertidos[chave] = valor
+    return dados, convertidos, erros
+
+
+def coluna_existe(cur, tabela, coluna):
+    """SHOW COLUMNS uma vez por processo (tabela/coluna fixas no código, nunca do usuário)."""
+    chave = (tabela, coluna)
+    if chave not in _colunas:
+        try:
+            cur.execute(f"SHOW COLUMNS FROM {tabela} LIKE %s", (coluna,))
+            existe = cur.fetchone() is not None
+        except Exception:
+            return False
+        _colunas[chave] = existe
+    return _colunas[chave]
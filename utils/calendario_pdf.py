@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Extração de eventos de calendários em PDF (ex.: calendário FPJU).
+Dividido em duas etapas para permitir paralelismo:
+  1) extrair_paginas: lê tabelas e texto de um grupo de páginas (roda nos processos do pool);
+  2) eventos_de_paginas: interpreta as páginas já extraídas, em ordem (mês corrente e
+     "linha sem dia" dependem das linhas anteriores, então esta etapa é sequencial).
+Sem dependências do Flask, para poder ser importado pelos processos filhos.
+"""
+import re
+from datetime import date
+
+MESES_ABREV = {'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6,
+               'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12}
+
+MSG_SEM_BIBLIOTECA = "Biblioteca pypdf não instalada. Execute: pip install pypdf"
+
+
+# ============================================================
+# 🔹 Leitura do PDF
+# ============================================================
+def contar_paginas(caminho):
+    try:
+        import pdfplumber
+        with pdfplumber.open(caminho) as pdf:
+            return len(pdf.pages)
+    except ImportError:
+        pass
+    from pypdf import PdfReader
+    return len(PdfReader(caminho).pages)
+
+
+def extrair_paginas(caminho, indices):
+    """
+    Tabelas e texto das páginas `indices` do PDF em `caminho`.
+    Retorna [{'pagina': i, 'tabelas': [...], 'texto': str}]. Sem pdfplumber, só texto (pypdf).
+    """
+    resultado = []
+    try:
+        import pdfplumber
+    except ImportError:
+        pdfplumber = None
+
+    if pdfplumber:
+        with pdfplumber.open(caminho) as pdf:
+            for i in indices:
+                page = pdf.pages[i]
+                try:
+                    tabelas = page.extract_tables() or []
+                except Exception:
+                    tabelas = []
+                resultado.append({'pagina': i, 'tabelas': tabelas, 'texto': page.extract_text() or ''})
+        return resultado
+
+    from pypdf import PdfReader
+    reader = PdfReader(caminho)
+    for i in indices:
+        resultado.append({'pagina': i, 'tabelas': [], 'texto': reader.pages[i].extract_text() or ''})
+    return resultado
+
+
+# ============================================================
+# 🔹 Interpretação
+# ============================================================
+def parsear_dias_evento(dia_str, mes_num, ano):
+    """
+    Converte string de dia(s) em lista de datas YYYY-MM-DD.
+    Ex: "24" -> [2026-01-24], "01 e 02" -> [2026-02-01, 2026-02-02],
+        "03 a 05" -> [2026-02-03, 2026-02-04, 2026-02-05],
+        "31/10 a 01/11" -> [2026-10-31, 2026-11-01]
+    """
+    if not dia_str or not isinstance(dia_str, str):
+        return []
+    dia_str = dia_str.strip()
+    if not dia_str or not dia_str[0].isdigit():
+        return []
+
+    datas = []
+
+    # Formato "31/10 a 01/11" (intervalo entre meses)
+    m_range = re.match(r'(\d{1,2})/(\d{1,2})\s+a\s+(\d{1,2})/(\d{1,2})', dia_str)
+    if m_range:
+        d1, m1, d2, m2 = int(m_range.group(1)), int(m_range.group(2)), int(m_range.group(3)), int(m_range.group(4))
+        if 1 <= d1 <= 31 and 1 <= m1 <= 12 and 1 <= d2 <= 31 and 1 <= m2 <= 12:
+            for d, m in [(d1, m1), (d2, m2)]:
+                try:
+                    dt = date(ano, m, d)
+                    datas.append(dt.strftime('%Y-%m-%d'))
+                except ValueError:
+                    pass
+        return datas
+
+    # Formato "01 e 02" ou "22 e 23"
+    m_e = re.match(r'(\d{1,2})\s+e\s+(\d{1,2})', dia_str)
+    if m_e:
+        d1, d2 = int(m_e.group(1)), int(m_e.group(2))
+        for d in [d1, d2]:
+            if 1 <= d <= 31:
+                try:
+                    dt = date(ano, mes_num, d)
+                    datas.append(dt.strftime('%Y-%m-%d'))
+                except ValueError:
+                    pass
+        return datas
+
+    # Formato "03 a 05" ou "27 a 29" ou "14 a 16" ou "17 a 20"
+    m_a = re.match(r'(\d{1,2})\s+a\s+(\d{1,2})', dia_str)
+    if m_a:
+        d1, d2 = int(m_a.group(1)), int(m_a.group(2))
+        for d in range(min(d1, d2), max(d1, d2) + 1):
+            if 1 <= d <= 31:
+                try:
+                    dt = date(ano, mes_num, d)
+                    datas.append(dt.strftime('%Y-%m-%d'))
+                except ValueError:
+                    pass
+        return datas
+
+    # Dia único: "24", "31", "01", "07"
+    m_single = re.match(r'^(\d{1,2})(?:\s|$|/)', dia_str)
+    if m_single:
+        d = int(m_single.group(1))
+        if 1 <= d <= 31:
+            try:
+                dt = date(ano, mes_num, d)
+                datas.append(dt.strftime('%Y-%m-%d'))
+            except ValueError:
+                pass
+    return datas
+
+
+def _eventos_de_tabelas(paginas):
+    """
+    Eventos de PDF com estrutura de tabela (MÊS | DIA | EVENTO | REALIZAÇÃO | LOCAL).
+    Ex: Calendário FPJU.
+    """
+    ano = date.today().year
+    # Tenta inferir ano do documento (ex: "2026" no título)
+    for pagina in paginas[:2]:
+        m_ano = re.search(r'20[2-3][0-9]', pagina['texto'] or '')
+        if m_ano:
+            ano = int(m_ano.group())
+            break
+
+    mes_atual = None
+    eventos = []
+    vistos = set()
+
+    for pagina in paginas:
+        for table in pagina['tabelas']:
+            if not table or len(table) < 2:
+                continue
+            for row in table:
+                if not row or len(row) < 3:
+                    continue
+                mes_cel, dia_cel, evento_cel = (row[0] or ''), (row[1] or ''), (row[2] or '')
+
+                # Pula cabeçalhos
+                if mes_cel and ('MÊS' in str(mes_cel).upper() or 'DIA' in str(dia_cel).upper() or 'EVENTO' in str(evento_cel).upper()):
+                    continue
+                if not evento_cel or len(str(evento_cel).strip()) < 3:
+                    continue
+
+                # Atualiza mês atual quando há nova célula de mês
+                if mes_cel and str(mes_cel).strip().upper() in MESES_ABREV:
+                    mes_atual = MESES_ABREV[str(mes_cel).strip().upper()]
+
+                if mes_atual is None:
+                    continue
+
+                titulo = re.sub(r'\s+', ' ', str(evento_cel).replace('\n', ' ')).strip()[:200]
+                if not titulo or titulo.lower() in ('evento', 'local', 'realização'):
+                    continue
+
+                datas = parsear_dias_evento(str(dia_cel), mes_atual, ano)
+
+                if not datas and dia_cel is None:
+                    # Linha sem dia (ex: Workshop) - usa último dia conhecido da tabela
+                    if eventos:
+                        datas = [eventos[-1]['data_str']]
+
+                for data_str in datas:
+                    chave = (data_str, titulo[:60])
+                    if chave not in vistos:
+                        vistos.add(chave)
+                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': f"{mes_cel} {dia_cel} {titulo}"})
+
+    return eventos
+
+
+def _eventos_de_texto(texto):
+    """Eventos por expressões de data no texto corrido (dd/mm/aaaa, dd/mm, "dd de mês")."""
+    padrao_data_completa = re.compile(r'\b(\d{1,2})[/\-\.](\d{1,2})[/\-\.](\d{2,4})\b', re.IGNORECASE)
+    padrao_data_parcial = re.compile(r'(?<!\d)\b(\d{1,2})[/\-\.](\d{1,2})\b(?!\d)')
+    meses_pt = {
+        'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+        'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+    }
+    padrao_data_extensa = re.compile(
+        r'\b(\d{1,2})\s+de\s+(' + '|'.join(meses_pt.keys()) + r')(?:\s+de\s+(\d{2,4}))?\b',
+        re.IGNORECASE
+    )
+
+    ano_atual = date.today().year
+    m_ano = re.search(r'20[2-3][0-9]', texto)
+    if m_ano:
+        ano_atual = int(m_ano.group())
+
+    eventos = []
+    vistos = set()
+
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        if not linha or len(linha) < 3:
+            continue
+
+        for m in padrao_data_completa.finditer(linha):
+            dia, mes, ano = int(m.group(1)), int(m.group(2)), int(m.group(3))
+            if ano < 100:
+                ano += 2000 if ano < 50 else 1900
+            if 1 <= dia <= 31 and 1 <= mes <= 12 and 2020 <= ano <= 2030:
+                data_str = f"{ano}-{mes:02d}-{dia:02d}"
+                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
+                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
+                if titulo and len(titulo) > 2 and not re.match(r'^\d+[/\-\.]\d+', titulo):
+                    chave = (data_str, titulo[:50])
+                    if chave not in vistos:
+                        vistos.add(chave)
+                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
+
+        for m in padrao_data_extensa.finditer(linha):
+            dia = int(m.group(1))
+            mes = meses_pt.get(m.group(2).lower(), 1)
+            ano = int(m.group(3)) if m.group(3) else ano_atual
+            if ano < 100:
+                ano += 2000 if ano < 50 else 1900
+            if 1 <= dia <= 31 and 1 <= mes <= 12:
+                data_str = f"{ano}-{mes:02d}-{dia:02d}"
+                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
+                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
+                if titulo and len(titulo) > 2:
+                    chave = (data_str, titulo[:50])
+                    if chave not in vistos:
+                        vistos.add(chave)
+                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
+
+        for m in padrao_data_parcial.finditer(linha):
+            dia, mes = int(m.group(1)), int(m.group(2))
+            if 1 <= dia <= 31 and 1 <= mes <= 12:
+                data_str = f"{ano_atual}-{mes:02d}-{dia:02d}"
+                titulo = (linha[:m.start()].strip() or linha[m.end():].strip()).strip()
+                titulo = re.sub(r'\s+', ' ', titulo)[:200] if titulo else f"Evento {data_str}"
+                if titulo and len(titulo) > 2 and not re.match(r'^\d+[/\-\.]', titulo):
+                    chave = (data_str, titulo[:50])
+                    if chave not in vistos:
+                        vistos.add(chave)
+                        eventos.append({'data_str': data_str, 'titulo': titulo, 'linha_raw': linha})
+
+    return eventos
+
+
+def eventos_de_paginas(paginas):
+    """
+    Identifica possíveis eventos (data + título) nas páginas extraídas, em ordem de página.
+    Tenta primeiro a estrutura de tabela, depois o texto corrido.
+    Retorna (eventos, erro) com eventos = [{'data_str': 'YYYY-MM-DD', 'titulo': str, 'linha_raw': str}, ...]
+    """
+    paginas = sorted(paginas, key=lambda p: p['pagina'])
+
+    # 1) Extração por tabela (calendários estruturados como FPJU)
+    eventos = _eventos_de_tabelas(paginas)
+    if not eventos:
+        # 2) Fallback: extração por texto
+        texto = "\n".join(p['texto'] for p in paginas if p['texto'])
+        if not texto.strip():
+            return [], "Nenhum texto encontrado no PDF."
+        eventos = _eventos_de_texto(texto)
+
+    eventos.sort(key=lambda x: x['data_str'])
+    return eventos, None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Entrega de arquivos enviados pelos usuários (static/uploads) depois da checagem de permissão.
+
+- Produção (UNIMASTER_X_ACCEL_UPLOADS definido, ex.: "/_uploads_protegidos/"): a resposta
+  só leva o cabeçalho X-Accel-Redirect e o nginx envia o arquivo pela location interna
+  (deploy/nginx-*.conf), com Range, ETag e Last-Modified próprios. A thread do Waitress
+  fica livre logo depois dos cabeçalhos, mesmo para PDFs grandes.
+- Sem nginx (execução local): send_file com conditional=True — ETag, Last-Modified,
+  304 para If-None-Match/If-Modified-Since e 206 para Range.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import current_app, send_file
+
+PASTA_UPLOADS = os.path.join("static", "uploads")
+
+
+def _prefixo_accel():
+    return current_app.config.get("X_ACCEL_UPLOADS") or os.environ.get("UNIMASTER_X_ACCEL_UPLOADS")
+
+
+def caminho_upload(caminho_relativo):
+    """Caminho absoluto de um arquivo em static/uploads, ou None se não existe ou sai da pasta."""
+    if not caminho_relativo:
+        return None
+    base = os.path.realpath(os.path.join(current_app.root_path, PASTA_UPLOADS))
+    caminho = os.path.realpath(os.path.join(base, caminho_relativo))
+    if not caminho.startswith(base + os.sep) or not os.path.isfile(caminho):
+        return None
+    return caminho
+
+
+def _content_disposition(nome, como_anexo):
+    tipo = "attachment" if como_anexo else "inline"
+    if not nome:
+        return tipo
+    try:
+        nome.encode("ascii")
+    except UnicodeEncodeError:
+        ascii_nome = nome.encode("ascii", "ignore").decode("ascii") or "arquivo"
+        return f"{tipo}; filename=\"{ascii_nome}\"; filename*=UTF-8''{quote(nome, safe='')}"
+    return f"{tipo}; filename=\"{nome}\""
+
+
+def enviar_upload(caminho_relativo, nome_download=None, mimetype=None, como_anexo=True):
+    """
+    Resposta com o arquivo em static/uploads/<caminho_relativo>. Retorna None se o arquivo
+    não existe (o chamador decide a mensagem). Conteúdo privado: nunca em cache compartilhado.
+    """
+    caminho = caminho_upload(caminho_relativo)
+    if caminho is None:
+        return None
+    mimetype = mimetype or mimetypes.guess_type(caminho)[0] or "application/octet-stream"
+    nome_download = nome_download or os.path.basename(caminho)
+
+    prefixo = _prefixo_accel()
+    if prefixo:
+        base = os.path.realpath(os.path.join(current_app.root_path, PASTA_UPLOADS))
+        relativo = os.path.relpath(caminho, base).replace(os.sep, "/")
+        resp = current_app.response_class(mimetype=mimetype)
+        resp.headers["X-Accel-Redirect"] = prefixo.rstrip("/") + "/" + quote(relativo)
+        resp.headers["Content-Disposition"] = _content_disposition(nome_download, como_anexo)
+    else:
+        resp = send_file(
+            caminho,
+            mimetype=mimetype,
+            as_attachment=como_anexo,
+            download_name=nome_download,
+            conditional=True,
+            etag=True,
+            max_age=0,
+        )
+    resp.cache_control.private = True
+    resp.cache_control.public = False
+    return resp
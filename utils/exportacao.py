@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação em streaming (XLSX write-only / PDF paginado / CSV).
+As linhas são consumidas de um iterável (ex.: cursor não-bufferizado) e
+gravadas direto em arquivo temporário; a resposta envia o arquivo em blocos.
+Memória fica limitada ao lote atual, independente do total de linhas.
+"""
+import csv
+import os
+import tempfile
+
+from flask import Response
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_PDF = "application/pdf"
+MIME_CSV = "text/csv; charset=utf-8"
+
+TAMANHO_LOTE = 500
+TAMANHO_BLOCO = 64 * 1024
+
+
+def iterar_cursor(cursor, tamanho=TAMANHO_LOTE):
+    """Itera as linhas de um cursor usando fetchmany (sem carregar tudo com fetchall)."""
+    while True:
+        lote = cursor.fetchmany(tamanho)
+        if not lote:
+            break
+        for row in lote:
+            yield row
+
+
+def novo_temporario(sufixo):
+    """Arquivo temporário vazio para os gravar_* (caminho=...); quem cria remove em caso de erro."""
+    fd, caminho = tempfile.mkstemp(suffix=sufixo, prefix="unimaster_export_")
+    os.close(fd)
+    return caminho
+
+
+def remover_arquivo(caminho):
+    """Remove o temporário (ignora se já não existe)."""
+    if not caminho:
+        return
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def gravar_xlsx(cabecalho, linhas, titulo="Dados", larguras=None, caminho=None):
+    """
+    Grava um XLSX em modo write-only (openpyxl) e retorna o caminho do arquivo.
+    linhas: iterável de listas/tuplas já formatadas, na ordem do cabeçalho.
+    larguras: lista opcional de larguras de coluna (mesmo tamanho do cabeçalho).
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    caminho = caminho or novo_temporario(".xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo[:31])
+    if larguras:
+        for idx, largura in enumerate(larguras, start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = largura
+    ws.freeze_panes = "A2"
+
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    celulas_cabecalho = []
+    for label in cabecalho:
+        cell = WriteOnlyCell(ws, value=label)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        celulas_cabecalho.append(cell)
+    ws.append(celulas_cabecalho)
+
+    for linha in linhas:
+        ws.append(list(linha))
+    wb.save(caminho)
+    return caminho
+
+
+def gravar_csv(cabecalho, linhas, caminho=None):
+    """Grava CSV (separador ';', UTF-8 com BOM para abrir corretamente no Excel)."""
+    caminho = caminho or novo_temporario(".csv")
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(cabecalho)
+        for linha in linhas:
+            writer.writerow(linha)
+    return caminho
+
+
+def gravar_pdf_tabela(cabecalho, linhas, titulo="", subtitulo="", paisagem=True,
+                      larguras=None, tamanho_fonte=8, margem=28, caminho=None, progresso=None,
+                      margem_vertical=None):
+    """
+    Grava uma tabela em PDF desenhando página a página com o canvas do reportlab.
+    Diferente do platypus.Table, não monta a tabela inteira em memória.
+    larguras: pesos relativos por coluna (normalizados para a largura útil).
+    margem: margem lateral em pontos; margem_vertical (padrão: igual a margem) no topo e na base.
+    progresso: callable opcional chamado com o número de linhas já desenhadas.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas as rl_canvas
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    caminho = caminho or novo_temporario(".pdf")
+    page_size = landscape(A4) if paisagem else A4
+    margem_vertical = margem if margem_vertical is None else margem_vertical
+    largura_pagina, altura_pagina = page_size
+    util = largura_pagina - 2 * margem
+    pesos = larguras or [1] * len(cabecalho)
+    total_pesos = float(sum(pesos)) or 1.0
+    cols = [util * p / total_pesos for p in pesos]
+    altura_linha = tamanho_fonte + 6
+
+    c = rl_canvas.Canvas(caminho, pagesize=page_size)
+    c.setTitle(titulo or "Relatório")
+    pagina = [0]
+
+    def _cortar(texto, largura, fonte):
+        texto = "" if texto is None else str(texto)
+        if stringWidth(texto, fonte, tamanho_fonte) <= largura - 4:
+            return texto
+        while texto and stringWidth(texto + "…", fonte, tamanho_fonte) > largura - 4:
+            texto = texto[:-1]
+        return texto + "…"
+
+    def _linha(valores, y, fonte, fundo=False):
+        if fundo:
+            c.setFillGray(0.88)
+            c.rect(margem, y - 3, util, altura_linha, stroke=0, fill=1)
+            c.setFillGray(0)
+        c.setFont(fonte, tamanho_fonte)
+        x = margem
+        for valor, largura in zip(valores, cols):
+            c.drawString(x + 2, y, _cortar(valor, largura, fonte))
+            x += largura
+        c.setStrokeGray(0.7)
+        c.line(margem, y - 3, margem + util, y - 3)
+
+    def _nova_pagina():
+        if pagina[0]:
+            c.showPage()
+        pagina[0] += 1
+        y = altura_pagina - margem_vertical
+        if titulo and pagina[0] == 1:
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(margem, y - 14, titulo)
+            y -= 22
+            if subtitulo:
+                c.setFont("Helvetica", 10)
+                c.drawString(margem, y - 10, subtitulo)
+                y -= 16
+        c.setFont("Helvetica", 7)
+        c.drawRightString(largura_pagina - margem, margem_vertical / 2, f"Página {pagina[0]}")
+        y -= altura_linha
+        _linha(cabecalho, y, "Helvetica-Bold", fundo=True)
+        return y - altura_linha
+
+    y = _nova_pagina()
+    n = 0
+    for valores in linhas:
+        if y < margem_vertical:
+            y = _nova_pagina()
+        _linha(valores, y, "Helvetica")
+        y -= altura_linha
+        n += 1
+        if progresso and n % TAMANHO_LOTE == 0:
+            progresso(n)
+    if n == 0:
+        c.setFont("Helvetica", tamanho_fonte)
+        c.drawString(margem, y, "Nenhum registro encontrado.")
+    c.save()
+    if progresso:
+        progresso(n)
+    return caminho
+
+
+def resposta_arquivo(caminho, nome_download, mimetype, remover=True):
+    """Envia o arquivo em blocos e (por padrão) remove o temporário ao final."""
+    tamanho = os.path.getsize(caminho)
+
+    def _gerar():
+        try:
+            with open(caminho, "rb") as f:
+                while True:
+                    bloco = f.read(TAMANHO_BLOCO)
+                    if not bloco:
+                        break
+                    yield bloco
+        finally:
+            if remover:
+                remover_arquivo(caminho)
+
+    resp = Response(_gerar(), mimetype=mimetype, direct_passthrough=True)
+    resp.headers["Content-Length"] = str(tamanho)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{nome_download}"'
+    return resp
+
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Calendário local de feriados brasileiros (sem dependência de API externa).
+Nacionais fixos + móveis (baseados na Páscoa) para qualquer ano; tabelas estaduais e
+municipais são plugáveis via registrar_feriado_estadual / registrar_feriado_municipal.
+Os nomes dos nacionais seguem os da BrasilAPI usada anteriormente, para que feriados já
+sincronizados casem com a chave única (nivel, nivel_id, data_inicio, titulo).
+
+Cada regra é (quando, nome) ou (quando, nome, desde): quando = (mes, dia) para datas fixas
+ou um inteiro com o deslocamento em dias a partir do domingo de Páscoa.
+"""
+import unicodedata
+from datetime import date, timedelta
+
+
+FERIADOS_NACIONAIS = [
+    ((1, 1), 'Confraternização mundial'),
+    (-47, 'Carnaval'),
+    (-2, 'Sexta-feira Santa'),
+    (0, 'Páscoa'),
+    ((4, 21), 'Tiradentes'),
+    ((5, 1), 'Dia do trabalho'),
+    (60, 'Corpus Christi'),
+    ((9, 7), 'Independência do Brasil'),
+    ((10, 12), 'Nossa Senhora Aparecida'),
+    ((11, 2), 'Finados'),
+    ((11, 15), 'Proclamação da República'),
+    ((11, 20), 'Dia da consciência negra', 2024),  # Lei 14.759/2023
+    ((12, 25), 'Natal'),
+]
+
+# {UF: [regras]}
+FERIADOS_ESTADUAIS = {
+    'BA': [((7, 2), 'Independência da Bahia')],
+    'PR': [((12, 19), 'Emancipação Política do Paraná')],
+    'RJ': [((4, 23), 'Dia de São Jorge')],
+    'RS': [((9, 20), 'Revolução Farroupilha')],
+    'SP': [((7, 9), 'Revolução Constitucionalista de 1932')],
+}
+
+# {(UF, cidade normalizada): [regras]}
+FERIADOS_MUNICIPAIS = {
+    ('RJ', 'rio de janeiro'): [((1, 20), 'Dia de São Sebastião')],
+    ('SP', 'sao paulo'): [((1, 25), 'Aniversário de São Paulo')],
+}
+
+
+def _normalizar_cidade(cidade):
+    texto = unicodedata.normalize('NFKD', cidade or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+
+def registrar_feriado_estadual(uf, quando, nome, desde=None):
+    FERIADOS_ESTADUAIS.setdefault(uf.upper(), []).append((quando, nome, desde))
+
+
+def registrar_feriado_municipal(uf, cidade, quando, nome, desde=None):
+    chave = (uf.upper(), _normalizar_cidade(cidade))
+    FERIADOS_MUNICIPAIS.setdefault(chave, []).append((quando, nome, desde))
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)."""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def _aplicar_regras(regras, ano, domingo_pascoa, tipo):
+    for regra in regras:
+        quando, nome = regra[0], regra[1]
+        desde = regra[2] if len(regra) > 2 else None
+        if desde and ano < desde:
+            continue
+        if isinstance(quando, int):
+            data = domingo_pascoa + timedelta(days=quando)
+        else:
+            data = date(ano, quando[0], quando[1])
+        yield {'data': data, 'nome': nome, 'tipo': tipo}
+
+
+def feriados_do_ano(ano, uf=None, cidade=None):
+    """
+    Lista de feriados do ano ordenada por data: [{'data', 'nome', 'tipo'}], tipo em
+    nacional/estadual/municipal. UF e cidade (opcionais) acrescentam as tabelas locais.
+    """
+    domingo_pascoa = pascoa(ano)
+    lista = list(_aplicar_regras(FERIADOS_NACIONAIS, ano, domingo_pascoa, 'nacional'))
+    if uf:
+        uf = uf.upper()
+        lista += _aplicar_regras(FERIADOS_ESTADUAIS.get(uf, []), ano, domingo_pascoa, 'estadual')
+        if cidade:
+            regras = FERIADOS_MUNICIPAIS.get((uf, _normalizar_cidade(cidade)), [])
+            lista += _aplicar_regras(regras, ano, domingo_pascoa, 'municipal')
+    lista.sort(key=lambda f: f['data'])
+    return lista
@@ -72,3 +72,15 @@ def get_label(chave):
     """Retorna o label de um campo."""
     v = CAMPOS_ALUNO_PADRAO.get(chave)
     return v[0] if v else chave
+
+
+def completar_campos(chaves):
+    """
+    Chaves na ordem do formulário, com "categoria" logo após "peso" quando o formulário
+    tem peso, data de nascimento e sexo mas não tem categoria (a inscrição escolhe a
+    categoria por peso, idade e sexo). Aplicado ao salvar o formulário, nunca ao abrir a inscrição.
+    """
+    chaves = [c for c in chaves if c]
+    if all(c in chaves for c in ("peso", "data_nascimento", "sexo")) and "categoria" not in chaves:
+        chaves.insert(chaves.index("peso") + 1, "categoria")
+    return chaves
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Geração de iCalendar (RFC 5545) a partir das linhas de `eventos`.
+Aulas recorrentes viram RRULE semanal; exceções de cancelamento entram como EXDATE e
+exceções com novo horário como VEVENT com RECURRENCE-ID. Horários são "flutuantes"
+(hora local da academia), com X-WR-TIMEZONE para os clientes que o respeitam.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from utils.ocorrencias import _para_data, datas_recorrentes, parse_dias_semana
+
+PRODID = '-//UniMaster//Calendario//PT-BR'
+FUSO = 'America/Sao_Paulo'
+DOMINIO_UID = 'unimaster'
+BYDAY = ['SU', 'MO', 'TU', 'WE', 'TH', 'FR', 'SA']  # índice no padrão do sistema (0=Dom)
+
+
+def _escapar(texto):
+    texto = str(texto or '')
+    return (texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _dobrar(linha):
+    """Quebra linhas em 75 octetos (continuação começa com espaço)."""
+    if len(linha.encode('utf-8')) <= 75:
+        return linha
+    partes, atual, tamanho = [], '', 0
+    for c in linha:
+        n = len(c.encode('utf-8'))
+        if tamanho + n > (75 if not partes else 74):
+            partes.append(atual)
+            atual, tamanho = '', 0
+        atual += c
+        tamanho += n
+    partes.append(atual)
+    return '\r\n '.join(partes)
+
+
+def _hora(valor):
+    """TIME do MySQL (timedelta), time ou 'HH:MM[:SS]' -> time; None se vazio."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, time):
+        return valor
+    if hasattr(valor, 'total_seconds'):
+        minutos = int(valor.total_seconds()) // 60
+        return time((minutos // 60) % 24, minutos % 60)
+    partes = str(valor).split(':')
+    try:
+        return time(int(partes[0]) % 24, int(partes[1]) if len(partes) > 1 else 0)
+    except ValueError:
+        return None
+
+
+def _fmt_dt(dia, hora):
+    return datetime.combine(dia, hora).strftime('%Y%m%dT%H%M%S')
+
+
+def _linhas_tempo(d_ini, d_fim, h_ini, h_fim):
+    """DTSTART/DTEND: dia inteiro se não há hora de início (DTEND exclusivo)."""
+    if h_ini is None:
+        return [f"DTSTART;VALUE=DATE:{d_ini.strftime('%Y%m%d')}",
+                f"DTEND;VALUE=DATE:{((d_fim or d_ini) + timedelta(days=1)).strftime('%Y%m%d')}"]
+    inicio = datetime.combine(d_ini, h_ini)
+    fim = datetime.combine(d_fim or d_ini, h_fim) if h_fim else inicio + timedelta(hours=1)
+    if fim <= inicio:
+        fim = inicio + timedelta(hours=1)
+    return [f"DTSTART:{inicio.strftime('%Y%m%dT%H%M%S')}", f"DTEND:{fim.strftime('%Y%m%dT%H%M%S')}"]
+
+
+def _vevent(evento, carimbo, linhas_tempo, extras=()):
+    linhas = ['BEGIN:VEVENT',
+              f"UID:evento-{evento['id']}@{DOMINIO_UID}",
+              f"DTSTAMP:{carimbo}"]
+    linhas += linhas_tempo
+    linhas.append(f"SUMMARY:{_escapar(evento.get('titulo'))}")
+    if evento.get('descricao'):
+        linhas.append(f"DESCRIPTION:{_escapar(evento['descricao'])}")
+    if evento.get('tipo'):
+        linhas.append(f"CATEGORIES:{_escapar(evento['tipo'])}")
+    linhas += extras
+    linhas.append('END:VEVENT')
+    return linhas
+
+
+def _eventos_recorrentes(evento, excecoes_evento, carimbo):
+    dias = parse_dias_semana(evento.get('dias_semana'))
+    d_ini = _para_data(evento.get('data_inicio')) or date.today()
+    primeira = next(datas_recorrentes(dias, d_ini, d_ini + timedelta(days=6)), None)
+    if primeira is None:
+        return []
+    h_ini, h_fim = _hora(evento.get('hora_inicio')), _hora(evento.get('hora_fim'))
+
+    def ref(dia):
+        if h_ini is None:
+            return f"RECURRENCE-ID;VALUE=DATE:{dia.strftime('%Y%m%d')}", f"EXDATE;VALUE=DATE:{dia.strftime('%Y%m%d')}"
+        return f"RECURRENCE-ID:{_fmt_dt(dia, h_ini)}", f"EXDATE:{_fmt_dt(dia, h_ini)}"
+
+    extras = [f"RRULE:FREQ=WEEKLY;BYDAY={','.join(BYDAY[d] for d in sorted(dias))}"]
+    alteradas = []
+    for dia, excecao in sorted(excecoes_evento, key=lambda item: item[0]):
+        if dia < primeira:
+            continue
+        if excecao.get('tipo') == 'cancelamento':
+            extras.append(ref(dia)[1])
+        elif excecao.get('nova_hora_inicio'):
+            alteradas.append((dia, excecao))
+
+    linhas = _vevent(evento, carimbo, _linhas_tempo(primeira, primeira, h_ini, h_fim), extras)
+    for dia, excecao in alteradas:
+        nova_ini, nova_fim = _hora(excecao['nova_hora_inicio']), _hora(excecao.get('nova_hora_fim'))
+        linhas += _vevent(evento, carimbo, _linhas_tempo(dia, dia, nova_ini, nova_fim), [ref(dia)[0]])
+    return linhas
+
+
+def calendario_ics(nome, eventos_normais, eventos_recorrentes, excecoes=None):
+    """
+    Texto .ics completo. excecoes = {(evento_id, data): exceção} (ver ocorrencias.buscar_excecoes).
+    """
+    carimbo = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    por_evento = {}
+    for (evento_id, dia), excecao in (excecoes or {}).items():
+        por_evento.setdefault(evento_id, []).append((dia, excecao))
+
+    linhas = ['BEGIN:VCALENDAR',
+              'VERSION:2.0',
+              f'PRODID:{PRODID}',
+              'CALSCALE:GREGORIAN',
+              'METHOD:PUBLISH',
+              f'X-WR-CALNAME:{_escapar(nome)}',
+              f'X-WR-TIMEZONE:{FUSO}']
+    for evento in eventos_normais:
+        d_ini = _para_data(evento.get('data_inicio'))
+        if d_ini is None:
+            continue
+        d_fim = _para_data(evento.get('data_fim'))
+        if d_fim and d_fim < d_ini:
+            d_fim = d_ini
+        tempo = _linhas_tempo(d_ini, d_fim, _hora(evento.get('hora_inicio')), _hora(evento.get('hora_fim')))
+        linhas += _vevent(evento, carimbo, tempo)
+    for evento in eventos_recorrentes:
+        linhas += _eventos_recorrentes(evento, por_evento.get(evento['id'], []), carimbo)
+    linhas.append('END:VCALENDAR')
+    return '\r\n'.join(_dobrar(l) for l in linhas) + '\r\n'
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de ocorrências do calendário.
+Expande eventos recorrentes (dias_semana: 0=Dom, 1=Seg ... 6=Sáb) e eventos de
+vários dias para qualquer janela de datas (mês, semana, ano), de forma preguiçosa.
+As datas recorrentes são calculadas aritmeticamente (primeira data de cada dia da
+semana + passos de 7 dias), sem percorrer todos os dias do período.
+Exceções (eventos_excecoes) entram por um mapa pré-indexado {(evento_id, data): exceção}.
+"""
+import heapq
+from datetime import date, datetime, timedelta
+
+
+# ============================================================
+# 🔹 Janelas de datas (início e fim inclusivos)
+# ============================================================
+def janela_mes(ano, mes):
+    inicio = date(ano, mes, 1)
+    fim = date(ano + (mes == 12), mes % 12 + 1, 1) - timedelta(days=1)
+    return inicio, fim
+
+
+def janela_semana(dia):
+    """Semana de domingo a sábado que contém `dia`."""
+    inicio = dia - timedelta(days=(dia.weekday() + 1) % 7)
+    return inicio, inicio + timedelta(days=6)
+
+
+def janela_ano(ano):
+    return date(ano, 1, 1), date(ano, 12, 31)
+
+
+# ============================================================
+# 🔹 Conversões
+# ============================================================
+def hora_para_sort(hora):
+    """Converte hora (time/timedelta/str) para string ordenável HH:MM."""
+    if hora is None:
+        return '00:00'
+    if hasattr(hora, 'strftime'):
+        return hora.strftime('%H:%M')
+    if hasattr(hora, 'total_seconds'):
+        s = int(hora.total_seconds())
+        h, m = divmod(s // 60, 60)
+        return f'{h:02d}:{m:02d}'
+    s = str(hora)
+    return s[:5] if len(s) >= 5 else '00:00'
+
+
+def _para_data(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+
+def dia_sistema(dia):
+    """Dia da semana no padrão do sistema (0=Dom ... 6=Sáb)."""
+    return (dia.weekday() + 1) % 7
+
+
+def parse_dias_semana(dias_semana):
+    """'1,3,5' -> frozenset({1, 3, 5}). Valores inválidos são ignorados."""
+    if not dias_semana:
+        return frozenset()
+    if isinstance(dias_semana, (set, frozenset, list, tuple)):
+        return frozenset(int(d) for d in dias_semana if 0 <= int(d) <= 6)
+    dias = set()
+    for d in str(dias_semana).split(','):
+        d = d.strip()
+        if d.isdigit() and 0 <= int(d) <= 6:
+            dias.add(int(d))
+    return frozenset(dias)
+
+
+def ocorre_em(dias_semana, dia):
+    """True se o padrão de dias_semana inclui a data."""
+    return dia_sistema(dia) in parse_dias_semana(dias_semana)
+
+
+def indexar_por_dia_semana(itens, chave_data=lambda item: item):
+    """{dia_sistema: [itens]} — índice para cruzar datas avulsas com padrões dias_semana."""
+    por_dia = {}
+    for item in itens:
+        por_dia.setdefault(dia_sistema(_para_data(chave_data(item))), []).append(item)
+    return por_dia
+
+
+def cruzar_dias_semana(por_dia, dias_semana):
+    """Itens de um índice indexar_por_dia_semana que caem nos dias_semana (interseção direta)."""
+    for d in sorted(parse_dias_semana(dias_semana)):
+        yield from por_dia.get(d, ())
+
+
+def indexar_excecoes(excecoes):
+    """Linhas de eventos_excecoes -> {(evento_id, data): exceção}."""
+    return {(e['evento_id'], _para_data(e['data_excecao'])): e for e in excecoes}
+
+
+def buscar_excecoes(cursor, evento_ids, inicio, fim):
+    """
+    Exceções apenas dos eventos recorrentes informados, na janela [inicio, fim].
+    Usa a chave única (evento_id, data_excecao) da tabela; retorna o mapa indexado.
+    cursor deve ser dictionary=True.
+    """
+    evento_ids = sorted({i for i in evento_ids if i})
+    if not evento_ids:
+        return {}
+    ph = ','.join(['%s'] * len(evento_ids))
+    cursor.execute(f"""
+        SELECT evento_id, data_excecao, tipo, motivo, nova_hora_inicio, nova_hora_fim
+        FROM eventos_excecoes
+        WHERE evento_id IN ({ph}) AND data_excecao BETWEEN %s AND %s
+    """, tuple(evento_ids) + (inicio, fim))
+    return indexar_excecoes(cursor.fetchall())
+
+
+# ============================================================
+# 🔹 Expansão
+# ============================================================
+def datas_recorrentes(dias_semana, inicio, fim):
+    """Gera, em ordem, as datas entre inicio e fim (inclusivo) que caem nos dias_semana."""
+    dias = parse_dias_semana(dias_semana)
+    if not dias or fim < inicio:
+        return
+    # Deslocamento (0..6) a partir de `inicio` até cada dia da semana pedido
+    base = dia_sistema(inicio)
+    deslocamentos = sorted((d - base) % 7 for d in dias)
+    semana = inicio
+    while semana <= fim:
+        for desloc in deslocamentos:
+            d = semana + timedelta(days=desloc)
+            if d > fim:
+                return
+            yield d
+        semana += timedelta(days=7)
+
+
+def expandir_recorrente(evento, inicio, fim, excecoes=None):
+    """
+    Ocorrências de um evento recorrente na janela. Exceções de 'cancelamento' removem a data;
+    exceções com nova_hora_inicio alteram o horário daquela ocorrência.
+    """
+    excecoes = excecoes or {}
+    for d in datas_recorrentes(evento.get('dias_semana'), inicio, fim):
+        excecao = excecoes.get((evento['id'], d))
+        if excecao and excecao.get('tipo') == 'cancelamento':
+            continue
+        ocorrencia = dict(evento)
+        ocorrencia['data_inicio'] = d
+        ocorrencia['data_fim'] = d
+        if excecao and excecao.get('nova_hora_inicio'):
+            ocorrencia['hora_inicio'] = excecao['nova_hora_inicio']
+            ocorrencia['hora_fim'] = excecao['nova_hora_fim']
+        yield ocorrencia
+
+
+def expandir_periodo(evento, inicio, fim):
+    """Ocorrências diárias de um evento de vários dias (data_inicio..data_fim) dentro da janela."""
+    d_ini = _para_data(evento['data_inicio'])
+    d_fim = _para_data(evento.get('data_fim')) or d_ini
+    if d_fim < d_ini:
+        d_fim = d_ini
+    d = max(d_ini, inicio)
+    ultimo = min(d_fim, fim)
+    while d <= ultimo:
+        ocorrencia = dict(evento)
+        ocorrencia['data_inicio'] = d
+        ocorrencia['data_fim'] = d_fim
+        yield ocorrencia
+        d += timedelta(days=1)
+
+
+def _chave_ordem(ocorrencia):
+    return (ocorrencia['data_inicio'], hora_para_sort(ocorrencia.get('hora_inicio')))
+
+
+def ocorrencias(eventos_normais, eventos_recorrentes, inicio, fim, excecoes=None):
+    """
+    Gera todas as ocorrências da janela ordenadas por (data, hora), sem montar listas
+    intermediárias: cada evento é um gerador já ordenado e o resultado é um merge.
+    """
+    geradores = [expandir_periodo(ev, inicio, fim) for ev in eventos_normais]
+    geradores += [expandir_recorrente(ev, inicio, fim, excecoes) for ev in eventos_recorrentes
+                  if ev.get('dias_semana')]
+    # Cada gerador é ordenado por data; dentro do mesmo dia o merge ordena pela hora
+    return heapq.merge(*geradores, key=_chave_ordem)
+
+
+def agrupar_por_data(ocorrencias_iter):
+    """{'AAAA-MM-DD': [ocorrências]} preservando a ordem recebida."""
+    por_data = {}
+    for ocorrencia in ocorrencias_iter:
+        por_data.setdefault(ocorrencia['data_inicio'].strftime('%Y-%m-%d'), []).append(ocorrencia)
+    return por_data
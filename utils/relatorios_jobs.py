@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Relatórios gerados em segundo plano, com progresso, numa fila persistida em relatorios_jobs.
+
+- enfileirar() grava o job (tipo + parâmetros em JSON) e o entrega a um pool de threads
+  local; a requisição volta na hora com o id.
+- O gerador registrado para o tipo roda com o contexto da aplicação, informa o progresso
+  (linhas desenhadas / total) e devolve o arquivo final, que fica em disco (instance/)
+  e é servido pela rota de download.
+- Enquanto gera, o job grava heartbeat_em a cada INTERVALO_HEARTBEAT (lease). Como os
+  parâmetros estão no banco, retomar() — chamado só pelo ponto de entrada do servidor
+  (run_production.py), nunca ao importar app.py — recoloca na fila os jobs 'processando'
+  cujo lease venceu (até MAX_TENTATIVAS; os demais viram erro) e repete a verificação a
+  cada LEASE_SEGUNDOS. Jobs com lease em dia seguem com o processo que os gera.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+from config import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get("RELATORIOS_WORKERS", "2"))
+MAX_TENTATIVAS = 2
+JOB_TTL_DIAS = 7
+INTERVALO_PROGRESSO = 1.0  # segundos entre gravações do progresso no banco
+INTERVALO_HEARTBEAT = 30  # segundos entre sinais de vida do job em processamento
+LEASE_SEGUNDOS = 120  # sem heartbeat por mais que isso, o job é dado como interrompido
+
+_geradores = {}
+_lock = threading.Lock()
+_executor = None
+_vigia = None
+
+
+def registrar(tipo):
+    """
+    Decorador do gerador de um tipo de relatório:
+        gerador(parametros, progresso) -> {"caminho", "nome_download", "mimetype"}
+    progresso(linhas_processadas, linhas_total) pode ser chamado quantas vezes quiser.
+    """
+    def decorador(funcao):
+        _geradores[tipo] = funcao
+        return funcao
+    return decorador
+
+
+def _obter_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="relatorio")
+        return _executor
+
+
+def _executar_sql(sql, params):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+        conn.close()
+
+
+def enfileirar(app, tipo, usuario_id, parametros, evento_id=None):
+    """Grava e agenda o job. Retorna o id, ou None se a tabela (migração) não existe."""
+    job_id = uuid.uuid4().hex
+    try:
+        _executar_sql("""
+            INSERT INTO relatorios_jobs (id, tipo, usuario_id, evento_id, parametros)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (job_id, tipo, usuario_id, evento_id, json.dumps(parametros, default=str)))
+    except mysql.connector.errors.ProgrammingError as e:
+        logger.warning("relatorios_jobs indisponível: %s", e)
+        return None
+    _obter_executor().submit(_executar, app, job_id)
+    return job_id
+
+
+def _executar(app, job_id):
+    with app.app_context():
+        # Só um worker assume o job (fila retomada por mais de um processo, por exemplo)
+        if not _executar_sql("""
+            UPDATE relatorios_jobs
+            SET status = 'processando', tentativas = tentativas + 1, iniciado_em = NOW(),
+                linhas_processadas = 0, erro = NULL
+            WHERE id = %s AND status = 'pendente'
+        """, (job_id,)):
+            return
+
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("SELECT tipo, parametros FROM relatorios_jobs WHERE id = %s", (job_id,))
+            job = cur.fetchone()
+        finally:
+            cur.close()
+            conn.close()
+
+        parar = threading.Event()
+        threading.Thread(target=_pulsar, args=(job_id, parar), daemon=True,
+                         name=f"relatorio-heartbeat-{job_id[:8]}").start()
+        try:
+            _gerar(app, job_id, job)
+        finally:
+            parar.set()
+
+
+def _pulsar(job_id, parar):
+    """Renova o lease do job até o gerador terminar."""
+    while not parar.wait(INTERVALO_HEARTBEAT):
+        try:
+            _executar_sql(
+                "UPDATE relatorios_jobs SET heartbeat_em = NOW() WHERE id = %s AND status = 'processando'",
+                (job_id,))
+        except mysql.connector.Error as e:
+            logger.warning("Heartbeat do relatório %s não gravado: %s", job_id, e)
+
+
+def _gerar(app, job_id, job):
+    ultimo = [0.0]
+
+    def progresso(feitas, total):
+        agora = time.monotonic()
+        if agora - ultimo[0] < INTERVALO_PROGRESSO and feitas < total:
+            return
+        ultimo[0] = agora
+        try:
+            _executar_sql(
+                "UPDATE relatorios_jobs SET linhas_processadas = %s, linhas_total = %s WHERE id = %s",
+                (feitas, total, job_id))
+        except mysql.connector.Error as e:
+            logger.warning("Progresso do relatório %s não gravado: %s", job_id, e)
+
+    try:
+        gerador = _geradores.get(job["tipo"])
+        if gerador is None:
+            raise ValueError(f"Tipo de relatório desconhecido: {job['tipo']}")
+        resultado = gerador(json.loads(job["parametros"]), progresso)
+        _executar_sql("""
+            UPDATE relatorios_jobs
+            SET status = 'concluido', linhas_processadas = linhas_total, arquivo = %s,
+                nome_download = %s, mimetype = %s, concluido_em = NOW()
+            WHERE id = %s
+        """, (os.path.relpath(resultado["caminho"], app.instance_path),
+              resultado["nome_download"], resultado["mimetype"], job_id))
+    except ImportError:
+        _falhar(job_id, "Biblioteca reportlab não instalada. Use exportar em Excel.")
+    except Exception as e:
+        logger.error("Erro ao gerar relatório %s: %s", job_id, e, exc_info=True)
+        _falhar(job_id, f"Erro ao gerar relatório: {e}")
+
+
+def _falhar(job_id, mensagem):
+    try:
+        _executar_sql(
+            "UPDATE relatorios_jobs SET status = 'erro', erro = %s, concluido_em = NOW() WHERE id = %s",
+            (mensagem[:2000], job_id))
+    except mysql.connector.Error as e:
+        logger.error("Falha do relatório %s não gravada: %s", job_id, e)
+
+
+def obter(job_id, usuario_id):
+    """Estado do job (com progresso em %), apenas para o usuário que o pediu; ou None."""
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT id, tipo, evento_id, status, linhas_total, linhas_processadas, arquivo,
+                   nome_download, mimetype, erro
+            FROM relatorios_jobs WHERE id = %s AND usuario_id = %s
+        """, (job_id, usuario_id))
+        job = cur.fetchone()
+    except mysql.connector.errors.ProgrammingError:
+        return None
+    finally:
+        cur.close()
+        conn.close()
+    if job:
+        total = job["linhas_total"] or 0
+        if job["status"] == "concluido":
+            job["progresso"] = 100
+        else:
+            job["progresso"] = int(99 * job["linhas_processadas"] / total) if total else 0
+    return job
+
+
+def caminho_arquivo(app, job):
+    """Caminho do arquivo de um job concluído, ou None se já saiu do disco."""
+    if not job or job["status"] != "concluido" or not job["arquivo"]:
+        return None
+    base = os.path.realpath(app.instance_path)
+    caminho = os.path.realpath(os.path.join(base, job["arquivo"]))
+    if not caminho.startswith(base + os.sep) or not os.path.isfile(caminho):
+        return None
+    return caminho
+
+
+def _recolocar_expirados(app, limpar=False):
+    """
+    Jobs 'processando' com lease vencido voltam a 'pendente' (ou viram erro depois de
+    MAX_TENTATIVAS) e todos os pendentes são agendados; limpar apaga os antigos.
+    Agendar um pendente que outro processo já agendou é inofensivo: _executar só roda
+    o job se conseguir passá-lo de 'pendente' para 'processando'.
+    """
+    try:
+        conn = get_db_connection()
+    except mysql.connector.Error as e:
+        logger.warning("Fila de relatórios não verificada: %s", e)
+        return
+    cur = conn.cursor()
+    # heartbeat_em de uma tentativa anterior não conta: vale o mais recente entre ele e iniciado_em
+    expirado = ("status = 'processando' AND GREATEST(COALESCE(heartbeat_em, iniciado_em), iniciado_em)"
+                " < NOW() - INTERVAL %s SECOND")
+    try:
+        if limpar:
+            cur.execute("DELETE FROM relatorios_jobs WHERE criado_em < NOW() - INTERVAL %s DAY", (JOB_TTL_DIAS,))
+        cur.execute(f"""
+            UPDATE relatorios_jobs
+            SET status = 'erro', erro = 'Geração interrompida (processo encerrado).', concluido_em = NOW()
+            WHERE {expirado} AND tentativas >= %s
+        """, (LEASE_SEGUNDOS, MAX_TENTATIVAS))
+        cur.execute(f"UPDATE relatorios_jobs SET status = 'pendente' WHERE {expirado}", (LEASE_SEGUNDOS,))
+        recolocados = cur.rowcount
+        cur.execute("SELECT id FROM relatorios_jobs WHERE status = 'pendente' ORDER BY criado_em")
+        pendentes = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    except mysql.connector.errors.ProgrammingError as e:
+        logger.warning("Fila de relatórios não verificada (migrations create_relatorios_jobs.sql e "
+                       "add_relatorios_jobs_heartbeat.sql): %s", e)
+        return
+    finally:
+        cur.close()
+        conn.close()
+    for job_id in pendentes:
+        _obter_executor().submit(_executar, app, job_id)
+    if recolocados:
+        logger.info("%s relatório(s) interrompido(s) recolocado(s) na fila.", recolocados)
+
+
+def _vigiar(app):
+    while True:
+        time.sleep(LEASE_SEGUNDOS)
+        _recolocar_expirados(app)
+
+
+def retomar(app):
+    """
+    Chamado uma vez pelo ponto de entrada do servidor: retoma os jobs cujo lease venceu,
+    agenda os pendentes, apaga os antigos e inicia a verificação periódica dos leases.
+    """
+    global _vigia
+    _recolocar_expirados(app, limpar=True)
+    with _lock:
+        if _vigia is None:
+            _vigia = threading.Thread(target=_vigiar, args=(app,), daemon=True, name="relatorios-vigia")
+            _vigia.start()